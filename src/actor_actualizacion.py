@@ -0,0 +1,124 @@
+"""
+actor_actualizacion.py
+Bucle común de los Actores de actualizaciones asíncronas (DEVOLUCION y
+RENOVACION, ver actor_devolucion.py y actor_renovacion.py).
+
+Responsabilidades:
+- Anunciarse al Gestor de Carga (GC) como consumidor del tópico
+  (ZeroMQ DEALER hacia el ROUTER del GC, ver bandeja_salida.py).
+- Juntar los mensajes que ya estén esperando en un micro-lote (hasta
+  LOTE_MAX_MENSAJES o LOTE_MAX_ESPERA_MS) y enviarlos al GA en una sola
+  solicitud LOTE, que el GA aplica en orden y guarda con una sola escritura.
+- Si el GA primario falla, reenviar al Gestor de Almacenamiento Respaldo
+  (timeouts según los RTT observados, ver cliente_ga.py).
+- Confirmar (ACK) cada mensaje que el GA aplicó o rechazó por una regla
+  del negocio; si no respondió ningún GA o hubo un error interno responde
+  NACK y el GC lo vuelve a entregar más tarde.
+"""
+
+import time
+
+import zmq
+
+from config import (
+    SEDE1_HOST,
+    SEDE2_HOST,
+    GC_PUB_SEDE1_PORT,
+    GC_PUB_SEDE2_PORT,
+    ACTOR_HEARTBEAT_INTERVALO,
+    LOTE_MAX_MENSAJES,
+    LOTE_MAX_ESPERA_MS,
+)
+from cliente_ga import ClienteGA
+from bandeja_salida import (
+    conectar_consumidor,
+    leer_entrega,
+    drenar_lote,
+    mensaje_anuncio,
+    mensaje_ack,
+    mensaje_nack,
+    se_puede_confirmar,
+)
+from transporte import direccion_conexion
+
+
+def resultados_del_lote(respuesta_ga: dict, cantidad: int) -> list:
+    """Resultado de cada operación: los de un LOTE, o la misma respuesta para todas."""
+    resultados = respuesta_ga.get("resultados") if cantidad > 1 else None
+    if not isinstance(resultados, list) or len(resultados) != cantidad:
+        return [respuesta_ga] * cantidad
+    return resultados
+
+
+def ejecutar_actor_actualizacion(sede: str, topico: str, nombre: str):
+    """
+    Consume 'topico' (DEVOLUCION o RENOVACION) de la bandeja de salida del
+    GC de 'sede' y aplica cada mensaje en el GA con la acción del mismo
+    nombre. 'nombre' identifica al Actor en los mensajes.
+    """
+
+    context = zmq.Context.instance()
+    cliente_ga = ClienteGA(context, nombre)
+
+    if sede == "1":
+        host_gc = SEDE1_HOST
+        puerto_pub = GC_PUB_SEDE1_PORT
+    else:
+        host_gc = SEDE2_HOST
+        puerto_pub = GC_PUB_SEDE2_PORT
+
+    socket_gc = conectar_consumidor(context, direccion_conexion(host_gc, puerto_pub))
+    socket_gc.send_multipart(mensaje_anuncio(topico))
+    ultimo_anuncio = time.time()
+    print(f"{nombre} consumiendo {topico} de {host_gc}:{puerto_pub}.")
+
+    while True:
+        try:
+            # Heartbeat: el GC solo entrega a Actores que se anuncian
+            if time.time() - ultimo_anuncio >= ACTOR_HEARTBEAT_INTERVALO:
+                socket_gc.send_multipart(mensaje_anuncio(topico))
+                ultimo_anuncio = time.time()
+
+            if not socket_gc.poll(int(ACTOR_HEARTBEAT_INTERVALO * 1000)):
+                continue
+
+            partes = socket_gc.recv_multipart()
+            entrega = leer_entrega(partes)
+            if entrega is None:
+                print(f"{nombre} recibió un mensaje mal formado: {partes}")
+                continue
+
+            # Micro-lote: se toman también los mensajes que ya estén esperando
+            lote = drenar_lote(socket_gc, entrega, LOTE_MAX_MENSAJES, LOTE_MAX_ESPERA_MS)
+            for _, _, mensaje_gc in lote:
+                print(f"{nombre} recibió del GC: {mensaje_gc}")
+
+            operaciones = [
+                {
+                    "accion": topico,
+                    "codigo_libro": mensaje_gc.get("codigo_libro"),
+                    "usuario": mensaje_gc.get("usuario", "desconocido"),
+                    "id_operacion": mensaje_gc.get("id_operacion")
+                }
+                for _, _, mensaje_gc in lote
+            ]
+
+            if len(operaciones) == 1:
+                mensaje_ga = operaciones[0]
+            else:
+                mensaje_ga = {"accion": "LOTE", "operaciones": operaciones}
+
+            respuesta_ga, origen = cliente_ga.enviar(mensaje_ga)
+            print(f"{nombre} recibió del GA ({origen}): {respuesta_ga}")
+
+            # Lo que no se pudo aplicar lo reentrega el GC; un reintento de
+            # algo ya aplicado lo descarta la deduplicación del GA
+            confirmar_lote = se_puede_confirmar(respuesta_ga, origen)
+            for (id_mensaje, _, _), resultado in zip(lote, resultados_del_lote(respuesta_ga, len(lote))):
+                if confirmar_lote and se_puede_confirmar(resultado, origen):
+                    socket_gc.send_multipart(mensaje_ack(id_mensaje))
+                else:
+                    socket_gc.send_multipart(mensaje_nack(id_mensaje))
+
+        except Exception as e:
+            print(f"Error en {nombre}: {e}")
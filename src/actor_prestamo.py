@@ -1,12 +1,17 @@
 """
 actor_prestamo.py
-Actor responsable de atender solicitudes de PRESTAMO.
+Actor responsable de atender solicitudes de PRESTAMO (y RESERVA, la lista
+de espera de un libro sin ejemplares).
 
 Responsabilidades:
 - Recibir solicitudes de préstamo del Gestor de Carga (GC) mediante ZeroMQ (REQ/REP).
 - Enviar la operación al Gestor de Almacenamiento primario.
-- Si el GA primario falla o no responde, reenviar al Gestor de Almacenamiento Respaldo.
+- Si el GA primario falla o no responde, reenviar al Gestor de Almacenamiento Respaldo
+  (timeouts según los RTT observados; las consultas se cubren con el
+  otro GA, ver cliente_ga.py).
 - Retornar al GC la respuesta que entregue el GA (primario o respaldo).
+- No enviar al GA una solicitud cuyo plazo ya venció (ver plazos.py) y
+  reenviarle el plazo a las demás.
 """
 
 import json
@@ -15,55 +20,12 @@ import sys
 import zmq
 
 from config import (
-    SEDE1_HOST,
-    SEDE2_HOST,
     GC_TO_LOAN_ACTOR_SEDE1_PORT,
     GC_TO_LOAN_ACTOR_SEDE2_PORT,
-    GA_PRIMARY_PORT,
-    GA_REPLICA_PORT,
 )
-
-
-def enviar_a_ga(context: zmq.Context, mensaje_ga: dict):
-    """
-    Envía una operación al GA primario. Si no responde en el tiempo
-    configurado o hay error, intenta con el GA de respaldo.
-
-    Retorna:
-        (respuesta_dict, origen)
-        origen ∈ {"primario", "respaldo", "ninguno"}
-    """
-
-    # Intento con GA primario
-    socket_ga = context.socket(zmq.REQ)
-    socket_ga.connect(f"tcp://{SEDE1_HOST}:{GA_PRIMARY_PORT}")
-    socket_ga.setsockopt(zmq.RCVTIMEO, 3000)
-    socket_ga.setsockopt(zmq.SNDTIMEO, 3000)
-
-    try:
-        socket_ga.send_string(json.dumps(mensaje_ga))
-        respuesta_ga_str = socket_ga.recv_string()
-        socket_ga.close()
-        return json.loads(respuesta_ga_str), "primario"
-    except Exception as e:
-        socket_ga.close()
-        print(f"Actor Prestamo: fallo al comunicarse con GA primario: {e}")
-
-    # Intento con GA respaldo
-    socket_ga = context.socket(zmq.REQ)
-    socket_ga.connect(f"tcp://{SEDE1_HOST}:{GA_REPLICA_PORT}")
-    socket_ga.setsockopt(zmq.RCVTIMEO, 3000)
-    socket_ga.setsockopt(zmq.SNDTIMEO, 3000)
-
-    try:
-        socket_ga.send_string(json.dumps(mensaje_ga))
-        respuesta_ga_str = socket_ga.recv_string()
-        socket_ga.close()
-        return json.loads(respuesta_ga_str), "respaldo"
-    except Exception as e:
-        socket_ga.close()
-        print(f"Actor Prestamo: fallo al comunicarse con GA respaldo: {e}")
-        return {"ok": False, "mensaje": "Error al comunicarse con GA primario y GA respaldo."}, "ninguno"
+from cliente_ga import ClienteGA
+from plazos import DESCARTADAS, descartar_si_vencido
+from transporte import direccion_bind
 
 
 def ejecutar_actor_prestamo(sede: str):
@@ -73,7 +35,8 @@ def ejecutar_actor_prestamo(sede: str):
     - sede: "1" o "2"
     """
 
-    context = zmq.Context()
+    context = zmq.Context.instance()
+    cliente_ga = ClienteGA(context, f"Actor Prestamo (sede {sede})")
 
     if sede == "1":
         puerto_gc_actor = GC_TO_LOAN_ACTOR_SEDE1_PORT
@@ -81,7 +44,7 @@ def ejecutar_actor_prestamo(sede: str):
         puerto_gc_actor = GC_TO_LOAN_ACTOR_SEDE2_PORT
 
     socket_desde_gc = context.socket(zmq.REP)
-    socket_desde_gc.bind(f"tcp://*:{puerto_gc_actor}")
+    socket_desde_gc.bind(direccion_bind(puerto_gc_actor))
     print(f"Actor de Prestamo de sede {sede} escuchando al GC en puerto {puerto_gc_actor}.")
 
     while True:
@@ -91,13 +54,27 @@ def ejecutar_actor_prestamo(sede: str):
 
             print(f"Actor Prestamo (sede {sede}) recibió del GC: {mensaje_gc}")
 
+            vencida = descartar_si_vencido(mensaje_gc, "el Actor de Préstamo")
+            if vencida is not None:
+                print(f"Actor Prestamo (sede {sede}): plazo vencido, no se envía al GA "
+                      f"(descartadas: {DESCARTADAS.resumen()})")
+                socket_desde_gc.send_string(json.dumps(vencida))
+                continue
+
             mensaje_ga = {
                 "accion": mensaje_gc.get("accion"),
                 "codigo_libro": mensaje_gc.get("codigo_libro"),
-                "usuario": mensaje_gc.get("usuario", "desconocido")
+                "usuario": mensaje_gc.get("usuario", "desconocido"),
+                "id_operacion": mensaje_gc.get("id_operacion")
             }
 
-            respuesta_ga, origen = enviar_a_ga(context, mensaje_ga)
+            if mensaje_ga["accion"] == "BUSCAR":
+                mensaje_ga["texto"] = mensaje_gc.get("texto", "")
+                mensaje_ga["pagina"] = mensaje_gc.get("pagina", 1)
+            if "plazo" in mensaje_gc:
+                mensaje_ga["plazo"] = mensaje_gc["plazo"]
+
+            respuesta_ga, origen = cliente_ga.enviar(mensaje_ga)
             print(f"Actor Prestamo (sede {sede}) recibió del GA ({origen}): {respuesta_ga}")
 
             socket_desde_gc.send_string(json.dumps(respuesta_ga))
@@ -0,0 +1,335 @@
+"""
+actores_async.py
+Versiones asyncio (zmq.asyncio) de los Actores de préstamo, devolución y
+renovación.
+
+Responsabilidades:
+- Igual que actor_prestamo.py, actor_devolucion.py y actor_renovacion.py,
+  pero cada mensaje es una tarea del event loop: muchas operaciones en vuelo
+  a la vez, solapando los viajes al GA, los timeouts y el reintento con el
+  GA de respaldo, sin un hilo por solicitud.
+- El Actor de préstamo usa un ROUTER hacia el GC (el GC sigue usando REQ).
+- Los Actores de devolución/renovación consumen la bandeja de salida del GC
+  (ver bandeja_salida.py) y mantienen el orden por libro: una operación
+  espera a la anterior del mismo libro antes de ir al GA.
+- ACTOR_MAX_EN_VUELO limita cuántas operaciones hay abiertas por proceso.
+"""
+
+import asyncio
+import json
+import sys
+import time
+
+import zmq
+import zmq.asyncio
+
+from config import (
+    SEDE1_HOST,
+    SEDE2_HOST,
+    GC_PUB_SEDE1_PORT,
+    GC_PUB_SEDE2_PORT,
+    GC_TO_LOAN_ACTOR_SEDE1_PORT,
+    GC_TO_LOAN_ACTOR_SEDE2_PORT,
+    TOPIC_DEVOLUCION,
+    TOPIC_RENOVACION,
+    ACTOR_MAX_EN_VUELO,
+    ACTOR_HEARTBEAT_INTERVALO,
+    ACTOR_COBERTURA_ACTIVA,
+)
+from cliente_ga import (
+    ENDPOINTS_GA,
+    RESPUESTA_SIN_GA,
+    EstadisticasRTT,
+    MandatoVisto,
+    acotar_al_plazo,
+    es_solo_lectura,
+)
+from plazos import descartar_si_vencido
+from bandeja_salida import (
+    conectar_consumidor,
+    leer_entrega,
+    mensaje_anuncio,
+    mensaje_ack,
+    mensaje_nack,
+    se_puede_confirmar,
+)
+from transporte import direccion_bind, direccion_conexion
+
+
+# ============================
+# Comunicación con el GA
+# ============================
+
+class ClienteGAAsync:
+    """
+    Versión asyncio de cliente_ga.ClienteGA: timeouts según los RTT
+    observados con cada GA, consultas de solo lectura cubiertas con el
+    otro GA después del p95 del primero y preferencia por el GA con el
+    mayor mandato.
+
+    enviar() retorna (respuesta_dict, origen), origen ∈ {"primario",
+    "respaldo", "ninguno"}.
+    """
+
+    def __init__(self, context: zmq.asyncio.Context, nombre_actor: str,
+                 endpoints=ENDPOINTS_GA, cobertura: bool = ACTOR_COBERTURA_ACTIVA):
+        self.context = context
+        self.nombre_actor = nombre_actor
+        self.endpoints = endpoints
+        self.cobertura = cobertura
+
+        self.rtt = {origen: EstadisticasRTT() for _, origen in endpoints}
+        self.visto = MandatoVisto(endpoints)
+
+        self.cubiertas = 0
+        self.ganadas_por_cobertura = 0
+
+    async def _intentar(self, endpoint: str, origen: str, mensaje_ga: dict):
+        """Un intento con un GA. Retorna la respuesta o None si falló."""
+        timeout_rtt = self.rtt[origen].timeout_ms()
+        timeout_ms = acotar_al_plazo(timeout_rtt, mensaje_ga)
+        timeout = timeout_ms / 1000.0
+        inicio = time.perf_counter()
+
+        socket_ga = self.context.socket(zmq.REQ)
+        socket_ga.setsockopt(zmq.LINGER, 0)
+        socket_ga.connect(endpoint)
+
+        try:
+            await asyncio.wait_for(socket_ga.send_string(self.visto.serializar(mensaje_ga)), timeout)
+            respuesta_ga_str = await asyncio.wait_for(socket_ga.recv_string(), timeout)
+            self.rtt[origen].registrar(time.perf_counter() - inicio)
+            respuesta = self.visto.revisar(origen, json.loads(respuesta_ga_str))
+            if respuesta is None:
+                print(f"{self.nombre_actor}: GA {origen} está relegado")
+            return respuesta
+        except asyncio.TimeoutError:
+            # Un corte por el plazo no dice nada del RTT del GA
+            if timeout_ms == timeout_rtt:
+                self.rtt[origen].registrar(timeout)
+            print(f"{self.nombre_actor}: GA {origen} no respondió en {timeout_ms} ms")
+            return None
+        except Exception as e:
+            print(f"{self.nombre_actor}: fallo al comunicarse con GA {origen}: {e!r}")
+            return None
+        finally:
+            socket_ga.close()
+
+    async def enviar(self, mensaje_ga: dict):
+        endpoints = self.visto.en_orden()
+        if self.cobertura and len(endpoints) > 1 and es_solo_lectura(mensaje_ga):
+            retraso = self.rtt[endpoints[0][1]].retraso_cobertura_ms()
+            if retraso is not None:
+                return await self._enviar_cubierto(mensaje_ga, retraso)
+
+        for endpoint, origen in endpoints:
+            vencida = descartar_si_vencido(mensaje_ga, self.nombre_actor)
+            if vencida is not None:
+                return vencida, "ninguno"
+            respuesta = await self._intentar(endpoint, origen, mensaje_ga)
+            if respuesta is not None:
+                return respuesta, origen
+
+        return dict(RESPUESTA_SIN_GA), "ninguno"
+
+    async def _enviar_cubierto(self, mensaje_ga: dict, retraso_ms: float):
+        (endpoint_1, origen_1), (endpoint_2, origen_2) = self.visto.en_orden()[:2]
+
+        primera = asyncio.create_task(self._intentar(endpoint_1, origen_1, mensaje_ga))
+        origenes = {primera: origen_1}
+
+        try:
+            await asyncio.wait([primera], timeout=retraso_ms / 1000.0)
+            if primera.done() and primera.result() is not None:
+                return primera.result(), origen_1
+
+            vencida = descartar_si_vencido(mensaje_ga, self.nombre_actor)
+            if vencida is not None:
+                return vencida, "ninguno"
+
+            self.cubiertas += 1
+            cubierta = asyncio.create_task(self._intentar(endpoint_2, origen_2, mensaje_ga))
+            origenes[cubierta] = origen_2
+
+            pendientes = {t for t in origenes if not t.done()}
+            while pendientes:
+                _, pendientes = await asyncio.wait(pendientes, return_when=asyncio.FIRST_COMPLETED)
+                for tarea, origen in origenes.items():
+                    if tarea.done() and tarea.result() is not None:
+                        if origen == origen_2:
+                            self.ganadas_por_cobertura += 1
+                        return tarea.result(), origen
+
+            return dict(RESPUESTA_SIN_GA), "ninguno"
+
+        finally:
+            for tarea in origenes:
+                tarea.cancel()
+
+
+# ============================
+# Actor de préstamo
+# ============================
+
+async def ejecutar_actor_prestamo_async(sede: str, endpoint_gc: str = None,
+                                        endpoints_ga=ENDPOINTS_GA, verbose: bool = True):
+    """
+    Actor de préstamo asíncrono. Atiende en paralelo todas las solicitudes
+    que le lleguen del GC.
+    """
+
+    if endpoint_gc is None:
+        puerto = GC_TO_LOAN_ACTOR_SEDE1_PORT if sede == "1" else GC_TO_LOAN_ACTOR_SEDE2_PORT
+        endpoint_gc = direccion_bind(puerto)
+
+    nombre = f"Actor Prestamo async (sede {sede})"
+    # Sobre el contexto del proceso: con inproc comparte sockets con los componentes síncronos
+    context = zmq.asyncio.Context(zmq.Context.instance())
+    cliente_ga = ClienteGAAsync(context, nombre, endpoints_ga)
+
+    socket_desde_gc = context.socket(zmq.ROUTER)
+    socket_desde_gc.bind(endpoint_gc)
+    print(f"{nombre} escuchando al GC en {endpoint_gc}.")
+
+    limite = asyncio.Semaphore(ACTOR_MAX_EN_VUELO)
+    tareas = set()
+
+    async def atender(sobre: list, payload: bytes):
+        async with limite:
+            try:
+                mensaje_gc = json.loads(payload.decode("utf-8"))
+                if verbose:
+                    print(f"{nombre} recibió del GC: {mensaje_gc}")
+
+                vencida = descartar_si_vencido(mensaje_gc, "el Actor de Préstamo")
+                if vencida is not None:
+                    await socket_desde_gc.send_multipart(sobre + [json.dumps(vencida).encode("utf-8")])
+                    return
+
+                mensaje_ga = {
+                    "accion": mensaje_gc.get("accion"),
+                    "codigo_libro": mensaje_gc.get("codigo_libro"),
+                    "usuario": mensaje_gc.get("usuario", "desconocido"),
+                    "id_operacion": mensaje_gc.get("id_operacion")
+                }
+
+                if mensaje_ga["accion"] == "BUSCAR":
+                    mensaje_ga["texto"] = mensaje_gc.get("texto", "")
+                    mensaje_ga["pagina"] = mensaje_gc.get("pagina", 1)
+                if "plazo" in mensaje_gc:
+                    mensaje_ga["plazo"] = mensaje_gc["plazo"]
+
+                respuesta_ga, origen = await cliente_ga.enviar(mensaje_ga)
+                if verbose:
+                    print(f"{nombre} recibió del GA ({origen}): {respuesta_ga}")
+
+            except Exception as e:
+                print(f"Error en {nombre}: {e}")
+                respuesta_ga = {"ok": False, "mensaje": "Error interno en Actor de Prestamo"}
+
+            await socket_desde_gc.send_multipart(sobre + [json.dumps(respuesta_ga).encode("utf-8")])
+
+    while True:
+        partes = await socket_desde_gc.recv_multipart()
+        tarea = asyncio.create_task(atender(partes[:-1], partes[-1]))
+        tareas.add(tarea)
+        tarea.add_done_callback(tareas.discard)
+
+
+# ============================
+# Actores de devolución / renovación
+# ============================
+
+async def ejecutar_actor_suscriptor_async(sede: str, topico: str, endpoint_gc: str = None,
+                                          endpoints_ga=ENDPOINTS_GA, verbose: bool = True):
+    """
+    Actor asíncrono que consume 'topico' (DEVOLUCION o RENOVACION) desde la
+    bandeja de salida del GC y confirma cada mensaje con ACK/NACK.
+    """
+
+    if endpoint_gc is None:
+        host_gc = SEDE1_HOST if sede == "1" else SEDE2_HOST
+        puerto_pub = GC_PUB_SEDE1_PORT if sede == "1" else GC_PUB_SEDE2_PORT
+        endpoint_gc = direccion_conexion(host_gc, puerto_pub)
+
+    nombre = f"Actor {topico.capitalize()} async (sede {sede})"
+    # Sobre el contexto del proceso: con inproc comparte sockets con los componentes síncronos
+    context = zmq.asyncio.Context(zmq.Context.instance())
+    cliente_ga = ClienteGAAsync(context, nombre, endpoints_ga)
+
+    socket_gc = conectar_consumidor(context, endpoint_gc)
+    print(f"{nombre} consumiendo {topico} de {endpoint_gc}.")
+
+    async def anunciar():
+        while True:
+            await socket_gc.send_multipart(mensaje_anuncio(topico))
+            await asyncio.sleep(ACTOR_HEARTBEAT_INTERVALO)
+
+    limite = asyncio.Semaphore(ACTOR_MAX_EN_VUELO)
+    # Última tarea por libro: la siguiente operación del mismo libro la espera
+    ultima_por_libro = {}
+
+    async def atender(id_mensaje: str, mensaje_ga: dict, anterior: asyncio.Task):
+        if anterior is not None:
+            await asyncio.wait([anterior])
+
+        async with limite:
+            respuesta_ga, origen = await cliente_ga.enviar(mensaje_ga)
+            if verbose:
+                print(f"{nombre} recibió del GA ({origen}): {respuesta_ga}")
+
+        if se_puede_confirmar(respuesta_ga, origen):
+            await socket_gc.send_multipart(mensaje_ack(id_mensaje))
+        else:
+            await socket_gc.send_multipart(mensaje_nack(id_mensaje))
+
+    def liberar(codigo: str, tarea: asyncio.Task):
+        if ultima_por_libro.get(codigo) is tarea:
+            del ultima_por_libro[codigo]
+
+    tarea_anuncio = asyncio.create_task(anunciar())
+    try:
+        while True:
+            partes = await socket_gc.recv_multipart()
+            entrega = leer_entrega(partes)
+            if entrega is None:
+                print(f"{nombre} recibió un mensaje mal formado: {partes}")
+                continue
+
+            id_mensaje, _, mensaje_gc = entrega
+            if verbose:
+                print(f"{nombre} recibió del GC: {mensaje_gc}")
+
+            codigo = mensaje_gc.get("codigo_libro")
+            mensaje_ga = {
+                "accion": topico,
+                "codigo_libro": codigo,
+                "usuario": mensaje_gc.get("usuario", "desconocido"),
+                "id_operacion": mensaje_gc.get("id_operacion")
+            }
+
+            tarea = asyncio.create_task(atender(id_mensaje, mensaje_ga, ultima_por_libro.get(codigo)))
+            ultima_por_libro[codigo] = tarea
+            tarea.add_done_callback(lambda t, c=codigo: liberar(c, t))
+    finally:
+        tarea_anuncio.cancel()
+
+
+if __name__ == "__main__":
+    # Uso:
+    # python actores_async.py [prestamo|devolucion|renovacion] [sede]
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ("prestamo", "devolucion", "renovacion"):
+        print("Uso: python src/actores_async.py [prestamo|devolucion|renovacion] [sede]")
+        sys.exit(1)
+
+    tipo = sys.argv[1]
+    sede = sys.argv[2] if len(sys.argv) >= 3 else "1"
+
+    print(f"Iniciando Actor asíncrono de {tipo} para sede {sede}...")
+    if tipo == "prestamo":
+        asyncio.run(ejecutar_actor_prestamo_async(sede))
+    elif tipo == "devolucion":
+        asyncio.run(ejecutar_actor_suscriptor_async(sede, TOPIC_DEVOLUCION))
+    else:
+        asyncio.run(ejecutar_actor_suscriptor_async(sede, TOPIC_RENOVACION))
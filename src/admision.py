@@ -0,0 +1,126 @@
+"""
+admision.py
+Control de admisión del GC: límite por cliente y descarte por sobrecarga.
+
+Un PS desbocado no debe llenar la cola del GC y hacer esperar a todos:
+
+- Cada cliente autenticado ("cliente" del mensaje, validado con su token)
+  tiene un cubo de tokens: ADMISION_TASA_POR_CLIENTE solicitudes por
+  segundo sostenidas, con ráfagas de hasta ADMISION_RAFAGA_POR_CLIENTE.
+  Las solicitudes sin credenciales válidas comparten un solo cubo.
+- La cola de entrada está acotada (GC_COLA_MAX) y, si la espera estimada
+  en ella pasa de GC_OBJETIVO_LATENCIA_MS, la solicitud se rechaza de
+  inmediato en lugar de encolarla.
+
+El rechazo es una respuesta normal para el PS con "sobrecarga": True y
+"reintentar_en_ms" (cuándo vale la pena reintentar). Una solicitud
+rechazada no se procesó, así que reintentarla es seguro.
+"""
+
+import threading
+import time
+
+from config import (
+    ADMISION_TASA_POR_CLIENTE,
+    ADMISION_RAFAGA_POR_CLIENTE,
+    GC_COLA_MAX,
+    GC_OBJETIVO_LATENCIA_MS,
+)
+from seguridad import autenticar_token
+
+
+# Clave del cubo compartido por las solicitudes sin credenciales válidas
+CLIENTE_NO_AUTENTICADO = "(no autenticado)"
+
+
+class CuboTokens:
+    """Cubo de 'capacidad' tokens que se rellena a 'tasa' tokens por segundo."""
+
+    def __init__(self, tasa: float, capacidad: float):
+        self.tasa = tasa
+        self.capacidad = capacidad
+        self.tokens = capacidad
+        self.ultimo = time.monotonic()
+
+    def tomar(self, ahora: float) -> float:
+        """Toma un token. Retorna 0 si lo había, o los segundos hasta que haya uno."""
+        self.tokens = min(self.capacidad, self.tokens + (ahora - self.ultimo) * self.tasa)
+        self.ultimo = ahora
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.tasa
+
+
+class ControlAdmision:
+    """
+    admitir() se llama antes de encolar cada solicitud; retorna None si se
+    acepta, o la respuesta de rechazo para el PS.
+    """
+
+    def __init__(self, tasa: float = ADMISION_TASA_POR_CLIENTE, rafaga: int = ADMISION_RAFAGA_POR_CLIENTE,
+                 max_cola: int = GC_COLA_MAX, objetivo_latencia_ms: float = GC_OBJETIVO_LATENCIA_MS):
+        self.tasa = tasa
+        self.rafaga = rafaga
+        self.max_cola = max_cola
+        self.objetivo = objetivo_latencia_ms / 1000.0
+
+        self._lock = threading.Lock()
+        # cliente -> CuboTokens
+        self._cubos = {}
+        # cliente -> {"aceptadas", "rechazadas_tasa", "rechazadas_cola"}
+        self._contadores = {}
+
+    @staticmethod
+    def identificar(mensaje: dict) -> str:
+        """Cliente autenticado del mensaje (solo el token; el hash lo revisa el trabajador)."""
+        cliente = mensaje.get("cliente")
+        if isinstance(cliente, str) and autenticar_token(cliente, mensaje.get("token")):
+            return cliente
+        return CLIENTE_NO_AUTENTICADO
+
+    def admitir(self, mensaje: dict, en_cola: int = 0, espera_estimada: float = 0.0):
+        """
+        - mensaje: solicitud del PS ya decodificada
+        - en_cola: solicitudes esperando un trabajador
+        - espera_estimada: segundos que esperaría esta solicitud en la cola
+        """
+        cliente = self.identificar(mensaje)
+        with self._lock:
+            cubo = self._cubos.get(cliente)
+            if cubo is None:
+                cubo = self._cubos[cliente] = CuboTokens(self.tasa, self.rafaga)
+                self._contadores[cliente] = {"aceptadas": 0, "rechazadas_tasa": 0, "rechazadas_cola": 0}
+            contadores = self._contadores[cliente]
+
+            # La cola primero: si está llena, no se gasta el token del cliente
+            if en_cola >= self.max_cola or espera_estimada > self.objetivo:
+                contadores["rechazadas_cola"] += 1
+                return self._rechazo("El GC está sobrecargado.", max(espera_estimada, self.objetivo))
+
+            espera_token = cubo.tomar(time.monotonic())
+            if espera_token > 0:
+                contadores["rechazadas_tasa"] += 1
+                return self._rechazo("El cliente superó su límite de solicitudes.", espera_token)
+
+            contadores["aceptadas"] += 1
+            return None
+
+    @staticmethod
+    def _rechazo(mensaje: str, reintentar_en: float) -> dict:
+        return {
+            "ok": False,
+            "mensaje": mensaje,
+            "sobrecarga": True,
+            "reintentar_en_ms": max(1, int(reintentar_en * 1000)),
+        }
+
+    def metricas(self) -> dict:
+        """Totales y contadores por cliente."""
+        with self._lock:
+            por_cliente = {cliente: dict(c) for cliente, c in self._contadores.items()}
+        totales = {"aceptadas": 0, "rechazadas_tasa": 0, "rechazadas_cola": 0}
+        for contadores in por_cliente.values():
+            for clave in totales:
+                totales[clave] += contadores[clave]
+        return {**totales, "por_cliente": por_cliente}
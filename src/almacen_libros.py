@@ -0,0 +1,510 @@
+"""
+almacen_libros.py
+BD del GA en disco (SQLite) con una caché de los libros más usados.
+
+Con un catálogo de millones de títulos (y su historial de préstamos) el
+diccionario en memoria del GA deja de caber. AlmacenLibros se usa en su
+lugar (mismas operaciones que el dict que reciben las funciones de
+base_datos.py) con GA_BD_EN_DISCO:
+
+- Cada libro es una fila de SQLite (código, JSON del libro).
+- Los libros que se usan quedan en una caché LRU de tamaño fijo; un
+  libro que no está se lee del disco al pedirlo (fallo de caché).
+- Un libro modificado queda "sucio" en la caché hasta que la persistencia
+  agrupada del GA lo escribe (ver concurrencia_bd.py); solo se escriben
+  los libros que cambiaron, no la BD completa.
+- Solo se desaloja un libro limpio cuyo lock de franja (BloqueosPorLibro)
+  está libre: así nadie lo está usando ni modificando.
+- En la misma transacción que cada libro se actualizan las tablas
+  derivadas: palabras del título (búsqueda BUSCAR, ver indice_titulos.py),
+  préstamos activos (índice de vencimientos) y libros con apartados. Así
+  el GA arranca sin recorrer el catálogo ni tener todos los títulos en
+  memoria.
+
+metricas() entrega aciertos, fallos y la tasa de aciertos para dimensionar
+la caché (ver benchmark_almacen.py).
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import nullcontext
+
+from config import GA_CACHE_LIBROS
+from indice_titulos import normalizar
+
+
+# Libros por consulta al recorrer la BD completa
+TAM_RECORRIDO = 1000
+
+# Versión de las tablas derivadas (PRAGMA user_version); un SQLite más
+# viejo las llena una vez al abrirse
+VERSION_ESQUEMA = 1
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS libros (codigo TEXT PRIMARY KEY, libro TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS titulos (codigo TEXT PRIMARY KEY, titulo TEXT);
+CREATE TABLE IF NOT EXISTS palabras (palabra TEXT, codigo TEXT, PRIMARY KEY (palabra, codigo)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS palabras_codigo ON palabras (codigo);
+CREATE TABLE IF NOT EXISTS prestamos (codigo TEXT, usuario TEXT, fecha_inicio TEXT, fecha_fin TEXT);
+CREATE INDEX IF NOT EXISTS prestamos_codigo ON prestamos (codigo);
+CREATE TABLE IF NOT EXISTS apartados (codigo TEXT PRIMARY KEY);
+"""
+
+
+def _escribir_derivadas(conexion, libros, reemplazar: bool = True):
+    """
+    Actualiza las tablas derivadas de [(codigo, libro), ...] dentro de la
+    transacción en curso. Con reemplazar=False (tablas vacías) no se
+    buscan ni borran las filas anteriores.
+    """
+    for codigo, libro in libros:
+        titulo = libro.get("titulo")
+        previo = None
+        if reemplazar:
+            fila = conexion.execute("SELECT titulo FROM titulos WHERE codigo = ?", (codigo,)).fetchone()
+            previo = fila[0] if fila is not None else None
+            if fila is not None and previo != titulo:
+                conexion.execute("DELETE FROM palabras WHERE codigo = ?", (codigo,))
+            conexion.execute("DELETE FROM prestamos WHERE codigo = ?", (codigo,))
+        if not reemplazar or previo != titulo:
+            conexion.execute("INSERT OR REPLACE INTO titulos VALUES (?, ?)", (codigo, titulo))
+            conexion.executemany("INSERT OR IGNORE INTO palabras VALUES (?, ?)",
+                                 [(palabra, codigo) for palabra in set(normalizar(titulo))])
+
+        conexion.executemany(
+            "INSERT INTO prestamos VALUES (?, ?, ?, ?)",
+            [(codigo, p["usuario"], p.get("fecha_inicio", ""), p["fecha_fin"]) for p in libro.get("prestamos", [])],
+        )
+        if libro.get("apartados"):
+            conexion.execute("INSERT OR IGNORE INTO apartados VALUES (?)", (codigo,))
+        elif reemplazar:
+            conexion.execute("DELETE FROM apartados WHERE codigo = ?", (codigo,))
+
+
+def es_archivo_almacen(ruta: str) -> bool:
+    """Las herramientas reconocen el SQLite de AlmacenLibros por la extensión."""
+    return ruta.endswith(".sqlite")
+
+
+def iterar_almacen(ruta_archivo: str):
+    """
+    (codigo, libro) de un SQLite de AlmacenLibros, en orden de código y
+    por bloques. Se abre en solo lectura: el GA puede seguir escribiéndolo
+    (se ve lo que la persistencia agrupada ya había escrito al empezar).
+    """
+    conexion = sqlite3.connect(f"file:{ruta_archivo}?mode=ro", uri=True)
+    try:
+        # Todos los bloques se leen en la misma transacción (un mismo estado)
+        conexion.execute("BEGIN")
+        ultimo = ""
+        while True:
+            filas = conexion.execute(
+                "SELECT codigo, libro FROM libros WHERE codigo > ? ORDER BY codigo LIMIT ?",
+                (ultimo, TAM_RECORRIDO),
+            ).fetchall()
+            if not filas:
+                break
+            for codigo, texto in filas:
+                yield codigo, json.loads(texto)
+            ultimo = filas[-1][0]
+    finally:
+        conexion.close()
+
+
+class EscritorAlmacen:
+    """
+    Equivalente de base_datos.EscritorBD para el SQLite de AlmacenLibros:
+    escribe libro por libro en un SQLite temporal que al cerrar reemplaza
+    al destino. El GA tiene que estar detenido.
+
+    Uso:
+        with EscritorAlmacen(ruta) as escritor:
+            escritor.escribir(codigo, libro)
+    """
+
+    def __init__(self, ruta_archivo: str, tam_lote: int = 10000):
+        self.ruta_archivo = ruta_archivo
+        self.tam_lote = tam_lote
+        self._temporal = ruta_archivo + ".tmp"
+        self._descartar_temporal()
+        self._almacen = AlmacenLibros(self._temporal)
+        self._lote = []
+        self.libros = 0
+
+    def escribir(self, codigo: str, libro: dict):
+        self._lote.append((codigo, libro))
+        self.libros += 1
+        if len(self._lote) >= self.tam_lote:
+            self._almacen.importar(self._lote)
+            self._lote = []
+
+    def cerrar(self):
+        if self._lote:
+            self._almacen.importar(self._lote)
+        # Al cerrar la última conexión SQLite pasa el WAL al archivo principal
+        self._almacen.cerrar()
+        # Un WAL que quedó del destino anterior no corresponde al archivo nuevo
+        for sufijo in ("-wal", "-shm"):
+            if os.path.exists(self.ruta_archivo + sufijo):
+                os.remove(self.ruta_archivo + sufijo)
+        os.replace(self._temporal, self.ruta_archivo)
+
+    def descartar(self):
+        self._almacen.cerrar()
+        self._descartar_temporal()
+
+    def _descartar_temporal(self):
+        for sufijo in ("", "-wal", "-shm"):
+            if os.path.exists(self._temporal + sufijo):
+                os.remove(self._temporal + sufijo)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo_error, error, traza):
+        if tipo_error is None:
+            self.cerrar()
+        else:
+            self.descartar()
+
+
+class AlmacenLibros:
+    """
+    - ruta_archivo: archivo SQLite (se crea si no existe)
+    - capacidad: máximo de libros en la caché (puede pasarse por un
+      momento si todos los candidatos a desalojar están sucios u ocupados)
+    - bloqueos: BloqueosPorLibro del GA (ver usar_bloqueos)
+    """
+
+    def __init__(self, ruta_archivo: str, capacidad: int = GA_CACHE_LIBROS, bloqueos=None):
+        self.ruta_archivo = ruta_archivo
+        self.capacidad = max(1, capacidad)
+        self.bloqueos = bloqueos
+
+        # Protege la caché y la conexión de lectura
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(ruta_archivo, check_same_thread=False)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.executescript(_ESQUEMA)
+        self._conexion.commit()
+        if self._conexion.execute("PRAGMA user_version").fetchone()[0] < VERSION_ESQUEMA:
+            self._reconstruir_derivadas()
+        # Las escrituras usan su propia conexión (WAL permite leer mientras
+        # tanto) y este lock, que también toma items() para recorrer un
+        # estado fijo del disco
+        self._lock_escritura = threading.Lock()
+        self._escritura = sqlite3.connect(ruta_archivo, check_same_thread=False)
+        # Las búsquedas en las tablas derivadas usan otra conexión, así una
+        # búsqueda larga no frena la caché
+        self._lock_consultas = threading.Lock()
+        self._consultas = sqlite3.connect(ruta_archivo, check_same_thread=False)
+
+        # codigo -> libro, del menos al más usado recientemente
+        self._cache = OrderedDict()
+        # códigos modificados desde la última escritura
+        self._sucios = set()
+        # codigo -> JSON ya tomado por la persistencia y aún no escrito
+        self._escribiendo = {}
+        # códigos que todavía no están en SQLite
+        self._nuevos = set()
+        self._total = self._conexion.execute("SELECT COUNT(*) FROM libros").fetchone()[0]
+
+        # Métricas
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        self.libros_escritos = 0
+
+    def usar_bloqueos(self, bloqueos):
+        """Locks por libro del GA; sin ellos se desaloja sin revisar (un solo hilo)."""
+        self.bloqueos = bloqueos
+
+    def importar(self, libros, tam_lote: int = 10000) -> int:
+        """Carga (codigo, libro) en SQLite sin pasar por la caché. Retorna cuántos."""
+        cantidad = 0
+        lote = []
+        with self._lock:
+            reemplazar = self._total > 0
+            for codigo, libro in libros:
+                lote.append((codigo, libro))
+                if len(lote) >= tam_lote:
+                    cantidad += self._importar_lote(lote, reemplazar)
+                    lote = []
+            if lote:
+                cantidad += self._importar_lote(lote, reemplazar)
+            self._conexion.commit()
+            self._total = self._conexion.execute("SELECT COUNT(*) FROM libros").fetchone()[0]
+        return cantidad
+
+    def _importar_lote(self, lote: list, reemplazar: bool) -> int:
+        """Con self._lock tomado."""
+        self._conexion.executemany(
+            "INSERT OR REPLACE INTO libros VALUES (?, ?)",
+            [(codigo, json.dumps(libro, ensure_ascii=False)) for codigo, libro in lote],
+        )
+        _escribir_derivadas(self._conexion, lote, reemplazar)
+        return len(lote)
+
+    def _reconstruir_derivadas(self):
+        """Llena las tablas derivadas recorriendo los libros (SQLite anterior a ellas)."""
+        for tabla in ("titulos", "palabras", "prestamos", "apartados"):
+            self._conexion.execute(f"DELETE FROM {tabla}")
+        ultimo = ""
+        cantidad = 0
+        while True:
+            filas = self._conexion.execute(
+                "SELECT codigo, libro FROM libros WHERE codigo > ? ORDER BY codigo LIMIT ?",
+                (ultimo, TAM_RECORRIDO),
+            ).fetchall()
+            if not filas:
+                break
+            _escribir_derivadas(self._conexion, [(codigo, json.loads(texto)) for codigo, texto in filas], False)
+            cantidad += len(filas)
+            ultimo = filas[-1][0]
+        self._conexion.execute(f"PRAGMA user_version = {VERSION_ESQUEMA}")
+        self._conexion.commit()
+        if cantidad:
+            print(f"AlmacenLibros: índices de {cantidad} libros reconstruidos en {self.ruta_archivo}.")
+
+    def cerrar(self):
+        with self._lock_escritura, self._lock, self._lock_consultas:
+            self._escritura.close()
+            self._conexion.close()
+            self._consultas.close()
+
+    # ============================
+    # Acceso como diccionario
+    # ============================
+
+    def get(self, codigo: str, por_defecto=None):
+        with self._lock:
+            libro = self._cache.get(codigo)
+            if libro is not None:
+                self._cache.move_to_end(codigo)
+                self.aciertos += 1
+                return libro
+
+            self.fallos += 1
+            libro = self._leer(codigo)
+            if libro is None:
+                return por_defecto
+            self._cache[codigo] = libro
+            self._recortar()
+            return libro
+
+    def __getitem__(self, codigo: str):
+        libro = self.get(codigo)
+        if libro is None:
+            raise KeyError(codigo)
+        return libro
+
+    def __contains__(self, codigo: str) -> bool:
+        # Quien pregunta casi siempre usa el libro enseguida: queda en la caché
+        return self.get(codigo) is not None
+
+    def __setitem__(self, codigo: str, libro: dict):
+        with self._lock:
+            if codigo not in self._cache and self._leer(codigo) is None:
+                self._nuevos.add(codigo)
+                self._total += 1
+            self._cache[codigo] = libro
+            self._cache.move_to_end(codigo)
+            self._sucios.add(codigo)
+            self._recortar()
+
+    def marcar_modificado(self, codigo: str):
+        """Anota que el libro (ya en la caché) se modificó en el lugar."""
+        with self._lock:
+            if codigo in self._cache:
+                self._sucios.add(codigo)
+
+    def __len__(self) -> int:
+        return self._total
+
+    def __iter__(self):
+        for codigo, _ in self.items():
+            yield codigo
+
+    def items(self, fijo: bool = True):
+        """
+        Recorre la BD completa (por bloques, en orden de código) sin llenar
+        la caché; de los libros que están en ella se entrega esa versión.
+        Se usa con todos los locks de libros tomados o al arrancar.
+
+        Con fijo=False no se toma el lock de escritura (la persistencia
+        sigue mientras tanto): un libro escrito durante el recorrido puede
+        salir en una versión anterior a la actual.
+        """
+        with self._lock_escritura if fijo else nullcontext():
+            ultimo = ""
+            while True:
+                with self._lock:
+                    filas = self._conexion.execute(
+                        "SELECT codigo, libro FROM libros WHERE codigo > ? ORDER BY codigo LIMIT ?",
+                        (ultimo, TAM_RECORRIDO),
+                    ).fetchall()
+                    libros = [self._version_en_memoria(codigo) for codigo, _ in filas]
+                if not filas:
+                    break
+                for (codigo, texto), libro in zip(filas, libros):
+                    yield codigo, libro if libro is not None else json.loads(texto)
+                ultimo = filas[-1][0]
+
+            # Libros nuevos que todavía no llegan a SQLite
+            with self._lock:
+                nuevos = [(codigo, self._version_en_memoria(codigo)) for codigo in sorted(self._nuevos)]
+            for codigo, libro in nuevos:
+                yield codigo, libro
+
+    def values(self):
+        for _, libro in self.items():
+            yield libro
+
+    # ============================
+    # Tablas derivadas
+    # ============================
+    # Reflejan lo que ya está escrito en SQLite (no los cambios que siguen
+    # en la caché): el GA las lee al arrancar y BUSCAR responde después
+    # de que IMPORTAR confirmó la escritura.
+
+    def prestamos_activos(self):
+        """(codigo, usuario, fecha_inicio, fecha_fin) de cada préstamo activo."""
+        with self._lock_consultas:
+            filas = self._consultas.execute("SELECT codigo, usuario, fecha_inicio, fecha_fin FROM prestamos").fetchall()
+        return filas
+
+    def codigos_con_apartados(self) -> list:
+        with self._lock_consultas:
+            return [codigo for codigo, in self._consultas.execute("SELECT codigo FROM apartados")]
+
+    def buscar_titulos(self, terminos: list, inicio: int, cantidad: int):
+        """
+        Libros cuyo título tiene, para cada término, una palabra que empieza
+        con él. Retorna (total, [(codigo, titulo), ...]) desde 'inicio', en
+        orden de código.
+        """
+        # Las palabras normalizadas solo tienen [0-9a-z]: "~" va después de todas
+        coincidencias = " INTERSECT ".join(
+            "SELECT codigo FROM palabras WHERE palabra >= ? AND palabra < ?" for _ in terminos
+        )
+        rangos = [valor for termino in terminos for valor in (termino, termino + "~")]
+        with self._lock_consultas:
+            total = self._consultas.execute(f"SELECT COUNT(*) FROM ({coincidencias})", rangos).fetchone()[0]
+            filas = self._consultas.execute(
+                f"SELECT t.codigo, t.titulo FROM ({coincidencias}) c JOIN titulos t ON t.codigo = c.codigo "
+                "ORDER BY t.codigo LIMIT ? OFFSET ?",
+                rangos + [cantidad, inicio],
+            ).fetchall()
+        return total, filas
+
+    def _leer(self, codigo: str):
+        """Libro desde la escritura en curso o desde SQLite (con self._lock tomado)."""
+        texto = self._escribiendo.get(codigo)
+        if texto is None:
+            fila = self._conexion.execute("SELECT libro FROM libros WHERE codigo = ?", (codigo,)).fetchone()
+            if fila is None:
+                return None
+            texto = fila[0]
+        return json.loads(texto)
+
+    def _version_en_memoria(self, codigo: str):
+        """Libro desde la caché o la escritura en curso, o None (con self._lock tomado)."""
+        libro = self._cache.get(codigo)
+        if libro is None and codigo in self._escribiendo:
+            libro = json.loads(self._escribiendo[codigo])
+        return libro
+
+    def _recortar(self):
+        """Desaloja los libros limpios menos usados hasta volver a la capacidad."""
+        exceso = len(self._cache) - self.capacidad
+        if exceso <= 0:
+            return
+
+        victimas = []
+        for codigo in self._cache:
+            if codigo in self._sucios:
+                continue
+            # El lock del libro libre indica que ningún hilo lo tiene en uso;
+            # el propio hilo tiene tomado el de su libro y lo salta
+            if self.bloqueos is not None:
+                bloqueo = self.bloqueos.de(codigo)
+                if not bloqueo.acquire(blocking=False):
+                    continue
+                bloqueo.release()
+            victimas.append(codigo)
+            if len(victimas) >= exceso:
+                break
+
+        for codigo in victimas:
+            del self._cache[codigo]
+        self.desalojos += len(victimas)
+
+    # ============================
+    # Persistencia
+    # ============================
+
+    def tomar_cambios(self) -> list:
+        """
+        [(codigo, JSON), ...] de los libros modificados. Se llama con todos
+        los locks de libros tomados; la escritura se hace después, sin ellos
+        (escribir_cambios).
+        """
+        with self._lock:
+            cambios = [(codigo, json.dumps(self._cache[codigo], ensure_ascii=False)) for codigo in self._sucios]
+            self._sucios = set()
+            # Hasta que estén en SQLite, un libro desalojado se lee de aquí
+            self._escribiendo = dict(cambios)
+        return cambios
+
+    def escribir_cambios(self, cambios: list):
+        """
+        Escribe en SQLite los cambios de tomar_cambios en una transacción.
+        Si falla, los libros vuelven a quedar sucios para el próximo intento.
+        """
+        with self._lock_escritura:
+            try:
+                self._escritura.executemany("INSERT OR REPLACE INTO libros VALUES (?, ?)", cambios)
+                _escribir_derivadas(self._escritura, [(codigo, json.loads(texto)) for codigo, texto in cambios])
+                self._escritura.commit()
+            except Exception:
+                self._escritura.rollback()
+                with self._lock:
+                    for codigo, texto in cambios:
+                        if codigo not in self._cache:
+                            self._cache[codigo] = json.loads(texto)
+                        self._sucios.add(codigo)
+                    self._escribiendo = {}
+                raise
+
+            with self._lock:
+                self._escribiendo = {}
+                self._nuevos.difference_update(codigo for codigo, _ in cambios)
+                self.libros_escritos += len(cambios)
+
+    def vaciar_cache(self):
+        """Descarta de la caché los libros limpios."""
+        with self._lock:
+            for codigo in [c for c in self._cache if c not in self._sucios]:
+                del self._cache[codigo]
+
+    def reiniciar_metricas(self):
+        with self._lock:
+            self.aciertos = self.fallos = self.desalojos = 0
+
+    def metricas(self) -> dict:
+        with self._lock:
+            accesos = self.aciertos + self.fallos
+            return {
+                "libros": self._total,
+                "en_cache": len(self._cache),
+                "capacidad": self.capacidad,
+                "sucios": len(self._sucios),
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "tasa_aciertos": self.aciertos / accesos if accesos else 0.0,
+                "desalojos": self.desalojos,
+                "libros_escritos": self.libros_escritos,
+            }
@@ -0,0 +1,321 @@
+"""
+analitica_catalogo.py
+Reporte diario del catálogo para el personal de operación.
+
+Responsabilidades:
+- Leer la BD desde su archivo (el JSON que persiste el GA, o su SQLite
+  con GA_BD_EN_DISCO, ver almacen_libros.py) o desde una foto columnar
+  .npz que esta misma herramienta guardó antes. No se comunica con el
+  GA: solo lee archivos.
+- Pasar la BD a columnas NumPy (un arreglo por campo de libros y de
+  préstamos) y calcular los agregados de forma vectorizada:
+    - uso por libro (ejemplares prestados / ejemplares totales)
+    - libros sin ejemplares disponibles (y cuántos tienen lista de espera)
+    - préstamos por usuario
+    - distribución de renovaciones
+    - préstamos vencidos y su antigüedad
+
+Uso:
+    python src/analitica_catalogo.py [--bd datos/bd_libros_primaria.json | datos/bd_libros_primaria.sqlite]
+        [--guardar-foto foto.npz] [--json reporte.json] [--top 10]
+    python src/analitica_catalogo.py --bd foto.npz
+    python src/analitica_catalogo.py --sintetico 1000000 --prestamos 5000000
+
+Con un catálogo grande casi todo el tiempo se va en leer el JSON; la foto
+.npz se carga en una fracción de segundo.
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from almacen_libros import es_archivo_almacen, iterar_almacen
+from config import DB_PRIMARY_FILE, GA_BD_EN_DISCO, GA_BD_SQLITE_FILE, MAX_RENOVACIONES, PRESTAMO_DIAS
+
+
+# ============================
+# Columnas
+# ============================
+
+class ColumnasCatalogo:
+    """
+    La BD en columnas. Por libro (índice 0..n-1):
+    - codigos, disponibles, prestados, reservas, apartados
+    Por préstamo:
+    - prestamo_libro (índice del libro), prestamo_usuario (índice en
+      'usuarios'), prestamo_fin (datetime64[us]), prestamo_renovaciones
+    """
+
+    CAMPOS = (
+        "codigos", "disponibles", "prestados", "reservas", "apartados",
+        "usuarios", "prestamo_libro", "prestamo_usuario", "prestamo_fin", "prestamo_renovaciones",
+    )
+
+    def __init__(self, **columnas):
+        for campo in self.CAMPOS:
+            setattr(self, campo, columnas[campo])
+
+    @classmethod
+    def desde_bd(cls, bd: dict):
+        """Un solo recorrido de la BD; las fechas se convierten en bloque."""
+        n = len(bd)
+        libros = bd.values()
+
+        disponibles = np.fromiter((l.get("ejemplares_disponibles", 0) for l in libros), np.int32, n)
+        prestados = np.fromiter((len(l.get("prestamos", ())) for l in libros), np.int32, n)
+        reservas = np.fromiter((len(l.get("reservas", ())) for l in libros), np.int32, n)
+        apartados = np.fromiter((len(l.get("apartados", ())) for l in libros), np.int32, n)
+
+        ids_usuario = {}
+        prestamo_usuario = []
+        fechas_fin = []
+        renovaciones = []
+        for libro in libros:
+            for p in libro.get("prestamos", ()):
+                prestamo_usuario.append(ids_usuario.setdefault(p["usuario"], len(ids_usuario)))
+                fechas_fin.append(p["fecha_fin"])
+                renovaciones.append(p.get("renovaciones", 0))
+
+        return cls(
+            codigos=np.array(list(bd), dtype=str),
+            disponibles=disponibles,
+            prestados=prestados,
+            reservas=reservas,
+            apartados=apartados,
+            usuarios=np.array(list(ids_usuario), dtype=str),
+            prestamo_libro=np.repeat(np.arange(n, dtype=np.int32), prestados),
+            prestamo_usuario=np.array(prestamo_usuario, dtype=np.int32),
+            # numpy entiende el formato de str(datetime)
+            prestamo_fin=np.array(fechas_fin, dtype="datetime64[us]"),
+            prestamo_renovaciones=np.array(renovaciones, dtype=np.int16),
+        )
+
+    @classmethod
+    def desde_foto(cls, ruta: str):
+        with np.load(ruta, allow_pickle=False) as foto:
+            return cls(**{campo: foto[campo] for campo in cls.CAMPOS})
+
+    def guardar_foto(self, ruta: str):
+        np.savez(ruta, **{campo: getattr(self, campo) for campo in self.CAMPOS})
+
+    @classmethod
+    def sinteticas(cls, num_libros: int, num_prestamos: int, num_usuarios: int, semilla: int = 7):
+        """Catálogo sintético generado directamente en columnas (para medir)."""
+        rng = np.random.default_rng(semilla)
+        ahora = np.datetime64("now", "us")
+
+        prestamo_libro = np.sort(rng.integers(0, num_libros, num_prestamos, dtype=np.int32))
+        prestados = np.bincount(prestamo_libro, minlength=num_libros).astype(np.int32)
+        # Días hasta fecha_fin; los negativos son préstamos vencidos
+        dias = rng.integers(-30, PRESTAMO_DIAS + 1, num_prestamos)
+        # Menos préstamos cuantas más renovaciones
+        pesos = np.arange(MAX_RENOVACIONES + 1, 0, -1, dtype=float)
+
+        return cls(
+            codigos=np.array([f"LIB{i:07d}" for i in range(num_libros)], dtype=str),
+            disponibles=rng.integers(0, 4, num_libros, dtype=np.int32),
+            prestados=prestados,
+            reservas=(rng.random(num_libros) < 0.02).astype(np.int32) * rng.integers(1, 5, num_libros, dtype=np.int32),
+            apartados=np.zeros(num_libros, dtype=np.int32),
+            usuarios=np.array([f"usuario{i}" for i in range(num_usuarios)], dtype=str),
+            prestamo_libro=prestamo_libro,
+            prestamo_usuario=(rng.zipf(1.3, num_prestamos) % num_usuarios).astype(np.int32),
+            prestamo_fin=ahora + dias.astype("timedelta64[D]").astype("timedelta64[us]"),
+            prestamo_renovaciones=rng.choice(MAX_RENOVACIONES + 1, num_prestamos, p=pesos / pesos.sum()).astype(np.int16),
+        )
+
+
+def leer_bd(ruta: str, intentos: int = 5) -> dict:
+    """
+    Lee el JSON de la BD. El GA reescribe el archivo completo, así que una
+    lectura que cae en medio de una escritura se reintenta. Un .sqlite se
+    lee en una transacción de SQLite y no necesita reintentos.
+    """
+    if es_archivo_almacen(ruta):
+        return dict(iterar_almacen(ruta))
+    for intento in range(intentos):
+        try:
+            with open(ruta, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except json.JSONDecodeError:
+            if intento == intentos - 1:
+                raise
+            time.sleep(0.2)
+
+
+# ============================
+# Agregados
+# ============================
+
+def _percentiles(valores: np.ndarray) -> dict:
+    if valores.size == 0:
+        return {"media": 0.0, "p50": 0.0, "p90": 0.0, "p99": 0.0, "max": 0.0}
+    p50, p90, p99 = np.percentile(valores, [50, 90, 99])
+    return {
+        "media": float(valores.mean()),
+        "p50": float(p50),
+        "p90": float(p90),
+        "p99": float(p99),
+        "max": float(valores.max()),
+    }
+
+
+def _mayores(valores: np.ndarray, desempate: np.ndarray, top: int) -> np.ndarray:
+    """Índices de los 'top' mayores valores (desempata por 'desempate'), de mayor a menor."""
+    if valores.size == 0:
+        return np.array([], dtype=np.int64)
+    # Solo se ordenan los que alcanzan el k-ésimo mayor valor (con empates)
+    k = min(top, valores.size)
+    umbral = np.partition(valores, -k)[-k]
+    candidatos = np.flatnonzero(valores >= umbral)
+    orden = np.lexsort((desempate[candidatos], valores[candidatos]))[::-1]
+    return candidatos[orden][:k]
+
+
+def calcular_reporte(col: ColumnasCatalogo, ahora: np.datetime64 = None, top: int = 10) -> dict:
+    ahora = np.datetime64("now", "us") if ahora is None else ahora
+
+    # ---- uso por libro ----
+    ejemplares = col.disponibles + col.prestados + col.apartados
+    uso = np.divide(col.prestados, ejemplares, out=np.zeros(ejemplares.size), where=ejemplares > 0)
+    histograma_uso, _ = np.histogram(uso[ejemplares > 0], bins=[0.0, 0.25, 0.5, 0.75, 1.0])
+    mas_usados = _mayores(uso, col.prestados, top)
+
+    total_ejemplares = int(ejemplares.sum())
+
+    # ---- préstamos por usuario ----
+    por_usuario = np.bincount(col.prestamo_usuario, minlength=col.usuarios.size)
+    usuarios_activos = por_usuario[por_usuario > 0]
+    top_usuarios = _mayores(por_usuario, np.zeros_like(por_usuario), top)
+
+    # ---- renovaciones ----
+    renovaciones = np.bincount(col.prestamo_renovaciones, minlength=MAX_RENOVACIONES + 1)
+
+    # ---- vencidos ----
+    vencido = col.prestamo_fin <= ahora
+    dias_vencido = (ahora - col.prestamo_fin[vencido]) / np.timedelta64(1, "D")
+    antiguedad, _ = np.histogram(dias_vencido, bins=[0, 1, 7, 30, np.inf])
+
+    num_prestamos = int(col.prestamo_libro.size)
+
+    return {
+        "libros": int(col.codigos.size),
+        "ejemplares": total_ejemplares,
+        "prestamos": num_prestamos,
+        "uso": {
+            "global": float(col.prestados.sum() / total_ejemplares) if total_ejemplares else 0.0,
+            "por_libro": _percentiles(uso[ejemplares > 0]),
+            "histograma": dict(zip(["0-25%", "25-50%", "50-75%", "75-100%"], histograma_uso.tolist())),
+            "mas_usados": [
+                {"codigo_libro": str(col.codigos[i]), "uso": float(uso[i]), "prestados": int(col.prestados[i])}
+                for i in mas_usados
+            ],
+        },
+        "sin_ejemplares": {
+            "libros": int((col.disponibles == 0).sum()),
+            "con_lista_espera": int(((col.disponibles == 0) & (col.reservas > 0)).sum()),
+            "usuarios_en_espera": int(col.reservas.sum()),
+            "ejemplares_apartados": int(col.apartados.sum()),
+        },
+        "prestamos_por_usuario": dict(
+            _percentiles(usuarios_activos),
+            usuarios=int(usuarios_activos.size),
+            mas_prestamos=[
+                {"usuario": str(col.usuarios[i]), "prestamos": int(por_usuario[i])}
+                for i in top_usuarios if por_usuario[i] > 0
+            ],
+        ),
+        "renovaciones": {
+            "distribucion": {str(k): int(v) for k, v in enumerate(renovaciones)},
+            "tasa": float((col.prestamo_renovaciones > 0).mean()) if num_prestamos else 0.0,
+            "media": float(col.prestamo_renovaciones.mean()) if num_prestamos else 0.0,
+        },
+        "vencidos": {
+            "prestamos": int(vencido.sum()),
+            "usuarios": int(np.count_nonzero(np.bincount(col.prestamo_usuario[vencido]))),
+            "libros": int(np.count_nonzero(np.bincount(col.prestamo_libro[vencido]))),
+            "dias": dict(zip(["0-1", "1-7", "7-30", "30+"], antiguedad.tolist())),
+        },
+    }
+
+
+def imprimir_reporte(reporte: dict):
+    uso = reporte["uso"]
+    sin = reporte["sin_ejemplares"]
+    ppu = reporte["prestamos_por_usuario"]
+    ren = reporte["renovaciones"]
+    ven = reporte["vencidos"]
+
+    print(f"\nLibros: {reporte['libros']} | Ejemplares: {reporte['ejemplares']} | Préstamos activos: {reporte['prestamos']}")
+
+    print(f"\nUso (prestados / ejemplares): global {uso['global']:.1%}")
+    pl = uso["por_libro"]
+    print(f"  por libro: media {pl['media']:.1%}  p50 {pl['p50']:.1%}  p90 {pl['p90']:.1%}  p99 {pl['p99']:.1%}")
+    print("  libros por rango de uso: " + "  ".join(f"{k}: {v}" for k, v in uso["histograma"].items()))
+    for libro in uso["mas_usados"]:
+        print(f"    {libro['codigo_libro']}: {libro['uso']:.0%} ({libro['prestados']} prestados)")
+
+    print(f"\nSin ejemplares disponibles: {sin['libros']} libros "
+          f"({sin['con_lista_espera']} con lista de espera, {sin['usuarios_en_espera']} usuarios esperando, "
+          f"{sin['ejemplares_apartados']} ejemplares apartados)")
+
+    print(f"\nPréstamos por usuario ({ppu['usuarios']} usuarios con préstamos): media {ppu['media']:.2f}  "
+          f"p50 {ppu['p50']:.0f}  p90 {ppu['p90']:.0f}  p99 {ppu['p99']:.0f}  máx {ppu['max']:.0f}")
+    for usuario in ppu["mas_prestamos"]:
+        print(f"    {usuario['usuario']}: {usuario['prestamos']}")
+
+    print(f"\nRenovaciones: {ren['tasa']:.1%} de los préstamos renovados, media {ren['media']:.2f}")
+    print("  " + "  ".join(f"{k} renov.: {v}" for k, v in ren["distribucion"].items()))
+
+    print(f"\nVencidos: {ven['prestamos']} préstamos, {ven['usuarios']} usuarios, {ven['libros']} libros")
+    print("  días de atraso: " + "  ".join(f"{k}: {v}" for k, v in ven["dias"].items()))
+
+
+# ============================
+# Entrada principal
+# ============================
+
+def main():
+    parser = argparse.ArgumentParser(description="Reporte de uso del catálogo (NumPy, sin hablar con el GA)")
+    parser.add_argument("--bd", default=GA_BD_SQLITE_FILE if GA_BD_EN_DISCO else DB_PRIMARY_FILE,
+                        help="BD en JSON, SQLite del GA (.sqlite) o foto columnar .npz")
+    parser.add_argument("--guardar-foto", help="guarda las columnas en este .npz para reportes siguientes")
+    parser.add_argument("--json", help="escribe el reporte en este archivo JSON")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--sintetico", type=int, metavar="LIBROS", help="usa un catálogo sintético de LIBROS libros")
+    parser.add_argument("--prestamos", type=int, default=5_000_000, help="préstamos del catálogo sintético")
+    parser.add_argument("--usuarios", type=int, default=200_000, help="usuarios del catálogo sintético")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    if args.sintetico:
+        col = ColumnasCatalogo.sinteticas(args.sintetico, args.prestamos, args.usuarios)
+        origen = f"sintético ({args.sintetico} libros, {args.prestamos} préstamos)"
+    elif args.bd.endswith(".npz"):
+        col = ColumnasCatalogo.desde_foto(args.bd)
+        origen = args.bd
+    else:
+        col = ColumnasCatalogo.desde_bd(leer_bd(args.bd))
+        origen = args.bd
+    carga = time.perf_counter() - inicio
+
+    if args.guardar_foto:
+        col.guardar_foto(args.guardar_foto)
+
+    inicio = time.perf_counter()
+    reporte = calcular_reporte(col, top=args.top)
+    calculo = time.perf_counter() - inicio
+
+    print(f"Origen: {origen}")
+    print(f"Carga: {carga:.2f} s | Agregados: {calculo:.2f} s")
+    imprimir_reporte(reporte)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reporte, f, indent=4, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,513 @@
+"""
+bandeja_salida.py
+Entrega confiable de DEVOLUCION/RENOVACION desde el GC hacia los Actores.
+
+Responsabilidades:
+- Bandeja de salida (outbox) del GC: cada mensaje aceptado se agrega a un
+  archivo local antes de responder al PS, así no se pierde si el GC o los
+  Actores se caen.
+- Despachador: entrega cada mensaje a un Actor suscrito al tópico por un
+  socket ROUTER, espera su ACK y lo reentrega si no llega a tiempo o si el
+  Actor responde NACK (por ejemplo, cuando fallan los dos GA).
+- Grupos de consumidores: todos los Actores anunciados para un tópico
+  forman su grupo y cada mensaje va a exactamente uno de ellos. El grupo se
+  reparte por codigo_libro (hashing de rendezvous), así un libro siempre lo
+  atiende el mismo Actor mientras el grupo no cambie, y si un Actor entra
+  o sale solo se mueven los libros que le tocaban.
+- Mantiene el orden por libro y tópico: nunca hay dos mensajes del mismo
+  libro y tópico en vuelo a la vez, aunque el libro cambie de Actor.
+
+Protocolo (multipart):
+    Actor -> GC: [b"LISTO", topico]     anuncio / heartbeat
+                 [b"ACK", id]           mensaje aplicado (o rechazado por el GA)
+                 [b"NACK", id]          no se pudo aplicar (ningún GA respondió
+                                        o error interno), reintentar luego
+    GC -> Actor: [b"MSG", id, topico, json]
+
+La entrega es "al menos una vez": un mensaje puede llegar repetido si se
+pierde el ACK.
+"""
+
+import heapq
+import json
+import os
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict, deque
+
+import zmq
+
+from config import (
+    GC_OUTBOX_FSYNC,
+    GC_OUTBOX_COMPACTAR_CADA,
+    ENTREGA_TIMEOUT_ACK,
+    ENTREGA_REINTENTO_NACK,
+    ENTREGA_VENTANA_ACTOR,
+    ENTREGA_ACTOR_EXPIRA,
+)
+
+
+# ============================
+# Bandeja de salida persistente
+# ============================
+
+class BandejaSalida:
+    """
+    Archivo de solo-agregar con dos tipos de línea:
+        {"t": "M", "id": ..., "topico": ..., "mensaje": {...}}   mensaje nuevo
+        {"t": "A", "id": ...}                                    mensaje confirmado
+    Al abrirla se recuperan los mensajes que aún no tienen confirmación.
+    """
+
+    def __init__(self, ruta_archivo: str, fsync: bool = GC_OUTBOX_FSYNC,
+                 compactar_cada: int = GC_OUTBOX_COMPACTAR_CADA):
+        self.ruta_archivo = ruta_archivo
+        self.fsync = fsync
+        self.compactar_cada = compactar_cada
+
+        self._lock = threading.Lock()
+        self._pendientes = OrderedDict()
+        self._confirmados_desde_compactar = 0
+
+        self._recuperar()
+        self._archivo = open(self.ruta_archivo, "a", encoding="utf-8")
+
+    def _recuperar(self):
+        if not os.path.exists(self.ruta_archivo):
+            return
+
+        with open(self.ruta_archivo, "r", encoding="utf-8") as f:
+            for linea in f:
+                try:
+                    registro = json.loads(linea)
+                except json.JSONDecodeError:
+                    continue  # última línea a medio escribir
+
+                if registro.get("t") == "M":
+                    self._pendientes[registro["id"]] = (registro["topico"], registro["mensaje"])
+                elif registro.get("t") == "A":
+                    self._pendientes.pop(registro["id"], None)
+
+        if self._pendientes:
+            print(f"Bandeja de salida: {len(self._pendientes)} mensajes pendientes recuperados.")
+
+    def _escribir(self, registro: dict):
+        self._archivo.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        self._archivo.flush()
+        if self.fsync:
+            os.fsync(self._archivo.fileno())
+
+    def agregar(self, topico: str, mensaje: dict) -> str:
+        """Guarda un mensaje nuevo y retorna su id."""
+        id_mensaje = uuid.uuid4().hex
+        with self._lock:
+            self._escribir({"t": "M", "id": id_mensaje, "topico": topico, "mensaje": mensaje})
+            self._pendientes[id_mensaje] = (topico, mensaje)
+        return id_mensaje
+
+    def confirmar(self, id_mensaje: str):
+        """Marca el mensaje como entregado y aplicado."""
+        with self._lock:
+            if self._pendientes.pop(id_mensaje, None) is None:
+                return
+            self._escribir({"t": "A", "id": id_mensaje})
+            self._confirmados_desde_compactar += 1
+            if self._confirmados_desde_compactar >= self.compactar_cada:
+                self._compactar()
+
+    def pendientes(self) -> list:
+        """Lista [(id, topico, mensaje)] en orden de llegada."""
+        with self._lock:
+            return [(i, t, m) for i, (t, m) in self._pendientes.items()]
+
+    def _compactar(self):
+        """Reescribe el archivo solo con los pendientes (se llama con el lock tomado)."""
+        temporal = self.ruta_archivo + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            for id_mensaje, (topico, mensaje) in self._pendientes.items():
+                f.write(json.dumps({"t": "M", "id": id_mensaje, "topico": topico, "mensaje": mensaje},
+                                   ensure_ascii=False) + "\n")
+        self._archivo.close()
+        os.replace(temporal, self.ruta_archivo)
+        self._archivo = open(self.ruta_archivo, "a", encoding="utf-8")
+        self._confirmados_desde_compactar = 0
+
+
+# ============================
+# Despachador (hilo dueño del ROUTER)
+# ============================
+
+class DespachadorEntregas:
+    """
+    - context: contexto ZeroMQ
+    - endpoint: bind del ROUTER hacia los Actores (ej. "tcp://*:5570")
+    - bandeja: BandejaSalida del GC
+
+    publicar() se puede llamar desde cualquier hilo del GC.
+
+    Los pendientes se guardan en una fila FIFO por (tópico, libro); solo
+    el primero de cada fila puede estar en vuelo. Una fila cuyo primero se
+    puede enviar está en la cola de listas; si el Actor dueño del libro
+    tiene la ventana llena, la fila espera a ese Actor, y si el tópico no
+    tiene Actores, espera a que se anuncie uno. Los plazos de ACK y los
+    reintentos después de un NACK van en heaps. Así un ACK, un NACK o un
+    vencimiento cuesta O(log n) y no un recorrido de todos los pendientes;
+    solo un cambio en un grupo de Actores vuelve a revisar las filas que
+    esperaban a ese grupo.
+    """
+
+    def __init__(self, context: zmq.Context, endpoint: str, bandeja: BandejaSalida):
+        self.context = context
+        self.endpoint = endpoint
+        self.bandeja = bandeja
+
+        self._endpoint_nuevos = f"inproc://entregas-{uuid.uuid4().hex}"
+        self._lock_publicar = threading.Lock()
+        self._detener = threading.Event()
+
+        # id -> {"fila", "payload", "actor", "enviado", "no_antes", "envio"}
+        self._mensajes = {}
+        # (topico, codigo) -> deque de ids en orden de llegada
+        self._filas = {}
+        # filas cuyo primer mensaje se puede enviar
+        self._listas = deque()
+        # actor -> filas que esperan lugar en su ventana
+        self._esperando_actor = {}
+        # topico -> filas que esperan a que se anuncie un Actor
+        self._sin_actor = {}
+        # (vence, id, envio): plazo del ACK de cada entrega
+        self._plazos_ack = []
+        # (no_antes, id, envio): reintento después de un NACK
+        self._reintentos = []
+        # topico -> {identidad: ultimo_visto}
+        self._consumidores = {}
+        # identidad -> ids sin confirmar
+        self._en_vuelo_actor = {}
+
+        self.metricas = {"publicados": 0, "entregas": 0, "reentregas": 0, "acks": 0, "nacks": 0, "tardios": 0}
+
+    # ----------------------------
+    # API para el GC
+    # ----------------------------
+
+    def iniciar(self):
+        self._pull_nuevos = self.context.socket(zmq.PULL)
+        self._pull_nuevos.bind(self._endpoint_nuevos)
+        self._push_nuevos = self.context.socket(zmq.PUSH)
+        self._push_nuevos.connect(self._endpoint_nuevos)
+
+        self._router = self.context.socket(zmq.ROUTER)
+        self._router.bind(self.endpoint)
+
+        for id_mensaje, topico, mensaje in self.bandeja.pendientes():
+            self._encolar(id_mensaje, topico, mensaje)
+
+        self._hilo = threading.Thread(target=self._bucle, daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+        self._hilo.join(timeout=2)
+
+    def publicar(self, topico: str, mensaje: dict) -> str:
+        """
+        Guarda el mensaje en la bandeja (queda durable) y lo pasa al
+        despachador. Retorna el id asignado.
+        """
+        # Un solo lock para que el orden de la bandeja y el del despachador coincidan
+        with self._lock_publicar:
+            id_mensaje = self.bandeja.agregar(topico, mensaje)
+            self._push_nuevos.send_multipart([id_mensaje.encode(), topico.encode(),
+                                              json.dumps(mensaje).encode("utf-8")])
+        return id_mensaje
+
+    # ----------------------------
+    # Estado interno
+    # ----------------------------
+
+    def _encolar(self, id_mensaje: str, topico: str, mensaje: dict):
+        fila = (topico, mensaje.get("codigo_libro"))
+        self._mensajes[id_mensaje] = {
+            "fila": fila,
+            "payload": json.dumps(mensaje).encode("utf-8"),
+            "actor": None,
+            "enviado": 0.0,
+            "no_antes": 0.0,
+            "envio": 0,
+        }
+        cola = self._filas.setdefault(fila, deque())
+        cola.append(id_mensaje)
+        if len(cola) == 1:
+            self._listas.append(fila)
+        self.metricas["publicados"] += 1
+
+    def _primero_listo(self, fila: tuple, ahora: float):
+        """Id del primer mensaje de la fila si se puede enviar ahora, o None."""
+        cola = self._filas.get(fila)
+        if not cola:
+            return None
+        estado = self._mensajes[cola[0]]
+        if estado["actor"] is not None or estado["no_antes"] > ahora:
+            return None
+        return cola[0]
+
+    def _liberar(self, id_mensaje: str, no_antes: float = 0.0):
+        """Saca el mensaje de vuelo para que se vuelva a entregar."""
+        estado = self._mensajes.get(id_mensaje)
+        if estado is None or estado["actor"] is None:
+            return
+        actor = estado["actor"]
+        estado["actor"] = None
+        estado["no_antes"] = no_antes
+        if no_antes:
+            heapq.heappush(self._reintentos, (no_antes, id_mensaje, estado["envio"]))
+        else:
+            self._listas.append(estado["fila"])
+        self._liberar_lugar(actor, id_mensaje)
+
+    def _liberar_lugar(self, actor: bytes, id_mensaje: str):
+        """Quita el mensaje de la ventana del Actor y despierta una fila que lo esperaba."""
+        en_vuelo = self._en_vuelo_actor.get(actor)
+        if en_vuelo is not None:
+            en_vuelo.discard(id_mensaje)
+        esperando = self._esperando_actor.get(actor)
+        ahora = time.time()
+        # Las filas que ya no esperan (se enviaron por otro lado) se descartan
+        while esperando:
+            fila = esperando.popleft()
+            if self._primero_listo(fila, ahora) is not None:
+                self._listas.append(fila)
+                break
+        if esperando is not None and not esperando:
+            del self._esperando_actor[actor]
+
+    def _revisar_grupo(self, topico: str, actores):
+        """
+        El grupo de 'topico' cambió y con él los dueños de los libros: las
+        filas que esperaban a alguno de 'actores' o a que hubiera Actores
+        vuelven a la cola de listas.
+        """
+        self._listas.extend(self._sin_actor.pop(topico, ()))
+        for actor in actores:
+            self._listas.extend(self._esperando_actor.pop(actor, ()))
+
+    def _elegir_actor(self, topico: str, codigo: str):
+        """Actor del grupo dueño del libro (hashing de rendezvous: gana el de mayor crc32(identidad + codigo))."""
+        grupo = self._consumidores.get(topico)
+        if not grupo:
+            return None
+        clave = str(codigo).encode()
+        return max(grupo, key=lambda actor: zlib.crc32(actor + clave))
+
+    def _despachar(self, ahora: float):
+        while self._reintentos and self._reintentos[0][0] <= ahora:
+            _, id_mensaje, envio = heapq.heappop(self._reintentos)
+            estado = self._mensajes.get(id_mensaje)
+            if estado is not None and estado["actor"] is None and estado["envio"] == envio:
+                self._listas.append(estado["fila"])
+
+        while self._listas:
+            fila = self._listas.popleft()
+            id_mensaje = self._primero_listo(fila, ahora)
+            if id_mensaje is None:
+                continue
+
+            topico, codigo = fila
+            actor = self._elegir_actor(topico, codigo)
+            if actor is None:
+                self._sin_actor.setdefault(topico, deque()).append(fila)
+                continue
+            # Con la ventana del dueño llena el mensaje espera: no se pasa a
+            # otro Actor del grupo
+            en_vuelo = self._en_vuelo_actor.setdefault(actor, set())
+            if len(en_vuelo) >= ENTREGA_VENTANA_ACTOR:
+                self._esperando_actor.setdefault(actor, deque()).append(fila)
+                continue
+
+            estado = self._mensajes[id_mensaje]
+            self._router.send_multipart([actor, b"MSG", id_mensaje.encode(), topico.encode(), estado["payload"]])
+            if estado["enviado"]:
+                self.metricas["reentregas"] += 1
+            self.metricas["entregas"] += 1
+            estado["actor"] = actor
+            estado["enviado"] = ahora
+            estado["envio"] += 1
+            en_vuelo.add(id_mensaje)
+            heapq.heappush(self._plazos_ack, (ahora + ENTREGA_TIMEOUT_ACK, id_mensaje, estado["envio"]))
+
+    def _revisar_vencimientos(self, ahora: float):
+        # Actores que dejaron de anunciarse
+        for topico, actores in self._consumidores.items():
+            for actor, visto in list(actores.items()):
+                if ahora - visto > ENTREGA_ACTOR_EXPIRA:
+                    del actores[actor]
+                    print(f"Despachador: actor {actor.hex()} de {topico} dado por caído "
+                          f"(grupo con {len(actores)} actores).")
+                    for id_mensaje in list(self._en_vuelo_actor.get(actor, ())):
+                        self._liberar(id_mensaje)
+                    self._en_vuelo_actor.pop(actor, None)
+                    # Con rendezvous solo cambian de dueño los libros del Actor caído
+                    self._revisar_grupo(topico, [actor])
+
+        # Mensajes sin ACK a tiempo
+        while self._plazos_ack and self._plazos_ack[0][0] < ahora:
+            _, id_mensaje, envio = heapq.heappop(self._plazos_ack)
+            estado = self._mensajes.get(id_mensaje)
+            if estado is not None and estado["actor"] is not None and estado["envio"] == envio:
+                self._liberar(id_mensaje)
+
+    def _confirmar(self, id_mensaje: str):
+        """ACK: el mensaje sale de su fila y el siguiente del libro queda listo."""
+        estado = self._mensajes.pop(id_mensaje, None)
+        if estado is None:
+            return
+        if estado["actor"] is not None:
+            self._liberar_lugar(estado["actor"], id_mensaje)
+
+        fila = estado["fila"]
+        cola = self._filas[fila]
+        if cola[0] == id_mensaje:
+            cola.popleft()
+        else:
+            cola.remove(id_mensaje)
+        if cola:
+            self._listas.append(fila)
+        else:
+            del self._filas[fila]
+
+        self.bandeja.confirmar(id_mensaje)
+        self.metricas["acks"] += 1
+
+    def _atender_actor(self, partes: list, ahora: float):
+        actor, tipo = partes[0], partes[1]
+
+        # Cualquier mensaje del Actor cuenta como señal de vida
+        for actores in self._consumidores.values():
+            if actor in actores:
+                actores[actor] = ahora
+
+        if tipo == b"LISTO" and len(partes) >= 3:
+            topico = partes[2].decode()
+            grupo = self._consumidores.setdefault(topico, {})
+            if actor not in grupo:
+                print(f"Despachador: actor {actor.hex()} disponible para {topico} "
+                      f"(grupo con {len(grupo) + 1} actores).")
+                grupo[actor] = ahora
+                self._revisar_grupo(topico, list(grupo))
+            grupo[actor] = ahora
+
+        elif tipo in (b"ACK", b"NACK") and len(partes) >= 3:
+            id_mensaje = partes[2].decode()
+            estado = self._mensajes.get(id_mensaje)
+            # Respuesta tardía de un Actor que ya no tiene el mensaje (se
+            # venció el plazo y se reentregó): no toca la ventana del Actor
+            # actual; la entrega vigente recibirá su propia respuesta
+            if estado is None or estado["actor"] != actor:
+                self.metricas["tardios"] += 1
+            elif tipo == b"ACK":
+                self._confirmar(id_mensaje)
+            else:
+                self._liberar(id_mensaje, no_antes=ahora + ENTREGA_REINTENTO_NACK)
+                self.metricas["nacks"] += 1
+
+    def _bucle(self):
+        poller = zmq.Poller()
+        poller.register(self._router, zmq.POLLIN)
+        poller.register(self._pull_nuevos, zmq.POLLIN)
+
+        while not self._detener.is_set():
+            eventos = dict(poller.poll(50))
+            ahora = time.time()
+
+            while self._pull_nuevos in eventos:
+                try:
+                    id_b, topico_b, payload = self._pull_nuevos.recv_multipart(zmq.NOBLOCK)
+                except zmq.Again:
+                    break
+                self._encolar(id_b.decode(), topico_b.decode(), json.loads(payload))
+
+            while self._router in eventos:
+                try:
+                    partes = self._router.recv_multipart(zmq.NOBLOCK)
+                except zmq.Again:
+                    break
+                self._atender_actor(partes, ahora)
+
+            self._revisar_vencimientos(ahora)
+            self._despachar(ahora)
+
+        self._router.close(linger=0)
+        self._pull_nuevos.close(linger=0)
+        self._push_nuevos.close(linger=0)
+
+
+# ============================
+# Lado del Actor
+# ============================
+
+def conectar_consumidor(context: zmq.Context, endpoint: str) -> zmq.Socket:
+    """Socket DEALER con el que un Actor recibe mensajes del GC."""
+    socket = context.socket(zmq.DEALER)
+    socket.setsockopt(zmq.LINGER, 0)
+    socket.connect(endpoint)
+    return socket
+
+
+def leer_entrega(partes: list):
+    """
+    Interpreta [b"MSG", id, topico, json].
+    Retorna (id, topico, mensaje_dict) o None si el mensaje está mal formado.
+    """
+    if len(partes) != 4 or partes[0] != b"MSG":
+        return None
+    try:
+        return partes[1].decode(), partes[2].decode(), json.loads(partes[3])
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        return None
+
+
+def drenar_lote(socket: zmq.Socket, primera: tuple, max_mensajes: int, max_espera_ms: float) -> list:
+    """
+    Junta en un lote la entrega 'primera' y las que lleguen después, hasta
+    'max_mensajes' o hasta que pasen 'max_espera_ms'. No espera más si ya
+    no hay mensajes listos en el socket.
+
+    Retorna la lista de entregas [(id, topico, mensaje_dict), ...] en orden
+    de llegada.
+    """
+    lote = [primera]
+    limite = time.time() + max_espera_ms / 1000.0
+
+    while len(lote) < max_mensajes:
+        restante_ms = (limite - time.time()) * 1000
+        if restante_ms <= 0 or not socket.poll(restante_ms):
+            break
+        entrega = leer_entrega(socket.recv_multipart())
+        if entrega is not None:
+            lote.append(entrega)
+
+    return lote
+
+
+def se_puede_confirmar(respuesta_ga: dict, origen: str) -> bool:
+    """
+    True si el mensaje se confirma (ACK): el GA aplicó la operación o la
+    rechazó por una regla del negocio. Si no respondió ningún GA o tuvo un
+    error interno ("error_interno"), el Actor responde NACK y el GC lo
+    vuelve a entregar.
+    """
+    return origen != "ninguno" and not respuesta_ga.get("error_interno")
+
+
+def mensaje_anuncio(topico: str) -> list:
+    return [b"LISTO", topico.encode()]
+
+
+def mensaje_ack(id_mensaje: str) -> list:
+    return [b"ACK", id_mensaje.encode()]
+
+
+def mensaje_nack(id_mensaje: str) -> list:
+    return [b"NACK", id_mensaje.encode()]
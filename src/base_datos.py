@@ -4,16 +4,21 @@ Manejo de la base de datos primaria y la réplica.
 
 Funciones:
 - cargar BD desde JSON
+- recorrer y escribir una BD JSON en flujo (sin tenerla completa en memoria)
 - guardar cambios
 - inicializar BD con libros
 - actualizar disponibilidad
 - registrar préstamo, devolución, renovación
+- lista de espera (reserva) con ejemplares apartados
+- consultas de solo lectura (disponibilidad, préstamos de un usuario,
+  préstamos vencidos)
 
 Este módulo será usado por el GA y los Actores.
 """
 
 import json
 import os
+import re
 from datetime import datetime, timedelta
 
 from config import (
@@ -21,7 +26,8 @@ from config import (
     DB_REPLICA_FILE, 
     DB_INITIAL_DATA_FILE,
     MAX_RENOVACIONES,
-    PRESTAMO_DIAS
+    PRESTAMO_DIAS,
+    RESERVA_APARTADO_SEGUNDOS,
 )
 
 
@@ -41,10 +47,174 @@ def cargar_bd(ruta_archivo: str) -> dict:
             return {}
 
 
+def serializar_bd(data: dict) -> str:
+    """Convierte la BD a texto JSON con el mismo formato de los archivos."""
+    return json.dumps(data, indent=4, ensure_ascii=False)
+
+
+def escribir_bd_serializada(ruta_archivo: str, contenido: str):
+    """
+    Escribe una BD ya serializada.
+    Permite tomar la foto de la BD bajo bloqueo y hacer la escritura
+    a disco fuera de él.
+    """
+    with open(ruta_archivo, "w", encoding="utf-8") as f:
+        f.write(contenido)
+
+
 def guardar_bd(ruta_archivo: str, data: dict):
     """Guarda la BD en un archivo JSON."""
-    with open(ruta_archivo, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
+    escribir_bd_serializada(ruta_archivo, serializar_bd(data))
+
+
+# =============================
+# Lectura y escritura en flujo
+# =============================
+
+# Un libro (con sus préstamos) más grande que esto se toma como BD inválida
+MAX_ENTRADA_BD = 64 * 1024 * 1024
+
+
+_ESPACIOS = re.compile(r"[ \t\r\n]*")
+
+
+def _saltar_espacios(texto: str, pos: int) -> int:
+    return _ESPACIOS.match(texto, pos).end()
+
+
+def iterar_bd(ruta_archivo: str, tam_bloque: int = 1 << 20):
+    """
+    Recorre una BD JSON ({codigo: libro, ...}) leyendo el archivo por
+    bloques y retorna (codigo, libro) de a uno. La memoria usada es la de
+    un bloque, no la de la BD.
+    """
+
+    decodificador = json.JSONDecoder()
+
+    with open(ruta_archivo, "r", encoding="utf-8") as f:
+        texto, pos = f.read(tam_bloque), 0
+        # "inicio" -> "clave" -> "coma" -> "clave" ... -> "fin"
+        estado = "inicio"
+
+        while True:
+            pos = _saltar_espacios(texto, pos)
+            if pos >= len(texto):
+                bloque = f.read(tam_bloque)
+                if not bloque:
+                    if estado != "fin":
+                        raise ValueError(f"BD incompleta: {ruta_archivo}")
+                    return
+                texto, pos = texto[pos:] + bloque, 0
+                continue
+
+            caracter = texto[pos]
+
+            if estado == "inicio":
+                if caracter != "{":
+                    raise ValueError(f"La BD no es un objeto JSON: {ruta_archivo}")
+                pos += 1
+                estado = "clave"
+                continue
+
+            if estado == "fin":
+                raise ValueError(f"Contenido después del final de la BD: {ruta_archivo}")
+
+            if caracter == "}":
+                pos += 1
+                estado = "fin"
+                continue
+
+            if estado == "coma":
+                if caracter != ",":
+                    raise ValueError(f"BD JSON inválida cerca de: {texto[pos:pos + 40]!r}")
+                pos += 1
+                estado = "clave"
+                continue
+
+            # estado == "clave": "codigo": {libro}
+            try:
+                codigo, fin = decodificador.raw_decode(texto, pos)
+                fin = _saltar_espacios(texto, fin)
+                if fin >= len(texto):
+                    raise json.JSONDecodeError("Entrada incompleta", texto, fin)
+                if texto[fin] != ":" or not isinstance(codigo, str):
+                    raise ValueError(f"BD JSON inválida cerca de: {texto[pos:pos + 40]!r}")
+                libro, fin = decodificador.raw_decode(texto, _saltar_espacios(texto, fin + 1))
+            except json.JSONDecodeError:
+                # La entrada sigue en el próximo bloque
+                bloque = f.read(tam_bloque)
+                if not bloque or len(texto) - pos > MAX_ENTRADA_BD:
+                    raise ValueError(f"BD JSON inválida cerca de: {texto[pos:pos + 40]!r}")
+                texto, pos = texto[pos:] + bloque, 0
+                continue
+
+            yield codigo, libro
+            pos = fin
+            estado = "coma"
+
+
+_CODIFICADOR = json.JSONEncoder(ensure_ascii=False)
+
+
+def _entrada_sangrada(codigo: str, libro: dict) -> str:
+    """
+    '\n    "codigo": {...}' igual que en json.dumps(bd, indent=4). Con
+    indent, json usa su codificador en Python; los libros sin préstamos
+    (el caso de un catálogo nuevo) se arman a mano con el codificador en C.
+    """
+    if not libro or any(isinstance(v, (list, dict)) and v for v in libro.values()):
+        # '{\n    "codigo": {...}\n}' sin las llaves de afuera: ya trae la sangría
+        return json.dumps({codigo: libro}, indent=4, ensure_ascii=False)[1:-2]
+
+    campos = ",\n".join(
+        f"        {_CODIFICADOR.encode(str(clave))}: {_CODIFICADOR.encode(valor)}"
+        for clave, valor in libro.items()
+    )
+    return f"\n    {_CODIFICADOR.encode(codigo)}: {{\n{campos}\n    }}"
+
+
+class EscritorBD:
+    """
+    Escribe una BD JSON libro por libro con el mismo formato de guardar_bd,
+    sin tenerla completa en memoria. Se escribe en un archivo temporal que
+    al cerrar reemplaza al destino, así nadie lee una BD a medio escribir.
+
+    Uso:
+        with EscritorBD(ruta) as escritor:
+            escritor.escribir(codigo, libro)
+    """
+
+    def __init__(self, ruta_archivo: str):
+        self.ruta_archivo = ruta_archivo
+        self._temporal = ruta_archivo + ".tmp"
+        self._archivo = open(self._temporal, "w", encoding="utf-8")
+        self._archivo.write("{")
+        self.libros = 0
+
+    def escribir(self, codigo: str, libro: dict):
+        entrada = _entrada_sangrada(codigo, libro)
+        if self.libros:
+            self._archivo.write(",")
+        self._archivo.write(entrada)
+        self.libros += 1
+
+    def cerrar(self):
+        self._archivo.write("\n}" if self.libros else "}")
+        self._archivo.close()
+        os.replace(self._temporal, self.ruta_archivo)
+
+    def descartar(self):
+        self._archivo.close()
+        os.remove(self._temporal)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo_error, error, traza):
+        if tipo_error is None:
+            self.cerrar()
+        else:
+            self.descartar()
 
 
 # =============================
@@ -54,7 +224,8 @@ def guardar_bd(ruta_archivo: str, data: dict):
 def inicializar_bd():
     """
     Si la BD primaria no existe, usa la BD inicial con 1000 libros.
-    Copia también esa BD a la réplica.
+    Copia también esa BD a la réplica. La copia se hace en flujo, así la
+    BD inicial puede ser más grande que la memoria disponible.
     """
 
     if os.path.exists(DB_PRIMARY_FILE):
@@ -66,11 +237,11 @@ def inicializar_bd():
     if not os.path.exists(DB_INITIAL_DATA_FILE):
         raise FileNotFoundError("ERROR: No existe 'datos/bd_libros_inicial.json'")
 
-    with open(DB_INITIAL_DATA_FILE, "r", encoding="utf-8") as f:
-        data_inicial = json.load(f)
-
-    guardar_bd(DB_PRIMARY_FILE, data_inicial)
-    guardar_bd(DB_REPLICA_FILE, data_inicial)
+    # La primaria se cierra (aparece) al final, cuando la réplica ya está
+    with EscritorBD(DB_PRIMARY_FILE) as primaria, EscritorBD(DB_REPLICA_FILE) as replica:
+        for codigo, libro in iterar_bd(DB_INITIAL_DATA_FILE):
+            primaria.escribir(codigo, libro)
+            replica.escribir(codigo, libro)
 
 
 # =============================
@@ -87,19 +258,86 @@ def libro_disponible(bd: dict, codigo: str) -> bool:
     return bd[codigo]["ejemplares_disponibles"] > 0
 
 
-def registrar_prestamo(bd: dict, codigo: str, usuario: str) -> dict:
+def consultar_libro(bd: dict, codigo: str) -> dict:
     """
-    Registra un préstamo si el libro existe y tiene ejemplares disponibles.
+    Retorna la disponibilidad de un libro sin modificar la BD.
     """
 
     if codigo not in bd:
         return {"ok": False, "mensaje": "El libro no existe."}
 
-    if bd[codigo]["ejemplares_disponibles"] <= 0:
+    return {
+        "ok": True,
+        "mensaje": "Consulta realizada",
+        "titulo": bd[codigo].get("titulo"),
+        "ejemplares_disponibles": bd[codigo]["ejemplares_disponibles"],
+    }
+
+
+def consultar_prestamos_usuario(bd: dict, usuario: str, codigos=None) -> dict:
+    """
+    Retorna los préstamos activos de un usuario sin modificar la BD.
+    Si se pasan 'codigos' solo se revisan esos libros (índice por usuario).
+    """
+
+    prestamos = []
+    for codigo in (bd if codigos is None else codigos):
+        libro = bd.get(codigo)
+        if libro is None:
+            continue
+        for p in libro.get("prestamos", []):
+            if p["usuario"] == usuario:
+                prestamos.append({
+                    "codigo_libro": codigo,
+                    "titulo": libro.get("titulo"),
+                    "fecha_fin": p["fecha_fin"],
+                    "renovaciones": p["renovaciones"],
+                })
+
+    return {"ok": True, "mensaje": "Consulta realizada", "usuario": usuario, "prestamos": prestamos}
+
+
+def prestamos_vencidos(bd: dict, ahora: datetime = None) -> dict:
+    """
+    Recorre todos los préstamos y retorna los vencidos. Solo para un GA sin
+    índice de vencimientos (ver vencimientos.py).
+    """
+
+    ahora = ahora or datetime.now()
+    vencidos = []
+    for codigo, libro in bd.items():
+        for p in libro.get("prestamos", []):
+            if datetime.fromisoformat(p["fecha_fin"]) <= ahora:
+                vencidos.append({"codigo_libro": codigo, "usuario": p["usuario"], "fecha_fin": p["fecha_fin"]})
+
+    vencidos.sort(key=lambda v: datetime.fromisoformat(v["fecha_fin"]))
+    return {"ok": True, "mensaje": "Consulta realizada", "vencidos": vencidos}
+
+
+def registrar_prestamo(bd: dict, codigo: str, usuario: str, vencimientos=None) -> dict:
+    """
+    Registra un préstamo si el libro existe y tiene ejemplares disponibles,
+    o si hay un ejemplar apartado para el usuario (ver registrar_reserva).
+    Si se pasa 'vencimientos' (vencimientos.IndiceVencimientos) se actualiza.
+    """
+
+    if codigo not in bd:
+        return {"ok": False, "mensaje": "El libro no existe."}
+
+    libro = bd[codigo]
+    apartado = _buscar_usuario(libro.get("apartados", []), usuario)
+
+    if apartado is not None:
+        # El ejemplar apartado ya no se contaba en ejemplares_disponibles
+        libro["apartados"].remove(apartado)
+    elif libro["ejemplares_disponibles"] <= 0:
         return {"ok": False, "mensaje": "No hay ejemplares disponibles."}
+    else:
+        libro["ejemplares_disponibles"] -= 1
 
-    # Registrar préstamo
-    bd[codigo]["ejemplares_disponibles"] -= 1
+    reserva = _buscar_usuario(libro.get("reservas", []), usuario)
+    if reserva is not None:
+        libro["reservas"].remove(reserva)
 
     fecha_inicio = datetime.now()
     fecha_fin = fecha_inicio + timedelta(days=PRESTAMO_DIAS)
@@ -115,10 +353,13 @@ def registrar_prestamo(bd: dict, codigo: str, usuario: str) -> dict:
         "renovaciones": 0
     })
 
+    if vencimientos is not None:
+        vencimientos.registrar(codigo, usuario, str(fecha_inicio), str(fecha_fin))
+
     return {"ok": True, "mensaje": "Préstamo registrado", "fecha_fin": str(fecha_fin)}
 
 
-def registrar_devolucion(bd: dict, codigo: str, usuario: str) -> dict:
+def registrar_devolucion(bd: dict, codigo: str, usuario: str, vencimientos=None) -> dict:
     """
     Registra la devolución de un libro, si el usuario lo tenía prestado.
     """
@@ -139,12 +380,21 @@ def registrar_devolucion(bd: dict, codigo: str, usuario: str) -> dict:
 
     # Eliminar el préstamo
     bd[codigo]["prestamos"].remove(prestamo_usuario)
-    bd[codigo]["ejemplares_disponibles"] += 1
 
-    return {"ok": True, "mensaje": "Devolución registrada"}
+    if vencimientos is not None:
+        vencimientos.quitar(codigo, usuario, prestamo_usuario.get("fecha_inicio", ""))
 
+    resultado = {"ok": True, "mensaje": "Devolución registrada"}
 
-def registrar_renovacion(bd: dict, codigo: str, usuario: str) -> dict:
+    # Si hay lista de espera el ejemplar se aparta para el primero
+    apartado = _liberar_ejemplar(bd[codigo], datetime.now())
+    if apartado is not None:
+        resultado["apartados"] = [apartado]
+
+    return resultado
+
+
+def registrar_renovacion(bd: dict, codigo: str, usuario: str, vencimientos=None) -> dict:
     """
     Renueva un libro si aún puede renovarse.
     """
@@ -172,8 +422,97 @@ def registrar_renovacion(bd: dict, codigo: str, usuario: str) -> dict:
     prestamo_usuario["fecha_fin"] = str(nueva_fecha_fin)
     prestamo_usuario["renovaciones"] += 1
 
+    if vencimientos is not None:
+        vencimientos.registrar(codigo, usuario, prestamo_usuario.get("fecha_inicio", ""), str(nueva_fecha_fin))
+
     return {
         "ok": True,
         "mensaje": "Renovación realizada",
         "nueva_fecha_fin": str(nueva_fecha_fin)
     }
+
+
+# =============================
+# Lista de espera (RESERVA)
+# =============================
+
+def _buscar_usuario(entradas: list, usuario: str):
+    for entrada in entradas:
+        if entrada["usuario"] == usuario:
+            return entrada
+    return None
+
+
+def _liberar_ejemplar(libro: dict, ahora: datetime):
+    """
+    Un ejemplar quedó libre. Si hay lista de espera se aparta para el
+    primero durante RESERVA_APARTADO_SEGUNDOS y se retorna el apartado;
+    si no, vuelve a ejemplares_disponibles y se retorna None.
+    """
+
+    reservas = libro.get("reservas")
+    if not reservas:
+        libro["ejemplares_disponibles"] += 1
+        return None
+
+    reserva = reservas.pop(0)
+    apartado = {
+        "usuario": reserva["usuario"],
+        "hasta": str(ahora + timedelta(seconds=RESERVA_APARTADO_SEGUNDOS)),
+    }
+    libro.setdefault("apartados", []).append(apartado)
+    return apartado
+
+
+def registrar_reserva(bd: dict, codigo: str, usuario: str, vencimientos=None) -> dict:
+    """
+    Agrega al usuario al final de la lista de espera de un libro sin
+    ejemplares disponibles. Cuando se devuelva un ejemplar se le aparta
+    (ver registrar_devolucion) y el GA le avisa; el usuario lo retira con
+    un PRESTAMO normal.
+    """
+
+    if codigo not in bd:
+        return {"ok": False, "mensaje": "El libro no existe."}
+
+    libro = bd[codigo]
+
+    if libro["ejemplares_disponibles"] > 0:
+        return {"ok": False, "mensaje": "Hay ejemplares disponibles: solicite el préstamo."}
+
+    if _buscar_usuario(libro.get("prestamos", []), usuario) is not None:
+        return {"ok": False, "mensaje": "El usuario ya tiene este libro."}
+
+    if (_buscar_usuario(libro.get("reservas", []), usuario) is not None
+            or _buscar_usuario(libro.get("apartados", []), usuario) is not None):
+        return {"ok": False, "mensaje": "El usuario ya está en la lista de espera."}
+
+    libro.setdefault("reservas", []).append({"usuario": usuario, "fecha": str(datetime.now())})
+
+    return {"ok": True, "mensaje": "Reserva registrada", "posicion": len(libro["reservas"])}
+
+
+def liberar_apartados_vencidos(bd: dict, codigo: str, usuario: str = None, vencimientos=None) -> dict:
+    """
+    Los apartados de 'codigo' cuyo plazo pasó sin PRESTAMO pasan al
+    siguiente de la lista de espera (o vuelven a ejemplares_disponibles).
+    Lo ejecuta el barrido del GA; la firma es la de las demás operaciones.
+    """
+
+    libro = bd.get(codigo)
+    if not libro or not libro.get("apartados"):
+        return {"ok": False, "mensaje": "No hay apartados."}
+
+    ahora = datetime.now()
+    vencidos = [a for a in libro["apartados"] if datetime.fromisoformat(a["hasta"]) <= ahora]
+    if not vencidos:
+        return {"ok": False, "mensaje": "No hay apartados vencidos."}
+
+    nuevos = []
+    for apartado in vencidos:
+        libro["apartados"].remove(apartado)
+        nuevo = _liberar_ejemplar(libro, ahora)
+        if nuevo is not None:
+            nuevos.append(nuevo)
+
+    return {"ok": True, "mensaje": "Apartados vencidos liberados", "liberados": len(vencidos), "apartados": nuevos}
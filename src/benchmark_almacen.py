@@ -0,0 +1,129 @@
+"""
+benchmark_almacen.py
+Dimensiona la caché de libros del GA con BD en disco (almacen_libros.py).
+
+Carga de trabajo:
+- Catálogo sintético de N libros en un SQLite temporal, algunos con
+  préstamos (historial que también ocupa memoria).
+- Accesos con distribución Zipf (pocos libros concentran la mayoría de
+  los préstamos); una fracción de los accesos modifica el libro y se
+  persiste como lo hace el GA (tomar_cambios / escribir_cambios).
+- Para cada tamaño de caché (fracción del catálogo): tasa de aciertos,
+  latencia p50/p99 de un acceso y memoria que ocupan los libros en caché.
+
+Uso:
+    python src/benchmark_almacen.py [--libros 1000000] [--accesos 200000]
+        [--zipf 1.1] [--fracciones 0.001,0.01,0.05,0.2]
+"""
+
+import argparse
+import bisect
+import itertools
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from almacen_libros import AlmacenLibros
+from benchmark_busqueda import percentil
+
+
+def libro_sintetico(i: int, rng: random.Random) -> dict:
+    prestamos = [
+        {"usuario": f"usuario{rng.randrange(100000)}", "fecha_inicio": "2026-01-01 10:00:00",
+         "fecha_fin": "2026-01-15 10:00:00", "renovaciones": rng.randint(0, 2)}
+        for _ in range(rng.choice((0, 0, 0, 1, 2)))
+    ]
+    return {"titulo": f"Libro sintético {i}", "ejemplares_disponibles": rng.randint(0, 5), "prestamos": prestamos}
+
+
+def crear_almacen(ruta: str, num_libros: int, semilla: int) -> AlmacenLibros:
+    rng = random.Random(semilla)
+    almacen = AlmacenLibros(ruta)
+    almacen.importar((f"LIB{i:07d}", libro_sintetico(i, rng)) for i in range(num_libros))
+    return almacen
+
+
+def generador_zipf(num_libros: int, s: float, rng: random.Random):
+    """Función que retorna un índice de libro con probabilidad ~ 1/rango^s."""
+    acumulados = list(itertools.accumulate(1.0 / (k ** s) for k in range(1, num_libros + 1)))
+    total = acumulados[-1]
+    # El rango no coincide con el orden de los códigos
+    permutacion = list(range(num_libros))
+    rng.shuffle(permutacion)
+    return lambda: permutacion[min(num_libros - 1, bisect.bisect_left(acumulados, rng.random() * total))]
+
+
+def medir(almacen: AlmacenLibros, capacidad: int, siguiente, accesos: int, escrituras: float,
+          rng: random.Random) -> dict:
+    almacen.capacidad = capacidad
+    almacen.vaciar_cache()
+
+    # Calentamiento: la caché se llena antes de medir
+    for _ in range(min(accesos, capacidad * 2)):
+        almacen.get(f"LIB{siguiente():07d}")
+    almacen.reiniciar_metricas()
+
+    latencias = []
+    for n in range(accesos):
+        codigo = f"LIB{siguiente():07d}"
+        t0 = time.perf_counter()
+        libro = almacen.get(codigo)
+        latencias.append(time.perf_counter() - t0)
+        if rng.random() < escrituras:
+            libro["ejemplares_disponibles"] += 1
+            almacen.marcar_modificado(codigo)
+        if n % 1000 == 999:
+            almacen.escribir_cambios(almacen.tomar_cambios())
+    almacen.escribir_cambios(almacen.tomar_cambios())
+
+    m = almacen.metricas()
+
+    # Memoria de los libros en caché: se mide una muestra y se extrapola
+    tracemalloc.start()
+    muestra = [libro_sintetico(i, rng) for i in range(2000)]
+    memoria, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    por_libro = memoria / len(muestra)
+    return {
+        "capacidad": capacidad,
+        "tasa_aciertos": m["tasa_aciertos"],
+        "p50_us": percentil(latencias, 50) * 1e6,
+        "p99_us": percentil(latencias, 99) * 1e6,
+        "memoria_mb": por_libro * m["en_cache"] / 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la caché de libros del GA con BD en disco")
+    parser.add_argument("--libros", type=int, default=1_000_000)
+    parser.add_argument("--accesos", type=int, default=200_000)
+    parser.add_argument("--zipf", type=float, default=1.1, help="exponente de la distribución de accesos")
+    parser.add_argument("--escrituras", type=float, default=0.3, help="fracción de accesos que modifican el libro")
+    parser.add_argument("--fracciones", default="0.001,0.01,0.05,0.2", help="tamaños de caché (fracción del catálogo)")
+    parser.add_argument("--semilla", type=int, default=7)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, "libros.sqlite")
+        print(f"Creando SQLite con {args.libros} libros...")
+        inicio = time.perf_counter()
+        almacen = crear_almacen(ruta, args.libros, args.semilla)
+        print(f"Listo en {time.perf_counter() - inicio:.1f} s ({os.path.getsize(ruta) / 1e6:.0f} MB en disco)")
+
+        rng = random.Random(args.semilla)
+        siguiente = generador_zipf(args.libros, args.zipf, rng)
+
+        print(f"\n{'caché':>9} {'% catálogo':>10} {'aciertos':>9} {'p50 µs':>8} {'p99 µs':>8} {'memoria MB':>11}")
+        for fraccion in (float(f) for f in args.fracciones.split(",")):
+            capacidad = max(1, int(args.libros * fraccion))
+            r = medir(almacen, capacidad, siguiente, args.accesos, args.escrituras, rng)
+            print(f"{r['capacidad']:>9} {fraccion * 100:>9.1f}% {r['tasa_aciertos'] * 100:>8.1f}% "
+                  f"{r['p50_us']:>8.1f} {r['p99_us']:>8.1f} {r['memoria_mb']:>11.1f}")
+
+        almacen.cerrar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+benchmark_async.py
+
+Compara las versiones bloqueantes y asyncio del GA y del Actor de préstamo.
+
+Parte A - GA:
+    C clientes REQ hacen pares PRESTAMO/DEVOLUCION (libros Zipf) contra
+    - el GA con hilos (gestor_almacenamiento.iniciar_servidor_ga)
+    - el GA asyncio (gestor_almacenamiento_async.servir_ga_async)
+    Ambos con BD temporal, en el mismo proceso del benchmark.
+
+Parte B - Actor de préstamo:
+    Un GA simulado responde cada solicitud después de un retardo fijo
+    (viaje entre sedes + trabajo del GA). Se lanza como subproceso
+    - actor_prestamo.py          (bloqueante, una solicitud a la vez)
+    - actores_async.py prestamo  (asyncio, muchas en vuelo)
+    y C clientes REQ le envían PRESTAMO como lo haría el GC.
+    Usa los puertos de config.py (GA_PRIMARY_PORT y GC_TO_LOAN_ACTOR_SEDE1_PORT),
+    así que el sistema no debe estar corriendo en la misma máquina.
+
+Uso:
+    python src/benchmark_async.py [--clientes 32] [--pares 50] [--libros 2000]
+        [--trabajadores 8] [--retardo-ga-ms 5] [--prestamos 50]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import zmq
+import zmq.asyncio
+
+from config import GA_PRIMARY_PORT, GC_TO_LOAN_ACTOR_SEDE1_PORT
+from base_datos import guardar_bd
+from gestor_almacenamiento import iniciar_servidor_ga
+from gestor_almacenamiento_async import servir_ga_async
+from benchmark_ga_concurrente import crear_catalogo, pesos_zipf, percentil, hilo_cliente
+
+
+def resumen(nombre: str, latencias: list, duracion: float) -> dict:
+    return {
+        "variante": nombre,
+        "operaciones": len(latencias),
+        "throughput": len(latencias) / duracion if duracion > 0 else 0.0,
+        "p50_ms": percentil(latencias, 50) * 1000,
+        "p99_ms": percentil(latencias, 99) * 1000,
+        "media_ms": statistics.mean(latencias) * 1000 if latencias else 0.0,
+    }
+
+
+def imprimir(resultados: list):
+    print(f"{'variante':<22} {'ops':>7} {'ops/s':>9} {'media ms':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for r in resultados:
+        print(f"{r['variante']:<22} {r['operaciones']:>7} {r['throughput']:>9.1f} "
+              f"{r['media_ms']:>9.2f} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f}")
+
+
+def lanzar_clientes(endpoint: str, clientes: int, objetivo, args_objetivo) -> (list, float):
+    """Corre 'clientes' hilos con la función objetivo y mide el tiempo total."""
+    context = zmq.Context()
+    latencias = []
+    barrera = threading.Barrier(clientes + 1)
+    hilos = [
+        threading.Thread(target=objetivo, args=(context, endpoint) + args_objetivo(i) + (latencias, barrera))
+        for i in range(clientes)
+    ]
+    for h in hilos:
+        h.start()
+    barrera.wait()
+    inicio = time.perf_counter()
+    for h in hilos:
+        h.join()
+    duracion = time.perf_counter() - inicio
+    context.term()
+    return latencias, duracion
+
+
+# ============================
+# Parte A: GA
+# ============================
+
+def bench_ga_hilos(args) -> dict:
+    bd = crear_catalogo(args.libros)
+    codigos, acumulados = list(bd.keys()), pesos_zipf(args.libros, 1.1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta_bd = os.path.join(tmp, "bd.json")
+        guardar_bd(ruta_bd, bd)
+        context = zmq.Context()
+        servidor, persistencia = iniciar_servidor_ga(
+            context, "tcp://127.0.0.1:*", bd, ruta_bd,
+            num_trabajadores=args.trabajadores, verbose=False,
+        )
+        latencias, duracion = lanzar_clientes(
+            servidor.endpoint_real, args.clientes, hilo_cliente,
+            lambda i: (codigos, acumulados, args.pares, i),
+        )
+        servidor.detener()
+        persistencia.detener()
+        context.term()
+
+    return resumen(f"GA hilos ({args.trabajadores})", latencias, duracion)
+
+
+def bench_ga_async(args) -> dict:
+    bd = crear_catalogo(args.libros)
+    codigos, acumulados = list(bd.keys()), pesos_zipf(args.libros, 1.1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta_bd = os.path.join(tmp, "bd.json")
+        guardar_bd(ruta_bd, bd)
+
+        loop = asyncio.new_event_loop()
+        context = zmq.asyncio.Context()
+        listo = loop.create_future()
+        tarea = loop.create_task(
+            servir_ga_async(context, "tcp://127.0.0.1:*", bd, ruta_bd, verbose=False, listo=listo)
+        )
+        hilo_loop = threading.Thread(target=loop.run_forever, daemon=True)
+        hilo_loop.start()
+
+        endpoint, _ = asyncio.run_coroutine_threadsafe(asyncio.wait_for(listo, 5), loop).result()
+        latencias, duracion = lanzar_clientes(
+            endpoint, args.clientes, hilo_cliente,
+            lambda i: (codigos, acumulados, args.pares, i),
+        )
+
+        loop.call_soon_threadsafe(tarea.cancel)
+        time.sleep(0.2)
+        loop.call_soon_threadsafe(loop.stop)
+        hilo_loop.join()
+        context.term()
+
+    return resumen("GA asyncio", latencias, duracion)
+
+
+# ============================
+# Parte B: Actor de préstamo
+# ============================
+
+async def ga_simulado(endpoint: str, retardo: float):
+    """GA falso que responde ok después de 'retardo' segundos."""
+    context = zmq.asyncio.Context.instance()
+    socket = context.socket(zmq.ROUTER)
+    socket.bind(endpoint)
+
+    async def responder(partes):
+        await asyncio.sleep(retardo)
+        respuesta = json.dumps({"ok": True, "mensaje": "Préstamo registrado"})
+        await socket.send_multipart(partes[:-1] + [respuesta.encode("utf-8")])
+
+    tareas = set()
+    try:
+        while True:
+            partes = await socket.recv_multipart()
+            tarea = asyncio.create_task(responder(partes))
+            tareas.add(tarea)
+            tarea.add_done_callback(tareas.discard)
+    finally:
+        socket.close(linger=0)
+
+
+def hilo_cliente_gc(context, endpoint, prestamos, semilla, latencias, barrera):
+    """Simula al GC: REQ contra el Actor de préstamo."""
+    socket = context.socket(zmq.REQ)
+    socket.connect(endpoint)
+    barrera.wait()
+    for i in range(prestamos):
+        mensaje = {"accion": "PRESTAMO", "codigo_libro": f"LIB{i:06d}", "usuario": f"bench{semilla}"}
+        t0 = time.perf_counter()
+        socket.send_string(json.dumps(mensaje))
+        socket.recv_string()
+        latencias.append(time.perf_counter() - t0)
+    socket.close(linger=0)
+
+
+def bench_actor(args, nombre: str, comando: list) -> dict:
+    loop = asyncio.new_event_loop()
+    tarea_ga = loop.create_task(ga_simulado(f"tcp://127.0.0.1:{GA_PRIMARY_PORT}", args.retardo_ga_ms / 1000.0))
+    hilo_loop = threading.Thread(target=loop.run_forever, daemon=True)
+    hilo_loop.start()
+
+    directorio = os.path.dirname(os.path.abspath(__file__))
+    proceso = subprocess.Popen([sys.executable] + comando, cwd=directorio,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    time.sleep(1.0)  # tiempo para que el actor haga bind
+
+    try:
+        latencias, duracion = lanzar_clientes(
+            f"tcp://127.0.0.1:{GC_TO_LOAN_ACTOR_SEDE1_PORT}", args.clientes, hilo_cliente_gc,
+            lambda i: (args.prestamos, i),
+        )
+    finally:
+        proceso.terminate()
+        proceso.wait()
+        loop.call_soon_threadsafe(tarea_ga.cancel)
+        time.sleep(0.2)
+        loop.call_soon_threadsafe(loop.stop)
+        hilo_loop.join()
+
+    return resumen(nombre, latencias, duracion)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bloqueante vs asyncio")
+    parser.add_argument("--clientes", type=int, default=32)
+    parser.add_argument("--pares", type=int, default=50, help="pares PRESTAMO/DEVOLUCION por cliente (parte A)")
+    parser.add_argument("--libros", type=int, default=2000)
+    parser.add_argument("--trabajadores", type=int, default=8)
+    parser.add_argument("--retardo-ga-ms", type=float, default=5.0, help="retardo del GA simulado (parte B)")
+    parser.add_argument("--prestamos", type=int, default=50, help="préstamos por cliente (parte B)")
+    parser.add_argument("--solo", choices=("ga", "actor"), default=None)
+    args = parser.parse_args()
+
+    if args.solo in (None, "ga"):
+        print(f"\n== Parte A: GA | clientes={args.clientes} libros={args.libros} ==")
+        imprimir([bench_ga_hilos(args), bench_ga_async(args)])
+
+    if args.solo in (None, "actor"):
+        print(f"\n== Parte B: Actor de préstamo | clientes={args.clientes} retardo GA={args.retardo_ga_ms} ms ==")
+        imprimir([
+            bench_actor(args, "Actor bloqueante", ["actor_prestamo.py", "1"]),
+            bench_actor(args, "Actor asyncio", ["actores_async.py", "prestamo", "1"]),
+        ])
+
+
+if __name__ == "__main__":
+    main()
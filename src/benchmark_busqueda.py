@@ -0,0 +1,168 @@
+"""
+benchmark_busqueda.py
+
+Mide la latencia de BUSCAR con el índice invertido de títulos
+(indice_titulos.py) frente a recorrer el catálogo comparando cada título.
+
+Carga de trabajo:
+- Catálogo sintético de N libros con títulos en español (con tildes) y
+  un vocabulario de palabras inventadas para tener palabras raras.
+- Tipos de consulta: una palabra común, una palabra rara, un prefijo
+  corto, dos prefijos, y una palabra escrita sin tildes.
+- La primera página de resultados (BUSQUEDA_TAM_PAGINA) y una página
+  lejana.
+
+Uso:
+    python src/benchmark_busqueda.py [--libros 1000000] [--consultas 500]
+        [--recorridos 3]
+
+El recorrido del catálogo se mide con pocas consultas (--recorridos)
+porque cada una tarda segundos con un millón de libros.
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from config import BUSQUEDA_TAM_PAGINA
+from indice_titulos import IndiceTitulos, normalizar
+
+
+TEMAS = [
+    "Sistemas", "Redes", "Programación", "Álgebra", "Cálculo", "Física", "Química",
+    "Economía", "Historia", "Biología", "Matemáticas", "Estadística", "Filosofía",
+    "Derecho", "Psicología", "Arquitectura", "Electrónica", "Geografía", "Música",
+    "Literatura",
+]
+
+CALIFICATIVOS = [
+    "Distribuidos", "Operativos", "Lineal", "Cuántica", "Orgánica", "Avanzada", "Básica",
+    "Moderna", "Numérico", "Aplicada", "Clásica", "Contemporánea", "Teórica", "Práctica",
+    "Computacional", "Española", "Latinoamericana", "Financiera", "Molecular", "Digital",
+]
+
+COMPLEMENTOS = [
+    "para Ingenieros", "en la Práctica", "del Siglo XXI", "y sus Aplicaciones",
+    "para Principiantes", "de la Información", "en América Latina", "con Python",
+    "Volumen I", "Volumen II", "Volumen III", "", "", "",
+]
+
+SILABAS = ["ca", "lo", "mi", "ta", "ne", "ri", "so", "pa", "du", "ve", "ño", "lé", "gu", "ber", "tis"]
+
+
+def palabra_inventada(rng: random.Random) -> str:
+    return "".join(rng.choice(SILABAS) for _ in range(rng.randint(2, 4))).capitalize()
+
+
+def crear_catalogo(num_libros: int, semilla: int = 7) -> dict:
+    rng = random.Random(semilla)
+    catalogo = {}
+    for i in range(num_libros):
+        partes = [rng.choice(TEMAS), rng.choice(CALIFICATIVOS), rng.choice(COMPLEMENTOS)]
+        if rng.random() < 0.5:
+            partes.append(palabra_inventada(rng))
+        catalogo[f"LIB{i:07d}"] = {
+            "titulo": " ".join(p for p in partes if p),
+            "ejemplares_disponibles": 1,
+            "prestamos": [],
+        }
+    return catalogo
+
+
+def generar_consultas(rng: random.Random, cantidad: int) -> list:
+    """[(tipo, texto, pagina), ...]"""
+    tipos = [
+        ("comun", lambda: rng.choice(TEMAS)),
+        ("rara", lambda: palabra_inventada(rng)),
+        ("prefijo", lambda: rng.choice(CALIFICATIVOS)[:3]),
+        ("dos_prefijos", lambda: f"{rng.choice(TEMAS)[:4]} {rng.choice(CALIFICATIVOS)[:4]}"),
+        ("sin_tildes", lambda: "".join(normalizar(rng.choice(["Álgebra", "Cálculo", "Física", "Química"])))),
+    ]
+    consultas = []
+    for _ in range(cantidad):
+        tipo, generar = rng.choice(tipos)
+        pagina = 1 if rng.random() < 0.8 else rng.randint(2, 50)
+        consultas.append((tipo, generar(), pagina))
+    return consultas
+
+
+def buscar_recorriendo(catalogo: dict, texto: str, pagina: int, tam_pagina: int = BUSQUEDA_TAM_PAGINA):
+    """BUSCAR sin índice: normaliza y compara todos los títulos. Retorna (total, página)."""
+    terminos = normalizar(texto)
+    coincidencias = []
+    for codigo, libro in catalogo.items():
+        palabras = normalizar(libro["titulo"])
+        if all(any(p.startswith(t) for p in palabras) for t in terminos):
+            coincidencias.append(codigo)
+    coincidencias.sort()
+    inicio = (pagina - 1) * tam_pagina
+    return len(coincidencias), coincidencias[inicio:inicio + tam_pagina]
+
+
+def percentil(valores: list, p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, int(round(p / 100.0 * (len(ordenados) - 1))))
+    return ordenados[indice]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de BUSCAR (índice invertido de títulos)")
+    parser.add_argument("--libros", type=int, default=1_000_000)
+    parser.add_argument("--consultas", type=int, default=500)
+    parser.add_argument("--recorridos", type=int, default=3, help="consultas medidas recorriendo el catálogo")
+    parser.add_argument("--semilla", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"Generando catálogo de {args.libros} libros...")
+    catalogo = crear_catalogo(args.libros, args.semilla)
+
+    inicio = time.perf_counter()
+    indice = IndiceTitulos.desde_bd(catalogo)
+    construccion = time.perf_counter() - inicio
+    print(f"Índice: {indice.palabras} palabras, construido en {construccion:.2f} s")
+
+    rng = random.Random(args.semilla)
+    consultas = generar_consultas(rng, args.consultas)
+
+    # tipo -> (latencias, totales)
+    por_tipo = {}
+    for tipo, texto, pagina in consultas:
+        t0 = time.perf_counter()
+        resultado = indice.buscar(texto, pagina)
+        latencia = time.perf_counter() - t0
+        latencias, totales = por_tipo.setdefault(tipo, ([], []))
+        latencias.append(latencia)
+        totales.append(resultado.get("total", 0))
+
+    print(f"\n{'consulta':>13} {'n':>5} {'p50 ms':>9} {'p99 ms':>9} {'media ms':>9} {'resultados':>11}")
+    todas = []
+    for tipo, (latencias, totales) in sorted(por_tipo.items()):
+        todas.extend(latencias)
+        print(f"{tipo:>13} {len(latencias):>5} {percentil(latencias, 50) * 1000:>9.3f} "
+              f"{percentil(latencias, 99) * 1000:>9.3f} {statistics.mean(latencias) * 1000:>9.3f} "
+              f"{statistics.mean(totales):>11.0f}")
+    print(f"{'todas':>13} {len(todas):>5} {percentil(todas, 50) * 1000:>9.3f} "
+          f"{percentil(todas, 99) * 1000:>9.3f} {statistics.mean(todas) * 1000:>9.3f}")
+
+    if args.recorridos > 0:
+        print(f"\nRecorriendo el catálogo ({args.recorridos} consultas)...")
+        recorridos = []
+        for tipo, texto, pagina in consultas[:args.recorridos]:
+            t0 = time.perf_counter()
+            total, _ = buscar_recorriendo(catalogo, texto, pagina)
+            recorridos.append(time.perf_counter() - t0)
+            esperado = indice.buscar(texto, pagina).get("total", 0)
+            estado = "ok" if total == esperado else f"DIFERENTE (índice {esperado})"
+            print(f"  {tipo:>13} '{texto}': {total} resultados en {recorridos[-1] * 1000:.0f} ms [{estado}]")
+
+        media_indice = statistics.mean(todas)
+        media_recorrido = statistics.mean(recorridos)
+        print(f"Recorrido medio: {media_recorrido * 1000:.0f} ms | índice medio: {media_indice * 1000:.3f} ms "
+              f"| {media_recorrido / media_indice:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+benchmark_disponibilidad.py
+Costo de leer ejemplares_disponibles: diccionario de la BD frente a la
+tabla mapeada en memoria (tabla_disponibilidad.py).
+
+Se mide, para N libros y códigos al azar:
+- dict: libro_disponible() y bd[codigo]["ejemplares_disponibles"], el
+  camino de base_datos.py dentro del GA.
+- tabla: LectorDisponibilidad.ejemplares() (código -> ranura + int32 del
+  archivo mapeado), leer_ranura() con la ranura ya resuelta (id estable
+  del libro) y consultar() (la respuesta completa del GC, con revisión
+  del latido y de la secuencia).
+- Otro proceso: lo que le cuesta leer un contador sin la tabla (cargar el
+  JSON de la BD) frente a abrir la tabla (mapear e indexar las ranuras).
+- Recorrido completo: total de ejemplares sumando el dict frente a NumPy
+  sobre el archivo mapeado, sin copiarlo (si NumPy está instalado).
+
+Uso:
+    python src/benchmark_disponibilidad.py [--libros 1000000] [--lecturas 1000000]
+"""
+
+import argparse
+import json
+import mmap
+import os
+import random
+import tempfile
+import time
+
+from base_datos import guardar_bd, libro_disponible
+from tabla_disponibilidad import DTYPE_RANURA, TAM_ENCABEZADO, LectorDisponibilidad, TablaDisponibilidad
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def crear_bd(num_libros: int, semilla: int) -> dict:
+    rng = random.Random(semilla)
+    return {
+        f"LIB{i:07d}": {"titulo": f"Libro {i}", "ejemplares_disponibles": rng.randint(0, 5), "prestamos": []}
+        for i in range(num_libros)
+    }
+
+
+def medir(nombre: str, funcion, claves: list):
+    inicio = time.perf_counter()
+    for clave in claves:
+        funcion(clave)
+    duracion = time.perf_counter() - inicio
+    print(f"{nombre:>38} {duracion / len(claves) * 1e9:>10.0f} ns/lectura")
+    return duracion
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de lectura de disponibilidad: dict vs tabla mapeada")
+    parser.add_argument("--libros", type=int, default=1_000_000)
+    parser.add_argument("--lecturas", type=int, default=1_000_000)
+    parser.add_argument("--semilla", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"Generando BD de {args.libros} libros...")
+    bd = crear_bd(args.libros, args.semilla)
+    rng = random.Random(args.semilla)
+    codigos = [f"LIB{rng.randrange(args.libros):07d}" for _ in range(args.lecturas)]
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta_bd = os.path.join(directorio, "bd.json")
+        ruta_tabla = os.path.join(directorio, "disponibilidad.tabla")
+        guardar_bd(ruta_bd, bd)
+
+        inicio = time.perf_counter()
+        tabla = TablaDisponibilidad.crear(ruta_tabla, bd)
+        print(f"Tabla creada en {time.perf_counter() - inicio:.2f} s "
+              f"({os.path.getsize(ruta_tabla) / 1e6:.0f} MB, capacidad {tabla.capacidad})")
+
+        print("\nLectura de un contador (mismo proceso):")
+        medir("dict libro_disponible()", lambda c: libro_disponible(bd, c), codigos)
+        medir('dict bd[c]["ejemplares_disponibles"]', lambda c: bd[c]["ejemplares_disponibles"], codigos)
+
+        # Sin GA que renueve el latido: se mide la lectura, no la vigencia
+        lector = LectorDisponibilidad(ruta_tabla, max_desfase=float("inf"))
+        lector.ejemplares(codigos[0])  # abre e indexa
+        medir("tabla ejemplares()", lector.ejemplares, codigos)
+        ranuras = [lector.ranura(c) for c in codigos]
+        medir("tabla leer_ranura() (ranura resuelta)", lector.leer_ranura, ranuras)
+        medir("tabla consultar() (respuesta GC)", lector.consultar, codigos)
+        assert lector.rechazadas == 0
+
+        # Los valores coinciden
+        assert all(lector.ejemplares(c) == bd[c]["ejemplares_disponibles"] for c in codigos[:10000])
+
+        print("\nOtro proceso que quiere leer contadores:")
+        inicio = time.perf_counter()
+        with open(ruta_bd, "r", encoding="utf-8") as f:
+            json.load(f)
+        print(f"{'cargar el JSON de la BD':>38} {time.perf_counter() - inicio:>10.2f} s")
+        inicio = time.perf_counter()
+        otro = LectorDisponibilidad(ruta_tabla)
+        otro.ejemplares(codigos[0])
+        print(f"{'abrir e indexar la tabla':>38} {time.perf_counter() - inicio:>10.2f} s")
+        otro.cerrar()
+
+        print("\nTotal de ejemplares disponibles (recorrido completo):")
+        inicio = time.perf_counter()
+        total_dict = sum(libro["ejemplares_disponibles"] for libro in bd.values())
+        print(f"{'dict':>38} {time.perf_counter() - inicio:>10.3f} s")
+        if np is not None:
+            with open(ruta_tabla, "rb") as f:
+                mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            inicio = time.perf_counter()
+            ranuras = np.frombuffer(mapa, dtype=DTYPE_RANURA, count=tabla.usados, offset=TAM_ENCABEZADO)
+            total_tabla = int(ranuras["ejemplares"].sum())
+            print(f"{'NumPy sobre la tabla (sin copia)':>38} {time.perf_counter() - inicio:>10.3f} s")
+            assert total_tabla == total_dict
+            del ranuras
+            mapa.close()
+
+        lector.cerrar()
+        tabla.cerrar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,422 @@
+"""
+benchmark_fallas.py
+Tolerancia a fallas medida: una carga constante de PS contra la Sede 1
+mientras se matan (SIGKILL) o se pausan (SIGSTOP) componentes en momentos
+fijos. Los componentes los levanta y vigila supervisor.Supervisor, como en
+una corrida normal, en un directorio temporal con un catálogo sintético
+(no toca datos/ del proyecto).
+
+Eventos (--eventos, separados por coma): "segundo:acción:componente[:pausa]"
+- kill: SIGKILL al proceso. El supervisor lo reinicia, o promueve al
+  respaldo si es el GA primario.
+- stop: SIGSTOP y, pasados 'pausa' segundos (5 por defecto), SIGCONT si
+  sigue vivo. Un GA pausado deja de responder PING y el supervisor lo mata
+  antes; un Actor o un GC pausado no se detecta (solo se ve en los PS).
+Los componentes son los de SUPERVISOR_COMPONENTES (config.py).
+
+Carga: cada PS hace PRESTAMO con un usuario nuevo, a un ritmo fijo (--tasa
+operaciones por segundo entre todos), y la mitad de los usuarios devuelve
+el libro enseguida. Como cada usuario es único, al final se sabe qué
+debería haber en la BD.
+
+Reporte:
+- Por evento: tiempo hasta que el supervisor detectó la falla y hasta que
+  el componente volvió (o el respaldo quedó promovido), y el mayor hueco
+  sin respuestas exitosas que vieron los PS.
+- Por segundo: operaciones exitosas y fallidas, latencia p50/p99.
+- Perdidas: operaciones confirmadas al PS cuyo efecto no está en el GA
+  activo. Duplicadas: préstamos aplicados más de una vez. Sin confirmar:
+  aplicadas aunque el PS no recibió la confirmación.
+- Divergencia: usuarios con distintos préstamos en el GA primario y en el
+  de respaldo, si los dos responden al final.
+
+Uso:
+    python src/benchmark_fallas.py [--eventos 10:kill:ga] [--duracion 30]
+        [--tasa 100] [--clientes 4] [--libros 1000] [--semilla 7]
+    python src/benchmark_fallas.py --eventos 8:stop:actor_prestamo_1:4,20:kill:gc_1
+"""
+
+import argparse
+import json
+import os
+import random
+import signal
+import sys
+import tempfile
+import threading
+import time
+
+import zmq
+
+import config
+
+
+COMPONENTES_SEDE1 = ("ga", "ga_respaldo", "actor_prestamo_1", "actor_devolucion_1", "actor_renovacion_1", "gc_1")
+
+SENALES = {"kill": signal.SIGKILL, "stop": signal.SIGSTOP}
+
+
+def leer_eventos(texto: str) -> list:
+    eventos = []
+    for parte in (p.strip() for p in texto.split(",")):
+        if not parte:
+            continue
+        campos = parte.split(":")
+        if len(campos) not in (3, 4) or campos[1] not in SENALES:
+            raise argparse.ArgumentTypeError(f"Evento inválido: {parte} (segundo:kill|stop:componente[:pausa])")
+        eventos.append({
+            "segundo": float(campos[0]),
+            "accion": campos[1],
+            "componente": campos[2],
+            "pausa": float(campos[3]) if len(campos) == 4 else 5.0,
+        })
+    return sorted(eventos, key=lambda e: e["segundo"])
+
+
+# ============================
+# Carga de PS
+# ============================
+
+def hilo_cliente(cliente: int, args, inicio: float, fin: float, resultados: list, usuarios: dict):
+    """PRESTAMO con un usuario nuevo cada vez; los usuarios pares devuelven el libro enseguida."""
+    from cliente_ps import enviar_operacion
+    from lanzador_local import NOMBRE_CLIENTE, crear_socket_ps
+
+    rng = random.Random(args.semilla * 1000 + cliente)
+    token = config.VALID_CLIENT_TOKENS[NOMBRE_CLIENTE]
+    socket = crear_socket_ps()
+    periodo = args.clientes / args.tasa
+    proxima = inicio
+    secuencia_sesion = 0
+
+    def operar(tipo: str, codigo: str, usuario: str) -> bool:
+        nonlocal proxima, secuencia_sesion
+        espera = proxima - time.monotonic()
+        if espera > 0:
+            time.sleep(espera)
+        proxima += periodo
+        t0 = time.monotonic()
+        op = {"tipo_operacion": tipo, "codigo_libro": codigo, "usuario": usuario}
+        respuesta = enviar_operacion(socket, NOMBRE_CLIENTE, token, op, secuencia_sesion)
+        ok = bool(respuesta.get("ok"))
+        resultados.append((tipo, t0 - inicio, time.monotonic() - t0, ok))
+        secuencia_sesion = max(secuencia_sesion, respuesta.get("secuencia") or 0)
+        return ok
+
+    n = 0
+    while time.monotonic() < fin:
+        usuario = f"caos{cliente}-{n}"
+        registro = {"codigo_libro": f"LIB{rng.randrange(args.libros):06d}", "prestamo": None, "devolucion": None}
+        usuarios[usuario] = registro
+        registro["prestamo"] = operar("PRESTAMO", registro["codigo_libro"], usuario)
+        if registro["prestamo"] and n % 2 == 0:
+            registro["devolucion"] = operar("DEVOLUCION", registro["codigo_libro"], usuario)
+        n += 1
+    socket.close(linger=0)
+
+
+# ============================
+# Fallas
+# ============================
+
+def hilo_eventos(supervisor, eventos: list, inicio: float):
+    """Aplica cada evento a su hora y anota cuándo (en el reloj de la carga)."""
+    por_nombre = {c.nombre: c for c in supervisor.componentes}
+    for evento in eventos:
+        espera = inicio + evento["segundo"] - time.monotonic()
+        if espera > 0:
+            time.sleep(espera)
+        proceso = por_nombre[evento["componente"]].proceso
+        if proceso is None or proceso.poll() is not None:
+            evento["aplicado"] = None
+            supervisor.log(f"Evento {evento['accion']} sobre {evento['componente']}: no estaba corriendo.")
+            continue
+        os.kill(proceso.pid, SENALES[evento["accion"]])
+        evento["aplicado"] = time.monotonic()
+        supervisor.log(f"Evento {evento['accion']} sobre {evento['componente']} (pid {proceso.pid}).")
+        if evento["accion"] == "stop":
+            threading.Timer(evento["pausa"], reanudar, args=(supervisor, proceso, evento["componente"])).start()
+
+
+def reanudar(supervisor, proceso, nombre: str):
+    # Si el supervisor ya lo mató (GA colgado) no hay nada que reanudar
+    if proceso.poll() is None:
+        os.kill(proceso.pid, signal.SIGCONT)
+        supervisor.log(f"SIGCONT a {nombre} (pid {proceso.pid}).")
+
+
+def esperar_sanos(supervisor, limite: float = 60.0) -> bool:
+    fin = time.monotonic() + limite
+    while time.monotonic() < fin:
+        if all(c.sano for c in supervisor.componentes if c.proximo_arranque is not None):
+            return True
+        time.sleep(0.2)
+    return False
+
+
+# ============================
+# Verificación de la BD
+# ============================
+
+def contar_prestamos(endpoint: str, usuarios: list):
+    """
+    Préstamos de cada usuario según un GA (PRESTAMOS_USUARIO). Retorna
+    (conteos, None), o (None, motivo) si el GA no puede responder.
+    """
+    socket = zmq.Context.instance().socket(zmq.REQ)
+    socket.setsockopt(zmq.LINGER, 0)
+    socket.connect(endpoint)
+    conteos = {}
+    try:
+        for usuario in usuarios:
+            socket.send_string(json.dumps({"accion": "PRESTAMOS_USUARIO", "usuario": usuario}))
+            if not socket.poll(2000):
+                return None, "no responde"
+            respuesta = json.loads(socket.recv_string())
+            if respuesta.get("relegado"):
+                return None, "relegado"
+            if not respuesta.get("ok"):
+                return None, respuesta.get("mensaje", "error")
+            conteos[usuario] = len(respuesta["prestamos"])
+    finally:
+        socket.close()
+    return conteos, None
+
+
+def clasificar(usuarios: dict, conteos: dict) -> dict:
+    """Compara lo que se confirmó a los PS con los préstamos que quedaron en el GA activo."""
+    perdidas = {"PRESTAMO": 0, "DEVOLUCION": 0}
+    duplicadas = 0
+    sin_confirmar = 0
+    for usuario, r in usuarios.items():
+        n = conteos[usuario]
+        if n > 1:
+            duplicadas += 1
+        if not r["prestamo"]:
+            sin_confirmar += n > 0
+        elif r["devolucion"] is None:
+            perdidas["PRESTAMO"] += n == 0
+        elif r["devolucion"]:
+            perdidas["DEVOLUCION"] += n > 0
+        else:
+            sin_confirmar += n == 0
+    return {"perdidas": perdidas, "duplicadas": duplicadas, "sin_confirmar": sin_confirmar}
+
+
+def verificar(usuarios: dict) -> dict:
+    from mandato_ga import ROL_RESPALDO, leer_mandato
+    from transporte import direccion_conexion
+
+    mandato, activo = leer_mandato()
+    nombres = list(usuarios)
+    estados = {}
+    for rol, puerto in (("primario", config.GA_PRIMARY_PORT), ("respaldo", config.GA_REPLICA_PORT)):
+        estados[rol] = contar_prestamos(direccion_conexion(config.SEDE1_HOST, puerto), nombres)
+
+    activos, motivo = estados[ROL_RESPALDO if activo == ROL_RESPALDO else "primario"]
+    resultado = {"ga_activo": activo, "mandato": mandato, "usuarios": len(nombres)}
+    if activos is None:
+        resultado["error"] = f"el GA activo ({activo}) {motivo}"
+    else:
+        resultado.update(clasificar(usuarios, activos))
+
+    primario, motivo_primario = estados["primario"]
+    respaldo, motivo_respaldo = estados["respaldo"]
+    if primario is not None and respaldo is not None:
+        resultado["divergentes"] = sum(1 for u in nombres if primario[u] != respaldo[u])
+    else:
+        resultado["divergentes"] = None
+        resultado["sin_divergencia"] = (f"primario {motivo_primario}" if primario is None
+                                        else f"respaldo {motivo_respaldo}")
+    return resultado
+
+
+# ============================
+# Métricas
+# ============================
+
+def linea_de_tiempo(resultados: list, duracion: float) -> list:
+    from benchmark_ga_concurrente import percentil
+
+    segundos = []
+    for s in range(int(duracion) + 1):
+        # Cada operación cuenta en el segundo en que terminó
+        del_segundo = [(lat, ok) for _, envio, lat, ok in resultados if int(envio + lat) == s]
+        latencias = [lat for lat, ok in del_segundo if ok]
+        segundos.append({
+            "segundo": s,
+            "ok": len(latencias),
+            "fallidas": len(del_segundo) - len(latencias),
+            "p50_ms": percentil(latencias, 50) * 1000,
+            "p99_ms": percentil(latencias, 99) * 1000,
+        })
+    return segundos
+
+
+def medir_eventos(eventos: list, incidentes: list, resultados: list, inicio: float, duracion: float) -> list:
+    terminadas = sorted(envio + lat for _, envio, lat, ok in resultados if ok)
+    medidos = []
+    for i, evento in enumerate(eventos):
+        medido = {k: evento[k] for k in ("segundo", "accion", "componente")}
+        medidos.append(medido)
+        aplicado = evento.get("aplicado")
+        if aplicado is None:
+            continue
+        incidente = next((x for x in incidentes
+                          if x["componente"] == evento["componente"] and x["detectada"] >= aplicado), None)
+        if incidente is not None:
+            medido["causa"] = incidente["causa"]
+            medido["deteccion_s"] = incidente["detectada"] - aplicado
+            if "recuperado" in incidente:
+                medido["recuperacion_s"] = incidente["recuperado"] - aplicado
+                medido["como"] = incidente["como"]
+
+        # Mayor hueco entre respuestas exitosas, desde la última antes del evento hasta el próximo
+        t_evento = aplicado - inicio
+        hasta = eventos[i + 1]["segundo"] if i + 1 < len(eventos) else duracion
+        anteriores = [t for t in terminadas if t <= t_evento]
+        puntos = (anteriores[-1:] or [t_evento]) + [t for t in terminadas if t_evento < t <= hasta]
+        medido["volvio"] = puntos[-1] > t_evento
+        if not medido["volvio"]:
+            # El servicio no volvió antes del próximo evento: el hueco es al menos esto
+            puntos.append(hasta)
+        medido["hueco_s"] = max(b - a for a, b in zip(puntos, puntos[1:]))
+    return medidos
+
+
+# ============================
+# Reporte
+# ============================
+
+def segundos_o_guion(valor) -> str:
+    return f"{valor:.2f}" if valor is not None else "-"
+
+
+def imprimir_resultado(r: dict, salida):
+    print(f"Carga: {r['tasa']:.0f} ops/s objetivo con {r['clientes']} PS durante {r['duracion_s']:.0f} s | "
+          f"{r['operaciones']} operaciones, {r['fallidas']} fallidas", file=salida)
+
+    print(f"\n{'evento':>28} {'detección s':>12} {'recuperación s':>15} {'hueco PS s':>11}  causa", file=salida)
+    for e in r["eventos"]:
+        nombre = f"{e['segundo']:g}s {e['accion']} {e['componente']}"
+        causa = e.get("causa", "no detectada por el supervisor")
+        if "como" in e:
+            causa += f" -> {e['como']}"
+        hueco = segundos_o_guion(e.get("hueco_s"))
+        if e.get("volvio") is False:
+            hueco = ">" + hueco
+        print(f"{nombre:>28} {segundos_o_guion(e.get('deteccion_s')):>12} "
+              f"{segundos_o_guion(e.get('recuperacion_s')):>15} {hueco:>11}  {causa}", file=salida)
+
+    marcas = {}
+    for e in r["eventos"]:
+        marcas.setdefault(int(e["segundo"]), []).append(f"<- {e['accion']} {e['componente']}")
+    print(f"\n{'seg':>4} {'ok':>6} {'fallidas':>9} {'p50 ms':>8} {'p99 ms':>8}", file=salida)
+    for s in r["por_segundo"]:
+        print(f"{s['segundo']:>4} {s['ok']:>6} {s['fallidas']:>9} {s['p50_ms']:>8.2f} {s['p99_ms']:>8.2f} "
+              f"{' '.join(marcas.get(s['segundo'], []))}", file=salida)
+
+    v = r["verificacion"]
+    print(f"\nGA activo al final: {v['ga_activo']} (mandato {v['mandato']}) | {v['usuarios']} usuarios", file=salida)
+    if "error" in v:
+        print(f"No se pudo verificar: {v['error']}", file=salida)
+    else:
+        print(f"Perdidas: {v['perdidas']['PRESTAMO']} PRESTAMO, {v['perdidas']['DEVOLUCION']} DEVOLUCION | "
+              f"duplicadas: {v['duplicadas']} | aplicadas sin confirmar: {v['sin_confirmar']}", file=salida)
+    if v["divergentes"] is not None:
+        print(f"Usuarios con distinto estado en primario y respaldo: {v['divergentes']}", file=salida)
+    else:
+        print(f"Divergencia primario/respaldo: sin medir ({v['sin_divergencia']})", file=salida)
+
+
+# ============================
+# Entrada principal
+# ============================
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de fallas: carga constante con componentes caídos o pausados")
+    parser.add_argument("--eventos", type=leer_eventos, default=leer_eventos("10:kill:ga"),
+                        help="segundo:kill|stop:componente[:pausa], separados por coma")
+    parser.add_argument("--componentes", default=",".join(COMPONENTES_SEDE1),
+                        help="componentes que levanta el supervisor, separados por coma")
+    parser.add_argument("--duracion", type=float, default=30.0, help="segundos de carga")
+    parser.add_argument("--tasa", type=float, default=100.0, help="operaciones por segundo entre todos los PS")
+    parser.add_argument("--clientes", type=int, default=4)
+    parser.add_argument("--libros", type=int, default=1000)
+    parser.add_argument("--semilla", type=int, default=7)
+    parser.add_argument("--asentamiento", type=float, default=5.0,
+                        help="segundos de espera tras la carga (devoluciones en bandeja, replicación)")
+    parser.add_argument("--json", action="store_true", help="resultado como una línea JSON")
+    args = parser.parse_args()
+
+    nombres = [n.strip() for n in args.componentes.split(",") if n.strip()]
+    desconocidos = [n for n in nombres if n not in config.SUPERVISOR_COMPONENTES]
+    desconocidos += [e["componente"] for e in args.eventos if e["componente"] not in nombres]
+    if desconocidos:
+        print(f"Componentes desconocidos o no levantados: {', '.join(desconocidos)}")
+        sys.exit(1)
+
+    from lanzador_local import esperar_sistema, preparar_directorio
+    from supervisor import Componente, Supervisor
+
+    directorio = tempfile.mkdtemp(prefix="biblioteca-fallas-")
+    # Los componentes y el supervisor imprimen cada paso: todo eso va al log
+    ruta_log = os.path.join(directorio, "benchmark.log")
+    log = open(ruta_log, "w", buffering=1, encoding="utf-8")
+    salida = sys.stdout
+    sys.stdout = log
+
+    # Los procesos del supervisor heredan el directorio: usan el datos/ del temporal
+    preparar_directorio(directorio, args.libros)
+    os.makedirs("logs")
+    supervisor = Supervisor([Componente(n, *config.SUPERVISOR_COMPONENTES[n]) for n in nombres],
+                            os.path.join(directorio, "logs"))
+    detenido = threading.Event()
+    t_supervisor = threading.Thread(target=supervisor.ejecutar, args=(detenido,))
+    t_supervisor.start()
+
+    resultado = None
+    try:
+        if esperar_sanos(supervisor) and esperar_sistema():
+            resultados, usuarios = [], {}
+            inicio = time.monotonic()
+            fin = inicio + args.duracion
+            hilos = [threading.Thread(target=hilo_cliente, args=(c, args, inicio, fin, resultados, usuarios))
+                     for c in range(args.clientes)]
+            hilos.append(threading.Thread(target=hilo_eventos, args=(supervisor, args.eventos, inicio)))
+            for h in hilos:
+                h.start()
+            for h in hilos:
+                h.join()
+            duracion = time.monotonic() - inicio
+
+            time.sleep(args.asentamiento)
+            resultado = {
+                "tasa": args.tasa,
+                "clientes": args.clientes,
+                "duracion_s": duracion,
+                "operaciones": len(resultados),
+                "fallidas": sum(1 for *_, ok in resultados if not ok),
+                "eventos": medir_eventos(args.eventos, supervisor.incidentes, resultados, inicio, duracion),
+                "por_segundo": linea_de_tiempo(resultados, duracion),
+                "verificacion": verificar(usuarios),
+            }
+    finally:
+        detenido.set()
+        t_supervisor.join()
+        supervisor.cerrar()
+        print(supervisor.resumen())
+
+    if resultado is None:
+        print(f"El sistema no respondió a tiempo; ver {ruta_log}", file=salida)
+    elif args.json:
+        print(json.dumps(resultado), file=salida)
+    else:
+        imprimir_resultado(resultado, salida)
+        print(f"\nSalida del supervisor: {ruta_log} (componentes en {os.path.join(directorio, 'logs')})",
+              file=salida)
+    sys.exit(0 if resultado is not None else 1)
+
+
+if __name__ == "__main__":
+    main()
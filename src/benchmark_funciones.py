@@ -0,0 +1,290 @@
+"""
+benchmark_funciones.py
+Microbenchmarks de las funciones calientes de base_datos y seguridad, sin
+red ni procesos: cómo escalan con el tamaño del catálogo y con los
+préstamos por libro.
+
+Funciones y escenarios:
+- registrar_prestamo / registrar_devolucion / registrar_renovacion: sobre
+  un catálogo de N libros, en --muestras libros que tienen P préstamos
+  cada uno. La devolución y la renovación buscan a un usuario al azar de
+  la lista (caso promedio). Lo que cambia el estado se deshace fuera de
+  la medición, así cada llamada ve N libros y P préstamos.
+- guardar_bd / cargar_bd: el catálogo completo con P préstamos en cada
+  libro, en un archivo temporal. Se omiten los puntos con N x P mayor que
+  --max-prestamos-total (1M libros x 1000 préstamos no entra en memoria).
+- generar_hash_contenido / verificar_hash: un mensaje de PS como el que
+  arma cliente_ps; no dependen del catálogo y se miden una vez.
+
+Por cada punto: tiempo por llamada (p50, p99 y media, con el recolector de
+basura apagado como hace timeit) y memoria, medida aparte con tracemalloc:
+el pico por llamada (lo que asigna aunque lo libere al terminar) y los
+bloques que quedan asignados después de la llamada (sys.getallocatedblocks).
+
+Uso:
+    python src/benchmark_funciones.py [--libros 1000,10000,100000,1000000]
+        [--prestamos 0,10,100,1000] [--repeticiones 2000] [--funciones registrar_prestamo,cargar_bd]
+        [--json resultados.json]
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+from base_datos import cargar_bd, guardar_bd, registrar_devolucion, registrar_prestamo, registrar_renovacion
+from benchmark_ga_concurrente import percentil
+from seguridad import generar_hash_contenido, verificar_hash
+
+
+FUNCIONES_REGISTRO = ("registrar_prestamo", "registrar_devolucion", "registrar_renovacion")
+FUNCIONES_ARCHIVO = ("guardar_bd", "cargar_bd")
+FUNCIONES_HASH = ("generar_hash_contenido", "verificar_hash")
+FUNCIONES = FUNCIONES_REGISTRO + FUNCIONES_ARCHIVO + FUNCIONES_HASH
+
+
+def lista_de_enteros(texto: str) -> list:
+    return [int(x) for x in texto.split(",") if x.strip()]
+
+
+# ============================
+# Datos sintéticos
+# ============================
+
+def prestamo_sintetico(usuario: str) -> dict:
+    return {"usuario": usuario, "fecha_inicio": "2026-01-01 10:00:00",
+            "fecha_fin": "2026-01-15 10:00:00", "renovaciones": 0}
+
+
+def crear_catalogo(num_libros: int) -> dict:
+    return {
+        f"LIB{i:07d}": {"titulo": f"Libro sintético {i}", "ejemplares_disponibles": 1_000_000, "prestamos": []}
+        for i in range(num_libros)
+    }
+
+
+def mensaje_ps() -> dict:
+    """Un mensaje PS -> GC sin hash, con los campos que arma cliente_ps.enviar_operacion."""
+    return {
+        "cliente": "ps_sede1",
+        "token": "TOKEN_PS_SEDE1_123",
+        "tipo_operacion": "PRESTAMO",
+        "codigo_libro": "LIB0000042",
+        "usuario": "usuario42",
+        "id_operacion": uuid.uuid4().hex,
+        "secuencia_minima": 0,
+        "plazo": time.time() + 10.0,
+    }
+
+
+# ============================
+# Medición
+# ============================
+
+def medir(preparar, llamar, deshacer, repeticiones: int, muestras_memoria: int) -> dict:
+    """
+    preparar(i) -> argumentos de la llamada i (sin medir); llamar(*args) es lo
+    que se mide; deshacer(*args) vuelve al estado anterior (sin medir).
+    """
+    tiempos = []
+    gc.collect()
+    gc.disable()
+    try:
+        for i in range(repeticiones):
+            args = preparar(i)
+            t0 = time.perf_counter_ns()
+            llamar(*args)
+            tiempos.append(time.perf_counter_ns() - t0)
+            deshacer(*args)
+    finally:
+        gc.enable()
+
+    picos, bloques = [], []
+    tracemalloc.start()
+    try:
+        for i in range(muestras_memoria):
+            args = preparar(repeticiones + i)
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            bloques_antes = sys.getallocatedblocks()
+            llamar(*args)
+            bloques.append(sys.getallocatedblocks() - bloques_antes)
+            picos.append(tracemalloc.get_traced_memory()[1] - base)
+            deshacer(*args)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "llamadas": repeticiones,
+        "p50_us": percentil(tiempos, 50) / 1000,
+        "p99_us": percentil(tiempos, 99) / 1000,
+        "media_us": sum(tiempos) / len(tiempos) / 1000,
+        "pico_bytes": sum(picos) / len(picos),
+        "bloques_retenidos": sum(bloques) / len(bloques),
+    }
+
+
+def sin_efecto(*_):
+    pass
+
+
+def escenario_registro(funcion: str, bd: dict, codigos: list, prestamos: int, rng: random.Random):
+    """(preparar, llamar, deshacer) de una función de registro sobre los libros de 'codigos'."""
+    if funcion == "registrar_prestamo":
+        def preparar(i):
+            return codigos[i % len(codigos)], f"nuevo{i}"
+
+        def deshacer(codigo, usuario):
+            registrar_devolucion(bd, codigo, usuario)
+
+        return preparar, lambda codigo, usuario: registrar_prestamo(bd, codigo, usuario), deshacer
+
+    def preparar(i):
+        codigo = codigos[i % len(codigos)]
+        return codigo, bd[codigo]["prestamos"][rng.randrange(prestamos)]["usuario"]
+
+    if funcion == "registrar_devolucion":
+        # El préstamo vuelve al final de la lista: la posición sigue siendo al azar
+        def deshacer(codigo, usuario):
+            registrar_prestamo(bd, codigo, usuario)
+
+        return preparar, lambda codigo, usuario: registrar_devolucion(bd, codigo, usuario), deshacer
+
+    def deshacer(codigo, usuario):
+        for p in bd[codigo]["prestamos"]:
+            if p["usuario"] == usuario:
+                p["renovaciones"] = 0
+
+    return preparar, lambda codigo, usuario: registrar_renovacion(bd, codigo, usuario), deshacer
+
+
+def medir_registros(bd: dict, funciones: list, prestamos: int, args, rng: random.Random) -> dict:
+    codigos = rng.sample(list(bd), min(args.muestras, len(bd)))
+    for n, codigo in enumerate(codigos):
+        bd[codigo]["prestamos"] = [prestamo_sintetico(f"u{n}-{j}") for j in range(prestamos)]
+
+    resultados = {}
+    for funcion in funciones:
+        if funcion != "registrar_prestamo" and prestamos == 0:
+            # Sin préstamos no hay a quién devolver ni renovar
+            continue
+        preparar, llamar, deshacer = escenario_registro(funcion, bd, codigos, prestamos, rng)
+        resultados[funcion] = medir(preparar, llamar, deshacer, args.repeticiones, args.muestras_memoria)
+
+    for codigo in codigos:
+        bd[codigo]["prestamos"] = []
+    return resultados
+
+
+def medir_archivos(bd: dict, funciones: list, prestamos: int, args, directorio: str) -> dict:
+    # Todos los libros comparten la misma lista: guardar_bd escribe lo mismo
+    # que con listas propias, sin ocupar N x P préstamos en memoria
+    compartida = [prestamo_sintetico(f"u{j}") for j in range(prestamos)]
+    for libro in bd.values():
+        libro["prestamos"] = compartida
+
+    ruta = os.path.join(directorio, "bd.json")
+    resultados = {}
+    if "guardar_bd" in funciones or "cargar_bd" in funciones:
+        guardar_bd(ruta, bd)
+    if "guardar_bd" in funciones:
+        resultados["guardar_bd"] = medir(lambda i: (ruta, bd), guardar_bd, sin_efecto,
+                                         args.repeticiones_archivo, 1)
+        resultados["guardar_bd"]["bytes_archivo"] = os.path.getsize(ruta)
+    if "cargar_bd" in funciones:
+        resultados["cargar_bd"] = medir(lambda i: (ruta,), cargar_bd, sin_efecto, args.repeticiones_archivo, 1)
+        resultados["cargar_bd"]["bytes_archivo"] = os.path.getsize(ruta)
+    os.remove(ruta)
+
+    for libro in bd.values():
+        libro["prestamos"] = []
+    return resultados
+
+
+def medir_hash(funciones: list, args) -> dict:
+    mensaje = mensaje_ps()
+    firmado = dict(mensaje, hash=generar_hash_contenido(mensaje))
+    resultados = {}
+    if "generar_hash_contenido" in funciones:
+        resultados["generar_hash_contenido"] = medir(lambda i: (mensaje,), generar_hash_contenido, sin_efecto,
+                                                     args.repeticiones, args.muestras_memoria)
+    if "verificar_hash" in funciones:
+        resultados["verificar_hash"] = medir(lambda i: (firmado,), verificar_hash, sin_efecto,
+                                             args.repeticiones, args.muestras_memoria)
+    return resultados
+
+
+# ============================
+# Entrada principal
+# ============================
+
+def imprimir_fila(funcion: str, libros, prestamos, m: dict):
+    extra = f" {m['bytes_archivo'] / 1e6:>9.1f} MB" if "bytes_archivo" in m else ""
+    print(f"{funcion:>22} {libros:>9} {prestamos:>6} {m['p50_us']:>11.2f} {m['p99_us']:>11.2f} "
+          f"{m['media_us']:>11.2f} {m['pico_bytes']:>12.0f} {m['bloques_retenidos']:>9.1f}{extra}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks de base_datos y seguridad")
+    parser.add_argument("--libros", type=lista_de_enteros, default=[1000, 10000, 100000, 1000000],
+                        help="tamaños del catálogo")
+    parser.add_argument("--prestamos", type=lista_de_enteros, default=[0, 10, 100, 1000],
+                        help="préstamos por libro")
+    parser.add_argument("--funciones", default=",".join(FUNCIONES), help="subconjunto, separado por coma")
+    parser.add_argument("--repeticiones", type=int, default=2000, help="llamadas medidas por punto")
+    parser.add_argument("--repeticiones-archivo", type=int, default=3, help="llamadas a guardar_bd / cargar_bd")
+    parser.add_argument("--muestras", type=int, default=100, help="libros con préstamos para las funciones de registro")
+    parser.add_argument("--muestras-memoria", type=int, default=200, help="llamadas medidas con tracemalloc")
+    parser.add_argument("--max-prestamos-total", type=int, default=200_000,
+                        help="N x P máximo para guardar_bd / cargar_bd")
+    parser.add_argument("--semilla", type=int, default=7)
+    parser.add_argument("--json", default=None, help="archivo donde guardar los resultados")
+    args = parser.parse_args()
+
+    funciones = [f.strip() for f in args.funciones.split(",") if f.strip()]
+    desconocidas = [f for f in funciones if f not in FUNCIONES]
+    if desconocidas:
+        parser.error(f"Funciones desconocidas: {', '.join(desconocidas)}")
+
+    rng = random.Random(args.semilla)
+    filas = []
+    print(f"{'función':>22} {'libros':>9} {'prést.':>6} {'p50 us':>11} {'p99 us':>11} {'media us':>11} "
+          f"{'pico B':>12} {'bloques':>9}")
+
+    for funcion, m in medir_hash(funciones, args).items():
+        imprimir_fila(funcion, "-", "-", m)
+        filas.append(dict(m, funcion=funcion, libros=None, prestamos=None))
+
+    con_registro = [f for f in funciones if f in FUNCIONES_REGISTRO]
+    con_archivo = [f for f in funciones if f in FUNCIONES_ARCHIVO]
+    with tempfile.TemporaryDirectory() as directorio:
+        for libros in args.libros:
+            if not con_registro and not con_archivo:
+                break
+            bd = crear_catalogo(libros)
+            for prestamos in args.prestamos:
+                medidos = medir_registros(bd, con_registro, prestamos, args, rng)
+                omitir_archivo = libros * prestamos > args.max_prestamos_total
+                if con_archivo and not omitir_archivo:
+                    medidos.update(medir_archivos(bd, con_archivo, prestamos, args, directorio))
+                for funcion, m in medidos.items():
+                    imprimir_fila(funcion, libros, prestamos, m)
+                    filas.append(dict(m, funcion=funcion, libros=libros, prestamos=prestamos))
+                if con_archivo and omitir_archivo:
+                    print(f"{'(archivo omitido)':>22} {libros:>9} {prestamos:>6}  N x P > {args.max_prestamos_total}")
+            del bd
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"parametros": vars(args), "resultados": filas}, f, indent=2)
+        print(f"Resultados en {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+benchmark_ga_concurrente.py
+
+Mide la mejora del GA concurrente (ROUTER + pool de hilos + locks por libro
++ persistencia agrupada) frente a atender una solicitud a la vez.
+
+Carga de trabajo:
+- Catálogo sintético de N libros.
+- C clientes REQ en paralelo; cada uno hace pares PRESTAMO/DEVOLUCION.
+- El libro de cada par se elige con una distribución Zipf: pocos libros
+  concentran la mayoría de las operaciones (contención realista).
+
+Uso:
+    python src/benchmark_ga_concurrente.py [--libros 5000] [--clientes 16]
+        [--pares 100] [--zipf 1.1] [--trabajadores 1,2,4,8]
+
+La configuración con 1 trabajador e intervalo 0 reproduce el GA original:
+una solicitud a la vez y una escritura a disco por cambio.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+import zmq
+
+from base_datos import guardar_bd
+from gestor_almacenamiento import iniciar_servidor_ga
+
+
+def crear_catalogo(num_libros: int) -> dict:
+    """Catálogo sintético con muchos ejemplares por libro."""
+    return {
+        f"LIB{i:06d}": {
+            "titulo": f"Libro sintético {i}",
+            "ejemplares_disponibles": 1_000_000,
+            "prestamos": [],
+        }
+        for i in range(num_libros)
+    }
+
+
+def pesos_zipf(n: int, s: float) -> list:
+    """Pesos acumulados de una Zipf(s) sobre n elementos."""
+    return list(itertools.accumulate(1.0 / (k ** s) for k in range(1, n + 1)))
+
+
+def percentil(valores: list, p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, int(round(p / 100.0 * (len(ordenados) - 1))))
+    return ordenados[indice]
+
+
+def hilo_cliente(context, endpoint, codigos, acumulados, pares, semilla, latencias, barrera):
+    rng = random.Random(semilla)
+    socket = context.socket(zmq.REQ)
+    socket.connect(endpoint)
+    usuario = f"bench{semilla}"
+
+    barrera.wait()
+    for _ in range(pares):
+        codigo = rng.choices(codigos, cum_weights=acumulados)[0]
+        for accion in ("PRESTAMO", "DEVOLUCION"):
+            mensaje = {"accion": accion, "codigo_libro": codigo, "usuario": usuario}
+            t0 = time.perf_counter()
+            socket.send_string(json.dumps(mensaje))
+            socket.recv_string()
+            latencias.append(time.perf_counter() - t0)
+
+    socket.close(linger=0)
+
+
+def correr_configuracion(num_libros, clientes, pares, zipf, trabajadores, intervalo):
+    bd = crear_catalogo(num_libros)
+    codigos = list(bd.keys())
+    acumulados = pesos_zipf(num_libros, zipf)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta_bd = os.path.join(tmp, "bd_bench.json")
+        guardar_bd(ruta_bd, bd)
+
+        context = zmq.Context()
+        servidor, persistencia = iniciar_servidor_ga(
+            context,
+            "tcp://127.0.0.1:*",
+            bd,
+            ruta_bd,
+            num_trabajadores=trabajadores,
+            intervalo_persistencia=intervalo,
+            verbose=False,
+        )
+
+        latencias = []
+        barrera = threading.Barrier(clientes + 1)
+        hilos = [
+            threading.Thread(
+                target=hilo_cliente,
+                args=(context, servidor.endpoint_real, codigos, acumulados, pares, i, latencias, barrera),
+            )
+            for i in range(clientes)
+        ]
+        for h in hilos:
+            h.start()
+
+        barrera.wait()
+        inicio = time.perf_counter()
+        for h in hilos:
+            h.join()
+        duracion = time.perf_counter() - inicio
+
+        servidor.detener()
+        persistencia.detener()
+        context.term()
+
+    return {
+        "trabajadores": trabajadores,
+        "operaciones": len(latencias),
+        "duracion_s": duracion,
+        "throughput": len(latencias) / duracion if duracion > 0 else 0.0,
+        "p50_ms": percentil(latencias, 50) * 1000,
+        "p99_ms": percentil(latencias, 99) * 1000,
+        "media_ms": statistics.mean(latencias) * 1000 if latencias else 0.0,
+        "escrituras": persistencia.escrituras,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del GA concurrente")
+    parser.add_argument("--libros", type=int, default=5000)
+    parser.add_argument("--clientes", type=int, default=16)
+    parser.add_argument("--pares", type=int, default=100, help="pares PRESTAMO/DEVOLUCION por cliente")
+    parser.add_argument("--zipf", type=float, default=1.1)
+    parser.add_argument("--trabajadores", default="1,2,4,8")
+    parser.add_argument("--intervalo", type=float, default=0.002,
+                        help="espera de la persistencia agrupada (s) para configuraciones con más de 1 trabajador")
+    args = parser.parse_args()
+
+    print(f"Libros: {args.libros} | Clientes: {args.clientes} | Pares por cliente: {args.pares} | Zipf s={args.zipf}")
+    print(f"{'trab':>5} {'ops':>7} {'seg':>8} {'ops/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'escrit':>7} {'speedup':>8}")
+
+    base = None
+    for trabajadores in [int(x) for x in args.trabajadores.split(",")]:
+        intervalo = 0.0 if trabajadores == 1 else args.intervalo
+        r = correr_configuracion(args.libros, args.clientes, args.pares, args.zipf, trabajadores, intervalo)
+        if base is None:
+            base = r["throughput"]
+        speedup = r["throughput"] / base if base else 0.0
+        print(f"{r['trabajadores']:>5} {r['operaciones']:>7} {r['duracion_s']:>8.2f} {r['throughput']:>9.1f} "
+              f"{r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['escrituras']:>7} {speedup:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
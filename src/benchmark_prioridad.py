@@ -0,0 +1,171 @@
+"""
+benchmark_prioridad.py
+Latencia de PRESTAMO detrás de ráfagas de DEVOLUCION en el GA, con la
+cola de entrada en orden de llegada frente a carriles de prioridad
+(servidor_concurrente.ColaPrioridad).
+
+Carga de trabajo:
+- Catálogo sintético de N libros; cada libro ya tiene préstamos para que
+  las devoluciones de la ráfaga sean reales.
+- Cada 'periodo' segundos llega una ráfaga de DEVOLUCION (un DEALER que
+  las envía todas juntas, como un GC que vacía su bandeja).
+- Mientras tanto, C clientes REQ hacen PRESTAMO uno tras otro.
+- Para cada configuración: latencia p50/p99/máx por clase vista por los
+  clientes, y las solicitudes que pasaron adelante por envejecimiento.
+
+Uso:
+    python src/benchmark_prioridad.py [--libros 1000] [--clientes 4]
+        [--rafagas 5] [--tam-rafaga 1000] [--periodo 0.5]
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+
+import zmq
+
+from base_datos import guardar_bd
+from benchmark_ga_concurrente import percentil
+from gestor_almacenamiento import iniciar_servidor_ga
+
+
+def crear_catalogo(num_libros: int, prestamos: int) -> dict:
+    """Catálogo con 'prestamos' préstamos repartidos entre los libros (usuario r<j>)."""
+    bd = {
+        f"LIB{i:06d}": {"titulo": f"Libro sintético {i}", "ejemplares_disponibles": 1_000_000, "prestamos": []}
+        for i in range(num_libros)
+    }
+    for j in range(prestamos):
+        bd[f"LIB{j % num_libros:06d}"]["prestamos"].append({
+            "usuario": f"r{j}",
+            "fecha_inicio": "2026-01-01 10:00:00",
+            "fecha_fin": "2026-01-15 10:00:00",
+            "renovaciones": 0,
+        })
+    return bd
+
+
+def hilo_rafagas(context, endpoint, num_libros, rafagas, tam_rafaga, periodo, envios, llegadas, listo):
+    """Envía las ráfagas de DEVOLUCION y anota cuándo sale y cuándo vuelve cada una."""
+    socket = context.socket(zmq.DEALER)
+    socket.connect(endpoint)
+    j = 0
+    for _ in range(rafagas):
+        proxima = time.perf_counter() + periodo
+        for _ in range(tam_rafaga):
+            mensaje = {"accion": "DEVOLUCION", "codigo_libro": f"LIB{j % num_libros:06d}",
+                       "usuario": f"r{j}", "id_operacion": f"dev-{j}"}
+            envios.append(time.perf_counter())
+            socket.send_multipart([b"", json.dumps(mensaje).encode("utf-8")])
+            j += 1
+        # Las respuestas se recogen mientras llega la próxima ráfaga
+        while time.perf_counter() < proxima:
+            if socket.poll(max(1, int((proxima - time.perf_counter()) * 1000))):
+                socket.recv_multipart()
+                llegadas.append(time.perf_counter())
+    while len(llegadas) < len(envios) and socket.poll(5000):
+        socket.recv_multipart()
+        llegadas.append(time.perf_counter())
+    socket.close(linger=0)
+    listo.set()
+
+
+def hilo_prestamos(context, endpoint, codigos, semilla, latencias, listo):
+    rng = random.Random(semilla)
+    socket = context.socket(zmq.REQ)
+    socket.connect(endpoint)
+    n = 0
+    while not listo.is_set():
+        mensaje = {"accion": "PRESTAMO", "codigo_libro": rng.choice(codigos),
+                   "usuario": f"p{semilla}-{n}", "id_operacion": f"pre-{semilla}-{n}"}
+        t0 = time.perf_counter()
+        socket.send_string(json.dumps(mensaje))
+        socket.recv_string()
+        latencias.append(time.perf_counter() - t0)
+        n += 1
+    socket.close(linger=0)
+
+
+def correr_configuracion(args, prioridad: bool) -> dict:
+    bd = crear_catalogo(args.libros, args.rafagas * args.tam_rafaga)
+    codigos = list(bd.keys())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta_bd = os.path.join(tmp, "bd.json")
+        guardar_bd(ruta_bd, bd)
+
+        context = zmq.Context()
+        servidor, persistencia = iniciar_servidor_ga(
+            context, "tcp://127.0.0.1:*", bd, ruta_bd,
+            num_trabajadores=args.trabajadores, prioridad=prioridad, verbose=False,
+        )
+
+        listo = threading.Event()
+        lat_prestamo = []
+        envios, llegadas = [], []
+
+        hilos = [threading.Thread(
+            target=hilo_rafagas,
+            args=(context, servidor.endpoint_real, args.libros, args.rafagas, args.tam_rafaga, args.periodo,
+                  envios, llegadas, listo),
+        )] + [
+            threading.Thread(target=hilo_prestamos,
+                             args=(context, servidor.endpoint_real, codigos, i, lat_prestamo, listo))
+            for i in range(args.clientes)
+        ]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+
+        metricas = servidor.metricas_clases()
+        envejecidas = servidor.cola.envejecidas
+        servidor.detener()
+        persistencia.detener()
+        context.term()
+
+    # Las respuestas del DEALER no traen el id: se emparejan en orden (las
+    # devoluciones se atienden en el orden en que llegaron)
+    lat_devolucion = [llegada - envio for envio, llegada in zip(envios, llegadas)]
+    return {
+        "prioridad": prioridad,
+        "prestamo": lat_prestamo,
+        "devolucion": lat_devolucion,
+        "servidor": metricas,
+        "envejecidas": envejecidas,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de carriles de prioridad en el GA")
+    parser.add_argument("--libros", type=int, default=1000)
+    parser.add_argument("--clientes", type=int, default=4, help="clientes que hacen PRESTAMO")
+    parser.add_argument("--trabajadores", type=int, default=4)
+    parser.add_argument("--rafagas", type=int, default=5)
+    parser.add_argument("--tam-rafaga", type=int, default=1000, help="DEVOLUCION por ráfaga")
+    parser.add_argument("--periodo", type=float, default=0.5, help="segundos entre ráfagas")
+    args = parser.parse_args()
+
+    print(f"Libros: {args.libros} | Clientes PRESTAMO: {args.clientes} | Trabajadores: {args.trabajadores} | "
+          f"Ráfagas: {args.rafagas} x {args.tam_rafaga} DEVOLUCION cada {args.periodo} s")
+    print(f"{'cola':>10} {'clase':>11} {'ops':>7} {'p50 ms':>8} {'p99 ms':>8} {'máx ms':>8} "
+          f"{'espera GA p99':>14} {'envejec.':>9}")
+
+    for prioridad in (False, True):
+        r = correr_configuracion(args, prioridad)
+        nombre = "carriles" if prioridad else "llegada"
+        for clase, latencias, clase_servidor in (("PRESTAMO", r["prestamo"], "sincrona"),
+                                                 ("DEVOLUCION", r["devolucion"], "asincrona")):
+            # Sin carriles todo va en el primero ("sincrona"), mezclado
+            espera = r["servidor"][clase_servidor if prioridad else "sincrona"]["espera_p99_ms"]
+            print(f"{nombre:>10} {clase:>11} {len(latencias):>7} {percentil(latencias, 50) * 1000:>8.2f} "
+                  f"{percentil(latencias, 99) * 1000:>8.2f} {max(latencias, default=0) * 1000:>8.2f} "
+                  f"{espera:>14.2f} {r['envejecidas']:>9}")
+
+
+if __name__ == "__main__":
+    main()
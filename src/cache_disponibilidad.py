@@ -0,0 +1,352 @@
+"""
+cache_disponibilidad.py
+Flujo de cambios publicado por el GA primario y sus suscriptores: la
+caché de ejemplares_disponibles del GC (CONSULTA sin ir al GA) y la
+réplica de lectura de la sede 2 (ver gestor_almacenamiento_lectura.py).
+
+Responsabilidades:
+- Lado GA (PublicadorDisponibilidad): después de cada registrar_* que
+  cambia la BD se publica (PUB) un aviso con el libro completo y un número
+  de secuencia. Esa secuencia también viaja en la respuesta de la
+  operación, así un cliente sabe qué cambio tiene que ver reflejado en
+  sus lecturas siguientes. Sin cambios se publica un latido con la última
+  secuencia. También arma la foto completa que piden los suscriptores al
+  arrancar o cuando se desincronizan.
+- Lado suscriptor (SuscriptorCambios): un hilo suscrito a esos avisos
+  carga la foto completa y aplica los avisos en orden.
+- CacheDisponibilidad: suscriptor del GC que solo guarda
+  ejemplares_disponibles y la versión (secuencia) de cada libro.
+
+El mismo socket PUB del GA lleva otros eventos en otros tópicos (por
+ejemplo VENCIDO, ver vencimientos.py), fuera de la secuencia de cambios.
+
+Desfase acotado:
+- Cada proceso GA tiene una "época" distinta; si cambia (el GA se
+  reinició) o falta una secuencia (PUB descarta mensajes si el suscriptor
+  se atrasa), se vuelve a pedir la foto completa.
+- Si el suscriptor no sabe del GA en CACHE_MAX_DESFASE segundos deja de
+  responder, y la lectura sigue el camino normal hacia el GA.
+"""
+
+import copy
+import json
+import queue
+import threading
+import time
+import uuid
+
+import zmq
+
+from config import (
+    TOPIC_DISPONIBILIDAD,
+    CACHE_LATIDO_INTERVALO,
+    CACHE_MAX_DESFASE,
+    CACHE_TIMEOUT_INSTANTANEA_MS,
+)
+
+
+# ============================
+# Lado GA
+# ============================
+
+class PublicadorDisponibilidad:
+    """
+    - context: contexto ZeroMQ del GA
+    - endpoint: dirección donde se publica (bind)
+
+    publicar() se llama con el lock del libro tomado, así los avisos de un
+    mismo libro salen en orden.
+    """
+
+    def __init__(self, context: zmq.Context, endpoint: str,
+                 intervalo_latido: float = CACHE_LATIDO_INTERVALO):
+        self.context = context
+        self.endpoint = endpoint
+        self.intervalo_latido = intervalo_latido
+
+        self.epoca = uuid.uuid4().hex
+        self.secuencia = 0
+
+        self._lock = threading.Lock()
+        self._cola = queue.Queue()
+        self._activo = False
+
+    def iniciar(self):
+        self._activo = True
+        self._hilo = threading.Thread(target=self._bucle, daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        self._activo = False
+        self._hilo.join(timeout=2)
+
+    def publicar(self, codigo: str, libro: dict) -> int:
+        """
+        Encola el aviso del cambio y retorna su número de secuencia. El libro
+        se serializa aquí mismo, mientras el lock del libro sigue tomado.
+        """
+        with self._lock:
+            self.secuencia += 1
+            aviso = json.dumps({
+                "tipo": "CAMBIO",
+                "epoca": self.epoca,
+                "secuencia": self.secuencia,
+                "codigo_libro": codigo,
+                "libro": libro,
+            }, ensure_ascii=False)
+            self._cola.put((self.secuencia, TOPIC_DISPONIBILIDAD, aviso))
+            return self.secuencia
+
+    def publicar_evento(self, topico: str, evento: dict):
+        """
+        Publica un evento en otro tópico del mismo socket (ej. VENCIDO).
+        No usa la secuencia del flujo de cambios.
+        """
+        self._cola.put((None, topico, json.dumps(evento, ensure_ascii=False)))
+
+    def instantanea(self, bd: dict, bloqueos, completa: bool = False) -> dict:
+        """
+        Foto de la BD. La secuencia se lee primero y cada libro se copia
+        después con su lock, sin tomar todos a la vez: un libro que cambie
+        durante la copia tiene un aviso con secuencia mayor, y el suscriptor
+        lo aplica igual (el aviso trae el libro completo).
+
+        - completa=False: solo ejemplares_disponibles por libro
+        - completa=True: copia de cada libro (para la réplica de lectura)
+        """
+        with self._lock:
+            epoca, secuencia = self.epoca, self.secuencia
+
+        # Con la BD en disco se recorre SQLite sin llenar la caché y sin
+        # frenar la persistencia (fijo=False)
+        libros = {}
+        for codigo, libro in (list(bd.items()) if isinstance(bd, dict) else bd.items(fijo=False)):
+            with bloqueos.de(codigo):
+                libros[codigo] = copy.deepcopy(libro) if completa else libro["ejemplares_disponibles"]
+
+        return {
+            "ok": True,
+            "epoca": epoca,
+            "secuencia": secuencia,
+            "libros": libros,
+        }
+
+    def _bucle(self):
+        socket = self.context.socket(zmq.PUB)
+        socket.setsockopt(zmq.LINGER, 0)
+        socket.bind(self.endpoint)
+        ultima_enviada = 0
+
+        while self._activo:
+            try:
+                secuencia, topico, aviso = self._cola.get(timeout=self.intervalo_latido)
+                if secuencia is not None:
+                    ultima_enviada = secuencia
+            except queue.Empty:
+                topico = TOPIC_DISPONIBILIDAD
+                aviso = json.dumps({"tipo": "LATIDO", "epoca": self.epoca, "secuencia": ultima_enviada})
+
+            socket.send_multipart([topico.encode("utf-8"), aviso.encode("utf-8")])
+
+        socket.close()
+
+
+# ============================
+# Lado suscriptor
+# ============================
+
+class SuscriptorCambios:
+    """
+    Base de los suscriptores del flujo de cambios.
+
+    - context: contexto ZeroMQ
+    - endpoint_cambios: PUB del GA primario
+    - endpoint_ga: GA al que se le pide la foto completa
+    - max_desfase: segundos sin saber del GA antes de dejar de responder
+
+    Las subclases definen _cargar_foto() y _aplicar_libro(); ambas se
+    llaman con self._lock tomado.
+    """
+
+    # Si la foto que se pide al GA trae los libros completos
+    FOTO_COMPLETA = False
+
+    def __init__(self, context: zmq.Context, endpoint_cambios: str, endpoint_ga: str,
+                 max_desfase: float = CACHE_MAX_DESFASE):
+        self.context = context
+        self.endpoint_cambios = endpoint_cambios
+        self.endpoint_ga = endpoint_ga
+        self.max_desfase = max_desfase
+
+        self._lock = threading.Lock()
+        # Se avisa cada vez que avanza la secuencia (ver esperar_secuencia)
+        self._avance = threading.Condition(self._lock)
+        self._epoca = None
+        self._ultima_secuencia = 0
+        self._ultimo_contacto = 0.0
+        self._sincronizada = False
+
+        self.resincronizaciones = 0
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._bucle, daemon=True)
+        self._hilo.start()
+
+    @property
+    def secuencia(self) -> int:
+        return self._ultima_secuencia
+
+    def _al_dia(self) -> bool:
+        """Llamar con self._lock tomado."""
+        return self._sincronizada and time.monotonic() - self._ultimo_contacto <= self.max_desfase
+
+    def esperar_secuencia(self, secuencia: int, timeout: float) -> bool:
+        """
+        Espera hasta 'timeout' segundos a que se haya aplicado el cambio
+        'secuencia'. Retorna True si el suscriptor está al día y lo incluye.
+        """
+        limite = time.monotonic() + timeout
+        with self._avance:
+            while True:
+                if self._al_dia() and self._ultima_secuencia >= secuencia:
+                    return True
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    return False
+                self._avance.wait(restante)
+
+    def _cargar_foto(self, libros: dict, secuencia: int):
+        raise NotImplementedError
+
+    def _aplicar_libro(self, codigo: str, libro: dict, secuencia: int):
+        raise NotImplementedError
+
+    def _pedir_instantanea(self) -> bool:
+        socket_ga = self.context.socket(zmq.REQ)
+        socket_ga.setsockopt(zmq.LINGER, 0)
+        socket_ga.connect(self.endpoint_ga)
+
+        try:
+            socket_ga.send_string(json.dumps({"accion": "DISPONIBILIDAD", "completa": self.FOTO_COMPLETA}))
+            if not socket_ga.poll(CACHE_TIMEOUT_INSTANTANEA_MS):
+                print(f"{type(self).__name__}: el GA no respondió la foto completa.")
+                return False
+            foto = json.loads(socket_ga.recv_string())
+        finally:
+            socket_ga.close()
+
+        if not foto.get("ok"):
+            print(f"{type(self).__name__}: el GA rechazó la foto completa: {foto.get('mensaje')}")
+            return False
+
+        secuencia = foto["secuencia"]
+        with self._avance:
+            self._cargar_foto(foto["libros"], secuencia)
+            self._epoca = foto["epoca"]
+            self._ultima_secuencia = secuencia
+            self._ultimo_contacto = time.monotonic()
+            self._sincronizada = True
+            self._avance.notify_all()
+
+        self.resincronizaciones += 1
+        print(f"{type(self).__name__} sincronizada: {len(foto['libros'])} libros, secuencia {secuencia}.")
+        return True
+
+    def _aplicar_aviso(self, aviso: dict):
+        """Aplica un aviso del GA. Si detecta un hueco o un GA nuevo, marca para resincronizar."""
+        with self._avance:
+            if aviso.get("epoca") != self._epoca:
+                self._sincronizada = False
+                return
+
+            secuencia = aviso.get("secuencia", 0)
+
+            if aviso.get("tipo") == "LATIDO":
+                if secuencia > self._ultima_secuencia:
+                    # Se perdió el último aviso
+                    self._sincronizada = False
+                else:
+                    self._ultimo_contacto = time.monotonic()
+                return
+
+            if secuencia <= self._ultima_secuencia:
+                # Ya incluido en la foto completa
+                return
+
+            if secuencia > self._ultima_secuencia + 1:
+                self._sincronizada = False
+                return
+
+            self._aplicar_libro(aviso["codigo_libro"], aviso["libro"], secuencia)
+            self._ultima_secuencia = secuencia
+            self._ultimo_contacto = time.monotonic()
+            self._avance.notify_all()
+
+    def _bucle(self):
+        socket_sub = self.context.socket(zmq.SUB)
+        socket_sub.connect(self.endpoint_cambios)
+        socket_sub.setsockopt(zmq.SUBSCRIBE, TOPIC_DISPONIBILIDAD.encode("utf-8"))
+
+        while True:
+            try:
+                if not self._sincronizada:
+                    if not self._pedir_instantanea():
+                        time.sleep(CACHE_LATIDO_INTERVALO)
+                        continue
+
+                if not socket_sub.poll(int(CACHE_LATIDO_INTERVALO * 1000)):
+                    continue
+
+                _, datos = socket_sub.recv_multipart()
+                self._aplicar_aviso(json.loads(datos.decode("utf-8")))
+
+            except Exception as e:
+                print(f"Error en {type(self).__name__}: {e}")
+                time.sleep(CACHE_LATIDO_INTERVALO)
+
+
+class CacheDisponibilidad(SuscriptorCambios):
+    """
+    Caché del GC. consultar() retorna la respuesta para el PS, o None si
+    la caché no está al día (o no incluye todavía 'secuencia_minima').
+    """
+
+    def __init__(self, context: zmq.Context, endpoint_cambios: str, endpoint_ga: str,
+                 max_desfase: float = CACHE_MAX_DESFASE):
+        super().__init__(context, endpoint_cambios, endpoint_ga, max_desfase)
+
+        # codigo -> (ejemplares_disponibles, versión)
+        self._libros = {}
+
+        self.aciertos = 0
+        self.rechazadas = 0
+
+    def _cargar_foto(self, libros: dict, secuencia: int):
+        self._libros = {codigo: (ejemplares, secuencia) for codigo, ejemplares in libros.items()}
+
+    def _aplicar_libro(self, codigo: str, libro: dict, secuencia: int):
+        self._libros[codigo] = (libro["ejemplares_disponibles"], secuencia)
+
+    def consultar(self, codigo: str, secuencia_minima: int = 0):
+        with self._lock:
+            if not self._al_dia() or self._ultima_secuencia < secuencia_minima:
+                self.rechazadas += 1
+                return None
+            self.aciertos += 1
+            desfase = time.monotonic() - self._ultimo_contacto
+            entrada = self._libros.get(codigo)
+            secuencia = self._ultima_secuencia
+
+        if entrada is None:
+            return {"ok": False, "mensaje": "El libro no existe.", "secuencia": secuencia, "fuente": "cache"}
+
+        ejemplares, version = entrada
+        return {
+            "ok": True,
+            "mensaje": "Consulta realizada",
+            "ejemplares_disponibles": ejemplares,
+            "version": version,
+            "secuencia": secuencia,
+            "desfase_ms": int(desfase * 1000),
+            "fuente": "cache",
+        }
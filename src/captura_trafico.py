@@ -0,0 +1,103 @@
+"""
+captura_trafico.py
+Captura de las solicitudes que atiende un GC, para reproducirlas después
+con reproductor_trafico.py: las ráfagas y la mezcla de operaciones reales
+en lugar de una carga sintética.
+
+Formato: una línea JSON por registro, en un archivo de solo agregar (con
+extensión .gz se guarda comprimido):
+    {"captura": 1, "sede": "1", "inicio": 1760000000.0}   cada vez que el GC arranca
+    [0.0123, "ps_sede1", "PRESTAMO", "LIB0001", "ana"]    una solicitud
+    [0.5071, "ps_sede1", "BUSCAR", "sist oper", "ana", 2]  BUSCAR: texto y página
+
+El primer campo es el instante de llegada al GC, en segundos desde
+"inicio"; el resto es la operación tal como la arma el PS (cliente_ps.py).
+El token, el hash, el id y el plazo no se guardan: se generan de nuevo al
+reproducir. Solo se capturan las solicitudes que pasan la validación de
+seguridad (las rechazadas por el control de admisión no llegan a ella).
+"""
+
+import gzip
+import json
+import threading
+import time
+
+from config import GC_CAPTURA_INTERVALO_FLUSH
+
+
+def abrir_captura(ruta: str, modo: str):
+    if ruta.endswith(".gz"):
+        return gzip.open(ruta, modo + "t", encoding="utf-8")
+    return open(ruta, modo, encoding="utf-8")
+
+
+class CapturaTrafico:
+    """
+    - ruta: archivo de captura (se agrega al final si ya existe)
+    - sede: sede del GC, para reproducir cada solicitud contra su GC
+    """
+
+    def __init__(self, ruta: str, sede: str, intervalo: float = GC_CAPTURA_INTERVALO_FLUSH):
+        self.ruta = ruta
+        self.inicio = time.time()
+        self.intervalo = intervalo
+        self.registradas = 0
+        self._lock = threading.Lock()
+        self._archivo = abrir_captura(ruta, "a")
+        self._archivo.write(json.dumps({"captura": 1, "sede": sede, "inicio": self.inicio}) + "\n")
+        self._detener = threading.Event()
+
+    def iniciar(self):
+        """Arranca el hilo que baja la captura a disco cada 'intervalo' segundos."""
+        threading.Thread(target=self._bucle_flush, daemon=True).start()
+
+    def registrar(self, mensaje: dict, llegada: float = None):
+        """Agrega una solicitud ya validada; 'llegada' es el time.time() de cuando llegó al GC."""
+        llegada = time.time() if llegada is None else llegada
+        registro = [round(llegada - self.inicio, 4), mensaje.get("cliente"), mensaje.get("tipo_operacion")]
+        if mensaje.get("tipo_operacion") == "BUSCAR":
+            registro += [mensaje.get("texto", ""), mensaje.get("usuario"), mensaje.get("pagina", 1)]
+        else:
+            registro += [mensaje.get("codigo_libro"), mensaje.get("usuario")]
+        linea = json.dumps(registro, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._archivo.write(linea)
+            self.registradas += 1
+
+    def _bucle_flush(self):
+        while not self._detener.wait(self.intervalo):
+            with self._lock:
+                self._archivo.flush()
+
+    def cerrar(self):
+        self._detener.set()
+        with self._lock:
+            self._archivo.close()
+
+
+def leer_captura(ruta: str) -> list:
+    """
+    Solicitudes de una captura como (instante, sede, op), con el instante
+    en segundos desde la época; op tiene el formato de cliente_ps.
+    """
+    solicitudes = []
+    inicio, sede = 0.0, "1"
+    with abrir_captura(ruta, "r") as f:
+        for linea in f:
+            linea = linea.strip()
+            if not linea:
+                continue
+            try:
+                registro = json.loads(linea)
+            except json.JSONDecodeError:
+                # Última línea a medio escribir si el GC se cayó
+                continue
+            if isinstance(registro, dict):
+                inicio, sede = registro["inicio"], registro["sede"]
+                continue
+            t, cliente, tipo, codigo, usuario = registro[:5]
+            op = {"cliente": cliente, "tipo_operacion": tipo, "codigo_libro": codigo, "usuario": usuario}
+            if tipo == "BUSCAR" and len(registro) > 5:
+                op["pagina"] = registro[5]
+            solicitudes.append((inicio + t, sede, op))
+    return solicitudes
@@ -0,0 +1,322 @@
+"""
+cliente_ga.py
+Comunicación de los Actores con el GA (primario y respaldo).
+
+Responsabilidades:
+- Enviar cada operación al GA primario y, si falla o no responde a
+  tiempo, al GA de respaldo (lo que antes hacía enviar_a_ga en cada Actor).
+- Llevar la distribución de los tiempos de ida y vuelta (RTT) que el
+  Actor observa con cada GA y derivar de ella el timeout de cada intento,
+  en lugar de esperar siempre ACTOR_TIMEOUT_GA_MS.
+- Solicitudes cubiertas ("hedged") para consultas de solo lectura: si el
+  primer GA no respondió dentro de su p95, la misma consulta se envía al
+  otro GA y se usa la primera respuesta que llegue. Así una pausa del GA
+  (por ejemplo una escritura grande de la BD) no se ve en la cola de
+  latencias.
+
+Las escrituras no se cubren: el respaldo también las aplicaría y su BD se
+separaría de la del primario hasta que llegue el flujo de replicación.
+
+Si el mensaje trae "plazo" (ver plazos.py), ningún intento espera más
+allá de él y no se prueba el otro GA con el plazo vencido.
+
+Promoción del respaldo (ver mandato_ga.py): el cliente envía el mayor
+"mandato" que vio en las respuestas, prueba primero el GA que lo tiene y
+salta al otro si un GA responde que está relegado.
+"""
+
+import json
+import threading
+import time
+from collections import deque
+
+import zmq
+
+from config import (
+    SEDE1_HOST,
+    GA_PRIMARY_PORT,
+    GA_REPLICA_PORT,
+    ACTOR_TIMEOUT_GA_MS,
+    ACTOR_RTT_VENTANA,
+    ACTOR_RTT_MIN_MUESTRAS,
+    ACTOR_TIMEOUT_PERCENTIL,
+    ACTOR_TIMEOUT_FACTOR,
+    ACTOR_TIMEOUT_MIN_MS,
+    ACTOR_COBERTURA_ACTIVA,
+    ACTOR_COBERTURA_PERCENTIL,
+    ACTOR_COBERTURA_MIN_MS,
+)
+from plazos import descartar_si_vencido, respuesta_vencida, restante, vencido
+from transporte import direccion_conexion
+
+
+ENDPOINTS_GA = (
+    (direccion_conexion(SEDE1_HOST, GA_PRIMARY_PORT), "primario"),
+    (direccion_conexion(SEDE1_HOST, GA_REPLICA_PORT), "respaldo"),
+)
+
+# Operaciones que no modifican la BD y por lo tanto se pueden repetir
+ACCIONES_SOLO_LECTURA = ("CONSULTA", "PRESTAMOS_USUARIO", "VENCIDOS", "BUSCAR")
+
+RESPUESTA_SIN_GA = {"ok": False, "mensaje": "Error al comunicarse con GA primario y GA respaldo."}
+
+
+def es_solo_lectura(mensaje_ga: dict) -> bool:
+    return mensaje_ga.get("accion") in ACCIONES_SOLO_LECTURA
+
+
+def acotar_al_plazo(timeout_ms: int, mensaje_ga: dict) -> int:
+    """El timeout de un intento, sin pasar del plazo de la solicitud."""
+    tiempo = restante(mensaje_ga)
+    if tiempo is None:
+        return timeout_ms
+    return max(1, min(timeout_ms, int(tiempo * 1000)))
+
+
+# ============================
+# Mandato del GA activo
+# ============================
+
+class MandatoVisto:
+    """
+    Mayor mandato que el cliente vio en las respuestas de los GA y el GA
+    que lo tenía, que pasa a ser el primero en probarse.
+    """
+
+    def __init__(self, endpoints):
+        self.endpoints = tuple(endpoints)
+        self.mandato = 0
+        self._preferido = None
+
+    def serializar(self, mensaje_ga: dict) -> str:
+        if self.mandato:
+            mensaje_ga = dict(mensaje_ga, mandato=self.mandato)
+        return json.dumps(mensaje_ga)
+
+    def revisar(self, origen: str, respuesta: dict):
+        """La respuesta, o None si el GA está relegado (hay que probar el otro)."""
+        mandato = respuesta.get("mandato")
+        if isinstance(mandato, int) and mandato > self.mandato and not respuesta.get("relegado"):
+            self.mandato = mandato
+            self._preferido = origen
+        if respuesta.get("relegado"):
+            return None
+        return respuesta
+
+    def en_orden(self):
+        """Endpoints con el GA del mayor mandato primero."""
+        if self._preferido is None:
+            return self.endpoints
+        return tuple(sorted(self.endpoints, key=lambda e: e[1] != self._preferido))
+
+
+# ============================
+# Distribución de RTT
+# ============================
+
+class EstadisticasRTT:
+    """
+    Últimos ACTOR_RTT_VENTANA tiempos de ida y vuelta (segundos) con un GA.
+
+    Un intento que vence se registra con el valor del timeout: así, si el
+    GA se vuelve más lento, la distribución crece y el timeout con ella.
+    Cuando gana la solicitud cubierta no se registra nada para el primer
+    GA: esa muestra quedaría siempre cerca del p95 y lo haría subir solo.
+    """
+
+    def __init__(self, ventana: int = ACTOR_RTT_VENTANA):
+        self._muestras = deque(maxlen=ventana)
+        self._lock = threading.Lock()
+
+    def registrar(self, rtt: float):
+        with self._lock:
+            self._muestras.append(rtt)
+
+    def percentil(self, p: float):
+        """Percentil p de las muestras (segundos), o None si aún son pocas."""
+        with self._lock:
+            if len(self._muestras) < ACTOR_RTT_MIN_MUESTRAS:
+                return None
+            ordenadas = sorted(self._muestras)
+        indice = min(len(ordenadas) - 1, int(len(ordenadas) * p / 100.0))
+        return ordenadas[indice]
+
+    def timeout_ms(self) -> int:
+        """Timeout para el próximo intento con este GA."""
+        p = self.percentil(ACTOR_TIMEOUT_PERCENTIL)
+        if p is None:
+            return ACTOR_TIMEOUT_GA_MS
+        return int(min(ACTOR_TIMEOUT_GA_MS, max(ACTOR_TIMEOUT_MIN_MS, p * 1000 * ACTOR_TIMEOUT_FACTOR)))
+
+    def retraso_cobertura_ms(self):
+        """Espera antes de enviar la solicitud cubierta, o None si aún son pocas muestras."""
+        p = self.percentil(ACTOR_COBERTURA_PERCENTIL)
+        if p is None:
+            return None
+        return max(ACTOR_COBERTURA_MIN_MS, p * 1000)
+
+
+# ============================
+# Cliente bloqueante
+# ============================
+
+class ClienteGA:
+    """
+    - context: contexto ZeroMQ del Actor
+    - nombre_actor: para los mensajes de log
+    - endpoints: ((endpoint, origen), ...) en orden de preferencia
+    - cobertura: si se cubren las consultas de solo lectura
+
+    enviar() retorna (respuesta_dict, origen), origen ∈ {"primario",
+    "respaldo", "ninguno"}, igual que el antiguo enviar_a_ga.
+    """
+
+    def __init__(self, context: zmq.Context, nombre_actor: str,
+                 endpoints=ENDPOINTS_GA, cobertura: bool = ACTOR_COBERTURA_ACTIVA):
+        self.context = context
+        self.nombre_actor = nombre_actor
+        self.endpoints = endpoints
+        self.cobertura = cobertura
+
+        self.rtt = {origen: EstadisticasRTT() for _, origen in endpoints}
+        self.visto = MandatoVisto(endpoints)
+
+        # Consultas en las que se envió la solicitud cubierta / en las que
+        # la respuesta cubierta llegó primero
+        self.cubiertas = 0
+        self.ganadas_por_cobertura = 0
+
+    def _abrir(self, endpoint: str, mensaje_ga: dict):
+        socket_ga = self.context.socket(zmq.REQ)
+        socket_ga.setsockopt(zmq.LINGER, 0)
+        socket_ga.setsockopt(zmq.SNDTIMEO, ACTOR_TIMEOUT_GA_MS)
+        socket_ga.connect(endpoint)
+        socket_ga.send_string(self.visto.serializar(mensaje_ga))
+        return socket_ga
+
+    def _intentar(self, endpoint: str, origen: str, mensaje_ga: dict):
+        """Un intento con un GA. Retorna la respuesta o None si falló."""
+        timeout_rtt = self.rtt[origen].timeout_ms()
+        timeout_ms = acotar_al_plazo(timeout_rtt, mensaje_ga)
+        inicio = time.perf_counter()
+        socket_ga = None
+
+        try:
+            socket_ga = self._abrir(endpoint, mensaje_ga)
+            if not socket_ga.poll(timeout_ms):
+                # Un corte por el plazo no dice nada del RTT del GA
+                if timeout_ms == timeout_rtt:
+                    self.rtt[origen].registrar(timeout_ms / 1000.0)
+                print(f"{self.nombre_actor}: GA {origen} no respondió en {timeout_ms} ms")
+                return None
+
+            respuesta = json.loads(socket_ga.recv_string())
+            self.rtt[origen].registrar(time.perf_counter() - inicio)
+            respuesta = self.visto.revisar(origen, respuesta)
+            if respuesta is None:
+                print(f"{self.nombre_actor}: GA {origen} está relegado")
+            return respuesta
+
+        except Exception as e:
+            print(f"{self.nombre_actor}: fallo al comunicarse con GA {origen}: {e}")
+            return None
+
+        finally:
+            if socket_ga is not None:
+                socket_ga.close()
+
+    def enviar(self, mensaje_ga: dict):
+        endpoints = self.visto.en_orden()
+        if self.cobertura and len(endpoints) > 1 and es_solo_lectura(mensaje_ga):
+            retraso = self.rtt[endpoints[0][1]].retraso_cobertura_ms()
+            if retraso is not None:
+                return self._enviar_cubierto(mensaje_ga, retraso)
+
+        for endpoint, origen in endpoints:
+            vencida = descartar_si_vencido(mensaje_ga, self.nombre_actor)
+            if vencida is not None:
+                return vencida, "ninguno"
+            respuesta = self._intentar(endpoint, origen, mensaje_ga)
+            if respuesta is not None:
+                return respuesta, origen
+
+        return dict(RESPUESTA_SIN_GA), "ninguno"
+
+    def _enviar_cubierto(self, mensaje_ga: dict, retraso_ms: float):
+        """
+        Envía al primer GA; si no respondió en 'retraso_ms', envía también
+        al segundo y se queda con la primera respuesta.
+        """
+        (endpoint_1, origen_1), (endpoint_2, origen_2) = self.visto.en_orden()[:2]
+        inicio = time.perf_counter()
+        # socket -> (origen, instante de envío)
+        abiertos = {}
+
+        try:
+            try:
+                abiertos[self._abrir(endpoint_1, mensaje_ga)] = (origen_1, inicio)
+            except Exception as e:
+                print(f"{self.nombre_actor}: fallo al comunicarse con GA {origen_1}: {e}")
+
+            poller = zmq.Poller()
+            for socket_ga in abiertos:
+                poller.register(socket_ga, zmq.POLLIN)
+
+            # Plazo total: el del primer GA, o el del segundo si este es mayor
+            plazo = inicio + max(self.rtt[origen_1].timeout_ms(),
+                                 retraso_ms + self.rtt[origen_2].timeout_ms()) / 1000.0
+            envio_cubierta = inicio + retraso_ms / 1000.0 if abiertos else inicio
+            # Sin pasar del plazo de la solicitud
+            tiempo = restante(mensaje_ga)
+            if tiempo is not None:
+                plazo = min(plazo, inicio + tiempo)
+                if envio_cubierta >= plazo:
+                    envio_cubierta = None
+
+            while True:
+                ahora = time.perf_counter()
+
+                if envio_cubierta is not None and ahora >= envio_cubierta:
+                    envio_cubierta = None
+                    self.cubiertas += 1
+                    try:
+                        socket_ga = self._abrir(endpoint_2, mensaje_ga)
+                        abiertos[socket_ga] = (origen_2, time.perf_counter())
+                        poller.register(socket_ga, zmq.POLLIN)
+                    except Exception as e:
+                        print(f"{self.nombre_actor}: fallo al comunicarse con GA {origen_2}: {e}")
+
+                limite = envio_cubierta if envio_cubierta is not None else plazo
+                espera_ms = max(0, int((limite - ahora) * 1000))
+                listos = dict(poller.poll(espera_ms))
+
+                for socket_ga in listos:
+                    origen, enviado = abiertos[socket_ga]
+                    respuesta = json.loads(socket_ga.recv_string())
+                    self.rtt[origen].registrar(time.perf_counter() - enviado)
+                    poller.unregister(socket_ga)
+                    respuesta = self.visto.revisar(origen, respuesta)
+                    if respuesta is None:
+                        # Relegado: si aún no se envió la cubierta, se envía ya
+                        if envio_cubierta is not None:
+                            envio_cubierta = time.perf_counter()
+                        continue
+                    if origen == origen_2:
+                        self.ganadas_por_cobertura += 1
+                    return respuesta, origen
+
+                if envio_cubierta is None and time.perf_counter() >= plazo:
+                    break
+
+            if vencido(mensaje_ga):
+                return respuesta_vencida(self.nombre_actor), "ninguno"
+            print(f"{self.nombre_actor}: ningún GA respondió la consulta a tiempo")
+            return dict(RESPUESTA_SIN_GA), "ninguno"
+
+        except Exception as e:
+            print(f"{self.nombre_actor}: fallo en la consulta cubierta: {e}")
+            return dict(RESPUESTA_SIN_GA), "ninguno"
+
+        finally:
+            for socket_ga in abiertos:
+                socket_ga.close()
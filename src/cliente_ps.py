@@ -10,21 +10,45 @@ Responsabilidades:
     - tipo_operacion
     - codigo_libro
     - usuario
+    - texto y pagina (solo BUSCAR)
+    - id_operacion (único por operación; el GA lo usa para no aplicar
+      dos veces una operación reintentada)
+    - secuencia_minima (última secuencia de cambio que vio esta sesión;
+      las lecturas desde caché o réplica la respetan: read-your-writes)
+    - plazo (instante después del cual el PS deja de esperar, ver
+      plazos.py; las etapas siguientes descartan el trabajo vencido)
     - hash (para integridad)
 - Enviar las solicitudes al Gestor de Carga (GC) mediante ZeroMQ (REQ/REP).
 - Imprimir la respuesta de confirmación que retorna el GC.
+- Reservas: después de una RESERVA aceptada el PS se suscribe (SUB) al
+  tópico "RESERVA.<usuario>" del GA; cuando llega el aviso de que hay un
+  ejemplar apartado, envía el PRESTAMO. Al terminar el archivo espera
+  esos avisos hasta PS_ESPERA_RESERVAS_SEGUNDOS, en lugar de reintentar
+  PRESTAMO hasta que haya ejemplares.
 
 Formato del archivo de operaciones (una por línea):
 TIPO_OPERACION;CODIGO_LIBRO;USUARIO
 
+En BUSCAR la segunda columna es el texto a buscar en los títulos y se
+puede agregar una cuarta con el número de página:
+BUSCAR;TEXTO;USUARIO[;PAGINA]
+
 Ejemplo:
 DEVOLUCION;LIB001;juan
 RENOVACION;LIB010;maria
 PRESTAMO;LIB500;andres
+RESERVA;LIB500;sofia
+CONSULTA;LIB500;andres
+PRESTAMOS_USUARIO;;andres
+VENCIDOS;;andres
+BUSCAR;sist oper;andres;2
 """
 
 import json
 import sys
+import time
+import uuid
+from collections import deque
 
 import zmq
 
@@ -34,9 +58,15 @@ from config import (
     SEDE2_HOST,
     GC_SEDE1_PORT,
     GC_SEDE2_PORT,
+    GA_CAMBIOS_PUB_PORT,
+    TOPIC_RESERVA,
+    PS_ESPERA_RESERVAS_SEGUNDOS,
+    PS_MAX_REINTENTOS_SOBRECARGA,
+    PS_PLAZO_SEGUNDOS,
     VALID_CLIENT_TOKENS,
 )
 from seguridad import generar_hash_contenido
+from transporte import direccion_conexion
 
 
 def leer_operaciones_desde_archivo(ruta_archivo: str):
@@ -64,11 +94,15 @@ def leer_operaciones_desde_archivo(ruta_archivo: str):
             codigo_libro = partes[1].strip()
             usuario = partes[2].strip()
 
-            operaciones.append({
+            op = {
                 "tipo_operacion": tipo_operacion,
                 "codigo_libro": codigo_libro,
                 "usuario": usuario
-            })
+            }
+            if tipo_operacion == "BUSCAR":
+                op["pagina"] = int(partes[3]) if len(partes) > 3 and partes[3].strip() else 1
+
+            operaciones.append(op)
 
     return operaciones
 
@@ -88,8 +122,12 @@ def ejecutar_cliente_ps(sede: str, ruta_archivo: str, nombre_cliente: str):
 
     token = VALID_CLIENT_TOKENS[nombre_cliente]
 
-    context = zmq.Context()
+    context = zmq.Context.instance()
     socket = context.socket(zmq.REQ)
+    # Si vence el plazo se envía la siguiente sin esperar esa respuesta
+    # (y si llega tarde, se descarta)
+    socket.setsockopt(zmq.REQ_RELAXED, 1)
+    socket.setsockopt(zmq.REQ_CORRELATE, 1)
 
     if sede == "1":
         host_gc = SEDE1_HOST
@@ -98,37 +136,130 @@ def ejecutar_cliente_ps(sede: str, ruta_archivo: str, nombre_cliente: str):
         host_gc = SEDE2_HOST
         puerto_gc = GC_SEDE2_PORT
 
-    socket.connect(f"tcp://{host_gc}:{puerto_gc}")
+    socket.connect(direccion_conexion(host_gc, puerto_gc))
     print(f"PS conectado al GC de sede {sede} en {host_gc}:{puerto_gc}.")
 
     operaciones = leer_operaciones_desde_archivo(ruta_archivo)
     print(f"Se leyeron {len(operaciones)} operaciones desde el archivo {ruta_archivo}.")
 
-    for op in operaciones:
-        print(f"Enviando operación: {op}")
+    # Sesión: mayor secuencia de cambio vista en las respuestas
+    secuencia_sesion = 0
+
+    pendientes = deque(operaciones)
+    # (codigo_libro, usuario) de las reservas que esperan su aviso
+    reservas = set()
+    socket_avisos = None
+    limite_espera = None
+
+    while pendientes or reservas:
+        if not pendientes:
+            if limite_espera is None:
+                limite_espera = time.monotonic() + PS_ESPERA_RESERVAS_SEGUNDOS
+                print(f"Esperando avisos de {len(reservas)} reservas...")
+            restante = limite_espera - time.monotonic()
+            if restante <= 0:
+                print(f"No llegó el aviso de {len(reservas)} reservas: {sorted(reservas)}")
+                break
+            socket_avisos.poll(int(restante * 1000))
+
+        for aviso in recibir_avisos(socket_avisos):
+            clave = (aviso.get("codigo_libro"), aviso.get("usuario"))
+            if clave in reservas:
+                reservas.discard(clave)
+                print(f"Aviso de reserva: {aviso}. Se solicita el préstamo.")
+                pendientes.append({"tipo_operacion": "PRESTAMO", "codigo_libro": clave[0], "usuario": clave[1]})
+
+        if not pendientes:
+            continue
+
+        op = pendientes.popleft()
+        es_reserva = op["tipo_operacion"] == "RESERVA"
+        topico_aviso = f"{TOPIC_RESERVA}.{op['usuario']}".encode("utf-8")
+
+        if es_reserva:
+            # Suscribirse antes de reservar, así no se pierde un aviso temprano
+            if socket_avisos is None:
+                socket_avisos = context.socket(zmq.SUB)
+                socket_avisos.connect(direccion_conexion(SEDE1_HOST, GA_CAMBIOS_PUB_PORT))
+            socket_avisos.setsockopt(zmq.SUBSCRIBE, topico_aviso)
+
+        respuesta = enviar_operacion(socket, nombre_cliente, token, op, secuencia_sesion)
+        secuencia_sesion = max(secuencia_sesion, respuesta.get("secuencia") or 0)
+
+        if es_reserva:
+            if respuesta.get("ok"):
+                reservas.add((op["codigo_libro"], op["usuario"]))
+            else:
+                socket_avisos.setsockopt(zmq.UNSUBSCRIBE, topico_aviso)
+
+
+def enviar_operacion(socket, nombre_cliente: str, token: str, op: dict, secuencia_sesion: int) -> dict:
+    """
+    Firma la operación, la envía al GC y retorna su respuesta. Si el GC la
+    rechaza por sobrecarga (no la procesó), se reintenta después del tiempo
+    que indica, hasta PS_MAX_REINTENTOS_SOBRECARGA veces y sin pasar del
+    plazo. Si el plazo vence sin respuesta, el PS deja de esperarla.
+    """
+
+    print(f"Enviando operación: {op}")
+
+    mensaje_sin_hash = {
+        "cliente": nombre_cliente,
+        "token": token,
+        "tipo_operacion": op["tipo_operacion"],
+        "codigo_libro": op["codigo_libro"],
+        "usuario": op["usuario"],
+        "id_operacion": uuid.uuid4().hex,
+        "secuencia_minima": secuencia_sesion,
+        "plazo": time.time() + PS_PLAZO_SEGUNDOS,
+    }
 
-        mensaje_sin_hash = {
-            "cliente": nombre_cliente,
-            "token": token,
-            "tipo_operacion": op["tipo_operacion"],
-            "codigo_libro": op["codigo_libro"],
-            "usuario": op["usuario"],
-        }
+    if op["tipo_operacion"] == "BUSCAR":
+        mensaje_sin_hash["codigo_libro"] = ""
+        mensaje_sin_hash["texto"] = op["codigo_libro"]
+        mensaje_sin_hash["pagina"] = op.get("pagina", 1)
 
-        # Generar hash de integridad
-        hash_contenido = generar_hash_contenido(mensaje_sin_hash)
+    # Generar hash de integridad
+    hash_contenido = generar_hash_contenido(mensaje_sin_hash)
 
-        mensaje = dict(mensaje_sin_hash)
-        mensaje["hash"] = hash_contenido
+    mensaje = dict(mensaje_sin_hash)
+    mensaje["hash"] = hash_contenido
 
+    for intento in range(PS_MAX_REINTENTOS_SOBRECARGA + 1):
         # Enviar al GC
         socket.send_string(json.dumps(mensaje))
 
-        # Esperar respuesta
+        # Esperar respuesta hasta el plazo
+        restante = mensaje["plazo"] - time.time()
+        if not socket.poll(max(0, int(restante * 1000))):
+            respuesta = {"ok": False, "mensaje": "Sin respuesta del GC dentro del plazo.", "plazo_vencido": True}
+            break
         respuesta_str = socket.recv_string()
         respuesta = json.loads(respuesta_str)
 
-        print(f"Respuesta del GC: {respuesta}")
+        if not respuesta.get("sobrecarga") or intento == PS_MAX_REINTENTOS_SOBRECARGA:
+            break
+        espera_ms = respuesta.get("reintentar_en_ms", 100)
+        if time.time() + espera_ms / 1000.0 >= mensaje["plazo"]:
+            break
+        print(f"GC sobrecargado: se reintenta en {espera_ms} ms")
+        time.sleep(espera_ms / 1000.0)
+
+    print(f"Respuesta del GC: {respuesta}")
+    return respuesta
+
+
+def recibir_avisos(socket_avisos) -> list:
+    """Avisos de reserva que ya llegaron (sin bloquear)."""
+
+    avisos = []
+    while socket_avisos is not None:
+        try:
+            _, datos = socket_avisos.recv_multipart(zmq.NOBLOCK)
+        except zmq.Again:
+            break
+        avisos.append(json.loads(datos.decode("utf-8")))
+    return avisos
 
 
 if __name__ == "__main__":
@@ -0,0 +1,173 @@
+"""
+concurrencia_bd.py
+Herramientas para modificar la BD desde varios hilos a la vez.
+
+Responsabilidades:
+- Bloqueos por libro (lock striping): operaciones sobre libros distintos
+  no compiten por el mismo lock.
+- Persistencia agrupada (group commit): muchos cambios se guardan a disco
+  con una sola escritura, hecha fuera de los bloqueos de los libros.
+
+Lo usa el GA cuando atiende solicitudes con un pool de hilos.
+"""
+
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+from almacen_libros import AlmacenLibros
+from base_datos import serializar_bd, escribir_bd_serializada
+from config import GA_REINTENTO_PERSISTENCIA
+
+
+# ============================
+# Bloqueos por libro
+# ============================
+
+class BloqueosPorLibro:
+    """
+    Conjunto fijo de locks. Cada código de libro cae siempre en el mismo
+    lock (crc32 del código módulo el número de locks).
+    """
+
+    def __init__(self, num_bloqueos: int):
+        self.num_bloqueos = max(1, num_bloqueos)
+        self._bloqueos = [threading.Lock() for _ in range(self.num_bloqueos)]
+
+    def indice(self, codigo: str) -> int:
+        return zlib.crc32(str(codigo).encode()) % self.num_bloqueos
+
+    def de(self, codigo: str) -> threading.Lock:
+        """Lock que protege al libro 'codigo'."""
+        return self._bloqueos[self.indice(codigo)]
+
+    @contextmanager
+    def todos(self):
+        """
+        Toma todos los locks (siempre en el mismo orden, para no generar
+        interbloqueos). Sirve para sacar una foto consistente de la BD.
+        """
+        for bloqueo in self._bloqueos:
+            bloqueo.acquire()
+        try:
+            yield
+        finally:
+            for bloqueo in reversed(self._bloqueos):
+                bloqueo.release()
+
+
+# ============================
+# Persistencia agrupada
+# ============================
+
+class PersistenciaAgrupada:
+    """
+    Hilo que guarda la BD a disco agrupando cambios.
+
+    Uso desde un trabajador:
+        ticket = persistencia.registrar_cambio()
+        persistencia.esperar(ticket)   # True cuando el cambio ya está en disco
+
+    Si la escritura falla, esperar() retorna False a quienes esperaban ese
+    lote (el trabajador responde un error interno) y la escritura se
+    reintenta cada 'reintento' segundos hasta que el cambio llegue a disco.
+
+    La foto de la BD se serializa con todos los locks tomados (es rápido y
+    deja un estado consistente); la escritura a disco se hace sin locks.
+    Si la BD es un AlmacenLibros (BD en disco), la foto son solo los libros
+    modificados y se escriben en su SQLite ('ruta_archivo' no se usa).
+    """
+
+    def __init__(self, bd: dict, ruta_archivo: str, bloqueos: BloqueosPorLibro,
+                 intervalo: float = 0.0, al_persistir=None, reintento: float = GA_REINTENTO_PERSISTENCIA):
+        self.bd = bd
+        self.ruta_archivo = ruta_archivo
+        self.bloqueos = bloqueos
+        self.intervalo = intervalo
+        self.al_persistir = al_persistir
+        self.reintento = reintento
+
+        self._condicion = threading.Condition()
+        self._cambios = 0
+        self._persistidos = 0
+        # Último ticket de una escritura que falló (y sigue sin guardarse)
+        self._fallidos = 0
+        self._activo = True
+
+        # Métricas simples
+        self.escrituras = 0
+        self.escrituras_fallidas = 0
+
+        self._hilo = threading.Thread(target=self._bucle, daemon=True)
+        self._hilo.start()
+
+    def registrar_cambio(self) -> int:
+        """Anota que hubo un cambio y retorna el ticket que lo identifica."""
+        with self._condicion:
+            self._cambios += 1
+            self._condicion.notify_all()
+            return self._cambios
+
+    def ultimo_ticket(self) -> int:
+        """Ticket del último cambio registrado (esperarlo cubre todo lo anterior)."""
+        with self._condicion:
+            return self._cambios
+
+    def esperar(self, ticket: int, timeout: float = None) -> bool:
+        """
+        Bloquea hasta que el cambio 'ticket' esté guardado en disco o falle
+        la escritura que lo incluía. Retorna True solo si quedó en disco.
+        """
+        with self._condicion:
+            self._condicion.wait_for(lambda: self._persistidos >= ticket or self._fallidos >= ticket, timeout)
+            return self._persistidos >= ticket
+
+    def detener(self):
+        with self._condicion:
+            self._activo = False
+            self._condicion.notify_all()
+        self._hilo.join()
+
+    def _bucle(self):
+        while True:
+            with self._condicion:
+                self._condicion.wait_for(lambda: self._cambios > self._persistidos or not self._activo)
+                if not self._activo and self._cambios == self._persistidos:
+                    return
+
+            # Pequeña espera para juntar más cambios en la misma escritura
+            if self.intervalo > 0:
+                time.sleep(self.intervalo)
+
+            with self._condicion:
+                objetivo = self._cambios
+
+            en_disco = isinstance(self.bd, AlmacenLibros)
+            with self.bloqueos.todos():
+                contenido = self.bd.tomar_cambios() if en_disco else serializar_bd(self.bd)
+
+            try:
+                if en_disco:
+                    self.bd.escribir_cambios(contenido)
+                else:
+                    escribir_bd_serializada(self.ruta_archivo, contenido)
+                self.escrituras += 1
+                if self.al_persistir and not en_disco:
+                    self.al_persistir(contenido)
+            except Exception as e:
+                print(f"Error en persistencia agrupada ({self.ruta_archivo}): {e}")
+                self.escrituras_fallidas += 1
+                # No se avanza _persistidos: los cambios siguen pendientes
+                # (AlmacenLibros los vuelve a marcar sucios) y se reintentan
+                with self._condicion:
+                    self._fallidos = objetivo
+                    self._condicion.notify_all()
+                    if not self._activo:
+                        return
+                time.sleep(self.reintento)
+                continue
+
+            with self._condicion:
+                self._persistidos = objetivo
+                self._condicion.notify_all()
@@ -28,8 +28,10 @@ GC_SEDE2_PORT = 5556
 GC_TO_LOAN_ACTOR_SEDE1_PORT = 5560
 GC_TO_LOAN_ACTOR_SEDE2_PORT = 5561
 
-# GC -> Actores de devolución/renovación (pub/sub)
-# Usamos un solo socket PUB por sede y diferenciamos por tópico.
+# GC -> Actores de devolución/renovación
+# Un solo socket por sede y diferenciamos por tópico. Desde la bandeja de
+# salida del GC se entrega con ROUTER/DEALER y confirmación (ACK); se
+# conservan los nombres de puerto del antiguo PUB/SUB.
 GC_PUB_SEDE1_PORT = 5570
 GC_PUB_SEDE2_PORT = 5571
 
@@ -42,6 +44,9 @@ GA_REPLICA_PORT = 5581          # GA réplica (en Sede 2)
 # o dejar uno separado para pings de monitor)
 GA_HEALTHCHECK_PORT = 5582
 
+# Health-check del GA réplica (mismo PING/PONG)
+GA_REPLICA_HEALTHCHECK_PORT = 5586
+
 # =========================
 #  TÓPICOS PUB/SUB
 # =========================
@@ -85,7 +90,8 @@ IDENTITY_ROLES = {
 
 # Para el experimento de rendimiento (Opción A):
 # - "SERIAL": GC atiende una solicitud a la vez.
-# - "MULTI": GC crea un hilo por solicitud o usa un pool.
+# - "MULTI": GC atiende con un pool de GC_NUM_TRABAJADORES hilos detrás de
+#   un ROUTER (ver servidor_concurrente.py).
 
 GC_MODE_SERIAL = "SERIAL"
 GC_MODE_MULTI = "MULTI"
@@ -93,6 +99,9 @@ GC_MODE_MULTI = "MULTI"
 # Modo por defecto (puedes cambiarlo o sobreescribirlo con argumento CLI)
 DEFAULT_GC_MODE = GC_MODE_SERIAL
 
+# Hilos trabajadores del GC en modo MULTI
+GC_NUM_TRABAJADORES = 8
+
 # =========================
 #  RUTAS DE ARCHIVOS DE BD
 # =========================
@@ -120,3 +129,361 @@ MAX_RENOVACIONES = 2
 
 # Duración del préstamo (en días) – el enunciado dice 2 semanas
 PRESTAMO_DIAS = 14
+
+# =========================
+#  CONCURRENCIA DEL GA
+# =========================
+
+# Número de hilos trabajadores que atienden solicitudes en el GA
+GA_NUM_TRABAJADORES = 8
+
+# Número de locks para repartir los libros (lock striping)
+GA_NUM_BLOQUEOS = 64
+
+# Espera (segundos) para juntar varios cambios en una sola escritura a disco
+GA_INTERVALO_PERSISTENCIA = 0.002
+
+# Espera (segundos) antes de reintentar una escritura a disco que falló
+GA_REINTENTO_PERSISTENCIA = 0.5
+
+# =========================
+#  BD EN DISCO CON CACHÉ DE LIBROS (GA)
+# =========================
+
+# Con GA_BD_EN_DISCO el GA primario no tiene la BD completa en memoria: los
+# libros viven en SQLite y solo los más usados quedan en una caché LRU (ver
+# almacen_libros.py). La primera vez el SQLite se llena desde DB_PRIMARY_FILE;
+# después ese JSON ya no se actualiza: analitica_catalogo.py lee el SQLite y
+# importador_catalogo.py lo escribe con --salida GA_BD_SQLITE_FILE.
+GA_BD_EN_DISCO = False
+GA_BD_SQLITE_FILE = "datos/bd_libros_primaria.sqlite"
+
+# Máximo de libros en la caché
+GA_CACHE_LIBROS = 100_000
+
+# Cada cuánto (segundos) el GA imprime las métricas de la caché
+GA_CACHE_INTERVALO_METRICAS = 60.0
+
+# =========================
+#  VERSIONES ASÍNCRONAS (asyncio)
+# =========================
+
+# Máximo de operaciones en vuelo por proceso asíncrono (Actor)
+ACTOR_MAX_EN_VUELO = 256
+
+# Timeout (ms) de cada intento de comunicación Actor -> GA
+ACTOR_TIMEOUT_GA_MS = 3000
+
+# =========================
+#  ENTREGA CONFIABLE GC -> ACTORES (DEVOLUCION / RENOVACION)
+# =========================
+
+# Bandeja de salida del GC (archivo local, solo se agregan líneas)
+GC_OUTBOX_SEDE1_FILE = "datos/outbox_gc_sede1.log"
+GC_OUTBOX_SEDE2_FILE = "datos/outbox_gc_sede2.log"
+
+# Si es True, hace fsync en cada mensaje (sobrevive a caídas del SO,
+# no solo del proceso), a costa de más latencia por solicitud.
+GC_OUTBOX_FSYNC = False
+
+# Confirmaciones acumuladas antes de compactar el archivo de la bandeja
+GC_OUTBOX_COMPACTAR_CADA = 5000
+
+# Segundos sin ACK antes de reentregar un mensaje a otro Actor (debe ser
+# mayor que el peor caso del Actor: timeout GA primario + GA respaldo)
+ENTREGA_TIMEOUT_ACK = 10.0
+
+# Espera (segundos) antes de reintentar un mensaje que el Actor rechazó (NACK)
+ENTREGA_REINTENTO_NACK = 1.0
+
+# Máximo de mensajes sin confirmar por Actor
+ENTREGA_VENTANA_ACTOR = 16
+
+# Cada Actor se anuncia al GC con esta frecuencia (segundos)
+ACTOR_HEARTBEAT_INTERVALO = 1.0
+
+# Si el GC no sabe de un Actor en este tiempo, lo da por caído (segundos).
+# Un Actor bloqueado esperando a los dos GA no se anuncia, así que también
+# debe ser mayor que ese peor caso.
+ENTREGA_ACTOR_EXPIRA = 15.0
+
+# =========================
+#  MICRO-LOTES (Actores de devolución / renovación)
+# =========================
+
+# Máximo de mensajes que un Actor junta en una sola solicitud LOTE al GA
+LOTE_MAX_MENSAJES = 16
+
+# Máximo tiempo (ms) que un Actor espera para completar un lote
+LOTE_MAX_ESPERA_MS = 5
+
+# =========================
+#  IDEMPOTENCIA Y REPLICACIÓN GA PRIMARIO -> RESPALDO
+# =========================
+
+# Tabla de deduplicación del GA (id_operacion -> resultado)
+DEDUP_MAX_ENTRADAS = 100000
+DEDUP_TTL_SEGUNDOS = 600.0
+
+# El GA de respaldo recibe el flujo de cambios del primario en este puerto (PULL)
+GA_REPLICA_SYNC_PORT = 5583
+
+# Entradas que el primario guarda en memoria mientras el respaldo está caído
+# o atrasado. Si se llena, descarta las pendientes y el respaldo vuelve a
+# pedir la foto completa (ver replicacion.py)
+GA_REPLICACION_COLA_MAX = 100000
+
+# Entradas en el socket PUSH hacia el respaldo (aparte de la cola anterior)
+GA_REPLICACION_HWM = 10000
+
+# Espera máxima (ms) del respaldo por la foto completa del primario
+GA_REPLICACION_TIMEOUT_FOTO_MS = 30000
+
+# Segundos entre intentos del respaldo de pedir la foto si el primario no responde
+GA_REPLICACION_REINTENTO = 2.0
+
+# =========================
+#  TIMEOUTS ADAPTATIVOS Y SOLICITUDES CUBIERTAS (Actores -> GA)
+# =========================
+
+# Cada Actor guarda los últimos RTT observados con cada GA (segundos)
+ACTOR_RTT_VENTANA = 512
+
+# Con menos muestras que esto se usa ACTOR_TIMEOUT_GA_MS fijo
+ACTOR_RTT_MIN_MUESTRAS = 20
+
+# Timeout de cada intento = percentil observado * factor, acotado a
+# [ACTOR_TIMEOUT_MIN_MS, ACTOR_TIMEOUT_GA_MS]
+ACTOR_TIMEOUT_PERCENTIL = 99
+ACTOR_TIMEOUT_FACTOR = 4.0
+ACTOR_TIMEOUT_MIN_MS = 250
+
+# Consultas de solo lectura: si el primer GA no responde en su percentil
+# ACTOR_COBERTURA_PERCENTIL, se envía la misma consulta al otro GA y se
+# usa la primera respuesta que llegue
+ACTOR_COBERTURA_ACTIVA = True
+ACTOR_COBERTURA_PERCENTIL = 95
+ACTOR_COBERTURA_MIN_MS = 2
+
+# =========================
+#  CACHÉ DE DISPONIBILIDAD EN EL GC (CONSULTA)
+# =========================
+
+# El GA primario publica (PUB) un aviso por cada cambio de ejemplares_disponibles
+GA_CAMBIOS_PUB_PORT = 5584
+TOPIC_DISPONIBILIDAD = "DISPONIBILIDAD"
+
+# Sin cambios, el GA publica un latido con esta frecuencia (segundos)
+CACHE_LATIDO_INTERVALO = 0.2
+
+# Máximo desfase aceptado (segundos): si el GC no sabe del GA en este
+# tiempo, deja de responder CONSULTA desde la caché
+CACHE_MAX_DESFASE = 1.0
+
+# Timeout (ms) al pedir al GA la foto completa de disponibilidad
+CACHE_TIMEOUT_INSTANTANEA_MS = 3000
+
+# =========================
+#  TABLA DE DISPONIBILIDAD MAPEADA EN MEMORIA
+# =========================
+
+# El GA primario escribe ejemplares_disponibles de cada libro en un archivo
+# mapeado en memoria (ver tabla_disponibilidad.py). Los procesos de la
+# misma máquina (GC de la Sede 1, analitica_catalogo.py) lo leen sin pedir
+# nada al GA; el desfase máximo aceptado es CACHE_MAX_DESFASE.
+TABLA_DISPONIBILIDAD_ACTIVA = True
+TABLA_DISPONIBILIDAD_FILE = "datos/disponibilidad.tabla"
+
+# =========================
+#  RÉPLICA DE LECTURA (SEDE 2)
+# =========================
+
+# Réplica de solo lectura en la Sede 2, alimentada por el flujo de cambios
+# del primario (GA_CAMBIOS_PUB_PORT). El GC de la Sede 2 le envía CONSULTA
+# y PRESTAMOS_USUARIO; las escrituras que reciba las reenvía al primario.
+GA_LECTURA_PORT = 5585
+GA_LECTURA_NUM_TRABAJADORES = 8
+
+# Read-your-writes: espera máxima (ms) a que la réplica alcance la
+# secuencia de la sesión antes de reenviar la lectura al primario
+LECTURA_ESPERA_MAX_MS = 200
+
+# =========================
+#  VENCIMIENTOS DE PRÉSTAMOS
+# =========================
+
+# El GA primario publica un aviso por cada préstamo que vence, en su
+# socket PUB (GA_CAMBIOS_PUB_PORT) con este tópico
+TOPIC_VENCIDO = "VENCIDO"
+
+# Cada cuánto (segundos) el GA revisa el índice de vencimientos
+VENCIMIENTOS_INTERVALO_BARRIDO = 60.0
+
+# =========================
+#  LISTA DE ESPERA (RESERVA)
+# =========================
+
+# Cuando se devuelve un libro con lista de espera, el GA aparta el ejemplar
+# para el primero de la lista y lo avisa en su socket PUB
+# (GA_CAMBIOS_PUB_PORT) con el tópico "RESERVA.<usuario>"; así cada PS se
+# suscribe solo a los usuarios que atiende
+TOPIC_RESERVA = "RESERVA"
+
+# Tiempo (segundos) que el ejemplar queda apartado esperando el PRESTAMO
+RESERVA_APARTADO_SEGUNDOS = 48 * 3600
+
+# Cada cuánto (segundos) el GA libera los apartados vencidos
+RESERVA_INTERVALO_BARRIDO = 30.0
+
+# Tiempo máximo (segundos) que el PS espera avisos de sus reservas después
+# de enviar todas las operaciones del archivo
+PS_ESPERA_RESERVAS_SEGUNDOS = 60.0
+
+# =========================
+#  BÚSQUEDA POR TÍTULO (BUSCAR)
+# =========================
+
+# Resultados por página de la operación BUSCAR (índice invertido del GA,
+# ver indice_titulos.py)
+BUSQUEDA_TAM_PAGINA = 20
+
+# =========================
+#  IMPORTACIÓN DE CATÁLOGOS
+# =========================
+
+# Libros por mensaje IMPORTAR al cargar un catálogo en un GA que ya está
+# corriendo (ver importador_catalogo.py)
+IMPORTACION_LOTE = 1000
+
+# Máximo de ejemplares aceptado por libro al validar un catálogo
+IMPORTACION_MAX_EJEMPLARES = 10000
+
+# =========================
+#  CONTROL DE ADMISIÓN EN EL GC
+# =========================
+
+# Límite por cliente autenticado (cubo de tokens): solicitudes por segundo
+# sostenidas y ráfaga máxima
+ADMISION_TASA_POR_CLIENTE = 200.0
+ADMISION_RAFAGA_POR_CLIENTE = 50
+
+# Solicitudes en cola como máximo (modo MULTI); más allá se rechazan
+GC_COLA_MAX = 1000
+
+# Si la espera estimada en la cola pasa de este objetivo, se rechaza
+# de inmediato con una sugerencia de reintento (modo MULTI)
+GC_OBJETIVO_LATENCIA_MS = 200
+
+# Cada cuánto el GC imprime los contadores de admisión (segundos)
+ADMISION_INTERVALO_METRICAS = 30.0
+
+# Reintentos del PS ante un rechazo por sobrecarga (respeta reintentar_en_ms)
+PS_MAX_REINTENTOS_SOBRECARGA = 5
+
+# =========================
+#  PRIORIDAD DE SOLICITUDES (GA Y GC)
+# =========================
+
+# Carriles en la cola de entrada del GA y del GC (modo MULTI): primero lo
+# que un usuario está esperando (préstamos, reservas, consultas), después
+# las actualizaciones asíncronas (devoluciones, renovaciones, lotes)
+PRIORIDAD_ACTIVA = True
+
+# Cuando la solicitud más antigua de un carril de menor prioridad ya
+# esperó más que esto (envejecimiento), ese carril recibe una de cada
+# PRIORIDAD_PESO + 1 atenciones: ninguna clase espera indefinidamente
+PRIORIDAD_ENVEJECIMIENTO_MS = 50
+PRIORIDAD_PESO = 4
+
+# Últimas solicitudes por clase con las que se calculan las latencias
+PRIORIDAD_VENTANA_LATENCIAS = 2048
+
+# Cada cuánto el GA imprime la latencia por clase (segundos)
+PRIORIDAD_INTERVALO_METRICAS = 30.0
+
+# =========================
+#  PLAZOS DE LAS SOLICITUDES
+# =========================
+
+# Segundos que un PS espera la respuesta de una solicitud. Viaja como
+# plazo absoluto ("plazo") y cada etapa descarta lo que ya venció (ver
+# plazos.py)
+PS_PLAZO_SEGUNDOS = 10.0
+
+# =========================
+#  TRANSPORTE ENTRE COMPONENTES
+# =========================
+
+# Transporte ZeroMQ de todos los sockets (ver transporte.py):
+# - "tcp": despliegue normal en varias máquinas (HOST:PUERTO de arriba)
+# - "ipc": varios procesos en la misma máquina Linux, con sockets Unix en
+#   IPC_DIRECTORIO (un archivo por puerto)
+# - "inproc": todos los componentes como hilos de un solo proceso (ver
+#   lanzador_local.py); no pasa por el kernel
+TRANSPORTE = "tcp"
+IPC_DIRECTORIO = "/tmp/biblioteca-ipc"
+
+# Puerto del eco con el que lanzador_local.py mide el costo del transporte
+# solo (ida y vuelta REQ/REP sin lógica de negocio)
+LANZADOR_PUERTO_ECO = 5590
+
+# =========================
+#  SUPERVISOR DE PROCESOS
+# =========================
+
+# Componentes que levanta supervisor.py: nombre -> (script de src/, argumentos).
+# En varias máquinas se corre un supervisor por máquina con --componentes.
+SUPERVISOR_COMPONENTES = {
+    "ga": ("gestor_almacenamiento.py", ()),
+    "ga_respaldo": ("gestor_almacenamiento_respaldo.py", ()),
+    "ga_lectura": ("gestor_almacenamiento_lectura.py", ()),
+    "actor_prestamo_1": ("actor_prestamo.py", ("1",)),
+    "actor_devolucion_1": ("actor_devolucion.py", ("1",)),
+    "actor_renovacion_1": ("actor_renovacion.py", ("1",)),
+    "gc_1": ("gestor_carga.py", ("1", DEFAULT_GC_MODE)),
+    "actor_prestamo_2": ("actor_prestamo.py", ("2",)),
+    "actor_devolucion_2": ("actor_devolucion.py", ("2",)),
+    "actor_renovacion_2": ("actor_renovacion.py", ("2",)),
+    "gc_2": ("gestor_carga.py", ("2", DEFAULT_GC_MODE)),
+}
+
+# Cada cuánto (segundos) el supervisor revisa si los procesos siguen vivos.
+# Los GA además se revisan con PING/PONG cada GA_HEALTHCHECK_INTERVAL y se
+# dan por caídos (colgados) si no responden en GA_HEALTHCHECK_TIMEOUT.
+SUPERVISOR_INTERVALO = 0.2
+
+# Tiempo (segundos) que se le da a un GA para cargar la BD antes de exigirle PONG
+SUPERVISOR_GRACIA_ARRANQUE = 30.0
+
+# Reinicios con espera exponencial: SUPERVISOR_BACKOFF_INICIAL, el doble en
+# cada caída seguida, hasta SUPERVISOR_BACKOFF_MAX. Un proceso que lleva
+# SUPERVISOR_ESTABLE_SEGUNDOS sano vuelve a empezar desde la espera inicial.
+SUPERVISOR_BACKOFF_INICIAL = 0.5
+SUPERVISOR_BACKOFF_MAX = 30.0
+SUPERVISOR_ESTABLE_SEGUNDOS = 30.0
+
+# Si el GA primario cae con el respaldo sano, el supervisor promueve al
+# respaldo en lugar de reiniciar el primario (ver mandato_ga.py)
+SUPERVISOR_PROMOCION_ACTIVA = True
+
+# Mandato del GA activo (sube en cada promoción)
+GA_MANDATO_FILE = "datos/ga_mandato.json"
+
+# =========================
+#  CAPTURA Y REPRODUCCIÓN DE TRÁFICO
+# =========================
+
+# Con True, cada GC agrega a su archivo de captura las solicitudes que pasan
+# la validación de seguridad, con su instante de llegada (ver
+# captura_trafico.py). Con extensión .gz el archivo se comprime.
+GC_CAPTURA_ACTIVA = False
+GC_CAPTURA_SEDE1_FILE = "datos/captura_gc_sede1.log"
+GC_CAPTURA_SEDE2_FILE = "datos/captura_gc_sede2.log"
+
+# Cada cuánto (segundos) se baja a disco lo capturado
+GC_CAPTURA_INTERVALO_FLUSH = 1.0
+
+# Hilos que envían las solicitudes en reproductor_trafico.py (cada uno con
+# su socket REQ). Si todos están ocupados, la solicitud espera y esa espera
+# cuenta en su latencia, como le pasaría a un PS real.
+REPRODUCTOR_CONCURRENCIA = 32
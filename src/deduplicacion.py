@@ -0,0 +1,68 @@
+"""
+deduplicacion.py
+Tabla de deduplicación de operaciones para el GA.
+
+Cada operación trae un "id_operacion" generado por el PS. El GA guarda el
+resultado de cada id durante un tiempo (TTL); si la misma operación llega
+otra vez (reintento del Actor, reentrega del GC, failover al respaldo),
+se responde el resultado guardado en lugar de aplicarla de nuevo.
+
+La tabla es acotada: se descartan primero las entradas más viejas, ya sea
+por TTL o porque se llegó al máximo de entradas.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from config import DEDUP_MAX_ENTRADAS, DEDUP_TTL_SEGUNDOS
+
+
+class TablaDeduplicacion:
+
+    def __init__(self, max_entradas: int = DEDUP_MAX_ENTRADAS, ttl: float = DEDUP_TTL_SEGUNDOS):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        # id_operacion -> (instante, resultado), en orden de inserción
+        self._entradas = OrderedDict()
+
+        self.aciertos = 0
+        self.fallos = 0
+
+    def _expulsar(self, ahora: float):
+        """Saca las entradas vencidas o sobrantes (las más viejas están al principio)."""
+        while self._entradas:
+            _, (instante, _) = next(iter(self._entradas.items()))
+            if ahora - instante <= self.ttl and len(self._entradas) <= self.max_entradas:
+                break
+            self._entradas.popitem(last=False)
+
+    def obtener(self, id_operacion: str):
+        """Resultado guardado para 'id_operacion', o None si no se conoce."""
+        with self._lock:
+            self._expulsar(time.time())
+            entrada = self._entradas.get(id_operacion)
+            if entrada is None:
+                self.fallos += 1
+                return None
+            self.aciertos += 1
+            return entrada[1]
+
+    def guardar(self, id_operacion: str, resultado: dict):
+        with self._lock:
+            ahora = time.time()
+            self._entradas[id_operacion] = (ahora, resultado)
+            self._entradas.move_to_end(id_operacion)
+            self._expulsar(ahora)
+
+    def entradas(self) -> list:
+        """[[id_operacion, resultado], ...] vigentes, de la más vieja a la más nueva."""
+        with self._lock:
+            self._expulsar(time.time())
+            return [[id_operacion, resultado] for id_operacion, (_, resultado) in self._entradas.items()]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entradas)
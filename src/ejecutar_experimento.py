@@ -15,8 +15,30 @@ Significado:
 - num_clientes: número de PS simultáneos (por ejemplo 4, 6, 10)
 - archivo_operaciones: archivo con las operaciones a ejecutar por cada PS
 - nombre_cliente: debe existir en VALID_CLIENT_TOKENS (config.py)
+
+Barrido de parámetros:
+    python src/ejecutar_experimento.py --barrido [--modos SERIAL,MULTI]
+        [--clientes 1,4,8] [--trabajadores 4,8] [--mezclas ciclo,lectura]
+        [--libros 1000] [--ensayos 3] [--base resultados/base/barrido.json]
+
+Cada ensayo es una corrida de lanzador_local.py (la Sede 1 completa en un
+directorio temporal, con calentamiento antes de medir). Por cada
+configuración se escribe en --salida (barrido.csv y barrido.json) la media
+de cada ensayo con su intervalo de confianza del 95 %: throughput y
+latencia p50/p99 (de todas las operaciones y por tipo). barrido.json
+guarda además cada ensayo con su número; los que fallaron quedan con
+"ok": false y sin métricas. Con --base se
+compara contra un barrido.json anterior: una configuración tiene una
+regresión si empeora más que --tolerancia y la diferencia supera el ruido
+(los intervalos no se superponen); en ese caso el script sale con código 2.
 """
 
+import argparse
+import csv
+import itertools
+import json
+import math
+import statistics
 import sys
 import time
 import subprocess
@@ -82,7 +104,209 @@ def ejecutar_experimento(sede: str, num_clientes: int, archivo_operaciones: str,
     print(f"  Throughput aproximado (operaciones/segundo): {throughput:.4f}")
 
 
+# ============================
+# Barrido de parámetros
+# ============================
+
+LANZADOR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lanzador_local.py")
+
+# Parámetros que identifican una configuración (y la emparejan con la base)
+CLAVE_CONFIGURACION = ("modo", "clientes", "trabajadores_gc", "mezcla", "libros")
+
+# Métricas comparadas con la base: nombre -> True si más alto es mejor
+METRICAS = {"throughput": True, "p50_ms": False, "p99_ms": False}
+
+# t de Student (dos colas, 95 %) por grados de libertad; más de 30, la normal
+T_95 = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306, 9: 2.262,
+        10: 2.228, 12: 2.179, 15: 2.131, 20: 2.086, 25: 2.060, 30: 2.042}
+
+
+def intervalo_confianza(valores: list) -> (float, float):
+    """Media y semiancho del intervalo de confianza del 95 % (0 con un solo valor)."""
+    media = statistics.mean(valores)
+    if len(valores) < 2:
+        return media, 0.0
+    grados = len(valores) - 1
+    t = T_95[max(g for g in T_95 if g <= grados)] if grados <= 30 else 1.96
+    return media, t * statistics.stdev(valores) / math.sqrt(len(valores))
+
+
+def lista_de(tipo):
+    return lambda texto: [tipo(x.strip()) for x in texto.split(",") if x.strip()]
+
+
+def configuraciones_barrido(args) -> list:
+    """Producto de los parámetros; en SERIAL los trabajadores no cuentan (una sola configuración)."""
+    configuraciones = []
+    for modo, clientes, trabajadores, mezcla, libros in itertools.product(
+            args.modos, args.clientes, args.trabajadores, args.mezclas, args.libros):
+        conf = {"modo": modo, "clientes": clientes, "trabajadores_gc": trabajadores if modo == "MULTI" else None,
+                "mezcla": mezcla, "libros": libros}
+        if conf not in configuraciones:
+            configuraciones.append(conf)
+    return configuraciones
+
+
+def correr_ensayo(conf: dict, args, ensayo: int):
+    """Una corrida de lanzador_local.py. Retorna su resultado JSON, o None si falló."""
+    cmd = [sys.executable, LANZADOR, "--json", "--transporte", args.transporte, "--modo", conf["modo"],
+           "--clientes", str(conf["clientes"]), "--mezcla", conf["mezcla"], "--libros", str(conf["libros"]),
+           "--operaciones", str(args.operaciones), "--calentamiento", str(args.calentamiento),
+           "--semilla", str(args.semilla + ensayo if args.variar_semilla else args.semilla), "--eco", "200"]
+    if conf["trabajadores_gc"]:
+        cmd += ["--trabajadores-gc", str(conf["trabajadores_gc"])]
+    salida = subprocess.run(cmd, stdout=subprocess.PIPE, text=True)
+    if salida.returncode != 0:
+        print(f"  ensayo {ensayo + 1}: falló ({salida.stdout.strip()})")
+        return None
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def resumir_configuracion(conf: dict, ensayos: list) -> dict:
+    resumen = dict(conf, ensayos=len(ensayos), fallidas=sum(e["fallidas"] for e in ensayos))
+    for metrica in METRICAS:
+        resumen[metrica], resumen[f"{metrica}_ic95"] = intervalo_confianza([e[metrica] for e in ensayos])
+    resumen["por_tipo"] = {}
+    for tipo in sorted({t for e in ensayos for t in e["por_tipo"]}):
+        filas = [e["por_tipo"][tipo] for e in ensayos if tipo in e["por_tipo"]]
+        resumen["por_tipo"][tipo] = {}
+        for metrica in ("p50_ms", "p99_ms"):
+            media, ic = intervalo_confianza([f[metrica] for f in filas])
+            resumen["por_tipo"][tipo][metrica] = media
+            resumen["por_tipo"][tipo][f"{metrica}_ic95"] = ic
+    return resumen
+
+
+def comparar_con_base(resumenes: list, base: list, tolerancia: float) -> list:
+    """Cambio de cada métrica contra la configuración igual de la base; "regresion" si empeoró de verdad."""
+    por_clave = {tuple(r[k] for k in CLAVE_CONFIGURACION): r for r in base}
+    comparaciones = []
+    for r in resumenes:
+        anterior = por_clave.get(tuple(r[k] for k in CLAVE_CONFIGURACION))
+        if anterior is None:
+            continue
+        for metrica, mas_es_mejor in METRICAS.items():
+            if not anterior[metrica]:
+                continue
+            cambio = (r[metrica] - anterior[metrica]) / anterior[metrica]
+            peor = -cambio if mas_es_mejor else cambio
+            # Que empeore más que la tolerancia y más que el ruido de los dos lados
+            fuera_del_ruido = abs(r[metrica] - anterior[metrica]) > r[f"{metrica}_ic95"] + anterior[f"{metrica}_ic95"]
+            comparaciones.append({
+                **{k: r[k] for k in CLAVE_CONFIGURACION},
+                "metrica": metrica,
+                "base": anterior[metrica],
+                "actual": r[metrica],
+                "cambio": cambio,
+                "regresion": peor > tolerancia and fuera_del_ruido,
+            })
+    return comparaciones
+
+
+def nombre_configuracion(r: dict) -> str:
+    trabajadores = f"x{r['trabajadores_gc']}" if r["trabajadores_gc"] else ""
+    return f"{r['modo']}{trabajadores} {r['clientes']}PS {r['mezcla']} {r['libros']}L"
+
+
+def escribir_resultados(directorio: str, resumenes: list, crudos: list, comparaciones: list, args):
+    os.makedirs(directorio, exist_ok=True)
+    columnas = list(CLAVE_CONFIGURACION) + ["ensayos", "ensayos_fallidos", "fallidas"]
+    for metrica in METRICAS:
+        columnas += [metrica, f"{metrica}_ic95"]
+    with open(os.path.join(directorio, "barrido.csv"), "w", newline="", encoding="utf-8") as f:
+        escritor = csv.DictWriter(f, fieldnames=columnas, extrasaction="ignore")
+        escritor.writeheader()
+        escritor.writerows(resumenes)
+    with open(os.path.join(directorio, "barrido.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "parametros": {"transporte": args.transporte, "operaciones": args.operaciones,
+                           "calentamiento": args.calentamiento, "semilla": args.semilla},
+            "configuraciones": resumenes,
+            "ensayos": crudos,
+            "comparacion": comparaciones,
+        }, f, indent=2)
+
+
+def ejecutar_barrido(argv: list):
+    import config
+
+    parser = argparse.ArgumentParser(prog="ejecutar_experimento.py --barrido",
+                                     description="Barrido de parámetros con ensayos repetidos")
+    parser.add_argument("--modos", type=lista_de(str), default=[config.GC_MODE_SERIAL, config.GC_MODE_MULTI])
+    parser.add_argument("--clientes", type=lista_de(int), default=[1, 4, 8], help="PS simultáneos")
+    parser.add_argument("--trabajadores", type=lista_de(int), default=[config.GC_NUM_TRABAJADORES],
+                        help="hilos del GC en modo MULTI")
+    parser.add_argument("--mezclas", type=lista_de(str), default=["ciclo"], help="ver MEZCLAS en lanzador_local.py")
+    parser.add_argument("--libros", type=lista_de(int), default=[1000], help="tamaños del catálogo")
+    parser.add_argument("--ensayos", type=int, default=3, help="corridas por configuración")
+    parser.add_argument("--operaciones", type=int, default=300, help="operaciones medidas por PS")
+    parser.add_argument("--calentamiento", type=int, default=50, help="operaciones por PS antes de medir")
+    parser.add_argument("--semilla", type=int, default=7)
+    parser.add_argument("--variar-semilla", action="store_true",
+                        help="otra carga en cada ensayo (por defecto, la misma: solo se mide el ruido)")
+    parser.add_argument("--transporte", choices=("inproc", "ipc", "tcp"), default=config.TRANSPORTE)
+    parser.add_argument("--salida", default=os.path.join("resultados", time.strftime("barrido-%Y%m%d-%H%M%S")),
+                        help="directorio para barrido.csv y barrido.json")
+    parser.add_argument("--base", default=None, help="barrido.json de una corrida anterior para comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.10,
+                        help="empeoramiento relativo que se tolera antes de marcar una regresión")
+    args = parser.parse_args(argv)
+
+    from lanzador_local import MEZCLAS
+
+    desconocidos = [m for m in args.modos if m not in (config.GC_MODE_SERIAL, config.GC_MODE_MULTI)]
+    desconocidos += [m for m in args.mezclas if m not in MEZCLAS]
+    if desconocidos:
+        parser.error(f"Modos o mezclas desconocidos: {', '.join(desconocidos)}")
+
+    configuraciones = configuraciones_barrido(args)
+    print(f"Barrido: {len(configuraciones)} configuraciones x {args.ensayos} ensayos "
+          f"({args.operaciones} operaciones por PS, {args.calentamiento} de calentamiento)")
+
+    resumenes, crudos = [], []
+    for i, conf in enumerate(configuraciones, 1):
+        print(f"[{i}/{len(configuraciones)}] {nombre_configuracion(conf)}")
+        ensayos = []
+        for n in range(args.ensayos):
+            e = correr_ensayo(conf, args, n)
+            # Los ensayos fallidos quedan en los crudos con su número, sin métricas
+            if e is None:
+                crudos.append(dict(conf, ensayo=n, ok=False))
+                continue
+            metricas = {k: e[k] for k in ("throughput", "p50_ms", "p99_ms", "fallidas")}
+            crudos.append(dict(conf, ensayo=n, ok=True, **metricas))
+            ensayos.append(e)
+        if not ensayos:
+            continue
+        r = resumir_configuracion(conf, ensayos)
+        r["ensayos_fallidos"] = args.ensayos - len(ensayos)
+        resumenes.append(r)
+        print(f"  {r['throughput']:.0f} ± {r['throughput_ic95']:.0f} ops/s | p50 {r['p50_ms']:.2f} ± "
+              f"{r['p50_ms_ic95']:.2f} ms | p99 {r['p99_ms']:.2f} ± {r['p99_ms_ic95']:.2f} ms")
+
+    comparaciones = []
+    if args.base:
+        with open(args.base, "r", encoding="utf-8") as f:
+            comparaciones = comparar_con_base(resumenes, json.load(f)["configuraciones"], args.tolerancia)
+        print(f"\nComparación con {args.base} (tolerancia {args.tolerancia:.0%}):")
+        print(f"{'configuración':>32} {'métrica':>11} {'base':>10} {'actual':>10} {'cambio':>8}")
+        for c in comparaciones:
+            marca = "  REGRESIÓN" if c["regresion"] else ""
+            print(f"{nombre_configuracion(c):>32} {c['metrica']:>11} {c['base']:>10.2f} {c['actual']:>10.2f} "
+                  f"{c['cambio']:>+8.1%}{marca}")
+
+    escribir_resultados(args.salida, resumenes, crudos, comparaciones, args)
+    print(f"\nResultados en {args.salida}")
+    if any(c["regresion"] for c in comparaciones):
+        sys.exit(2)
+
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--barrido":
+        ejecutar_barrido(sys.argv[2:])
+        sys.exit(0)
+
     if len(sys.argv) < 5:
         print("Uso: python src/ejecutar_experimento.py [sede] [num_clientes] [archivo_operaciones] [nombre_cliente]")
         sys.exit(1)
@@ -3,110 +3,534 @@ gestor_almacenamiento.py
 Proceso GA (Gestor de Almacenamiento y Persistencia).
 
 Responsabilidades:
-- Atender solicitudes de los Actores (préstamo, devolución, renovación)
+- Atender solicitudes de los Actores (préstamo, devolución, renovación,
+  reserva, consulta de disponibilidad y búsqueda por título con un
+  índice invertido, ver indice_titulos.py)
 - Aplicar los cambios sobre la BD primaria
-- Replicar los cambios a la BD secundaria de forma asíncrona
+- Replicar los cambios al GA de respaldo de forma asíncrona (flujo de
+  cambios, ver replicacion.py)
+- Publicar cada cambio de disponibilidad para la caché de CONSULTA de los
+  GC (ver cache_disponibilidad.py) y escribirlo en la tabla mapeada en
+  memoria que leen los procesos de la misma máquina (ver
+  tabla_disponibilidad.py)
+- Mantener el índice de vencimientos de préstamos, publicar un aviso por
+  cada préstamo que vence y responder la consulta VENCIDOS (ver
+  vencimientos.py)
+- Importar lotes de libros nuevos sin detener el GA (IMPORTAR, ver
+  importador_catalogo.py)
+- Lista de espera: al devolver un libro reservado, apartar el ejemplar
+  para el primero de la lista y avisarle por el tópico RESERVA; un
+  barrido libera los apartados que vencen sin PRESTAMO
+- No aplicar dos veces una misma operación: cada "id_operacion" se
+  recuerda en una tabla de deduplicación que también se replica
+- Opcionalmente (GA_BD_EN_DISCO) tener la BD en SQLite con solo los
+  libros más usados en memoria (ver almacen_libros.py)
 - Responder a mensajes de health-check para detección de fallos
 
-Este proceso se comunica con los Actores usando ZeroMQ (REQ/REP).
+Este proceso se comunica con los Actores usando ZeroMQ: un socket ROUTER
+recibe las solicitudes (los Actores siguen usando REQ) y un pool de hilos
+las atiende. Cada libro se protege con un lock de su "franja" (lock
+striping) y la escritura a disco se agrupa fuera de esos locks. Con
+PRIORIDAD_ACTIVA la cola de entrada atiende primero las operaciones que
+un usuario espera (PRESTAMO, RESERVA, consultas) y después las
+actualizaciones asíncronas (DEVOLUCION, RENOVACION, LOTE, IMPORTAR), con
+envejecimiento para que estas no se posterguen sin fin.
 """
 
 import json
 import threading
 import time
-import sys
 
 import zmq
 
 from config import (
-    SEDE1_HOST,
+    SEDE2_HOST,
     GA_PRIMARY_PORT,
     GA_HEALTHCHECK_PORT,
+    GA_REPLICA_SYNC_PORT,
+    GA_CAMBIOS_PUB_PORT,
+    TOPIC_VENCIDO,
+    TOPIC_RESERVA,
+    VENCIMIENTOS_INTERVALO_BARRIDO,
+    RESERVA_INTERVALO_BARRIDO,
     DB_PRIMARY_FILE,
-    DB_REPLICA_FILE,
+    GA_NUM_TRABAJADORES,
+    GA_NUM_BLOQUEOS,
+    GA_INTERVALO_PERSISTENCIA,
+    GA_BD_EN_DISCO,
+    GA_BD_SQLITE_FILE,
+    GA_CACHE_LIBROS,
+    GA_CACHE_INTERVALO_METRICAS,
+    CACHE_LATIDO_INTERVALO,
+    TABLA_DISPONIBILIDAD_ACTIVA,
+    TABLA_DISPONIBILIDAD_FILE,
+    PRIORIDAD_ACTIVA,
+    PRIORIDAD_INTERVALO_METRICAS,
 )
+from almacen_libros import AlmacenLibros
 from base_datos import (
     cargar_bd,
-    guardar_bd,
     inicializar_bd,
+    iterar_bd,
+    consultar_libro,
+    consultar_prestamos_usuario,
+    prestamos_vencidos,
     registrar_prestamo,
     registrar_devolucion,
     registrar_renovacion,
+    registrar_reserva,
+    liberar_apartados_vencidos,
 )
+from cache_disponibilidad import PublicadorDisponibilidad
+from concurrencia_bd import BloqueosPorLibro, PersistenciaAgrupada
+from deduplicacion import TablaDeduplicacion
+from importador_catalogo import validar_registro
+from indice_titulos import IndiceTitulos, IndiceTitulosDisco
+from mandato_ga import ROL_PRIMARIO, MandatoGA
+from plazos import DESCARTADAS, descartar_si_vencido
+from replicacion import ReplicadorCambios
+from servidor_concurrente import ServidorConcurrente, clasificador_por_campo
+from tabla_disponibilidad import TablaDisponibilidad
+from transporte import direccion_bind, direccion_conexion
+from vencimientos import IndiceVencimientos
+
+
+# Acciones que un usuario está esperando: van en el carril prioritario
+ACCIONES_SINCRONAS = ("PRESTAMO", "RESERVA", "CONSULTA", "PRESTAMOS_USUARIO", "VENCIDOS", "BUSCAR")
 
 
 # ============================
-# Replicación asíncrona
+# Estado del GA
 # ============================
 
-def replicar_asincrono(bd: dict):
+class EstadoGA:
     """
-    Replica el contenido actual de la BD primaria al archivo de réplica
-    en un hilo separado (simulación de replicación asíncrona).
+    Estado que comparten los hilos del GA:
+    - bd: la BD en memoria (dict) o en disco con caché (AlmacenLibros)
+    - bloqueos: locks por libro
+    - dedup: tabla de deduplicación por id_operacion (opcional)
+    - replicador: flujo de cambios hacia el GA de respaldo (opcional)
+    - notificador: avisos de disponibilidad para los GC (opcional)
+    - vencimientos: índice de fechas de vencimiento (opcional; sin él la
+      consulta VENCIDOS recorre toda la BD)
+    - titulos: índice invertido de títulos (opcional; sin él no se
+      responde BUSCAR)
+    - disponibilidad: tabla mapeada en memoria con ejemplares_disponibles
+      (opcional)
+    - mandato: mandato del GA para la promoción del respaldo (opcional,
+      ver mandato_ga.py)
+
+    libros_con_apartados guarda los códigos con algún ejemplar apartado,
+    así el barrido de apartados no recorre toda la BD.
     """
 
-    def tarea_replicacion():
-        time.sleep(0.5)
-        guardar_bd(DB_REPLICA_FILE, bd)
-        print("Réplica actualizada.")
-
-    hilo = threading.Thread(target=tarea_replicacion, daemon=True)
-    hilo.start()
+    def __init__(self, bd: dict, bloqueos: BloqueosPorLibro,
+                 dedup: TablaDeduplicacion = None, replicador: ReplicadorCambios = None,
+                 notificador: PublicadorDisponibilidad = None,
+                 vencimientos: IndiceVencimientos = None, titulos: IndiceTitulos = None,
+                 disponibilidad: TablaDisponibilidad = None, mandato: MandatoGA = None):
+        self.bd = bd
+        self.bloqueos = bloqueos
+        self.dedup = dedup
+        self.replicador = replicador
+        self.notificador = notificador
+        self.vencimientos = vencimientos
+        self.titulos = titulos
+        self.disponibilidad = disponibilidad
+        self.mandato = mandato
+        if isinstance(bd, AlmacenLibros):
+            self.libros_con_apartados = set(bd.codigos_con_apartados())
+        else:
+            self.libros_con_apartados = {codigo for codigo, libro in bd.items() if libro.get("apartados")}
+
+    def libro_modificado(self, codigo: str):
+        """Con la BD en disco, marca el libro para la próxima escritura."""
+        if isinstance(self.bd, AlmacenLibros):
+            self.bd.marcar_modificado(codigo)
 
 
 # ============================
 # Procesamiento de operaciones
 # ============================
 
-def procesar_operacion(bd: dict, mensaje: dict) -> dict:
+def aplicar_operacion(estado: EstadoGA, mensaje: dict) -> dict:
     """
-    Procesa una operación enviada por un Actor.
+    Valida una operación enviada por un Actor y la aplica sobre la BD en
+    memoria con el lock del libro tomado. No persiste.
 
     Formato esperado:
     {
-        "accion": "PRESTAMO" | "DEVOLUCION" | "RENOVACION",
+        "accion": "PRESTAMO" | "DEVOLUCION" | "RENOVACION" | "RESERVA"
+                  | "CONSULTA" | "PRESTAMOS_USUARIO" | "VENCIDOS" | "BUSCAR",
         "codigo_libro": "123",
-        "usuario": "usuarioX"
+        "usuario": "usuarioX",
+        "texto": "sist oper",        (solo BUSCAR)
+        "pagina": 1,                 (solo BUSCAR, opcional)
+        "id_operacion": "...",       (opcional, generado por el PS)
+        "plazo": 1767225600.0        (opcional, ver plazos.py)
     }
+
+    o un lote (micro-batch de los Actores), que se aplica en orden:
+    {
+        "accion": "LOTE",
+        "operaciones": [ {operación}, {operación}, ... ]
+    }
+    -> {"ok": True, "resultados": [ {resultado}, {resultado}, ... ]}
+
+    o un lote de libros nuevos (importador_catalogo.py):
+    {
+        "accion": "IMPORTAR",
+        "libros": [ {"codigo_libro": "...", "titulo": "...", "ejemplares_disponibles": 2}, ... ]
+    }
+    -> {"ok": True, "agregados": n, "existentes": m, "rechazados": [{"indice": i, "motivo": "..."}, ...]}
+
+    Si el plazo ya venció, nadie espera el resultado: no se aplica nada y
+    se responde "plazo_vencido": True.
+
+    Si el id_operacion ya se aplicó, se retorna el resultado guardado con
+    "duplicado": True y la BD no cambia.
+
+    Si el GA publica su flujo de cambios (notificador), el resultado de
+    cada cambio lleva su "secuencia" en ese flujo, y cada ejemplar que se
+    aparta para una reserva se avisa en el tópico "RESERVA.<usuario>".
+
+    LIBERAR_APARTADOS la usa el barrido de apartados del propio GA.
+
+    CONSULTA, PRESTAMOS_USUARIO, VENCIDOS y BUSCAR (sin código de libro) solo leen: no pasan
+    por la tabla de deduplicación ni se replican, y su resultado lleva
+    "solo_lectura": True. Lo mismo DISPONIBILIDAD, que retorna la foto
+    para los suscriptores del flujo de cambios ("completa": True para la
+    réplica de lectura), y FOTO_REPLICACION, que retorna la foto con la que
+    el GA de respaldo se vuelve a sincronizar (ver replicacion.py).
     """
 
     accion = mensaje.get("accion")
     codigo = mensaje.get("codigo_libro")
     usuario = mensaje.get("usuario", "desconocido")
+    id_operacion = mensaje.get("id_operacion")
+
+    vencida = descartar_si_vencido(mensaje, "el GA")
+    if vencida is not None:
+        return vencida
+
+    if accion == "LOTE":
+        return aplicar_lote(estado, mensaje)
+
+    if accion == "IMPORTAR":
+        return importar_libros(estado, mensaje)
+
+    if accion == "DISPONIBILIDAD":
+        if estado.notificador is None:
+            return {"ok": False, "mensaje": "Este GA no publica disponibilidad.", "solo_lectura": True}
+        foto = estado.notificador.instantanea(estado.bd, estado.bloqueos, bool(mensaje.get("completa")))
+        return dict(foto, solo_lectura=True)
+
+    if accion == "FOTO_REPLICACION":
+        if estado.replicador is None:
+            return {"ok": False, "mensaje": "Este GA no replica hacia un respaldo.", "solo_lectura": True}
+        foto = estado.replicador.instantanea(estado.bd, estado.bloqueos, estado.dedup)
+        return dict(foto, solo_lectura=True)
+
+    if accion == "PRESTAMOS_USUARIO":
+        return dict(prestamos_de_usuario(estado, usuario), solo_lectura=True)
+
+    if accion == "VENCIDOS":
+        if estado.vencimientos is not None:
+            vencidos = estado.vencimientos.vencidos()
+            return {"ok": True, "mensaje": "Consulta realizada", "vencidos": vencidos, "solo_lectura": True}
+        with estado.bloqueos.todos():
+            return dict(prestamos_vencidos(estado.bd), solo_lectura=True)
+
+    if accion == "BUSCAR":
+        if estado.titulos is None:
+            return {"ok": False, "mensaje": "Este GA no tiene índice de títulos.", "solo_lectura": True}
+        return dict(estado.titulos.buscar(mensaje.get("texto", ""), mensaje.get("pagina", 1)), solo_lectura=True)
 
     if not accion or not codigo:
         return {"ok": False, "mensaje": "Mensaje inválido: falta acción o código."}
 
+    if accion == "CONSULTA":
+        with estado.bloqueos.de(codigo):
+            return dict(consultar_libro(estado.bd, codigo), solo_lectura=True)
+
     if accion == "PRESTAMO":
-        resultado = registrar_prestamo(bd, codigo, usuario)
+        operacion = registrar_prestamo
 
     elif accion == "DEVOLUCION":
-        resultado = registrar_devolucion(bd, codigo, usuario)
+        operacion = registrar_devolucion
 
     elif accion == "RENOVACION":
-        resultado = registrar_renovacion(bd, codigo, usuario)
+        operacion = registrar_renovacion
+
+    elif accion == "RESERVA":
+        operacion = registrar_reserva
+
+    elif accion == "LIBERAR_APARTADOS":
+        operacion = liberar_apartados_vencidos
 
     else:
         return {"ok": False, "mensaje": f"Acción no soportada: {accion}"}
 
-    if resultado.get("ok"):
-        guardar_bd(DB_PRIMARY_FILE, bd)
-        replicar_asincrono(bd)
+    # La consulta a la tabla y la aplicación ocurren con el mismo lock, así
+    # dos reintentos simultáneos del mismo id no se aplican los dos.
+    with estado.bloqueos.de(codigo):
+        if id_operacion and estado.dedup is not None:
+            previo = estado.dedup.obtener(id_operacion)
+            if previo is not None:
+                return dict(previo, duplicado=True)
+
+        resultado = operacion(estado.bd, codigo, usuario, estado.vencimientos)
+        # Los apartados nuevos se avisan por PUB; no van en la respuesta
+        apartados = resultado.pop("apartados", None)
+
+        if resultado.get("ok"):
+            estado.libro_modificado(codigo)
+            if estado.bd[codigo].get("apartados"):
+                estado.libros_con_apartados.add(codigo)
+            else:
+                estado.libros_con_apartados.discard(codigo)
+
+        if estado.notificador is not None and resultado.get("ok"):
+            resultado["secuencia"] = estado.notificador.publicar(codigo, estado.bd[codigo])
+            for apartado in apartados or ():
+                avisar_apartado(estado.notificador, codigo, apartado)
+
+        if estado.disponibilidad is not None and resultado.get("ok"):
+            estado.disponibilidad.actualizar(codigo, estado.bd[codigo]["ejemplares_disponibles"],
+                                             resultado.get("secuencia"))
+
+        if id_operacion and estado.dedup is not None:
+            estado.dedup.guardar(id_operacion, resultado)
+
+        if estado.replicador is not None:
+            libro = estado.bd.get(codigo) if resultado.get("ok") else None
+            estado.replicador.registrar(id_operacion, codigo, resultado, libro)
+
+        return resultado
+
 
+def prestamos_de_usuario(estado: EstadoGA, usuario: str) -> dict:
+    """
+    PRESTAMOS_USUARIO leyendo solo los libros del usuario, cada uno con su
+    lock. Los libros salen del índice de vencimientos; sin él se recorre la
+    BD (con la BD en disco, items() no llena la caché).
+    """
+    if estado.vencimientos is not None:
+        codigos = estado.vencimientos.libros_de_usuario(usuario)
+    else:
+        libros = estado.bd.items() if isinstance(estado.bd, AlmacenLibros) else list(estado.bd.items())
+        codigos = [codigo for codigo, libro in libros
+                   if any(p["usuario"] == usuario for p in libro.get("prestamos", []))]
+
+    prestamos = []
+    for codigo in codigos:
+        with estado.bloqueos.de(codigo):
+            prestamos += consultar_prestamos_usuario(estado.bd, usuario, [codigo])["prestamos"]
+    return {"ok": True, "mensaje": "Consulta realizada", "usuario": usuario, "prestamos": prestamos}
+
+
+def avisar_apartado(notificador: PublicadorDisponibilidad, codigo: str, apartado: dict):
+    """Avisa al usuario que tiene un ejemplar apartado hasta apartado["hasta"]."""
+    notificador.publicar_evento(f"{TOPIC_RESERVA}.{apartado['usuario']}", {
+        "codigo_libro": codigo,
+        "usuario": apartado["usuario"],
+        "hasta": apartado["hasta"],
+    })
+
+
+def aplicar_lote(estado: EstadoGA, mensaje: dict) -> dict:
+    """Aplica cada operación del lote en orden y retorna un resultado por operación."""
+
+    operaciones = mensaje.get("operaciones")
+    if not isinstance(operaciones, list):
+        return {"ok": False, "mensaje": "Lote inválido: falta la lista de operaciones."}
+
+    resultados = []
+    for operacion in operaciones:
+        if not isinstance(operacion, dict) or operacion.get("accion") == "LOTE":
+            resultados.append({"ok": False, "mensaje": "Operación inválida dentro del lote."})
+        else:
+            resultados.append(aplicar_operacion(estado, operacion))
+
+    return {"ok": True, "resultados": resultados}
+
+
+def importar_libros(estado: EstadoGA, mensaje: dict) -> dict:
+    """
+    Agrega los libros del lote que no existen en la BD. Los que ya existen
+    no se tocan (tienen préstamos y reservas propios), así reenviar un lote
+    después de un fallo no cambia nada. Cada entrada se valida como en el
+    importador (validar_registro); las inválidas se informan en
+    "rechazados" ([{"indice": i, "motivo": ...}]) sin frenar el resto.
+    """
+
+    libros = mensaje.get("libros")
+    if not isinstance(libros, list):
+        return {"ok": False, "mensaje": "Importación inválida: falta la lista de libros."}
+
+    agregados = existentes = 0
+    rechazados = []
+    for indice, entrada in enumerate(libros):
+        valido, motivo = validar_registro(entrada if isinstance(entrada, dict) else None)
+        if valido is None:
+            rechazados.append({"indice": indice, "motivo": motivo})
+            continue
+        codigo = valido["codigo_libro"]
+
+        with estado.bloqueos.de(codigo):
+            if codigo in estado.bd:
+                existentes += 1
+                continue
+
+            libro = {
+                "titulo": valido["titulo"],
+                "ejemplares_disponibles": valido["ejemplares_disponibles"],
+                "prestamos": [],
+            }
+            estado.bd[codigo] = libro
+            agregados += 1
+
+            if estado.titulos is not None:
+                estado.titulos.agregar(codigo, libro["titulo"])
+            secuencia = None
+            if estado.notificador is not None:
+                secuencia = estado.notificador.publicar(codigo, libro)
+            if estado.disponibilidad is not None:
+                estado.disponibilidad.actualizar(codigo, libro["ejemplares_disponibles"], secuencia)
+            if estado.replicador is not None:
+                estado.replicador.registrar(None, codigo, {"ok": True}, libro)
+
+    return {"ok": True, "mensaje": "Importación realizada", "agregados": agregados, "existentes": existentes,
+            "rechazados": rechazados}
+
+
+def hubo_cambios(resultado: dict) -> bool:
+    """Indica si el resultado de aplicar_operacion modificó la BD."""
+    if "resultados" in resultado:
+        return any(hubo_cambios(r) for r in resultado["resultados"])
+    if "agregados" in resultado:
+        return resultado["agregados"] > 0
+    return bool(resultado.get("ok")) and not resultado.get("duplicado") and not resultado.get("solo_lectura")
+
+
+def hubo_duplicados(resultado: dict) -> bool:
+    """Indica si el resultado incluye reintentos de operaciones ya aplicadas."""
+    if "resultados" in resultado:
+        return any(hubo_duplicados(r) for r in resultado["resultados"])
+    return bool(resultado.get("duplicado"))
+
+
+def procesar_operacion(estado: EstadoGA, mensaje: dict, persistencia: PersistenciaAgrupada) -> dict:
+    """
+    Procesa una operación enviada por un Actor.
+
+    El cambio se aplica con el lock del libro tomado; la respuesta se
+    entrega cuando la persistencia agrupada confirma que ya está en disco.
+    Un GA relegado (otro tiene un mandato más nuevo) no aplica nada.
+    """
+
+    if estado.mandato is not None:
+        rechazo = estado.mandato.revisar(mensaje)
+        if rechazo is not None:
+            return rechazo
+
+    resultado = aplicar_operacion(estado, mensaje)
+
+    # Un lote también se guarda con una sola escritura. Un reintento ya
+    # aplicado espera lo pendiente: la escritura del original pudo fallar
+    ticket = None
+    if hubo_cambios(resultado):
+        ticket = persistencia.registrar_cambio()
+    elif hubo_duplicados(resultado):
+        ticket = persistencia.ultimo_ticket()
+
+    if ticket is not None and not persistencia.esperar(ticket):
+        # El cambio sigue en memoria y se reintenta guardar; quien lo envió
+        # lo reenvía (NACK) y la deduplicación responde cuando esté en disco
+        resultado = {"ok": False, "mensaje": "Error interno en GA: no se pudo guardar en disco",
+                     "error_interno": True}
+
+    if estado.mandato is not None:
+        return estado.mandato.anotar(resultado)
     return resultado
 
 
+def crear_manejador(estado: EstadoGA, persistencia: PersistenciaAgrupada, verbose: bool = True):
+    """
+    Crea la función que ejecuta cada hilo trabajador: recibe el texto JSON
+    de la solicitud y retorna el texto JSON de la respuesta.
+    """
+
+    def manejador(data: str) -> str:
+        try:
+            mensaje = json.loads(data)
+        except json.JSONDecodeError:
+            return json.dumps({"ok": False, "mensaje": "Mensaje inválido: no es JSON."})
+
+        if verbose:
+            print(f"GA recibió mensaje: {mensaje}")
+
+        respuesta = procesar_operacion(estado, mensaje, persistencia)
+
+        if verbose:
+            print(f"GA respondió: {respuesta}")
+        return json.dumps(respuesta)
+
+    return manejador
+
+
+def iniciar_servidor_ga(context: zmq.Context, endpoint: str, bd: dict, ruta_bd: str,
+                        num_trabajadores: int = GA_NUM_TRABAJADORES,
+                        num_bloqueos: int = GA_NUM_BLOQUEOS,
+                        intervalo_persistencia: float = GA_INTERVALO_PERSISTENCIA,
+                        replicador: ReplicadorCambios = None,
+                        notificador: PublicadorDisponibilidad = None,
+                        vencimientos: IndiceVencimientos = None,
+                        titulos: IndiceTitulos = None,
+                        disponibilidad: TablaDisponibilidad = None,
+                        mandato: MandatoGA = None,
+                        prioridad: bool = PRIORIDAD_ACTIVA, verbose: bool = True):
+    """
+    Arma el GA concurrente sobre 'bd' y lo deja escuchando en 'endpoint'.
+    Si publica avisos (notificador) también inicia el barrido de apartados.
+    Con 'prioridad' la cola de entrada tiene carriles (ACCIONES_SINCRONAS
+    primero).
+
+    Retorna:
+        (servidor, persistencia)
+    """
+
+    bloqueos = BloqueosPorLibro(num_bloqueos)
+    if isinstance(bd, AlmacenLibros):
+        bd.usar_bloqueos(bloqueos)
+    estado = EstadoGA(bd, bloqueos, TablaDeduplicacion(), replicador, notificador, vencimientos, titulos,
+                      disponibilidad, mandato)
+    persistencia = PersistenciaAgrupada(bd, ruta_bd, bloqueos, intervalo_persistencia)
+
+    manejador = crear_manejador(estado, persistencia, verbose)
+    clasificar = clasificador_por_campo("accion", ACCIONES_SINCRONAS) if prioridad else None
+    servidor = ServidorConcurrente(context, endpoint, manejador, num_trabajadores, clasificar=clasificar)
+    servidor.iniciar()
+
+    if notificador is not None:
+        t_apartados = threading.Thread(target=hilo_barrido_apartados, args=(estado, persistencia), daemon=True)
+        t_apartados.start()
+
+    return servidor, persistencia
+
+
 # ============================
 # Health-check
 # ============================
 
-def hilo_healthcheck(context: zmq.Context):
+def hilo_healthcheck(context: zmq.Context, puerto: int = GA_HEALTHCHECK_PORT):
     """
-    Hilo que responde a solicitudes de health-check en GA_HEALTHCHECK_PORT.
+    Hilo que responde a solicitudes de health-check en 'puerto'
+    (GA_HEALTHCHECK_PORT en el primario).
     """
     socket = context.socket(zmq.REP)
-    socket.bind(f"tcp://*:{GA_HEALTHCHECK_PORT}")
-    print(f"GA listo para health-check en puerto {GA_HEALTHCHECK_PORT}.")
+    socket.bind(direccion_bind(puerto))
+    print(f"GA listo para health-check en puerto {puerto}.")
 
     while True:
         try:
@@ -120,6 +544,155 @@ def hilo_healthcheck(context: zmq.Context):
             break
 
 
+def hilo_latido_tabla(disponibilidad: TablaDisponibilidad, mandato: MandatoGA = None,
+                      intervalo: float = CACHE_LATIDO_INTERVALO):
+    """
+    Renueva el latido de la tabla de disponibilidad, así los lectores saben
+    que el GA sigue vivo. Si el GA queda relegado, el latido se detiene.
+    """
+    while mandato is None or not mandato.relegado:
+        time.sleep(intervalo)
+        disponibilidad.latido()
+
+
+# ============================
+# Barrido de vencimientos
+# ============================
+
+def publicar_vencidos(vencimientos: IndiceVencimientos, notificador: PublicadorDisponibilidad) -> int:
+    """Publica un aviso por cada préstamo que venció desde el último barrido."""
+    vencimientos.avanzar(time.time())
+    pendientes = vencimientos.tomar_por_notificar()
+    for (codigo, usuario, _), fecha_fin in pendientes:
+        notificador.publicar_evento(TOPIC_VENCIDO, {
+            "codigo_libro": codigo,
+            "usuario": usuario,
+            "fecha_fin": fecha_fin,
+        })
+    return len(pendientes)
+
+
+def hilo_barrido_vencimientos(vencimientos: IndiceVencimientos, notificador: PublicadorDisponibilidad,
+                              intervalo: float = VENCIMIENTOS_INTERVALO_BARRIDO):
+    """
+    Hilo que revisa el índice cada 'intervalo' segundos. Cada barrido cuesta
+    O(log n) por préstamo vencido, no un recorrido de la BD.
+    """
+    while True:
+        time.sleep(intervalo)
+        try:
+            cantidad = publicar_vencidos(vencimientos, notificador)
+            if cantidad:
+                print(f"GA publicó {cantidad} préstamos vencidos en el tópico {TOPIC_VENCIDO}.")
+        except Exception as e:
+            print(f"Error en el barrido de vencimientos: {e}")
+
+
+# ============================
+# Barrido de apartados (RESERVA)
+# ============================
+
+def liberar_apartados(estado: EstadoGA) -> int:
+    """
+    Libera los apartados vencidos de cada libro con apartados (pasan al
+    siguiente de la lista, que recibe su aviso). Retorna cuántos libros
+    cambiaron. Un GA relegado no libera nada: ya no es el GA activo.
+    """
+    if estado.mandato is not None and estado.mandato.relegado:
+        return 0
+    cambios = 0
+    for codigo in list(estado.libros_con_apartados):
+        resultado = aplicar_operacion(estado, {"accion": "LIBERAR_APARTADOS", "codigo_libro": codigo})
+        if hubo_cambios(resultado):
+            cambios += 1
+    return cambios
+
+
+def hilo_barrido_apartados(estado: EstadoGA, persistencia: PersistenciaAgrupada,
+                           intervalo: float = RESERVA_INTERVALO_BARRIDO):
+    """Hilo que libera los apartados vencidos cada 'intervalo' segundos."""
+    while True:
+        time.sleep(intervalo)
+        try:
+            cambios = liberar_apartados(estado)
+            if cambios:
+                persistencia.registrar_cambio()
+                print(f"GA liberó apartados vencidos en {cambios} libros.")
+        except Exception as e:
+            print(f"Error en el barrido de apartados: {e}")
+
+
+# ============================
+# BD en disco (GA_BD_EN_DISCO)
+# ============================
+
+def cargar_bd_ga():
+    """
+    BD del GA primario según GA_BD_EN_DISCO. Retorna (bd, ruta_bd):
+    - en memoria: el dict de DB_PRIMARY_FILE
+    - en disco: un AlmacenLibros sobre GA_BD_SQLITE_FILE; si está vacío se
+      llena en flujo desde DB_PRIMARY_FILE
+    """
+
+    inicializar_bd()
+
+    if not GA_BD_EN_DISCO:
+        return cargar_bd(DB_PRIMARY_FILE), DB_PRIMARY_FILE
+
+    almacen = AlmacenLibros(GA_BD_SQLITE_FILE, GA_CACHE_LIBROS)
+    if len(almacen) == 0:
+        inicio = time.perf_counter()
+        cantidad = almacen.importar(iterar_bd(DB_PRIMARY_FILE))
+        print(f"GA: {cantidad} libros copiados de {DB_PRIMARY_FILE} a {GA_BD_SQLITE_FILE} "
+              f"({time.perf_counter() - inicio:.1f} s).")
+    print(f"GA: BD en disco ({GA_BD_SQLITE_FILE}) con caché de {GA_CACHE_LIBROS} libros.")
+    return almacen, GA_BD_SQLITE_FILE
+
+
+def crear_indices(bd: dict, notificar: bool = False):
+    """
+    Índices de vencimientos y de títulos del GA. Con la BD en disco no se
+    recorre el catálogo: se leen las tablas que AlmacenLibros mantiene al
+    escribir cada libro (préstamos activos) y la búsqueda va a su SQLite.
+    """
+    inicio = time.perf_counter()
+    if isinstance(bd, AlmacenLibros):
+        vencimientos = IndiceVencimientos.desde_prestamos(bd.prestamos_activos(), notificar)
+        titulos = IndiceTitulosDisco(bd)
+        print(f"GA: índice de vencimientos con {len(vencimientos)} préstamos activos; "
+              f"títulos en {bd.ruta_archivo} ({time.perf_counter() - inicio:.2f} s).")
+    else:
+        vencimientos = IndiceVencimientos.desde_bd(bd, notificar)
+        titulos = IndiceTitulos.desde_bd(bd)
+        print(f"GA: índice de vencimientos con {len(vencimientos)} préstamos activos; "
+              f"índice de títulos con {titulos.palabras} palabras ({time.perf_counter() - inicio:.2f} s).")
+    return vencimientos, titulos
+
+
+def hilo_metricas_almacen(almacen: AlmacenLibros, intervalo: float = GA_CACHE_INTERVALO_METRICAS):
+    """Imprime cada 'intervalo' segundos la tasa de aciertos de la caché de libros."""
+    while True:
+        time.sleep(intervalo)
+        m = almacen.metricas()
+        print(f"GA caché de libros: {m['en_cache']}/{m['capacidad']} libros, "
+              f"aciertos {m['tasa_aciertos']:.1%} ({m['aciertos']}/{m['aciertos'] + m['fallos']}), "
+              f"desalojos {m['desalojos']}, libros escritos {m['libros_escritos']}")
+
+
+def hilo_metricas_clases(servidor: ServidorConcurrente, intervalo: float = PRIORIDAD_INTERVALO_METRICAS):
+    """Imprime cada 'intervalo' segundos la espera y la latencia por clase, si hubo solicitudes."""
+    anteriores = 0
+    while True:
+        time.sleep(intervalo)
+        atendidas = sum(m["atendidas"] for m in servidor.metricas_clases().values())
+        if atendidas == anteriores:
+            continue
+        anteriores = atendidas
+        print(f"GA latencia por clase (adelantadas por envejecimiento: {servidor.cola.envejecidas}; "
+              f"descartadas por plazo vencido: {DESCARTADAS.resumen()}):")
+        print(servidor.resumen_clases())
+
+
 # ============================
 # Bucle principal del GA
 # ============================
@@ -129,40 +702,70 @@ def ejecutar_ga():
     Entrada principal del GA primario.
     - Inicializa BD si es necesario.
     - Carga BD primaria.
-    - Atiende solicitudes de Actores (PRESTAMO, DEVOLUCION, RENOVACION).
+    - Atiende solicitudes de Actores (PRESTAMO, DEVOLUCION, RENOVACION)
+      con GA_NUM_TRABAJADORES hilos.
     """
 
-    inicializar_bd()
-
-    bd = cargar_bd(DB_PRIMARY_FILE)
+    bd, ruta_bd = cargar_bd_ga()
     print(f"GA: BD primaria cargada con {len(bd)} libros.")
 
-    context = zmq.Context()
-    socket = context.socket(zmq.REP)
-    socket.bind(f"tcp://*:{GA_PRIMARY_PORT}")
-    print(f"GA escuchando en tcp://*:{GA_PRIMARY_PORT}")
+    # Si el respaldo fue promovido, este GA arranca relegado (ver mandato_ga.py)
+    mandato = MandatoGA.desde_archivo(ROL_PRIMARIO)
+    if mandato.relegado:
+        print(f"GA: el respaldo es el GA activo (mandato {mandato.mandato}); este GA arranca relegado.")
+
+    context = zmq.Context.instance()
+
+    replicador = ReplicadorCambios(context, direccion_conexion(SEDE2_HOST, GA_REPLICA_SYNC_PORT), mandato=mandato.mandato)
+    replicador.iniciar()
+    print(f"GA replicando cambios hacia el respaldo en {SEDE2_HOST}:{GA_REPLICA_SYNC_PORT}.")
+
+    notificador = PublicadorDisponibilidad(context, direccion_bind(GA_CAMBIOS_PUB_PORT))
+    if not mandato.relegado:
+        notificador.iniciar()
+        mandato.al_relegar = notificador.detener
+        print(f"GA publicando disponibilidad en puerto {GA_CAMBIOS_PUB_PORT}.")
+
+    vencimientos, titulos = crear_indices(bd, notificar=True)
+
+    disponibilidad = None
+    if TABLA_DISPONIBILIDAD_ACTIVA and not mandato.relegado:
+        disponibilidad = TablaDisponibilidad.crear(TABLA_DISPONIBILIDAD_FILE, bd, notificador.secuencia)
+        print(f"GA: tabla de disponibilidad en {TABLA_DISPONIBILIDAD_FILE} con {disponibilidad.usados} libros.")
+        t_latido = threading.Thread(target=hilo_latido_tabla, args=(disponibilidad, mandato), daemon=True)
+        t_latido.start()
+
+    endpoint = direccion_bind(GA_PRIMARY_PORT)
+    servidor, _ = iniciar_servidor_ga(
+        context,
+        endpoint,
+        bd,
+        ruta_bd,
+        replicador=replicador,
+        notificador=notificador,
+        vencimientos=vencimientos,
+        titulos=titulos,
+        disponibilidad=disponibilidad,
+        mandato=mandato,
+    )
+    print(f"GA escuchando en {endpoint} con {GA_NUM_TRABAJADORES} trabajadores.")
 
     t_health = threading.Thread(target=hilo_healthcheck, args=(context,), daemon=True)
     t_health.start()
 
-    while True:
-        try:
-            data = socket.recv_string()
-            mensaje = json.loads(data)
-
-            print(f"GA recibió mensaje: {mensaje}")
+    t_barrido = threading.Thread(target=hilo_barrido_vencimientos, args=(vencimientos, notificador), daemon=True)
+    t_barrido.start()
 
-            respuesta = procesar_operacion(bd, mensaje)
+    if isinstance(bd, AlmacenLibros):
+        t_metricas = threading.Thread(target=hilo_metricas_almacen, args=(bd,), daemon=True)
+        t_metricas.start()
 
-            socket.send_string(json.dumps(respuesta))
-            print(f"GA respondió: {respuesta}")
+    t_clases = threading.Thread(target=hilo_metricas_clases, args=(servidor,), daemon=True)
+    t_clases.start()
 
-        except Exception as e:
-            print(f"Error en GA: {e}")
-            try:
-                socket.send_string(json.dumps({"ok": False, "mensaje": "Error interno en GA"}))
-            except Exception:
-                pass
+    # El trabajo lo hacen los hilos del servidor; el hilo principal solo espera
+    while True:
+        time.sleep(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,296 @@
+"""
+gestor_almacenamiento_async.py
+Versión asyncio (zmq.asyncio) del GA primario.
+
+Responsabilidades:
+- Atender solicitudes de los Actores en un socket ROUTER con un solo hilo:
+  cada solicitud es una tarea del event loop, así que hay muchas
+  operaciones en vuelo sin crear un hilo por solicitud.
+- Aplicar los cambios con la misma lógica del GA con hilos
+  (gestor_almacenamiento.aplicar_operacion).
+- Guardar a disco agrupando cambios: la foto de la BD se toma en el event
+  loop (consistente, sin locks) y la escritura se hace en un executor.
+- Deduplicar por id_operacion, replicar al GA de respaldo (flujo de
+  cambios), publicar la disponibilidad para la caché de los GC, avisar
+  los préstamos vencidos y los ejemplares apartados, y responder el health-check (PING/PONG).
+"""
+
+import asyncio
+import json
+
+import zmq
+import zmq.asyncio
+
+from config import (
+    SEDE2_HOST,
+    GA_PRIMARY_PORT,
+    GA_HEALTHCHECK_PORT,
+    GA_REPLICA_SYNC_PORT,
+    GA_CAMBIOS_PUB_PORT,
+    VENCIMIENTOS_INTERVALO_BARRIDO,
+    RESERVA_INTERVALO_BARRIDO,
+    CACHE_LATIDO_INTERVALO,
+    GA_REINTENTO_PERSISTENCIA,
+    TABLA_DISPONIBILIDAD_ACTIVA,
+    TABLA_DISPONIBILIDAD_FILE,
+)
+from almacen_libros import AlmacenLibros
+from base_datos import (
+    serializar_bd,
+    escribir_bd_serializada,
+)
+from cache_disponibilidad import PublicadorDisponibilidad
+from concurrencia_bd import BloqueosPorLibro
+from deduplicacion import TablaDeduplicacion
+from gestor_almacenamiento import (
+    EstadoGA,
+    aplicar_operacion,
+    cargar_bd_ga,
+    crear_indices,
+    hubo_cambios,
+    hubo_duplicados,
+    liberar_apartados,
+    publicar_vencidos,
+)
+from indice_titulos import IndiceTitulos
+from mandato_ga import ROL_PRIMARIO, MandatoGA
+from replicacion import ReplicadorCambios
+from tabla_disponibilidad import TablaDisponibilidad
+from transporte import direccion_bind, direccion_conexion
+from vencimientos import IndiceVencimientos
+
+
+# ============================
+# Persistencia agrupada (asyncio)
+# ============================
+
+class PersistenciaAsync:
+    """
+    Equivalente asyncio de PersistenciaAgrupada.
+
+    Uso:
+        await persistencia.confirmar()   # vuelve cuando el cambio está en disco
+
+    Si la escritura falla, confirmar() lanza el error a quienes esperaban
+    ese lote y la escritura se reintenta cada 'reintento' segundos.
+    """
+
+    def __init__(self, bd: dict, ruta_archivo: str, reintento: float = GA_REINTENTO_PERSISTENCIA):
+        self.bd = bd
+        self.ruta_archivo = ruta_archivo
+        self.reintento = reintento
+
+        self._pendientes = []
+        self._hay_cambios = asyncio.Event()
+        # False mientras haya cambios sin llegar a disco
+        self.al_dia = True
+        self.escrituras = 0
+        self.escrituras_fallidas = 0
+
+    async def confirmar(self):
+        futuro = asyncio.get_running_loop().create_future()
+        self._pendientes.append(futuro)
+        self.al_dia = False
+        self._hay_cambios.set()
+        await futuro
+
+    async def ejecutar(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._hay_cambios.wait()
+            self._hay_cambios.clear()
+
+            # Todo lo que se confirmó hasta aquí entra en esta escritura
+            futuros, self._pendientes = self._pendientes, []
+            en_disco = isinstance(self.bd, AlmacenLibros)
+            contenido = self.bd.tomar_cambios() if en_disco else serializar_bd(self.bd)
+
+            try:
+                if en_disco:
+                    await loop.run_in_executor(None, self.bd.escribir_cambios, contenido)
+                else:
+                    await loop.run_in_executor(None, escribir_bd_serializada, self.ruta_archivo, contenido)
+                self.escrituras += 1
+            except Exception as e:
+                print(f"Error en persistencia asíncrona ({self.ruta_archivo}): {e}")
+                self.escrituras_fallidas += 1
+                for futuro in futuros:
+                    if not futuro.done():
+                        futuro.set_exception(e)
+                # Los cambios siguen en memoria (AlmacenLibros los vuelve a
+                # marcar sucios): se reintenta la escritura
+                await asyncio.sleep(self.reintento)
+                self._hay_cambios.set()
+                continue
+
+            for futuro in futuros:
+                if not futuro.done():
+                    futuro.set_result(None)
+            if not self._pendientes:
+                self.al_dia = True
+
+
+# ============================
+# Atención de solicitudes
+# ============================
+
+async def atender_solicitud(socket, sobre: list, payload: bytes, estado: EstadoGA,
+                            persistencia: PersistenciaAsync, verbose: bool):
+    try:
+        mensaje = json.loads(payload.decode("utf-8"))
+        if verbose:
+            print(f"GA async recibió mensaje: {mensaje}")
+
+        # Un GA relegado (otro tiene un mandato más nuevo) no aplica nada
+        respuesta = estado.mandato.revisar(mensaje) if estado.mandato is not None else None
+        if respuesta is None:
+            respuesta = aplicar_operacion(estado, mensaje)
+            # Un reintento ya aplicado espera lo pendiente: la escritura del
+            # original pudo fallar o seguir en curso
+            if hubo_cambios(respuesta) or (hubo_duplicados(respuesta) and not persistencia.al_dia):
+                await persistencia.confirmar()
+            if estado.mandato is not None:
+                respuesta = estado.mandato.anotar(respuesta)
+
+    except json.JSONDecodeError:
+        respuesta = {"ok": False, "mensaje": "Mensaje inválido: no es JSON."}
+    except Exception as e:
+        print(f"Error en GA async: {e}")
+        respuesta = {"ok": False, "mensaje": "Error interno en GA", "error_interno": True}
+
+    if verbose:
+        print(f"GA async respondió: {respuesta}")
+    await socket.send_multipart(sobre + [json.dumps(respuesta).encode("utf-8")])
+
+
+async def servir_ga_async(context: zmq.asyncio.Context, endpoint: str, bd: dict, ruta_bd: str,
+                          replicador: ReplicadorCambios = None,
+                          notificador: PublicadorDisponibilidad = None,
+                          vencimientos: IndiceVencimientos = None,
+                          titulos: IndiceTitulos = None,
+                          disponibilidad: TablaDisponibilidad = None,
+                          mandato: MandatoGA = None, verbose: bool = True,
+                          listo: asyncio.Future = None):
+    """
+    Atiende solicitudes de Actores en 'endpoint' hasta que se cancele la tarea.
+    Si se pasa el futuro 'listo', se resuelve con (endpoint_real, persistencia)
+    cuando el socket ya está escuchando. Con notificador también corre el
+    barrido de apartados.
+    """
+
+    # El event loop es de un solo hilo: un único lock basta para reutilizar
+    # aplicar_operacion y nunca hay contención.
+    estado = EstadoGA(bd, BloqueosPorLibro(1), TablaDeduplicacion(), replicador, notificador, vencimientos,
+                      titulos, disponibilidad, mandato)
+    persistencia = PersistenciaAsync(bd, ruta_bd)
+    tarea_persistencia = asyncio.create_task(persistencia.ejecutar())
+    tarea_apartados = None
+    if notificador is not None:
+        tarea_apartados = asyncio.create_task(barrido_apartados_async(estado, persistencia))
+
+    socket = context.socket(zmq.ROUTER)
+    socket.bind(endpoint)
+    if listo is not None:
+        listo.set_result((socket.getsockopt_string(zmq.LAST_ENDPOINT), persistencia))
+
+    tareas = set()
+    try:
+        while True:
+            partes = await socket.recv_multipart()
+            tarea = asyncio.create_task(
+                atender_solicitud(socket, partes[:-1], partes[-1], estado, persistencia, verbose)
+            )
+            tareas.add(tarea)
+            tarea.add_done_callback(tareas.discard)
+    finally:
+        tarea_persistencia.cancel()
+        if tarea_apartados is not None:
+            tarea_apartados.cancel()
+        socket.close(linger=0)
+
+
+async def healthcheck_async(context: zmq.asyncio.Context):
+    """Responde PING/PONG en GA_HEALTHCHECK_PORT."""
+    socket = context.socket(zmq.REP)
+    socket.bind(direccion_bind(GA_HEALTHCHECK_PORT))
+    print(f"GA async listo para health-check en puerto {GA_HEALTHCHECK_PORT}.")
+
+    while True:
+        mensaje = await socket.recv_string()
+        await socket.send_string("PONG" if mensaje == "PING" else "UNKNOWN")
+
+
+async def latido_tabla_async(disponibilidad: TablaDisponibilidad, mandato: MandatoGA = None):
+    """Equivalente asyncio de gestor_almacenamiento.hilo_latido_tabla."""
+    while mandato is None or not mandato.relegado:
+        await asyncio.sleep(CACHE_LATIDO_INTERVALO)
+        disponibilidad.latido()
+
+
+async def barrido_vencimientos_async(vencimientos: IndiceVencimientos, notificador: PublicadorDisponibilidad):
+    """Equivalente asyncio de gestor_almacenamiento.hilo_barrido_vencimientos."""
+    while True:
+        await asyncio.sleep(VENCIMIENTOS_INTERVALO_BARRIDO)
+        try:
+            publicar_vencidos(vencimientos, notificador)
+        except Exception as e:
+            print(f"Error en el barrido de vencimientos: {e}")
+
+
+async def barrido_apartados_async(estado: EstadoGA, persistencia: PersistenciaAsync):
+    """Equivalente asyncio de gestor_almacenamiento.hilo_barrido_apartados."""
+    while True:
+        await asyncio.sleep(RESERVA_INTERVALO_BARRIDO)
+        try:
+            if liberar_apartados(estado):
+                await persistencia.confirmar()
+        except Exception as e:
+            print(f"Error en el barrido de apartados: {e}")
+
+
+# ============================
+# Entrada principal
+# ============================
+
+async def ejecutar_ga_async():
+    bd, ruta_bd = cargar_bd_ga()
+    print(f"GA async: BD primaria cargada con {len(bd)} libros.")
+
+    # Sobre el contexto del proceso: con inproc comparte sockets con los componentes síncronos
+    context = zmq.asyncio.Context(zmq.Context.instance())
+
+    # Si el respaldo fue promovido, este GA arranca relegado (ver mandato_ga.py)
+    mandato = MandatoGA.desde_archivo(ROL_PRIMARIO)
+    if mandato.relegado:
+        print(f"GA async: el respaldo es el GA activo (mandato {mandato.mandato}); este GA arranca relegado.")
+
+    # El replicador y el notificador usan su propio hilo y sockets síncronos
+    replicador = ReplicadorCambios(zmq.Context.instance(), direccion_conexion(SEDE2_HOST, GA_REPLICA_SYNC_PORT),
+                                   mandato=mandato.mandato)
+    replicador.iniciar()
+    notificador = PublicadorDisponibilidad(zmq.Context.instance(), direccion_bind(GA_CAMBIOS_PUB_PORT))
+    if not mandato.relegado:
+        notificador.iniciar()
+        mandato.al_relegar = notificador.detener
+    vencimientos, titulos = crear_indices(bd, notificar=True)
+    disponibilidad = None
+    if TABLA_DISPONIBILIDAD_ACTIVA and not mandato.relegado:
+        disponibilidad = TablaDisponibilidad.crear(TABLA_DISPONIBILIDAD_FILE, bd, notificador.secuencia)
+
+    endpoint = direccion_bind(GA_PRIMARY_PORT)
+    tareas = [
+        servir_ga_async(context, endpoint, bd, ruta_bd, replicador, notificador,
+                        vencimientos, titulos, disponibilidad, mandato),
+        healthcheck_async(context),
+        barrido_vencimientos_async(vencimientos, notificador),
+    ]
+    if disponibilidad is not None:
+        tareas.append(latido_tabla_async(disponibilidad, mandato))
+
+    print(f"GA async escuchando en {endpoint}")
+    await asyncio.gather(*tareas)
+
+
+if __name__ == "__main__":
+    print("Iniciando Gestor de Almacenamiento (GA) primario asíncrono...")
+    asyncio.run(ejecutar_ga_async())
@@ -0,0 +1,180 @@
+"""
+gestor_almacenamiento_lectura.py
+Réplica de lectura del GA para la Sede 2.
+
+Responsabilidades:
+- Mantener una copia de la BD alimentada por el flujo de cambios del GA
+  primario (ver cache_disponibilidad.py), con un índice por usuario.
+- Responder localmente CONSULTA, PRESTAMOS_USUARIO, VENCIDOS y BUSCAR
+  (con sus propios índices de vencimientos y de títulos), así las lecturas de la Sede 2 no
+  cruzan a la Sede 1.
+- Read-your-writes: si la solicitud trae "secuencia_minima" (la última
+  secuencia que vio la sesión del PS), se espera a que la réplica haya
+  aplicado ese cambio; si no lo alcanza en LECTURA_ESPERA_MAX_MS, o la
+  réplica no está al día, la lectura se reenvía al primario.
+- Reenviar al primario (con respaldo, ver cliente_ga.py) las escrituras
+  que reciba.
+
+Comunicación: ZeroMQ (ROUTER con pool de hilos hacia los clientes, SUB
+hacia el flujo de cambios del primario, REQ para reenviar al GA).
+"""
+
+import json
+import time
+from collections import defaultdict
+
+import zmq
+
+from config import (
+    SEDE1_HOST,
+    GA_PRIMARY_PORT,
+    GA_CAMBIOS_PUB_PORT,
+    GA_LECTURA_PORT,
+    GA_LECTURA_NUM_TRABAJADORES,
+    LECTURA_ESPERA_MAX_MS,
+)
+from base_datos import consultar_libro, consultar_prestamos_usuario
+from cache_disponibilidad import SuscriptorCambios
+from cliente_ga import ClienteGA, es_solo_lectura
+from indice_titulos import IndiceTitulos
+from plazos import descartar_si_vencido
+from servidor_concurrente import ServidorConcurrente
+from transporte import direccion_bind, direccion_conexion
+from vencimientos import IndiceVencimientos
+
+
+class ReplicaLectura(SuscriptorCambios):
+    """
+    Copia de la BD del primario. leer() retorna la respuesta, o None si la
+    lectura debe ir al primario.
+    """
+
+    FOTO_COMPLETA = True
+
+    def __init__(self, context: zmq.Context, endpoint_cambios: str, endpoint_ga: str):
+        super().__init__(context, endpoint_cambios, endpoint_ga)
+
+        self.bd = {}
+        # usuario -> códigos de los libros que tiene prestados
+        self._por_usuario = defaultdict(set)
+        self.vencimientos = IndiceVencimientos()
+        self.titulos = IndiceTitulos()
+
+        self.locales = 0
+        self.reenviadas = 0
+
+    def _indexar(self, codigo: str, libro: dict, agregar: bool):
+        for p in libro.get("prestamos", []):
+            if agregar:
+                self._por_usuario[p["usuario"]].add(codigo)
+            else:
+                codigos = self._por_usuario.get(p["usuario"])
+                if codigos is not None:
+                    codigos.discard(codigo)
+                    if not codigos:
+                        del self._por_usuario[p["usuario"]]
+
+    def _cargar_foto(self, libros: dict, secuencia: int):
+        self.bd = libros
+        self._por_usuario = defaultdict(set)
+        for codigo, libro in libros.items():
+            self._indexar(codigo, libro, True)
+        self.vencimientos = IndiceVencimientos.desde_bd(libros)
+        self.titulos = IndiceTitulos.desde_bd(libros)
+
+    def _aplicar_libro(self, codigo: str, libro: dict, secuencia: int):
+        anterior = self.bd.get(codigo)
+        if anterior is not None:
+            self._indexar(codigo, anterior, False)
+        self.bd[codigo] = libro
+        self._indexar(codigo, libro, True)
+        self.vencimientos.actualizar_libro(codigo, libro)
+        self.titulos.agregar(codigo, libro.get("titulo"))
+
+    def leer(self, mensaje: dict):
+        secuencia_minima = mensaje.get("secuencia_minima") or 0
+        if not self.esperar_secuencia(secuencia_minima, LECTURA_ESPERA_MAX_MS / 1000.0):
+            self.reenviadas += 1
+            return None
+
+        with self._lock:
+            if mensaje.get("accion") == "CONSULTA":
+                resultado = consultar_libro(self.bd, mensaje.get("codigo_libro"))
+            elif mensaje.get("accion") == "VENCIDOS":
+                resultado = {"ok": True, "mensaje": "Consulta realizada", "vencidos": self.vencimientos.vencidos()}
+            elif mensaje.get("accion") == "BUSCAR":
+                resultado = self.titulos.buscar(mensaje.get("texto", ""), mensaje.get("pagina", 1))
+            else:
+                usuario = mensaje.get("usuario", "desconocido")
+                codigos = sorted(self._por_usuario.get(usuario, ()))
+                resultado = consultar_prestamos_usuario(self.bd, usuario, codigos)
+            secuencia = self._ultima_secuencia
+
+        self.locales += 1
+        return dict(resultado, solo_lectura=True, secuencia=secuencia, fuente="replica")
+
+
+def crear_manejador(replica: ReplicaLectura, cliente_ga: ClienteGA, verbose: bool = True):
+    """Función que ejecuta cada hilo trabajador (texto JSON -> texto JSON)."""
+
+    def manejador(data: str) -> str:
+        try:
+            mensaje = json.loads(data)
+        except json.JSONDecodeError:
+            return json.dumps({"ok": False, "mensaje": "Mensaje inválido: no es JSON."})
+
+        if verbose:
+            print(f"GA Lectura recibió: {mensaje}")
+
+        vencida = descartar_si_vencido(mensaje, "la réplica de lectura")
+        if vencida is not None:
+            return json.dumps(vencida)
+
+        respuesta = replica.leer(mensaje) if es_solo_lectura(mensaje) else None
+        if respuesta is None:
+            # Escrituras, o lecturas que la réplica no puede responder al día
+            respuesta, origen = cliente_ga.enviar(mensaje)
+            if verbose:
+                print(f"GA Lectura reenvió al GA {origen}")
+
+        if verbose:
+            print(f"GA Lectura respondió: {respuesta}")
+        return json.dumps(respuesta)
+
+    return manejador
+
+
+def ejecutar_ga_lectura():
+    """
+    Entrada principal de la réplica de lectura (Sede 2).
+    """
+
+    context = zmq.Context.instance()
+
+    replica = ReplicaLectura(
+        context,
+        direccion_conexion(SEDE1_HOST, GA_CAMBIOS_PUB_PORT),
+        direccion_conexion(SEDE1_HOST, GA_PRIMARY_PORT),
+    )
+    replica.iniciar()
+    print(f"GA Lectura siguiendo el flujo de cambios de {SEDE1_HOST}:{GA_CAMBIOS_PUB_PORT}.")
+
+    cliente_ga = ClienteGA(context, "GA Lectura")
+
+    endpoint = direccion_bind(GA_LECTURA_PORT)
+    servidor = ServidorConcurrente(
+        context,
+        endpoint,
+        crear_manejador(replica, cliente_ga),
+        GA_LECTURA_NUM_TRABAJADORES,
+    )
+    servidor.iniciar()
+    print(f"GA Lectura escuchando en {endpoint} con {GA_LECTURA_NUM_TRABAJADORES} trabajadores.")
+
+    while True:
+        time.sleep(1)
+
+
+if __name__ == "__main__":
+    print("Iniciando réplica de lectura del GA (Sede 2)...")
+    ejecutar_ga_lectura()
@@ -6,64 +6,89 @@ Responsabilidades:
 - Atender solicitudes de los Actores (préstamo, devolución, renovación)
 - Trabajar sobre la BD de respaldo (archivo JSON)
 - Actuar como sustituto cuando el GA primario falla
+- Recibir el flujo de cambios del primario (estado de cada libro + tabla
+  de deduplicación) y aplicarlo, así un reintento que llegue aquí tras un
+  failover no se aplica dos veces; al arrancar o si el flujo tiene un
+  hueco, sincronizarse con la foto completa del primario (ver replicacion.py)
 - No replica a ningún otro lado (la réplica se mantiene actualizada
   únicamente desde el primario mientras está activo)
+- Responder PING/PONG en GA_REPLICA_HEALTHCHECK_PORT y, cuando el
+  supervisor lo pide ({"accion": "PROMOVER", "mandato": N}), pasar a ser
+  el GA activo: desde ahí descarta el flujo de un primario con mandato
+  anterior (ver mandato_ga.py)
 
-Comunicación: ZeroMQ (REQ/REP)
+Comunicación: ZeroMQ (REQ/REP con los Actores, PUSH/PULL con el primario y
+REQ al primario para pedir la foto completa)
 """
 
 import json
+import threading
+import time
+
 import zmq
 
 from config import (
+    SEDE1_HOST,
+    GA_PRIMARY_PORT,
     GA_REPLICA_PORT,
+    GA_REPLICA_SYNC_PORT,
+    GA_REPLICA_HEALTHCHECK_PORT,
+    GA_NUM_BLOQUEOS,
     DB_REPLICA_FILE,
+    GA_REPLICACION_REINTENTO,
 )
 
-from base_datos import (
-    cargar_bd,
-    guardar_bd,
-    registrar_prestamo,
-    registrar_devolucion,
-    registrar_renovacion,
-)
+from base_datos import cargar_bd
+from concurrencia_bd import BloqueosPorLibro, PersistenciaAgrupada
+from deduplicacion import TablaDeduplicacion
+from gestor_almacenamiento import EstadoGA, hilo_healthcheck, procesar_operacion
+from indice_titulos import IndiceTitulos
+from mandato_ga import ROL_RESPALDO, MandatoGA
+from replicacion import SecuenciaReplicacion, aplicar_cambio_replicado, cargar_instantanea, pedir_instantanea
+from transporte import direccion_bind, direccion_conexion
+from vencimientos import IndiceVencimientos
 
 
-def procesar_operacion(bd: dict, mensaje: dict) -> dict:
+def hilo_replicacion(context: zmq.Context, estado: EstadoGA, persistencia: PersistenciaAgrupada,
+                     endpoint_primario: str):
     """
-    Procesa una operación enviada por un Actor.
-
-    Formato:
-    {
-        "accion": "PRESTAMO" | "DEVOLUCION" | "RENOVACION",
-        "codigo_libro": "LIB001",
-        "usuario": "juan"
-    }
+    Recibe el flujo de cambios del GA primario en GA_REPLICA_SYNC_PORT y lo
+    aplica sobre la BD de respaldo. Al arrancar, y cada vez que el flujo
+    tiene un hueco o viene de otro proceso primario, pide la foto completa
+    al primario y sigue desde ahí. Ya promovido, descarta lo que venga de
+    un primario con mandato anterior y no pide fotos.
     """
+    socket = context.socket(zmq.PULL)
+    socket.bind(direccion_bind(GA_REPLICA_SYNC_PORT))
+    print(f"GA Respaldo recibiendo cambios del primario en puerto {GA_REPLICA_SYNC_PORT}.")
 
-    accion = mensaje.get("accion")
-    codigo = mensaje.get("codigo_libro")
-    usuario = mensaje.get("usuario", "desconocido")
-
-    if not accion or not codigo:
-        return {"ok": False, "mensaje": "Mensaje inválido: falta acción o código."}
-
-    if accion == "PRESTAMO":
-        resultado = registrar_prestamo(bd, codigo, usuario)
-
-    elif accion == "DEVOLUCION":
-        resultado = registrar_devolucion(bd, codigo, usuario)
-
-    elif accion == "RENOVACION":
-        resultado = registrar_renovacion(bd, codigo, usuario)
-
-    else:
-        return {"ok": False, "mensaje": f"Acción no soportada: {accion}"}
-
-    if resultado.get("ok"):
-        guardar_bd(DB_REPLICA_FILE, bd)
+    posicion = SecuenciaReplicacion()
 
-    return resultado
+    while True:
+        try:
+            if not posicion.sincronizada and not estado.mandato.promovido:
+                foto = pedir_instantanea(context, endpoint_primario, estado.mandato.mandato)
+                if foto is None:
+                    time.sleep(GA_REPLICACION_REINTENTO)
+                    continue
+                cantidad = cargar_instantanea(estado, foto)
+                posicion.desde_foto(foto)
+                persistencia.registrar_cambio()
+                print(f"GA Respaldo sincronizado con el primario: {cantidad} libros, "
+                      f"secuencia {posicion.secuencia} (sincronización {posicion.resincronizaciones}).")
+
+            if not socket.poll(int(GA_REPLICACION_REINTENTO * 1000)):
+                continue
+            entrada = json.loads(socket.recv_string())
+            if not estado.mandato.admite_replicacion(entrada):
+                continue
+            if posicion.revisar(entrada) != "aplicar":
+                continue
+            if aplicar_cambio_replicado(estado, entrada):
+                # No hace falta esperar a que quede en disco
+                persistencia.registrar_cambio()
+        except Exception as e:
+            print(f"Error aplicando cambio replicado: {e}")
 
 
 def ejecutar_ga_respaldo():
@@ -75,11 +100,31 @@ def ejecutar_ga_respaldo():
     bd = cargar_bd(DB_REPLICA_FILE)
     print(f"GA Respaldo: BD cargada con {len(bd)} libros ({DB_REPLICA_FILE}).")
 
-    context = zmq.Context()
+    mandato = MandatoGA.desde_archivo(ROL_RESPALDO)
+    if mandato.promovido:
+        print(f"GA Respaldo: es el GA activo (mandato {mandato.mandato}).")
+
+    bloqueos = BloqueosPorLibro(GA_NUM_BLOQUEOS)
+    # El respaldo no publica avisos de vencimiento, pero responde VENCIDOS y BUSCAR
+    estado = EstadoGA(bd, bloqueos, TablaDeduplicacion(), vencimientos=IndiceVencimientos.desde_bd(bd),
+                      titulos=IndiceTitulos.desde_bd(bd), mandato=mandato)
+    persistencia = PersistenciaAgrupada(bd, DB_REPLICA_FILE, bloqueos)
+
+    context = zmq.Context.instance()
+
+    endpoint_primario = direccion_conexion(SEDE1_HOST, GA_PRIMARY_PORT)
+    t_replicacion = threading.Thread(target=hilo_replicacion, args=(context, estado, persistencia, endpoint_primario),
+                                     daemon=True)
+    t_replicacion.start()
+
+    t_health = threading.Thread(target=hilo_healthcheck, args=(context, GA_REPLICA_HEALTHCHECK_PORT), daemon=True)
+    t_health.start()
+
     socket = context.socket(zmq.REP)
-    socket.bind(f"tcp://*:{GA_REPLICA_PORT}")
+    endpoint = direccion_bind(GA_REPLICA_PORT)
+    socket.bind(endpoint)
 
-    print(f"GA Respaldo escuchando en tcp://*:{GA_REPLICA_PORT}")
+    print(f"GA Respaldo escuchando en {endpoint}")
 
     while True:
         try:
@@ -88,7 +133,10 @@ def ejecutar_ga_respaldo():
 
             print(f"GA Respaldo recibió: {mensaje}")
 
-            respuesta = procesar_operacion(bd, mensaje)
+            if mensaje.get("accion") == "PROMOVER":
+                respuesta = mandato.promover(mensaje.get("mandato"))
+            else:
+                respuesta = procesar_operacion(estado, mensaje, persistencia)
 
             socket.send_string(json.dumps(respuesta))
             print(f"GA Respaldo respondió: {respuesta}")
@@ -96,7 +144,7 @@ def ejecutar_ga_respaldo():
         except Exception as e:
             print(f"Error en GA Respaldo: {e}")
             try:
-                socket.send_string(json.dumps({"ok": False, "mensaje": "Error interno en GA Respaldo"}))
+                socket.send_string(json.dumps({"ok": False, "mensaje": "Error interno en GA Respaldo", "error_interno": True}))
             except Exception:
                 pass
 
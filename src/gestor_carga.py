@@ -6,20 +6,51 @@ Responsabilidades:
 - Recibir solicitudes de los Procesos Solicitantes (PS)
 - Verificar seguridad: autenticación, integridad y control de acceso
 - Para devoluciones y renovaciones:
+    - Guardar el mensaje en la bandeja de salida local (outbox)
     - Responder de forma inmediata al PS
-    - Publicar el mensaje en el tópico correspondiente (DEVOLUCION o RENOVACION)
-- Para préstamos:
+    - Entregar el mensaje a un Actor del tópico (DEVOLUCION o RENOVACION)
+      con confirmación y reentrega (ver bandeja_salida.py)
+- Para préstamos y reservas (lista de espera de un libro sin ejemplares):
     - Consultar al Actor de Préstamo de forma síncrona
     - Retornar al PS la respuesta final
+- Para consultas de disponibilidad (CONSULTA):
+    - En la Sede 1, leer el contador de la tabla mapeada en memoria que
+      escribe el GA primario en la misma máquina (ver tabla_disponibilidad.py)
+    - Si no, responder desde la caché local, que se mantiene con los avisos
+      que publica el GA (ver cache_disponibilidad.py)
+- Para CONSULTA que la caché no puede responder, PRESTAMOS_USUARIO,
+  VENCIDOS (préstamos atrasados) y BUSCAR (por título, paginada):
+    - En la Sede 2, preguntar a la réplica de lectura local
+      (gestor_almacenamiento_lectura.py)
+    - Si no hay réplica o no responde, consultar al Actor de Préstamo
+
+Control de admisión (ver admision.py): cada cliente autenticado tiene un
+límite de solicitudes por segundo y, en modo MULTI, la cola de entrada es
+acotada y se descarta lo que esperaría más que GC_OBJETIVO_LATENCIA_MS.
+Lo rechazado se responde de inmediato con "reintentar_en_ms".
+
+Captura (GC_CAPTURA_ACTIVA, ver captura_trafico.py): cada solicitud que
+pasa la validación de seguridad se agrega al archivo de captura de la
+sede con su instante de llegada, para reproducirla con
+reproductor_trafico.py.
+
+Plazos (ver plazos.py): una solicitud cuyo "plazo" ya venció se descarta
+sin efectos; el plazo se reenvía al Actor de Préstamo y a la réplica de
+lectura, y el GC no espera al Actor más allá de él.
 
 Implementa dos modos de operación:
 - SERIAL: atiende una solicitud a la vez.
-- MULTI: crea un hilo por solicitud (implementación sencilla para experimento A).
+- MULTI: un pool de GC_NUM_TRABAJADORES hilos detrás de un ROUTER (ver
+  servidor_concurrente.py); cada hilo tiene su socket al Actor de Préstamo.
+  Con PRIORIDAD_ACTIVA, PRESTAMO, RESERVA y las lecturas pasan antes que
+  DEVOLUCION y RENOVACION en la cola de entrada.
 """
 
 import json
 import sys
 import threading
+import time
+import uuid
 
 import zmq
 
@@ -32,25 +63,56 @@ from config import (
     GC_TO_LOAN_ACTOR_SEDE2_PORT,
     SEDE1_HOST,
     SEDE2_HOST,
+    GA_PRIMARY_PORT,
+    GA_CAMBIOS_PUB_PORT,
+    GA_LECTURA_PORT,
     TOPIC_DEVOLUCION,
     TOPIC_RENOVACION,
     GC_MODE_SERIAL,
     GC_MODE_MULTI,
     DEFAULT_GC_MODE,
+    GC_NUM_TRABAJADORES,
+    ADMISION_INTERVALO_METRICAS,
+    PRIORIDAD_ACTIVA,
+    GC_OUTBOX_SEDE1_FILE,
+    GC_OUTBOX_SEDE2_FILE,
+    GC_CAPTURA_ACTIVA,
+    GC_CAPTURA_SEDE1_FILE,
+    GC_CAPTURA_SEDE2_FILE,
+    TABLA_DISPONIBILIDAD_ACTIVA,
+    TABLA_DISPONIBILIDAD_FILE,
 )
+from admision import ControlAdmision
+from bandeja_salida import BandejaSalida, DespachadorEntregas
+from cache_disponibilidad import CacheDisponibilidad
+from captura_trafico import CapturaTrafico
+from cliente_ga import ClienteGA
+from plazos import DESCARTADAS, descartar_si_vencido, respuesta_vencida, restante
 from seguridad import (
     verificar_hash,
     autenticar_token,
     obtener_rol,
     permitir_operacion,
 )
+from servidor_concurrente import ServidorConcurrente, clasificador_por_campo
+from tabla_disponibilidad import LectorDisponibilidad
+from transporte import direccion_bind, direccion_conexion
+
+
+# Lecturas: caché / réplica de lectura, o el Actor de Préstamo
+OPERACIONES_LECTURA = ("CONSULTA", "PRESTAMOS_USUARIO", "VENCIDOS", "BUSCAR")
+OPERACIONES_SIN_LIBRO = ("PRESTAMOS_USUARIO", "VENCIDOS", "BUSCAR")
+# El PS espera la respuesta final: carril prioritario en modo MULTI
+OPERACIONES_SINCRONAS = ("PRESTAMO", "RESERVA") + OPERACIONES_LECTURA
 
 
 # ============================
 # Funciones de negocio del GC
 # ============================
 
-def procesar_mensaje_ps(mensaje: dict, socket_actor_prestamo, socket_pub):
+def procesar_mensaje_ps(mensaje: dict, socket_actor_prestamo, despachador: DespachadorEntregas,
+                        cache: CacheDisponibilidad = None, lectura: ClienteGA = None,
+                        tabla: LectorDisponibilidad = None):
     """
     Procesa un mensaje ya validado desde el PS.
 
@@ -58,12 +120,27 @@ def procesar_mensaje_ps(mensaje: dict, socket_actor_prestamo, socket_pub):
     {
         "cliente": "ps_sede1",
         "token": "TOKEN_PS_SEDE1_123",
-        "tipo_operacion": "DEVOLUCION" | "RENOVACION" | "PRESTAMO",
-        "codigo_libro": "123",
+        "tipo_operacion": "DEVOLUCION" | "RENOVACION" | "PRESTAMO" | "RESERVA"
+                          | "CONSULTA" | "PRESTAMOS_USUARIO" | "VENCIDOS" | "BUSCAR",
+        "codigo_libro": "123",          (no se usa en PRESTAMOS_USUARIO, VENCIDOS ni BUSCAR)
         "usuario": "usuarioX",
+        "texto": "sist oper",           (solo BUSCAR)
+        "pagina": 1,                    (solo BUSCAR, opcional)
+        "id_operacion": "...",
+        "secuencia_minima": 17,         (opcional, ver abajo)
+        "plazo": 1767225600.0,          (opcional, time.time() límite)
         "hash": "..."
     }
 
+    El id_operacion viaja hasta el GA para que los reintentos no se apliquen
+    dos veces. Si un PS antiguo no lo envía, el GC genera uno.
+
+    secuencia_minima es la última secuencia de cambio que vio la sesión del
+    PS: la caché y la réplica de lectura solo responden si ya la incluyen.
+
+    Con plazo vencido no se hace nada (ni siquiera se escribe la bandeja).
+    Las operaciones síncronas llevan el plazo al Actor y a la réplica.
+
     Retorna:
         dict con la respuesta al PS.
     """
@@ -71,51 +148,93 @@ def procesar_mensaje_ps(mensaje: dict, socket_actor_prestamo, socket_pub):
     tipo_operacion = mensaje.get("tipo_operacion")
     codigo_libro = mensaje.get("codigo_libro")
     usuario = mensaje.get("usuario", "desconocido")
+    id_operacion = mensaje.get("id_operacion") or uuid.uuid4().hex
+    secuencia_minima = mensaje.get("secuencia_minima") or 0
 
-    if not tipo_operacion or not codigo_libro:
+    if not tipo_operacion or (not codigo_libro and tipo_operacion not in OPERACIONES_SIN_LIBRO):
         return {"ok": False, "mensaje": "Solicitud inválida: falta tipo_operacion o codigo_libro."}
 
-    if tipo_operacion == "DEVOLUCION":
-        # Respuesta inmediata al PS
-        respuesta = {
-            "ok": True,
-            "mensaje": "La devolución fue aceptada. La BD se actualizará en segundo plano."
-        }
+    # El PS ya no espera esta respuesta (p. ej. la solicitud esperó en la cola)
+    vencida = descartar_si_vencido(mensaje, "el GC", tipo_operacion)
+    if vencida is not None:
+        return vencida
+
+    # Se reenvían tal cual en las operaciones síncronas
+    adicionales = {}
+    if tipo_operacion == "BUSCAR":
+        adicionales = {"texto": mensaje.get("texto", ""), "pagina": mensaje.get("pagina", 1)}
+    if "plazo" in mensaje:
+        adicionales["plazo"] = mensaje["plazo"]
+
+    if tipo_operacion == "CONSULTA" and tabla is not None:
+        # Misma máquina que el GA: el contador se lee del archivo mapeado
+        respuesta = tabla.consultar(codigo_libro, secuencia_minima)
+        if respuesta is not None:
+            return respuesta
+
+    if tipo_operacion == "CONSULTA" and cache is not None:
+        # Las lecturas no llegan al GA mientras la caché esté al día
+        respuesta = cache.consultar(codigo_libro, secuencia_minima)
+        if respuesta is not None:
+            return respuesta
+
+    if tipo_operacion in OPERACIONES_LECTURA and lectura is not None:
+        respuesta, origen = lectura.enviar({
+            "accion": tipo_operacion,
+            "codigo_libro": codigo_libro,
+            "usuario": usuario,
+            "secuencia_minima": secuencia_minima,
+            **adicionales
+        })
+        if origen != "ninguno" or respuesta.get("plazo_vencido"):
+            return respuesta
 
-        # Publicar en el tópico de devoluciones para que el Actor correspondiente lo atienda
+    if tipo_operacion == "DEVOLUCION":
+        # Guardar en la bandeja de salida para que el Actor correspondiente lo atienda.
+        # Una vez escrito ya no se pierde, así que se puede responder de inmediato.
         mensaje_actor = {
             "accion": "DEVOLUCION",
             "codigo_libro": codigo_libro,
-            "usuario": usuario
+            "usuario": usuario,
+            "id_operacion": id_operacion
         }
-        socket_pub.send_string(f"{TOPIC_DEVOLUCION} {json.dumps(mensaje_actor)}")
+        despachador.publicar(TOPIC_DEVOLUCION, mensaje_actor)
 
-        return respuesta
-
-    elif tipo_operacion == "RENOVACION":
-        respuesta = {
+        return {
             "ok": True,
-            "mensaje": "La renovación fue aceptada. La BD se actualizará en segundo plano."
+            "mensaje": "La devolución fue aceptada. La BD se actualizará en segundo plano."
         }
 
+    elif tipo_operacion == "RENOVACION":
         mensaje_actor = {
             "accion": "RENOVACION",
             "codigo_libro": codigo_libro,
-            "usuario": usuario
+            "usuario": usuario,
+            "id_operacion": id_operacion
         }
-        socket_pub.send_string(f"{TOPIC_RENOVACION} {json.dumps(mensaje_actor)}")
+        despachador.publicar(TOPIC_RENOVACION, mensaje_actor)
 
-        return respuesta
+        return {
+            "ok": True,
+            "mensaje": "La renovación fue aceptada. La BD se actualizará en segundo plano."
+        }
 
-    elif tipo_operacion == "PRESTAMO":
+    elif tipo_operacion in ("PRESTAMO", "RESERVA") or tipo_operacion in OPERACIONES_LECTURA:
         # Comunicación síncrona con el Actor de Préstamo
         mensaje_actor = {
-            "accion": "PRESTAMO",
+            "accion": tipo_operacion,
             "codigo_libro": codigo_libro,
-            "usuario": usuario
+            "usuario": usuario,
+            "id_operacion": id_operacion,
+            **adicionales
         }
 
         socket_actor_prestamo.send_string(json.dumps(mensaje_actor))
+        tiempo = restante(mensaje)
+        if tiempo is not None and not socket_actor_prestamo.poll(max(0, int(tiempo * 1000))):
+            # El PS ya se fue: la respuesta del Actor, si llega, se descarta
+            DESCARTADAS.registrar(tipo_operacion)
+            return respuesta_vencida("el GC")
         respuesta_actor_str = socket_actor_prestamo.recv_string()
         respuesta_actor = json.loads(respuesta_actor_str)
 
@@ -167,29 +286,89 @@ def validar_seguridad(mensaje: dict) -> (bool, str):
 # Bucle de atención a PS
 # ============================
 
-def atender_peticion(socket_ps, socket_actor_prestamo, socket_pub, data_str):
+def resolver_peticion(socket_actor_prestamo, despachador, cache, lectura, tabla, data_str,
+                      captura: CapturaTrafico = None, llegada: float = None) -> dict:
     """
-    Atiende una solicitud específica proveniente del PS.
-    Esta función se puede ejecutar en un hilo independiente
-    para el modo MULTI.
+    Valida y procesa una solicitud del PS. Retorna la respuesta.
+    En modo MULTI se ejecuta en los hilos trabajadores.
+    Con 'captura', la solicitud válida se registra con su 'llegada' (time.time()).
     """
     try:
         mensaje = json.loads(data_str)
     except json.JSONDecodeError:
-        respuesta = {"ok": False, "mensaje": "Mensaje inválido: no es JSON."}
-        socket_ps.send_string(json.dumps(respuesta))
-        return
+        return {"ok": False, "mensaje": "Mensaje inválido: no es JSON."}
 
     valido, mensaje_error = validar_seguridad(mensaje)
     if not valido:
-        respuesta = {"ok": False, "mensaje": mensaje_error}
-        socket_ps.send_string(json.dumps(respuesta))
-        return
+        return {"ok": False, "mensaje": mensaje_error}
+
+    if captura is not None:
+        captura.registrar(mensaje, llegada)
+
+    return procesar_mensaje_ps(mensaje, socket_actor_prestamo, despachador, cache, lectura, tabla)
+
 
-    respuesta = procesar_mensaje_ps(mensaje, socket_actor_prestamo, socket_pub)
+def atender_peticion(socket_ps, socket_actor_prestamo, despachador, cache, lectura, tabla, data_str,
+                     captura: CapturaTrafico = None, llegada: float = None):
+    """Atiende una solicitud del PS en el modo SERIAL (socket REP)."""
+    respuesta = resolver_peticion(socket_actor_prestamo, despachador, cache, lectura, tabla, data_str,
+                                  captura, llegada)
     socket_ps.send_string(json.dumps(respuesta))
 
 
+def revisar_admision(admision: ControlAdmision, data_str, en_cola: int = 0, espera_estimada: float = 0.0):
+    """
+    Respuesta de rechazo si la solicitud no se admite, o None. Un mensaje
+    que no es JSON se deja pasar: lo rechaza la validación normal.
+    """
+    try:
+        mensaje = json.loads(data_str)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+    if not isinstance(mensaje, dict):
+        return None
+    return admision.admitir(mensaje, en_cola, espera_estimada)
+
+
+def crear_socket_actor(context: zmq.Context, endpoint: str):
+    """
+    REQ hacia el Actor de Préstamo. Si se deja de esperar una respuesta
+    (plazo vencido) se puede enviar la siguiente; la tardía se descarta.
+    """
+    socket_actor = context.socket(zmq.REQ)
+    socket_actor.setsockopt(zmq.REQ_RELAXED, 1)
+    socket_actor.setsockopt(zmq.REQ_CORRELATE, 1)
+    socket_actor.connect(endpoint)
+    return socket_actor
+
+
+def hilo_metricas_admision(admision: ControlAdmision, sede: str, servidor: ServidorConcurrente = None,
+                           intervalo: float = ADMISION_INTERVALO_METRICAS):
+    """
+    Imprime cada 'intervalo' segundos los contadores de admisión, si
+    cambiaron, y la latencia por clase de solicitud (modo MULTI).
+    """
+    anteriores = None
+    while True:
+        time.sleep(intervalo)
+        m = admision.metricas()
+        totales = (m["aceptadas"], m["rechazadas_tasa"], m["rechazadas_cola"], DESCARTADAS.total)
+        if totales == anteriores:
+            continue
+        anteriores = totales
+        print(f"GC sede {sede} admisión: aceptadas {m['aceptadas']}, rechazadas por límite de cliente "
+              f"{m['rechazadas_tasa']}, por sobrecarga {m['rechazadas_cola']}; "
+              f"descartadas por plazo vencido {DESCARTADAS.resumen()}")
+        for cliente, c in sorted(m["por_cliente"].items()):
+            if c["rechazadas_tasa"] or c["rechazadas_cola"]:
+                print(f"  {cliente}: aceptadas {c['aceptadas']}, rechazadas {c['rechazadas_tasa']} "
+                      f"(límite) + {c['rechazadas_cola']} (sobrecarga)")
+        if servidor is not None:
+            print(f"GC sede {sede} latencia por clase "
+                  f"(adelantadas por envejecimiento: {servidor.cola.envejecidas}):")
+            print(servidor.resumen_clases())
+
+
 def ejecutar_gc(sede: str, modo_gc: str):
     """
     Ejecuta el Gestor de Carga para una sede específica.
@@ -198,53 +377,118 @@ def ejecutar_gc(sede: str, modo_gc: str):
     - modo_gc: GC_MODE_SERIAL o GC_MODE_MULTI
     """
 
-    context = zmq.Context()
+    context = zmq.Context.instance()
 
     if sede == "1":
         puerto_ps = GC_SEDE1_PORT
         puerto_pub = GC_PUB_SEDE1_PORT
         puerto_actor_prestamo = GC_TO_LOAN_ACTOR_SEDE1_PORT
         host_actor = SEDE1_HOST
+        ruta_outbox = GC_OUTBOX_SEDE1_FILE
+        ruta_captura = GC_CAPTURA_SEDE1_FILE
     else:
         puerto_ps = GC_SEDE2_PORT
         puerto_pub = GC_PUB_SEDE2_PORT
         puerto_actor_prestamo = GC_TO_LOAN_ACTOR_SEDE2_PORT
         host_actor = SEDE2_HOST
+        ruta_outbox = GC_OUTBOX_SEDE2_FILE
+        ruta_captura = GC_CAPTURA_SEDE2_FILE
+
+    # Bandeja de salida + despachador para mensajes de devolución/renovación
+    despachador = DespachadorEntregas(context, direccion_bind(puerto_pub), BandejaSalida(ruta_outbox))
+    despachador.iniciar()
+    print(f"GC de sede {sede} entregando a Actores en puerto {puerto_pub} (bandeja: {ruta_outbox}).")
+
+    # Caché de disponibilidad para CONSULTA, alimentada por el GA primario
+    cache = CacheDisponibilidad(
+        context,
+        direccion_conexion(SEDE1_HOST, GA_CAMBIOS_PUB_PORT),
+        direccion_conexion(SEDE1_HOST, GA_PRIMARY_PORT),
+    )
+    cache.iniciar()
+    print(f"GC de sede {sede} con caché de disponibilidad desde {SEDE1_HOST}:{GA_CAMBIOS_PUB_PORT}.")
+
+    # Tabla de disponibilidad del GA primario (solo la Sede 1, misma máquina)
+    tabla = None
+    if sede == "1" and TABLA_DISPONIBILIDAD_ACTIVA:
+        tabla = LectorDisponibilidad(TABLA_DISPONIBILIDAD_FILE)
+        print(f"GC de sede {sede} leyendo disponibilidad de la tabla {TABLA_DISPONIBILIDAD_FILE}.")
+
+    # Réplica de lectura local (solo la Sede 2; la Sede 1 tiene al primario)
+    lectura = None
+    if sede == "2":
+        lectura = ClienteGA(context, f"GC sede {sede}", ((direccion_conexion(SEDE2_HOST, GA_LECTURA_PORT), "lectura"),))
+        print(f"GC de sede {sede} enviando lecturas a la réplica en {SEDE2_HOST}:{GA_LECTURA_PORT}.")
+
+    endpoint_actor = direccion_conexion(host_actor, puerto_actor_prestamo)
+
+    # Control de admisión por cliente y por carga
+    admision = ControlAdmision()
+
+    captura = None
+    if GC_CAPTURA_ACTIVA:
+        captura = CapturaTrafico(ruta_captura, sede)
+        captura.iniciar()
+        print(f"GC de sede {sede} capturando solicitudes en {ruta_captura}.")
+
+    print(f"Modo de operación del GC: {modo_gc}")
+
+    if modo_gc == GC_MODE_MULTI:
+        # Cada trabajador tiene su propio socket REQ hacia el Actor de Préstamo
+        locales = threading.local()
+
+        def manejador(data_str: str) -> str:
+            socket_actor = getattr(locales, "socket_actor", None)
+            if socket_actor is None:
+                socket_actor = locales.socket_actor = crear_socket_actor(context, endpoint_actor)
+            llegada = servidor.llegada_actual() if captura is not None else None
+            respuesta = resolver_peticion(socket_actor, despachador, cache, lectura, tabla, data_str,
+                                          captura, llegada)
+            return json.dumps(respuesta)
+
+        def admitir(payload: bytes, en_cola: int, espera_estimada: float):
+            rechazo = revisar_admision(admision, payload, en_cola, espera_estimada)
+            return json.dumps(rechazo) if rechazo is not None else None
+
+        clasificar = clasificador_por_campo("tipo_operacion", OPERACIONES_SINCRONAS) if PRIORIDAD_ACTIVA else None
+        servidor = ServidorConcurrente(context, direccion_bind(puerto_ps), manejador, GC_NUM_TRABAJADORES,
+                                       admision=admitir, clasificar=clasificar)
+        servidor.iniciar()
+        t_metricas = threading.Thread(target=hilo_metricas_admision, args=(admision, sede, servidor), daemon=True)
+        t_metricas.start()
+        print(f"GC de sede {sede} escuchando solicitudes de PS en puerto {puerto_ps} "
+              f"con {GC_NUM_TRABAJADORES} trabajadores.")
+        print(f"GC de sede {sede} conectando al Actor de Préstamo en {endpoint_actor}.")
+
+        # El trabajo lo hacen los hilos del servidor; el hilo principal solo espera
+        while True:
+            time.sleep(1)
+
+    t_metricas = threading.Thread(target=hilo_metricas_admision, args=(admision, sede), daemon=True)
+    t_metricas.start()
 
     # Socket REP para comunicarse con los PS
     socket_ps = context.socket(zmq.REP)
-    socket_ps.bind(f"tcp://*:{puerto_ps}")
+    socket_ps.bind(direccion_bind(puerto_ps))
     print(f"GC de sede {sede} escuchando solicitudes de PS en puerto {puerto_ps}.")
 
-    # Socket PUB para publicar mensajes de devolución/renovación
-    socket_pub = context.socket(zmq.PUB)
-    socket_pub.bind(f"tcp://*:{puerto_pub}")
-    print(f"GC de sede {sede} publicando en puerto {puerto_pub}.")
-
     # Socket REQ para comunicarse con el Actor de Préstamo
-    socket_actor_prestamo = context.socket(zmq.REQ)
-    socket_actor_prestamo.connect(f"tcp://{host_actor}:{puerto_actor_prestamo}")
-    print(f"GC de sede {sede} conectado al Actor de Préstamo en {host_actor}:{puerto_actor_prestamo}.")
-
-    print(f"Modo de operación del GC: {modo_gc}")
+    socket_actor_prestamo = crear_socket_actor(context, endpoint_actor)
+    print(f"GC de sede {sede} conectado al Actor de Préstamo en {endpoint_actor}.")
 
     while True:
         try:
             data_str = socket_ps.recv_string()
+            llegada = time.time()
 
             if modo_gc == GC_MODE_SERIAL:
-                # Atendemos en el mismo hilo
-                atender_peticion(socket_ps, socket_actor_prestamo, socket_pub, data_str)
-
-            elif modo_gc == GC_MODE_MULTI:
-                # Creamos un hilo por solicitud
-                hilo = threading.Thread(
-                    target=atender_peticion,
-                    args=(socket_ps, socket_actor_prestamo, socket_pub, data_str),
-                    daemon=True
-                )
-                hilo.start()
-                hilo.join()  # Esta línea mantiene la semántica simple (puedes ajustarla)
+                # Sin cola propia: solo aplica el límite por cliente
+                rechazo = revisar_admision(admision, data_str)
+                if rechazo is not None:
+                    socket_ps.send_string(json.dumps(rechazo))
+                    continue
+                atender_peticion(socket_ps, socket_actor_prestamo, despachador, cache, lectura, tabla, data_str,
+                                 captura, llegada)
 
             else:
                 respuesta = {"ok": False, "mensaje": "Modo de GC no reconocido."}
@@ -0,0 +1,306 @@
+"""
+importador_catalogo.py
+Importación de catálogos grandes (millones de títulos) en flujo.
+
+Responsabilidades:
+- Leer el catálogo registro por registro: CSV con encabezado, JSON-lines
+  (un libro por línea) o una BD JSON como bd_libros_inicial.json (ver
+  base_datos.iterar_bd). Nunca se carga el catálogo completo.
+- Validar cada registro (código, título, ejemplares) y descartar los
+  códigos repetidos; los rechazados se cuentan y, si se pide, se escriben
+  con su motivo en un archivo aparte.
+- Destino, uno de:
+    - archivo(s) de BD en el formato que persiste el GA (--salida, se
+      puede repetir para la primaria y la réplica). Un destino .sqlite es
+      la BD en disco del GA (GA_BD_EN_DISCO, ver almacen_libros.py), que
+      al arrancar ya no lee el JSON primario. Con --base, la BD existente
+      (JSON o .sqlite) se copia primero y sus libros no se pisan. El GA
+      debe estar detenido: al arrancar carga el archivo.
+    - un GA que ya está corriendo (--ga): se envían lotes de
+      IMPORTACION_LOTE libros con la acción IMPORTAR. El GA solo agrega
+      los códigos que no tiene, así un lote reenviado no cambia nada.
+
+La memoria usada es la de un bloque de lectura (o un lote) más el
+conjunto de códigos ya vistos, necesario para detectar repetidos.
+
+Uso:
+    python src/importador_catalogo.py catalogo.csv --salida datos/bd_libros_primaria.json
+        --salida datos/bd_libros_replica.json [--base datos/bd_libros_primaria.json]
+        [--rechazados rechazados.txt]
+    python src/importador_catalogo.py catalogo.csv --salida datos/bd_libros_primaria.sqlite
+        --salida datos/bd_libros_replica.json --base datos/bd_libros_primaria.sqlite
+    python src/importador_catalogo.py catalogo.jsonl --ga [--lote 1000]
+"""
+
+import argparse
+import csv
+import json
+import os
+import time
+from contextlib import ExitStack
+
+import zmq
+
+from config import IMPORTACION_LOTE, IMPORTACION_MAX_EJEMPLARES
+from almacen_libros import EscritorAlmacen, es_archivo_almacen, iterar_almacen
+from base_datos import EscritorBD, iterar_bd
+from cliente_ga import ClienteGA
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+# Nombres aceptados para cada campo (CSV y JSON-lines)
+CAMPOS_CODIGO = ("codigo_libro", "codigo")
+CAMPOS_TITULO = ("titulo",)
+CAMPOS_EJEMPLARES = ("ejemplares_disponibles", "ejemplares")
+
+
+# ============================
+# Lectura del catálogo
+# ============================
+
+def detectar_formato(ruta: str) -> str:
+    extension = os.path.splitext(ruta)[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
+    return "json"
+
+
+def leer_registros(ruta: str, formato: str):
+    """Retorna (numero_de_registro, registro_dict o None si no se pudo leer)."""
+
+    if formato == "json":
+        for numero, (codigo, libro) in enumerate(iterar_bd(ruta), start=1):
+            yield numero, dict(libro, codigo_libro=codigo) if isinstance(libro, dict) else None
+        return
+
+    with open(ruta, "r", encoding="utf-8", newline="") as f:
+        if formato == "csv":
+            # DictReader lee de a una fila; la fila 1 es el encabezado
+            for numero, fila in enumerate(csv.DictReader(f), start=2):
+                yield numero, fila
+            return
+
+        for numero, linea in enumerate(f, start=1):
+            if not linea.strip():
+                continue
+            try:
+                registro = json.loads(linea)
+            except json.JSONDecodeError:
+                registro = None
+            yield numero, registro if isinstance(registro, dict) else None
+
+
+def _campo(registro: dict, nombres: tuple):
+    for nombre in nombres:
+        if registro.get(nombre) is not None:
+            return registro[nombre]
+    return None
+
+
+def validar_registro(registro: dict):
+    """
+    Retorna (libro, None) con libro = {"codigo_libro", "titulo",
+    "ejemplares_disponibles"}, o (None, motivo) si el registro no sirve.
+    """
+
+    if registro is None:
+        return None, "registro ilegible"
+
+    codigo = _campo(registro, CAMPOS_CODIGO)
+    codigo = str(codigo).strip() if codigo is not None else ""
+    if not codigo:
+        return None, "falta el código"
+
+    titulo = _campo(registro, CAMPOS_TITULO)
+    titulo = str(titulo).strip() if titulo is not None else ""
+    if not titulo:
+        return None, "falta el título"
+
+    ejemplares = _campo(registro, CAMPOS_EJEMPLARES)
+    try:
+        ejemplares = int(str(ejemplares).strip())
+    except ValueError:
+        return None, f"ejemplares no es un entero: {ejemplares!r}"
+    if not 0 <= ejemplares <= IMPORTACION_MAX_EJEMPLARES:
+        return None, f"ejemplares fuera de rango: {ejemplares}"
+
+    return {"codigo_libro": codigo, "titulo": titulo, "ejemplares_disponibles": ejemplares}, None
+
+
+# ============================
+# Importación
+# ============================
+
+class Importacion:
+    """Contadores de la importación y registro de rechazados."""
+
+    def __init__(self, ruta_rechazados: str = None):
+        self.leidos = 0
+        self.importados = 0
+        self.repetidos = 0
+        self.existentes = 0
+        self.rechazados = 0
+        # codigo -> True si ya estaba en el destino (BD base)
+        self._codigos = {}
+        self._rechazados = open(ruta_rechazados, "w", encoding="utf-8") if ruta_rechazados else None
+
+    def marcar_existente(self, codigo: str):
+        """Código que ya está en el destino (por ejemplo en la BD base)."""
+        self._codigos[codigo] = True
+
+    def libros(self, ruta: str, formato: str):
+        """Libros válidos y con código nuevo del catálogo, en orden."""
+        for numero, registro in leer_registros(ruta, formato):
+            self.leidos += 1
+            libro, motivo = validar_registro(registro)
+            if libro is None:
+                self.rechazados += 1
+                self.rechazar(numero, motivo, registro)
+                continue
+
+            codigo = libro["codigo_libro"]
+            previo = self._codigos.get(codigo)
+            if previo is not None:
+                if previo:
+                    self.existentes += 1
+                else:
+                    self.repetidos += 1
+                    self.rechazar(numero, "código repetido", registro)
+                continue
+
+            self._codigos[codigo] = False
+            yield libro
+
+    def rechazar(self, numero: int, motivo: str, registro):
+        if self._rechazados is not None:
+            self._rechazados.write(f"{numero};{motivo};{json.dumps(registro, ensure_ascii=False)}\n")
+
+    def cerrar(self):
+        if self._rechazados is not None:
+            self._rechazados.close()
+
+
+def importar_a_archivos(importacion: Importacion, ruta: str, formato: str,
+                        salidas: list, ruta_base: str = None):
+    """
+    Escribe la BD (base + catálogo) en cada archivo de 'salidas'. Si algo
+    falla, los archivos destino quedan como estaban.
+    """
+
+    with ExitStack() as pila:
+        escritores = [
+            pila.enter_context(EscritorAlmacen(salida) if es_archivo_almacen(salida) else EscritorBD(salida))
+            for salida in salidas
+        ]
+
+        if ruta_base:
+            base = iterar_almacen(ruta_base) if es_archivo_almacen(ruta_base) else iterar_bd(ruta_base)
+            for codigo, libro in base:
+                importacion.marcar_existente(codigo)
+                for escritor in escritores:
+                    escritor.escribir(codigo, libro)
+
+        for libro in importacion.libros(ruta, formato):
+            codigo = libro.pop("codigo_libro")
+            libro["prestamos"] = []
+            for escritor in escritores:
+                escritor.escribir(codigo, libro)
+            importacion.importados += 1
+
+
+def importar_a_ga(importacion: Importacion, ruta: str, formato: str, tam_lote: int = IMPORTACION_LOTE):
+    """
+    Envía el catálogo al GA en lotes IMPORTAR. Si ningún GA responde se
+    detiene: se puede volver a correr con el mismo catálogo, los libros ya
+    importados se cuentan como existentes.
+    """
+
+    context = zmq.Context()
+    cliente = ClienteGA(context, "Importador")
+
+    def enviar(lote: list):
+        respuesta, origen = cliente.enviar({"accion": "IMPORTAR", "libros": lote})
+        if not respuesta.get("ok"):
+            raise RuntimeError(f"El GA rechazó el lote ({origen}): {respuesta.get('mensaje')}")
+        importacion.importados += respuesta.get("agregados", 0)
+        importacion.existentes += respuesta.get("existentes", 0)
+        # El importador ya validó el lote: el GA solo rechaza si su validación difiere
+        for rechazo in respuesta.get("rechazados", []):
+            importacion.rechazados += 1
+            print(f"El GA rechazó {lote[rechazo['indice']].get('codigo_libro')}: {rechazo['motivo']}")
+
+    try:
+        lote = []
+        for libro in importacion.libros(ruta, formato):
+            lote.append(libro)
+            if len(lote) >= tam_lote:
+                enviar(lote)
+                lote = []
+        if lote:
+            enviar(lote)
+    finally:
+        context.term()
+
+
+def memoria_maxima_mb():
+    """Pico de memoria residente del proceso (MB), o None si no se puede medir."""
+    if resource is None:
+        return None
+    # Linux la entrega en KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+# ============================
+# Main
+# ============================
+
+def main():
+    parser = argparse.ArgumentParser(description="Importa un catálogo grande (CSV, JSON-lines o BD JSON) en flujo")
+    parser.add_argument("catalogo", help="archivo .csv, .jsonl o .json")
+    parser.add_argument("--formato", choices=("csv", "jsonl", "json"), help="por defecto según la extensión")
+    destino = parser.add_mutually_exclusive_group(required=True)
+    destino.add_argument("--salida", action="append",
+                         help="archivo de BD a escribir, JSON o .sqlite (se puede repetir)")
+    destino.add_argument("--ga", action="store_true", help="envía el catálogo al GA que está corriendo")
+    parser.add_argument("--base", help="BD existente (JSON o .sqlite) que se copia antes del catálogo (con --salida)")
+    parser.add_argument("--lote", type=int, default=IMPORTACION_LOTE, help="libros por mensaje IMPORTAR (con --ga)")
+    parser.add_argument("--rechazados", help="escribe aquí los registros rechazados y su motivo")
+    args = parser.parse_args()
+
+    if args.base and args.ga:
+        parser.error("--base solo se usa con --salida")
+
+    formato = args.formato or detectar_formato(args.catalogo)
+    importacion = Importacion(args.rechazados)
+    inicio = time.perf_counter()
+
+    try:
+        if args.ga:
+            print(f"Importando {args.catalogo} ({formato}) al GA en lotes de {args.lote}...")
+            importar_a_ga(importacion, args.catalogo, formato, args.lote)
+        else:
+            print(f"Importando {args.catalogo} ({formato}) en {', '.join(args.salida)}...")
+            importar_a_archivos(importacion, args.catalogo, formato, args.salida, args.base)
+    finally:
+        importacion.cerrar()
+
+    duracion = time.perf_counter() - inicio
+    print(f"Registros leídos: {importacion.leidos} en {duracion:.1f} s "
+          f"({importacion.leidos / duracion if duracion else 0:.0f}/s)")
+    print(f"Libros importados: {importacion.importados}")
+    print(f"Ya existentes: {importacion.existentes}")
+    print(f"Códigos repetidos: {importacion.repetidos}")
+    print(f"Rechazados: {importacion.rechazados}")
+    memoria = memoria_maxima_mb()
+    if memoria is not None:
+        print(f"Memoria máxima: {memoria:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+indice_titulos.py
+Índice invertido de títulos para la operación BUSCAR.
+
+Recorrer un catálogo de un millón de libros comparando cada título es
+demasiado lento para una búsqueda interactiva. El GA arma este índice al
+cargar la BD:
+
+- Cada título se normaliza: minúsculas, sin tildes ni diéresis ("Álgebra"
+  -> "algebra", "Pingüino" -> "pinguino"; la ñ queda como n) y partido en
+  palabras. Las palabras vacías ("de", "la", "y", ...) no se indexan.
+- palabra -> conjunto de códigos de libro, más el vocabulario ordenado
+  para resolver prefijos con búsqueda binaria.
+
+Cada término de la consulta es un prefijo ("sist oper" encuentra
+"Sistemas Operativos") y los términos se combinan con Y. Los resultados
+se ordenan por código y se entregan por páginas.
+
+Con la BD en disco (GA_BD_EN_DISCO) el GA usa IndiceTitulosDisco: las
+palabras están en una tabla del SQLite de almacen_libros.py y no se carga
+ningún título en memoria.
+"""
+
+import bisect
+import heapq
+import re
+import threading
+import unicodedata
+
+from config import BUSQUEDA_TAM_PAGINA
+
+
+PALABRAS_VACIAS = frozenset(
+    "a al con de del e el en la las lo los o para por u un una unas unos y".split()
+)
+
+_SEPARADOR = re.compile(r"[^0-9a-z]+")
+
+# Páginas más allá de esta no tienen resultados en ningún catálogo real
+PAGINA_MAXIMA = 10 ** 9
+
+
+def normalizar(texto: str) -> list:
+    """Palabras del texto sin tildes, en minúsculas y sin palabras vacías."""
+    descompuesto = unicodedata.normalize("NFD", (texto or "").lower())
+    sin_tildes = "".join(c for c in descompuesto if not unicodedata.combining(c))
+    return [p for p in _SEPARADOR.split(sin_tildes) if p and p not in PALABRAS_VACIAS]
+
+
+def leer_pagina(pagina):
+    """Página pedida (desde 1; vacía o menor que 1 es la primera), o None si no es un entero válido."""
+    if not pagina:
+        return 1
+    if isinstance(pagina, bool):
+        return None
+    try:
+        numero = int(pagina)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    if isinstance(pagina, float) and numero != pagina:
+        return None
+    return max(1, numero) if numero <= PAGINA_MAXIMA else None
+
+
+class IndiceTitulos:
+    """
+    Índice invertido en memoria. agregar() se usa al cargar la BD y cuando
+    llegan libros nuevos; buscar() responde la operación BUSCAR.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # palabra -> códigos de los libros cuyo título la contiene
+        self._libros_por_palabra = {}
+        # palabras indexadas, ordenadas (prefijos con bisect)
+        self._vocabulario = []
+        # codigo -> (titulo, palabras del título)
+        self._titulos = {}
+
+    @classmethod
+    def desde_bd(cls, bd: dict):
+        """Arma el índice recorriendo la BD una sola vez."""
+        indice = cls()
+        for codigo, libro in bd.items():
+            palabras = tuple(set(normalizar(libro.get("titulo"))))
+            indice._titulos[codigo] = (libro.get("titulo"), palabras)
+            for palabra in palabras:
+                indice._libros_por_palabra.setdefault(palabra, set()).add(codigo)
+        indice._vocabulario = sorted(indice._libros_por_palabra)
+        return indice
+
+    def __len__(self):
+        return len(self._titulos)
+
+    @property
+    def palabras(self) -> int:
+        return len(self._vocabulario)
+
+    def agregar(self, codigo: str, titulo: str):
+        """Indexa un libro nuevo, o vuelve a indexarlo si cambió su título."""
+        with self._lock:
+            previo = self._titulos.get(codigo)
+            if previo is not None:
+                if previo[0] == titulo:
+                    return
+                self._quitar(codigo, previo[1])
+
+            palabras = tuple(set(normalizar(titulo)))
+            self._titulos[codigo] = (titulo, palabras)
+            for palabra in palabras:
+                codigos = self._libros_por_palabra.get(palabra)
+                if codigos is None:
+                    codigos = self._libros_por_palabra[palabra] = set()
+                    bisect.insort(self._vocabulario, palabra)
+                codigos.add(codigo)
+
+    def _quitar(self, codigo: str, palabras: tuple):
+        for palabra in palabras:
+            codigos = self._libros_por_palabra.get(palabra)
+            if codigos is None:
+                continue
+            codigos.discard(codigo)
+            if not codigos:
+                del self._libros_por_palabra[palabra]
+                del self._vocabulario[bisect.bisect_left(self._vocabulario, palabra)]
+
+    def _conjuntos_de_prefijo(self, prefijo: str) -> list:
+        """Conjuntos de códigos de cada palabra que empieza con 'prefijo'."""
+        conjuntos = []
+        i = bisect.bisect_left(self._vocabulario, prefijo)
+        while i < len(self._vocabulario) and self._vocabulario[i].startswith(prefijo):
+            conjuntos.append(self._libros_por_palabra[self._vocabulario[i]])
+            i += 1
+        return conjuntos
+
+    def _coincidencias(self, terminos: list) -> set:
+        # Se empieza por el término con menos candidatos
+        por_termino = []
+        for termino in terminos:
+            conjuntos = self._conjuntos_de_prefijo(termino)
+            por_termino.append((sum(len(c) for c in conjuntos), termino, conjuntos))
+        por_termino.sort(key=lambda t: t[0])
+
+        _, _, conjuntos = por_termino[0]
+        if not conjuntos:
+            return set()
+        # Los conjuntos del índice no se modifican: cada paso crea uno nuevo
+        resultado = conjuntos[0] if len(conjuntos) == 1 else set().union(*conjuntos)
+
+        for tamano, termino, conjuntos in por_termino[1:]:
+            if not resultado:
+                break
+            if tamano > 4 * len(resultado):
+                # Prefijo muy común: es más barato revisar las palabras de
+                # los candidatos que unir todos sus conjuntos
+                resultado = {
+                    codigo for codigo in resultado
+                    if any(p.startswith(termino) for p in self._titulos[codigo][1])
+                }
+            else:
+                resultado = resultado & (conjuntos[0] if len(conjuntos) == 1 else set().union(*conjuntos))
+
+        return resultado
+
+    def buscar(self, texto: str, pagina: int = 1, tam_pagina: int = BUSQUEDA_TAM_PAGINA) -> dict:
+        """
+        Libros cuyo título contiene, para cada palabra de 'texto', alguna
+        palabra que empieza con ella. Retorna la página 'pagina' (desde 1).
+        """
+
+        terminos = normalizar(texto)
+        if not terminos:
+            return {"ok": False, "mensaje": "La búsqueda no tiene palabras válidas."}
+
+        pagina = leer_pagina(pagina)
+        if pagina is None:
+            return {"ok": False, "mensaje": f"La página debe ser un número entero (hasta {PAGINA_MAXIMA})."}
+        inicio = (pagina - 1) * tam_pagina
+
+        with self._lock:
+            coincidencias = self._coincidencias(terminos)
+            # Solo se ordena lo necesario para llegar a la página pedida
+            codigos = heapq.nsmallest(inicio + tam_pagina, coincidencias)[inicio:]
+            resultados = [{"codigo_libro": c, "titulo": self._titulos[c][0]} for c in codigos]
+
+        return respuesta_busqueda(texto, pagina, tam_pagina, len(coincidencias), resultados)
+
+
+class IndiceTitulosDisco:
+    """
+    Índice de títulos de un AlmacenLibros: las palabras de cada título
+    están en su SQLite y se actualizan al escribir el libro, así que
+    agregar() no hace nada. buscar() responde igual que IndiceTitulos.
+    """
+
+    def __init__(self, almacen):
+        self.almacen = almacen
+
+    def __len__(self):
+        return len(self.almacen)
+
+    def agregar(self, codigo: str, titulo: str):
+        """Sin efecto: el título se indexa cuando el libro llega a SQLite."""
+
+    def buscar(self, texto: str, pagina: int = 1, tam_pagina: int = BUSQUEDA_TAM_PAGINA) -> dict:
+        terminos = normalizar(texto)
+        if not terminos:
+            return {"ok": False, "mensaje": "La búsqueda no tiene palabras válidas."}
+
+        pagina = leer_pagina(pagina)
+        if pagina is None:
+            return {"ok": False, "mensaje": f"La página debe ser un número entero (hasta {PAGINA_MAXIMA})."}
+        total, filas = self.almacen.buscar_titulos(terminos, (pagina - 1) * tam_pagina, tam_pagina)
+        resultados = [{"codigo_libro": codigo, "titulo": titulo} for codigo, titulo in filas]
+        return respuesta_busqueda(texto, pagina, tam_pagina, total, resultados)
+
+
+def respuesta_busqueda(texto: str, pagina: int, tam_pagina: int, total: int, resultados: list) -> dict:
+    return {
+        "ok": True,
+        "mensaje": "Búsqueda realizada",
+        "texto": texto,
+        "pagina": pagina,
+        "paginas": (total + tam_pagina - 1) // tam_pagina,
+        "total": total,
+        "resultados": resultados,
+    }
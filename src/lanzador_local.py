@@ -0,0 +1,404 @@
+"""
+lanzador_local.py
+Levanta la Sede 1 completa en una sola máquina (GA primario, GA de
+respaldo, Actores de préstamo, devolución y renovación, y GC) y le aplica
+una carga de PS medida.
+
+Transporte (TRANSPORTE en config.py, o --transporte):
+- inproc: todos los componentes son hilos de este proceso y comparten el
+  contexto ZeroMQ; los mensajes no pasan por el kernel.
+- ipc / tcp: cada componente es un proceso aparte (este mismo script con
+  --componente), conectado por sockets Unix o por TCP local.
+
+Antes de la carga se mide un eco REQ/REP sin lógica de negocio con el
+mismo transporte: es el costo de un salto de ida y vuelta. Un PRESTAMO
+hace tres (PS -> GC -> Actor -> GA); una DEVOLUCION o RENOVACION, uno
+(el GC responde al guardarla en la bandeja); una CONSULTA desde la tabla
+de disponibilidad, uno. Lo que queda de la latencia es lógica de negocio.
+
+Cada corrida trabaja en un directorio temporal con un catálogo sintético
+(no toca datos/ del proyecto) y una carga fija por semilla, así se puede
+repetir en CI. La carga sigue una de las MEZCLAS de operaciones; con
+--calentamiento, cada PS hace antes esas operaciones sin medirlas. El límite por cliente del control de admisión se levanta
+salvo con --con-admision: los PS de la carga comparten nombre de cliente.
+Con inproc todos los hilos comparten el GIL; esa contención también queda
+en la comparación.
+
+Uso:
+    python src/lanzador_local.py [--transporte inproc] [--modo SERIAL]
+        [--clientes 4] [--operaciones 500] [--libros 1000] [--semilla 7]
+        [--mezcla ciclo] [--trabajadores-gc 8] [--calentamiento 50]
+    python src/lanzador_local.py --comparar    (inproc, ipc y tcp seguidos)
+Para barrer parámetros con ensayos repetidos: ejecutar_experimento.py --barrido.
+"""
+
+import argparse
+import importlib
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import zmq
+
+import config
+
+
+# nombre -> (módulo, función de entrada); la sede y el modo se agregan al llamar
+COMPONENTES = {
+    "ga": ("gestor_almacenamiento", "ejecutar_ga"),
+    "ga_respaldo": ("gestor_almacenamiento_respaldo", "ejecutar_ga_respaldo"),
+    "actor_prestamo": ("actor_prestamo", "ejecutar_actor_prestamo"),
+    "actor_devolucion": ("actor_devolucion", "ejecutar_actor_devolucion"),
+    "actor_renovacion": ("actor_renovacion", "ejecutar_actor_renovacion"),
+    "gc": ("gestor_carga", "ejecutar_gc"),
+    "eco": (None, None),
+}
+
+# Mezclas de operaciones: lo que hace cada usuario de la carga sobre un libro
+MEZCLAS = {
+    "ciclo": ("PRESTAMO", "CONSULTA", "RENOVACION", "CONSULTA", "DEVOLUCION"),
+    "lectura": ("PRESTAMO",) + ("CONSULTA",) * 8 + ("DEVOLUCION",),
+    "escritura": ("PRESTAMO", "RENOVACION", "RENOVACION", "DEVOLUCION"),
+}
+
+SEDE = "1"
+NOMBRE_CLIENTE = "ps_sede1"
+
+
+# ============================
+# Configuración y componentes
+# ============================
+
+def ajustar_config(args):
+    """
+    Aplica el transporte y los ajustes de la corrida a config. Debe ir antes
+    de importar cualquier módulo del sistema: leen config al importarse.
+    """
+    config.TRANSPORTE = args.transporte
+    config.IPC_DIRECTORIO = args.ipc_dir
+    if not args.con_admision:
+        config.ADMISION_TASA_POR_CLIENTE = 1e9
+        config.ADMISION_RAFAGA_POR_CLIENTE = 1e9
+    if args.trabajadores_gc:
+        config.GC_NUM_TRABAJADORES = args.trabajadores_gc
+
+
+def ejecutar_eco():
+    """REP que responde lo mismo que recibe (el salto sin lógica de negocio)."""
+    from transporte import direccion_bind
+
+    socket = zmq.Context.instance().socket(zmq.REP)
+    socket.bind(direccion_bind(config.LANZADOR_PUERTO_ECO))
+    while True:
+        socket.send(socket.recv())
+
+
+def ejecutar_componente(nombre: str, modo: str):
+    if nombre == "eco":
+        ejecutar_eco()
+        return
+    modulo, funcion = COMPONENTES[nombre]
+    entrada = getattr(importlib.import_module(modulo), funcion)
+    if nombre == "gc":
+        entrada(SEDE, modo)
+    elif nombre.startswith("actor_"):
+        entrada(SEDE)
+    else:
+        entrada()
+
+
+def preparar_directorio(directorio: str, num_libros: int):
+    """Catálogo sintético como BD inicial; el GA crea la primaria y la réplica a partir de él."""
+    from base_datos import guardar_bd, inicializar_bd
+
+    os.makedirs(os.path.join(directorio, "datos"), exist_ok=True)
+    os.chdir(directorio)
+    bd = {
+        f"LIB{i:06d}": {"titulo": f"Libro sintético {i}", "ejemplares_disponibles": 1000, "prestamos": []}
+        for i in range(num_libros)
+    }
+    guardar_bd(config.DB_INITIAL_DATA_FILE, bd)
+    # Antes de arrancar: el respaldo carga la réplica sin esperar al primario
+    inicializar_bd()
+
+
+def lanzar_hilos(modo: str):
+    for nombre in COMPONENTES:
+        hilo = threading.Thread(target=ejecutar_componente, args=(nombre, modo), daemon=True, name=nombre)
+        hilo.start()
+    return []
+
+
+def lanzar_procesos(args, directorio: str, log):
+    procesos = []
+    for nombre in COMPONENTES:
+        cmd = [sys.executable, os.path.abspath(__file__), "--componente", nombre,
+               "--transporte", args.transporte, "--modo", args.modo, "--ipc-dir", args.ipc_dir]
+        if args.con_admision:
+            cmd.append("--con-admision")
+        if args.trabajadores_gc:
+            cmd += ["--trabajadores-gc", str(args.trabajadores_gc)]
+        procesos.append(subprocess.Popen(cmd, cwd=directorio, stdout=log, stderr=subprocess.STDOUT))
+    return procesos
+
+
+# ============================
+# Carga de PS
+# ============================
+
+def generar_carga(cliente: int, operaciones: int, num_libros: int, semilla: int, mezcla: str = "ciclo",
+                  prefijo: str = "lz") -> list:
+    """Operaciones de un PS: cada usuario recorre MEZCLAS[mezcla] sobre un libro al azar."""
+    rng = random.Random(semilla * 1000 + cliente)
+    carga = []
+    usuario = 0
+    while len(carga) < operaciones:
+        codigo = f"LIB{rng.randrange(num_libros):06d}"
+        for tipo in MEZCLAS[mezcla]:
+            carga.append({"tipo_operacion": tipo, "codigo_libro": codigo,
+                          "usuario": f"{prefijo}{cliente}-{usuario}"})
+        usuario += 1
+    return carga[:operaciones]
+
+
+def crear_socket_ps():
+    from transporte import direccion_conexion
+
+    socket = zmq.Context.instance().socket(zmq.REQ)
+    socket.setsockopt(zmq.REQ_RELAXED, 1)
+    socket.setsockopt(zmq.REQ_CORRELATE, 1)
+    socket.connect(direccion_conexion(config.SEDE1_HOST, config.GC_SEDE1_PORT))
+    return socket
+
+
+def esperar_sistema(limite: float = 60.0) -> bool:
+    """Espera a que un PRESTAMO recorra PS -> GC -> Actor -> GA (y lo devuelve)."""
+    from cliente_ps import enviar_operacion
+
+    token = config.VALID_CLIENT_TOKENS[NOMBRE_CLIENTE]
+    socket = crear_socket_ps()
+    fin = time.monotonic() + limite
+    listo = False
+    while not listo and time.monotonic() < fin:
+        op = {"tipo_operacion": "PRESTAMO", "codigo_libro": "LIB000000", "usuario": "lz-calentamiento"}
+        listo = enviar_operacion(socket, NOMBRE_CLIENTE, token, op, 0).get("ok", False)
+        if not listo:
+            time.sleep(0.2)
+    if listo:
+        op = {"tipo_operacion": "DEVOLUCION", "codigo_libro": "LIB000000", "usuario": "lz-calentamiento"}
+        enviar_operacion(socket, NOMBRE_CLIENTE, token, op, 0)
+    socket.close(linger=0)
+    return listo
+
+
+def medir_eco(repeticiones: int) -> list:
+    """Latencias (s) de ida y vuelta contra el eco, con un mensaje del tamaño de una solicitud del PS."""
+    from transporte import direccion_conexion
+
+    socket = zmq.Context.instance().socket(zmq.REQ)
+    socket.connect(direccion_conexion(config.SEDE1_HOST, config.LANZADOR_PUERTO_ECO))
+    mensaje = json.dumps({
+        "cliente": NOMBRE_CLIENTE, "token": "x" * 18, "tipo_operacion": "PRESTAMO", "codigo_libro": "LIB000000",
+        "usuario": "lz0-0", "id_operacion": "0" * 32, "secuencia_minima": 0, "plazo": time.time(), "hash": "0" * 64,
+    }).encode("utf-8")
+    latencias = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        socket.send(mensaje)
+        socket.recv()
+        latencias.append(time.perf_counter() - t0)
+    socket.close(linger=0)
+    return latencias
+
+
+def hilo_cliente(carga: list, resultados: list):
+    from cliente_ps import enviar_operacion
+
+    token = config.VALID_CLIENT_TOKENS[NOMBRE_CLIENTE]
+    socket = crear_socket_ps()
+    secuencia_sesion = 0
+    for op in carga:
+        t0 = time.perf_counter()
+        respuesta = enviar_operacion(socket, NOMBRE_CLIENTE, token, op, secuencia_sesion)
+        resultados.append((op["tipo_operacion"], time.perf_counter() - t0, bool(respuesta.get("ok"))))
+        secuencia_sesion = max(secuencia_sesion, respuesta.get("secuencia") or 0)
+    socket.close(linger=0)
+
+
+def correr_clientes(cargas: list) -> (list, float):
+    """Un hilo PS por carga. Retorna los resultados y la duración (s)."""
+    resultados = []
+    hilos = [threading.Thread(target=hilo_cliente, args=(carga, resultados)) for carga in cargas]
+    inicio = time.perf_counter()
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    return resultados, time.perf_counter() - inicio
+
+
+def correr_carga(args) -> dict:
+    from benchmark_ga_concurrente import percentil
+
+    eco = medir_eco(args.eco)
+
+    if args.calentamiento:
+        # Usuarios aparte para no tocar los préstamos de la carga medida
+        correr_clientes([generar_carga(c, args.calentamiento, args.libros, args.semilla, args.mezcla, "cal")
+                         for c in range(args.clientes)])
+
+    cargas = [generar_carga(c, args.operaciones, args.libros, args.semilla, args.mezcla)
+              for c in range(args.clientes)]
+    resultados, duracion = correr_clientes(cargas)
+
+    por_tipo = {}
+    for tipo in sorted({tipo for tipo, _, _ in resultados}):
+        latencias = [lat for t, lat, _ in resultados if t == tipo]
+        por_tipo[tipo] = {
+            "operaciones": len(latencias),
+            "fallidas": sum(1 for t, _, ok in resultados if t == tipo and not ok),
+            "p50_ms": percentil(latencias, 50) * 1000,
+            "p99_ms": percentil(latencias, 99) * 1000,
+            "max_ms": max(latencias) * 1000,
+        }
+    latencias = [lat for _, lat, _ in resultados]
+    return {
+        "transporte": args.transporte,
+        "modo": args.modo,
+        "clientes": args.clientes,
+        "trabajadores_gc": config.GC_NUM_TRABAJADORES,
+        "mezcla": args.mezcla,
+        "libros": args.libros,
+        "operaciones": len(resultados),
+        "fallidas": sum(1 for _, _, ok in resultados if not ok),
+        "duracion_s": duracion,
+        "throughput": len(resultados) / duracion if duracion > 0 else 0.0,
+        "p50_ms": percentil(latencias, 50) * 1000,
+        "p99_ms": percentil(latencias, 99) * 1000,
+        "eco_p50_us": percentil(eco, 50) * 1e6,
+        "eco_p99_us": percentil(eco, 99) * 1e6,
+        "por_tipo": por_tipo,
+    }
+
+
+# ============================
+# Reportes
+# ============================
+
+def imprimir_resultado(r: dict, salida):
+    print(f"Transporte: {r['transporte']} | GC {r['modo']} | {r['clientes']} PS | mezcla {r['mezcla']} | "
+          f"{r['operaciones']} operaciones en {r['duracion_s']:.2f} s ({r['throughput']:.0f} ops/s)", file=salida)
+    print(f"Eco REQ/REP (un salto, sin lógica): p50 {r['eco_p50_us']:.0f} us, p99 {r['eco_p99_us']:.0f} us",
+          file=salida)
+    print(f"{'operación':>12} {'ops':>7} {'fallidas':>9} {'p50 ms':>8} {'p99 ms':>8} {'máx ms':>8}", file=salida)
+    for tipo, m in r["por_tipo"].items():
+        print(f"{tipo:>12} {m['operaciones']:>7} {m['fallidas']:>9} {m['p50_ms']:>8.2f} "
+              f"{m['p99_ms']:>8.2f} {m['max_ms']:>8.2f}", file=salida)
+
+
+def comparar(args):
+    """Corre el lanzador con cada transporte (un proceso por corrida) y los pone lado a lado."""
+    resultados = []
+    for transporte in ("inproc", "ipc", "tcp"):
+        cmd = [sys.executable, os.path.abspath(__file__), "--transporte", transporte, "--modo", args.modo,
+               "--clientes", str(args.clientes), "--operaciones", str(args.operaciones),
+               "--libros", str(args.libros), "--semilla", str(args.semilla), "--eco", str(args.eco),
+               "--mezcla", args.mezcla, "--calentamiento", str(args.calentamiento), "--json"]
+        if args.con_admision:
+            cmd.append("--con-admision")
+        if args.trabajadores_gc:
+            cmd += ["--trabajadores-gc", str(args.trabajadores_gc)]
+        print(f"Corriendo con {transporte}...")
+        salida = subprocess.run(cmd, stdout=subprocess.PIPE, text=True, check=True).stdout
+        resultados.append(json.loads(salida.strip().splitlines()[-1]))
+
+    tipos = sorted({tipo for r in resultados for tipo in r["por_tipo"]})
+    print(f"\nGC {args.modo} | {args.clientes} PS x {args.operaciones} operaciones | {args.libros} libros")
+    print(f"{'transporte':>10} {'ops/s':>8} {'eco p50 us':>11} " + " ".join(f"{t + ' p50':>16}" for t in tipos))
+    for r in resultados:
+        columnas = " ".join(f"{r['por_tipo'].get(t, {}).get('p50_ms', 0):>13.2f} ms" for t in tipos)
+        print(f"{r['transporte']:>10} {r['throughput']:>8.0f} {r['eco_p50_us']:>11.0f} {columnas}")
+
+
+# ============================
+# Entrada principal
+# ============================
+
+def main():
+    parser = argparse.ArgumentParser(description="Sede 1 completa en una máquina, con carga de PS medida")
+    parser.add_argument("--transporte", choices=("inproc", "ipc", "tcp"), default=config.TRANSPORTE)
+    parser.add_argument("--modo", choices=(config.GC_MODE_SERIAL, config.GC_MODE_MULTI),
+                        default=config.DEFAULT_GC_MODE)
+    parser.add_argument("--clientes", type=int, default=4)
+    parser.add_argument("--operaciones", type=int, default=500, help="operaciones por PS")
+    parser.add_argument("--libros", type=int, default=1000)
+    parser.add_argument("--semilla", type=int, default=7)
+    parser.add_argument("--eco", type=int, default=2000, help="idas y vueltas del eco")
+    parser.add_argument("--mezcla", choices=tuple(MEZCLAS), default="ciclo", help="mezcla de operaciones")
+    parser.add_argument("--trabajadores-gc", type=int, default=None,
+                        help="hilos del GC en modo MULTI (por defecto, GC_NUM_TRABAJADORES)")
+    parser.add_argument("--calentamiento", type=int, default=0, help="operaciones por PS antes de medir")
+    parser.add_argument("--con-admision", action="store_true",
+                        help="mantener el límite por cliente de config.py")
+    parser.add_argument("--log", default=None, help="salida de los componentes (por defecto, en el temporal)")
+    parser.add_argument("--json", action="store_true", help="resultado como una línea JSON")
+    parser.add_argument("--comparar", action="store_true", help="correr con inproc, ipc y tcp")
+    parser.add_argument("--componente", choices=tuple(COMPONENTES), help=argparse.SUPPRESS)
+    parser.add_argument("--ipc-dir", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.comparar:
+        comparar(args)
+        return
+
+    if args.componente:
+        # Proceso hijo: el directorio de trabajo ya es el temporal
+        ajustar_config(args)
+        ejecutar_componente(args.componente, args.modo)
+        return
+
+    directorio = tempfile.mkdtemp(prefix="biblioteca-")
+    args.ipc_dir = os.path.join(directorio, "ipc")
+    ajustar_config(args)
+
+    # Los componentes imprimen cada solicitud: todo eso va al log
+    ruta_log = os.path.abspath(args.log or os.path.join(directorio, "componentes.log"))
+    log = open(ruta_log, "w", buffering=1, encoding="utf-8")
+    salida = sys.stdout
+    sys.stdout = log
+
+    preparar_directorio(directorio, args.libros)
+
+    if args.transporte == "inproc":
+        procesos = lanzar_hilos(args.modo)
+    else:
+        procesos = lanzar_procesos(args, directorio, log)
+
+    try:
+        resultado = correr_carga(args) if esperar_sistema() else None
+    finally:
+        for proceso in procesos:
+            proceso.terminate()
+        for proceso in procesos:
+            proceso.wait()
+
+    if resultado is None:
+        print(f"El sistema no respondió a tiempo; ver {ruta_log}", file=salida)
+    elif args.json:
+        print(json.dumps(resultado), file=salida)
+    else:
+        imprimir_resultado(resultado, salida)
+        print(f"Salida de los componentes: {ruta_log}", file=salida)
+    salida.flush()
+    log.flush()
+    # Los componentes inproc no tienen cómo detenerse: se termina el proceso con ellos
+    os._exit(0 if resultado is not None else 1)
+
+
+if __name__ == "__main__":
+    main()
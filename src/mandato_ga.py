@@ -0,0 +1,120 @@
+"""
+mandato_ga.py
+Mandato del GA activo: el número de época con el que se promueve el GA de
+respaldo y se aísla (fencing) al primario que reemplaza.
+
+El supervisor (supervisor.py) promueve al respaldo cuando el primario cae:
+sube el mandato (un entero que solo crece), lo guarda en GA_MANDATO_FILE
+con el GA activo y se lo envía al respaldo ({"accion": "PROMOVER",
+"mandato": N}). Desde ahí:
+
+- Cada respuesta de un GA lleva su "mandato". ClienteGA recuerda el mayor
+  que vio, lo envía en cada solicitud y prefiere el GA que lo tiene.
+- Un GA que recibe una solicitud con un mandato mayor que el suyo ya fue
+  reemplazado: queda relegado y responde todo con "relegado": True sin
+  tocar la BD, y el cliente prueba el otro GA. Un primario que arranca
+  después de la promoción lee GA_MANDATO_FILE y arranca relegado.
+- El respaldo promovido descarta el flujo de replicación de un primario
+  con mandato menor (uno que solo estaba pausado y volvió).
+
+Un primario relegado deja de publicar avisos y de renovar el latido de la
+tabla de disponibilidad: los GC dejan de confiar en sus datos.
+"""
+
+import json
+import os
+import threading
+
+from config import GA_MANDATO_FILE
+
+
+ROL_PRIMARIO = "primario"
+ROL_RESPALDO = "respaldo"
+
+
+def leer_mandato(ruta: str = GA_MANDATO_FILE):
+    """(mandato, GA activo) guardados, o (0, primario) si no hubo promociones."""
+    try:
+        with open(ruta, "r", encoding="utf-8") as f:
+            datos = json.load(f)
+        return int(datos.get("mandato", 0)), datos.get("activo", ROL_PRIMARIO)
+    except (FileNotFoundError, ValueError):
+        return 0, ROL_PRIMARIO
+
+
+def guardar_mandato(mandato: int, activo: str, ruta: str = GA_MANDATO_FILE):
+    temporal = ruta + ".tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump({"mandato": mandato, "activo": activo}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporal, ruta)
+
+
+class MandatoGA:
+    """
+    - rol: ROL_PRIMARIO o ROL_RESPALDO (el proceso dueño)
+    - mandato / activo: lo guardado en GA_MANDATO_FILE
+    - al_relegar: función que se llama una vez cuando este GA queda relegado
+    """
+
+    def __init__(self, rol: str, mandato: int = 0, activo: str = ROL_PRIMARIO, al_relegar=None):
+        self.rol = rol
+        self.mandato = mandato
+        self.relegado = rol != activo and rol == ROL_PRIMARIO
+        self.promovido = rol == activo and rol == ROL_RESPALDO
+        self.al_relegar = al_relegar
+
+        self._lock = threading.Lock()
+        # Entradas de replicación descartadas por venir de un mandato anterior
+        self.replicacion_descartada = 0
+
+    @classmethod
+    def desde_archivo(cls, rol: str, ruta: str = GA_MANDATO_FILE, al_relegar=None):
+        mandato, activo = leer_mandato(ruta)
+        return cls(rol, mandato, activo, al_relegar)
+
+    def revisar(self, mensaje: dict):
+        """None si el GA puede atender 'mensaje', o la respuesta de rechazo."""
+        visto = mensaje.get("mandato")
+        if isinstance(visto, int) and visto > self.mandato:
+            with self._lock:
+                if visto > self.mandato:
+                    self.mandato = visto
+                    # Otro GA tiene un mandato más nuevo: este quedó reemplazado
+                    if self.rol == ROL_PRIMARIO and not self.relegado:
+                        self.relegado = True
+                        print(f"GA {self.rol}: relegado (hay un GA con mandato {visto}).")
+                        if self.al_relegar is not None:
+                            self.al_relegar()
+        if self.relegado:
+            return {
+                "ok": False,
+                "mensaje": f"GA {self.rol} relegado: hay otro GA activo (mandato {self.mandato}).",
+                "relegado": True,
+                "mandato": self.mandato,
+            }
+        return None
+
+    def anotar(self, respuesta: dict) -> dict:
+        return dict(respuesta, mandato=self.mandato)
+
+    def promover(self, mandato) -> dict:
+        """Atiende PROMOVER (solo el respaldo) y guarda el mandato para sus reinicios."""
+        if self.rol != ROL_RESPALDO:
+            return {"ok": False, "mensaje": "Solo se promueve el GA de respaldo."}
+        if not isinstance(mandato, int) or mandato < self.mandato:
+            return {"ok": False, "mensaje": f"Mandato inválido (actual {self.mandato}).", "mandato": self.mandato}
+        with self._lock:
+            self.mandato = mandato
+            self.promovido = True
+        guardar_mandato(mandato, ROL_RESPALDO)
+        print(f"GA respaldo: promovido a GA activo con mandato {mandato}.")
+        return {"ok": True, "mensaje": "GA de respaldo promovido.", "mandato": mandato}
+
+    def admite_replicacion(self, entrada: dict) -> bool:
+        """El respaldo promovido no aplica cambios de un primario con mandato anterior."""
+        if self.promovido and entrada.get("mandato", 0) < self.mandato:
+            self.replicacion_descartada += 1
+            return False
+        return True
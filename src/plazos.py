@@ -0,0 +1,79 @@
+"""
+plazos.py
+Plazo (deadline) de cada solicitud de un PS, de punta a punta.
+
+El PS pone en el mensaje "plazo": el instante (time.time(), segundos
+desde epoch) después del cual ya no espera la respuesta. El GC lo copia en
+lo que envía al Actor de Préstamo y a la réplica de lectura, el Actor en
+lo que envía al GA, y cada etapa lo revisa antes de trabajar: una
+solicitud vencida se responde sin tocar nada (ni la BD, ni la bandeja, ni
+la tabla de deduplicación), porque nadie va a leer esa respuesta.
+
+Solo llevan plazo las solicitudes que el PS espera (PRESTAMO, RESERVA y
+las lecturas). Una DEVOLUCION o RENOVACION que la bandeja del GC ya aceptó
+está confirmada al PS y se aplica aunque tarde.
+
+Los relojes de las máquinas deben estar sincronizados (NTP): el plazo es
+absoluto, no un tiempo restante.
+"""
+
+import threading
+import time
+
+
+def restante(mensaje: dict):
+    """Segundos que le quedan a la solicitud, o None si no tiene plazo."""
+    plazo = mensaje.get("plazo")
+    if not isinstance(plazo, (int, float)):
+        return None
+    return plazo - time.time()
+
+
+def vencido(mensaje: dict) -> bool:
+    tiempo = restante(mensaje)
+    return tiempo is not None and tiempo <= 0
+
+
+def respuesta_vencida(etapa: str) -> dict:
+    return {
+        "ok": False,
+        "mensaje": f"Plazo vencido: {etapa} descartó la solicitud sin procesarla.",
+        "plazo_vencido": True,
+    }
+
+
+class ContadorDescartes:
+    """Solicitudes descartadas por plazo vencido en este proceso (trabajo evitado), por acción."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.por_accion = {}
+
+    def registrar(self, accion):
+        with self._lock:
+            self.por_accion[accion] = self.por_accion.get(accion, 0) + 1
+
+    @property
+    def total(self) -> int:
+        with self._lock:
+            return sum(self.por_accion.values())
+
+    def resumen(self) -> str:
+        with self._lock:
+            detalle = ", ".join(f"{accion} {n}" for accion, n in sorted(self.por_accion.items(), key=str))
+            return f"{sum(self.por_accion.values())} ({detalle})" if detalle else "0"
+
+
+# Un contador por proceso: lo comparten todas las etapas que corren en él
+DESCARTADAS = ContadorDescartes()
+
+
+def descartar_si_vencido(mensaje: dict, etapa: str, accion=None):
+    """
+    Si la solicitud ya venció, la cuenta y retorna la respuesta para quien
+    la envió; si no, None.
+    """
+    if not vencido(mensaje):
+        return None
+    DESCARTADAS.registrar(accion or mensaje.get("accion") or mensaje.get("tipo_operacion"))
+    return respuesta_vencida(etapa)
@@ -0,0 +1,272 @@
+"""
+replicacion.py
+Flujo de cambios del GA primario hacia el GA de respaldo.
+
+Responsabilidades:
+- Lado primario: por cada operación aplicada se envía, en orden, una
+  entrada con el id de la operación, su resultado y el estado del libro
+  después del cambio. Un hilo dueño del socket PUSH las despacha.
+- Lado respaldo: aplicar esas entradas sobre su BD y su tabla de
+  deduplicación, así un reintento que llegue al respaldo tras un failover
+  recibe el resultado ya calculado en vez de aplicarse dos veces.
+
+Se replica el estado del libro (no la operación), así el respaldo queda
+igual al primario aunque las fechas se calculen con datetime.now().
+
+Memoria acotada en el primario:
+- Cada entrada lleva la "época" del replicador (una por proceso GA) y un
+  número de secuencia.
+- La cola hacia el respaldo tiene GA_REPLICACION_COLA_MAX entradas. Si se
+  llena (el respaldo está caído o atrasado) se descartan todas las
+  pendientes y se envía un aviso de HUECO con la última secuencia.
+- El respaldo, al arrancar, al ver una época distinta, un salto en la
+  secuencia o un HUECO, pide la foto completa al primario
+  (FOTO_REPLICACION) y sigue aplicando el flujo desde la secuencia de esa
+  foto, como la réplica de lectura (ver cache_disponibilidad.py).
+"""
+
+import copy
+import json
+import queue
+import threading
+import uuid
+
+import zmq
+
+from config import GA_REPLICACION_COLA_MAX, GA_REPLICACION_HWM, GA_REPLICACION_TIMEOUT_FOTO_MS
+
+
+# ============================
+# Lado primario
+# ============================
+
+class ReplicadorCambios:
+    """
+    - context: contexto ZeroMQ
+    - endpoint: dirección del PULL del GA de respaldo
+    - mandato: mandato del primario (ver mandato_ga.py); va en cada entrada
+    - cola_max: entradas pendientes antes de descartarlas
+
+    registrar() se llama desde los trabajadores del GA con el lock del
+    libro tomado, así el orden de la cola respeta el orden por libro.
+    """
+
+    def __init__(self, context: zmq.Context, endpoint: str, hwm: int = GA_REPLICACION_HWM, mandato: int = 0,
+                 cola_max: int = GA_REPLICACION_COLA_MAX):
+        self.context = context
+        self.endpoint = endpoint
+        self.hwm = hwm
+        self.mandato = mandato
+
+        self.epoca = uuid.uuid4().hex
+        self.secuencia = 0
+        # Protege la secuencia: el orden de la cola es el de la secuencia
+        self._lock = threading.Lock()
+        self._cola = queue.Queue(maxsize=cola_max)
+        self.enviadas = 0
+        self.descartadas = 0
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._bucle, daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        self._cola.put(None)
+        self._hilo.join(timeout=2)
+
+    def registrar(self, id_operacion: str, codigo: str, resultado: dict, libro: dict = None):
+        """
+        Encola una entrada. 'libro' es el estado del libro después del cambio
+        (None si la operación no modificó la BD); se serializa aquí mismo
+        para copiarlo mientras el lock del libro sigue tomado.
+        """
+        cuerpo = json.dumps({
+            "id_operacion": id_operacion,
+            "codigo_libro": codigo,
+            "resultado": resultado,
+            "libro": libro,
+            "mandato": self.mandato,
+            "epoca": self.epoca,
+        }, ensure_ascii=False)
+        with self._lock:
+            self.secuencia += 1
+            # La secuencia se agrega al JSON ya armado: el lock no cubre la serialización
+            entrada = f'{cuerpo[:-1]}, "secuencia": {self.secuencia}}}'
+            try:
+                self._cola.put_nowait(entrada)
+            except queue.Full:
+                self._descartar_pendientes()
+
+    def _descartar_pendientes(self):
+        """
+        Cola llena: el respaldo igual va a necesitar la foto completa, así
+        que se descarta lo pendiente y se deja solo el aviso de HUECO (con
+        self._lock tomado).
+        """
+        descartadas = 1
+        while True:
+            try:
+                entrada = self._cola.get_nowait()
+            except queue.Empty:
+                break
+            # El HUECO de un desborde anterior no es un cambio
+            if entrada is not None and not entrada.startswith('{"tipo": "HUECO"'):
+                descartadas += 1
+        self.descartadas += descartadas
+        self._cola.put_nowait(json.dumps({
+            "tipo": "HUECO",
+            "mandato": self.mandato,
+            "epoca": self.epoca,
+            "secuencia": self.secuencia,
+        }))
+        print(f"Replicación: cola llena, {descartadas} cambios descartados "
+              f"(el respaldo pedirá la foto completa; total descartados: {self.descartadas}).")
+
+    def instantanea(self, bd: dict, bloqueos, dedup=None) -> dict:
+        """
+        Foto para el respaldo: la secuencia actual, una copia de cada libro
+        y la tabla de deduplicación. Cada libro se copia con su lock, sin
+        tomar todos a la vez; lo que cambie durante la copia tiene una
+        secuencia mayor y el respaldo lo aplica después desde el flujo.
+        """
+        with self._lock:
+            epoca, secuencia = self.epoca, self.secuencia
+
+        # Con la BD en disco se recorre SQLite sin llenar la caché y sin
+        # frenar la persistencia (fijo=False)
+        libros = {}
+        for codigo, libro in (list(bd.items()) if isinstance(bd, dict) else bd.items(fijo=False)):
+            with bloqueos.de(codigo):
+                libros[codigo] = copy.deepcopy(libro)
+
+        return {
+            "ok": True,
+            "epoca": epoca,
+            "secuencia": secuencia,
+            "libros": libros,
+            "deduplicacion": dedup.entradas() if dedup is not None else [],
+        }
+
+    def _bucle(self):
+        socket = self.context.socket(zmq.PUSH)
+        # Mientras el respaldo está caído el socket guarda hasta 'hwm'
+        # entradas; después el envío se bloquea y la cola se llena
+        socket.setsockopt(zmq.SNDHWM, self.hwm)
+        socket.setsockopt(zmq.LINGER, 0)
+        socket.connect(self.endpoint)
+
+        while True:
+            entrada = self._cola.get()
+            if entrada is None:
+                break
+            socket.send_string(entrada)
+            self.enviadas += 1
+
+        socket.close()
+
+
+# ============================
+# Lado respaldo
+# ============================
+
+def pedir_instantanea(context: zmq.Context, endpoint_primario: str, mandato: int = 0,
+                      timeout_ms: int = GA_REPLICACION_TIMEOUT_FOTO_MS):
+    """
+    Pide la foto completa al GA primario. Retorna la foto, o None si no
+    respondió o la rechazó. El mandato del respaldo va en la solicitud: un
+    primario ya reemplazado queda relegado y no entrega una foto vieja.
+    """
+    socket = context.socket(zmq.REQ)
+    socket.setsockopt(zmq.LINGER, 0)
+    socket.connect(endpoint_primario)
+    try:
+        socket.send_string(json.dumps({"accion": "FOTO_REPLICACION", "mandato": mandato}))
+        if not socket.poll(timeout_ms):
+            print(f"Replicación: el primario no respondió la foto completa en {timeout_ms} ms.")
+            return None
+        foto = json.loads(socket.recv_string())
+    finally:
+        socket.close()
+
+    if not foto.get("ok"):
+        print(f"Replicación: el primario rechazó la foto completa: {foto.get('mensaje')}")
+        return None
+    return foto
+
+
+def cargar_instantanea(estado, foto: dict) -> int:
+    """
+    Aplica en el GA de respaldo la foto de pedir_instantanea (libros y
+    tabla de deduplicación). Retorna cuántos libros cargó.
+    """
+    for codigo, libro in foto["libros"].items():
+        aplicar_cambio_replicado(estado, {"codigo_libro": codigo, "libro": libro})
+    if estado.dedup is not None:
+        for id_operacion, resultado in foto.get("deduplicacion", []):
+            estado.dedup.guardar(id_operacion, resultado)
+    return len(foto["libros"])
+
+
+class SecuenciaReplicacion:
+    """
+    Posición del respaldo en el flujo del primario. revisar() dice qué
+    hacer con cada entrada: "aplicar", "omitir" (ya incluida en la foto) o
+    "resincronizar" (época distinta, salto en la secuencia o HUECO).
+    """
+
+    def __init__(self):
+        self.epoca = None
+        self.secuencia = 0
+        self.resincronizaciones = 0
+
+    @property
+    def sincronizada(self) -> bool:
+        return self.epoca is not None
+
+    def desde_foto(self, foto: dict):
+        self.epoca = foto["epoca"]
+        self.secuencia = foto["secuencia"]
+        self.resincronizaciones += 1
+
+    def revisar(self, entrada: dict) -> str:
+        if entrada.get("epoca") != self.epoca:
+            self.epoca = None
+            return "resincronizar"
+
+        secuencia = entrada.get("secuencia", 0)
+        if secuencia <= self.secuencia:
+            return "omitir"
+        if entrada.get("tipo") == "HUECO" or secuencia > self.secuencia + 1:
+            self.epoca = None
+            return "resincronizar"
+
+        self.secuencia = secuencia
+        return "aplicar"
+
+
+def aplicar_cambio_replicado(estado, entrada: dict) -> bool:
+    """
+    Aplica en el GA de respaldo una entrada del flujo del primario.
+    'estado' es el EstadoGA del respaldo.
+
+    Retorna True si la BD cambió.
+    """
+    id_operacion = entrada.get("id_operacion")
+    codigo = entrada.get("codigo_libro")
+    libro = entrada.get("libro")
+
+    with estado.bloqueos.de(codigo):
+        if libro is not None:
+            estado.bd[codigo] = libro
+            if estado.vencimientos is not None:
+                estado.vencimientos.actualizar_libro(codigo, libro)
+            if estado.titulos is not None:
+                estado.titulos.agregar(codigo, libro.get("titulo"))
+            if libro.get("apartados"):
+                estado.libros_con_apartados.add(codigo)
+            else:
+                estado.libros_con_apartados.discard(codigo)
+        if id_operacion and estado.dedup is not None:
+            estado.dedup.guardar(id_operacion, entrada.get("resultado"))
+
+    return libro is not None
@@ -0,0 +1,291 @@
+"""
+reproductor_trafico.py
+Reproduce capturas de tráfico de los GC (ver captura_trafico.py) contra una
+topología de prueba y reporta la distribución de latencias, para comparar
+el rendimiento con la forma del tráfico real (ráfagas, mezcla de
+operaciones) y no solo con cargas sintéticas.
+
+- Velocidad: --velocidad 1 respeta los tiempos entre llegadas de la
+  captura; N los divide por N; "max" envía todo lo más rápido posible
+  (cada hilo envía la siguiente apenas recibe la respuesta).
+- Cada solicitud sale por cliente_ps.enviar_operacion: se firma de nuevo
+  con seguridad (token del cliente en VALID_CLIENT_TOKENS, hash nuevo),
+  con id y plazo nuevos. Va al GC de la sede donde se capturó.
+- La latencia se mide desde el instante en que la solicitud debía salir
+  según la captura, no desde que un hilo la tomó: si el sistema se atrasa,
+  el atraso queda en la latencia en lugar de bajar la carga.
+- Con --levantar, la topología la arma supervisor.Supervisor en un
+  directorio temporal, con un catálogo hecho de los libros de la captura
+  (--ejemplares de cada uno); sin él, se usan los GC de config.py.
+
+Uso:
+    python src/reproductor_trafico.py datos/captura_gc_sede1.log [--velocidad 2] [--levantar]
+    python src/reproductor_trafico.py captura_1.log.gz captura_2.log.gz --velocidad max --json
+"""
+
+import argparse
+import json
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+import zmq
+
+import config
+from captura_trafico import leer_captura
+
+
+# Componentes que levanta --levantar para cada sede de la captura
+COMPONENTES_POR_SEDE = {
+    "1": ("actor_prestamo_1", "actor_devolucion_1", "actor_renovacion_1", "gc_1"),
+    "2": ("ga_lectura", "actor_prestamo_2", "actor_devolucion_2", "actor_renovacion_2", "gc_2"),
+}
+
+PUERTOS_GC = {"1": (config.SEDE1_HOST, config.GC_SEDE1_PORT), "2": (config.SEDE2_HOST, config.GC_SEDE2_PORT)}
+
+
+def leer_velocidad(texto: str):
+    """Factor de velocidad, o None para "max"."""
+    if texto == "max":
+        return None
+    velocidad = float(texto)
+    if velocidad <= 0:
+        raise argparse.ArgumentTypeError("La velocidad debe ser mayor que 0 (o \"max\").")
+    return velocidad
+
+
+def crear_socket_gc(sede: str):
+    from transporte import direccion_conexion
+
+    socket = zmq.Context.instance().socket(zmq.REQ)
+    socket.setsockopt(zmq.REQ_RELAXED, 1)
+    socket.setsockopt(zmq.REQ_CORRELATE, 1)
+    socket.connect(direccion_conexion(*PUERTOS_GC[sede]))
+    return socket
+
+
+# ============================
+# Topología de prueba
+# ============================
+
+def preparar_catalogo(directorio: str, codigos: set, ejemplares: int):
+    """BD inicial con los libros que aparecen en la captura; el GA arma la primaria y la réplica."""
+    from base_datos import guardar_bd, inicializar_bd
+
+    os.makedirs(os.path.join(directorio, "datos"), exist_ok=True)
+    os.chdir(directorio)
+    bd = {codigo: {"titulo": f"Libro {codigo}", "ejemplares_disponibles": ejemplares, "prestamos": []}
+          for codigo in sorted(codigos)}
+    guardar_bd(config.DB_INITIAL_DATA_FILE, bd)
+    inicializar_bd()
+
+
+def levantar_topologia(directorio: str, sedes: set):
+    from supervisor import Componente, Supervisor
+
+    nombres = ["ga", "ga_respaldo"] + [n for sede in sorted(sedes) for n in COMPONENTES_POR_SEDE[sede]]
+    os.makedirs(os.path.join(directorio, "logs"), exist_ok=True)
+    supervisor = Supervisor([Componente(n, *config.SUPERVISOR_COMPONENTES[n]) for n in nombres],
+                            os.path.join(directorio, "logs"))
+    detenido = threading.Event()
+    hilo = threading.Thread(target=supervisor.ejecutar, args=(detenido,))
+    hilo.start()
+    return supervisor, detenido, hilo
+
+
+def esperar_gc(sede: str, codigo: str, limite: float = 60.0) -> bool:
+    """Espera a que un PRESTAMO recorra la sede (y lo devuelve)."""
+    from cliente_ps import enviar_operacion
+
+    cliente = next(iter(config.VALID_CLIENT_TOKENS))
+    token = config.VALID_CLIENT_TOKENS[cliente]
+    socket = crear_socket_gc(sede)
+    fin = time.monotonic() + limite
+    listo = False
+    while not listo and time.monotonic() < fin:
+        op = {"tipo_operacion": "PRESTAMO", "codigo_libro": codigo, "usuario": "rp-calentamiento"}
+        listo = enviar_operacion(socket, cliente, token, op, 0).get("ok", False)
+        if not listo:
+            time.sleep(0.2)
+    if listo:
+        op = {"tipo_operacion": "DEVOLUCION", "codigo_libro": codigo, "usuario": "rp-calentamiento"}
+        enviar_operacion(socket, cliente, token, op, 0)
+    socket.close(linger=0)
+    return listo
+
+
+# ============================
+# Reproducción
+# ============================
+
+def hilo_enviador(pendientes: queue.Queue, resultados: list):
+    """Envía lo que toma de 'pendientes' con su propio socket por sede."""
+    from cliente_ps import enviar_operacion
+
+    sockets = {}
+    secuencias = {}
+    while True:
+        item = pendientes.get()
+        if item is None:
+            break
+        programada, sede, op = item
+        if sede not in sockets:
+            sockets[sede] = crear_socket_gc(sede)
+        cliente = op["cliente"]
+        inicio = time.monotonic()
+        respuesta = enviar_operacion(sockets[sede], cliente, config.VALID_CLIENT_TOKENS[cliente], op,
+                                     secuencias.get(cliente, 0))
+        fin = time.monotonic()
+        desde = inicio if programada is None else programada
+        resultados.append((op["tipo_operacion"], fin - desde, inicio - desde, bool(respuesta.get("ok"))))
+        secuencias[cliente] = max(secuencias.get(cliente, 0), respuesta.get("secuencia") or 0)
+    for socket in sockets.values():
+        socket.close(linger=0)
+
+
+def reproducir(solicitudes: list, velocidad, concurrencia: int) -> (list, float):
+    """Reproduce 'solicitudes' (instante, sede, op). Retorna los resultados y la duración."""
+    pendientes = queue.Queue()
+    resultados = []
+    hilos = [threading.Thread(target=hilo_enviador, args=(pendientes, resultados)) for _ in range(concurrencia)]
+    for h in hilos:
+        h.start()
+
+    base = solicitudes[0][0]
+    inicio = time.monotonic()
+    for instante, sede, op in solicitudes:
+        programada = None
+        if velocidad is not None:
+            programada = inicio + (instante - base) / velocidad
+            espera = programada - time.monotonic()
+            if espera > 0:
+                time.sleep(espera)
+        pendientes.put((programada, sede, op))
+    for _ in hilos:
+        pendientes.put(None)
+    for h in hilos:
+        h.join()
+    return resultados, time.monotonic() - inicio
+
+
+def resumir(solicitudes: list, resultados: list, duracion: float, args, omitidas: int) -> dict:
+    from benchmark_ga_concurrente import percentil
+
+    capturada = solicitudes[-1][0] - solicitudes[0][0]
+    por_segundo = Counter(int(instante - solicitudes[0][0]) for instante, _, _ in solicitudes)
+
+    def distribucion(filas: list) -> dict:
+        latencias = [lat for _, lat, _, _ in filas]
+        return {
+            "operaciones": len(filas),
+            "fallidas": sum(1 for *_, ok in filas if not ok),
+            "p50_ms": percentil(latencias, 50) * 1000,
+            "p90_ms": percentil(latencias, 90) * 1000,
+            "p99_ms": percentil(latencias, 99) * 1000,
+            "p999_ms": percentil(latencias, 99.9) * 1000,
+            "max_ms": max(latencias, default=0) * 1000,
+        }
+
+    por_tipo = {tipo: distribucion([r for r in resultados if r[0] == tipo])
+                for tipo in sorted({r[0] for r in resultados})}
+    por_tipo["TODAS"] = distribucion(resultados)
+    return {
+        "capturas": args.capturas,
+        "velocidad": args.velocidad or "max",
+        "concurrencia": args.concurrencia,
+        "solicitudes": len(solicitudes),
+        "omitidas": omitidas,
+        "capturada_s": capturada,
+        "pico_captura": max(por_segundo.values(), default=0),
+        "duracion_s": duracion,
+        "throughput": len(resultados) / duracion if duracion > 0 else 0.0,
+        "atraso_salida_p99_ms": percentil([atraso for _, _, atraso, _ in resultados], 99) * 1000,
+        "por_tipo": por_tipo,
+    }
+
+
+def imprimir_resultado(r: dict, salida):
+    velocidad = "lo más rápido posible" if r["velocidad"] == "max" else f"{r['velocidad']:g}x"
+    print(f"Captura: {r['solicitudes']} solicitudes en {r['capturada_s']:.1f} s "
+          f"(pico {r['pico_captura']} en un segundo)"
+          + (f", {r['omitidas']} omitidas (cliente sin token en config.py)" if r["omitidas"] else ""), file=salida)
+    print(f"Reproducción a {velocidad} con {r['concurrencia']} hilos: {r['duracion_s']:.1f} s, "
+          f"{r['throughput']:.0f} ops/s | atraso de salida p99 {r['atraso_salida_p99_ms']:.1f} ms", file=salida)
+    print(f"{'operación':>18} {'ops':>7} {'fallidas':>9} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} "
+          f"{'p99.9 ms':>9} {'máx ms':>8}", file=salida)
+    for tipo, m in r["por_tipo"].items():
+        print(f"{tipo:>18} {m['operaciones']:>7} {m['fallidas']:>9} {m['p50_ms']:>8.2f} {m['p90_ms']:>8.2f} "
+              f"{m['p99_ms']:>8.2f} {m['p999_ms']:>9.2f} {m['max_ms']:>8.2f}", file=salida)
+
+
+# ============================
+# Entrada principal
+# ============================
+
+def main():
+    parser = argparse.ArgumentParser(description="Reproduce capturas de tráfico del GC y mide latencias")
+    parser.add_argument("capturas", nargs="+", help="archivos de captura (captura_trafico.py)")
+    parser.add_argument("--velocidad", type=leer_velocidad, default=1.0,
+                        help="factor sobre los tiempos de la captura, o \"max\"")
+    parser.add_argument("--concurrencia", type=int, default=config.REPRODUCTOR_CONCURRENCIA,
+                        help="hilos que envían solicitudes")
+    parser.add_argument("--levantar", action="store_true",
+                        help="levantar una topología de prueba en un directorio temporal")
+    parser.add_argument("--ejemplares", type=int, default=1000, help="ejemplares de cada libro con --levantar")
+    parser.add_argument("--json", action="store_true", help="resultado como una línea JSON")
+    args = parser.parse_args()
+
+    solicitudes = []
+    for ruta in args.capturas:
+        solicitudes += leer_captura(os.path.abspath(ruta))
+    solicitudes.sort(key=lambda s: s[0])
+    validas = [s for s in solicitudes if s[2]["cliente"] in config.VALID_CLIENT_TOKENS]
+    if not validas:
+        print("Las capturas no tienen solicitudes de clientes conocidos.")
+        sys.exit(1)
+
+    directorio = tempfile.mkdtemp(prefix="biblioteca-reproductor-")
+    # enviar_operacion imprime cada solicitud: eso va al log
+    ruta_log = os.path.join(directorio, "reproductor.log")
+    log = open(ruta_log, "w", buffering=1, encoding="utf-8")
+    salida = sys.stdout
+    sys.stdout = log
+
+    sedes = {sede for _, sede, _ in validas}
+    codigos = {op["codigo_libro"] for _, _, op in validas if op["tipo_operacion"] != "BUSCAR" and op["codigo_libro"]}
+    supervisor = None
+    resultado = None
+    try:
+        listo = True
+        if args.levantar:
+            from benchmark_fallas import esperar_sanos
+
+            preparar_catalogo(directorio, codigos or {"LIB000000"}, args.ejemplares)
+            supervisor, detenido, hilo = levantar_topologia(directorio, sedes)
+            listo = esperar_sanos(supervisor)
+            codigo = min(codigos or {"LIB000000"})
+            listo = listo and all(esperar_gc(sede, codigo) for sede in sorted(sedes))
+        if listo:
+            resultados, duracion = reproducir(validas, args.velocidad, args.concurrencia)
+            resultado = resumir(validas, resultados, duracion, args, len(solicitudes) - len(validas))
+    finally:
+        if supervisor is not None:
+            detenido.set()
+            hilo.join()
+            supervisor.cerrar()
+
+    if resultado is None:
+        print(f"La topología no respondió a tiempo; ver {ruta_log}", file=salida)
+    elif args.json:
+        print(json.dumps(resultado), file=salida)
+    else:
+        imprimir_resultado(resultado, salida)
+    sys.exit(0 if resultado is not None else 1)
+
+
+if __name__ == "__main__":
+    main()
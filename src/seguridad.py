@@ -81,7 +81,8 @@ def permitir_operacion(rol: str, tipo_operacion: str) -> bool:
 
     # Rol CLIENTE (PS)
     if rol == "CLIENTE":
-        return tipo_operacion in ["DEVOLUCION", "RENOVACION", "PRESTAMO"]
+        return tipo_operacion in ["DEVOLUCION", "RENOVACION", "PRESTAMO", "RESERVA", "CONSULTA", "PRESTAMOS_USUARIO",
+                                  "VENCIDOS", "BUSCAR"]
 
     # Rol ACTOR
     if rol == "ACTOR":
@@ -0,0 +1,296 @@
+"""
+servidor_concurrente.py
+Servidor ZeroMQ con un socket ROUTER al frente y un pool de hilos detrás.
+
+Responsabilidades:
+- Recibir solicitudes en un ROUTER (los clientes REQ existentes siguen
+  funcionando igual, porque el ROUTER conserva el sobre con la identidad).
+- Encolar cada solicitud para que la tome cualquier hilo trabajador libre.
+- Devolver la respuesta del trabajador al cliente correcto.
+
+Los sockets ZeroMQ no son thread-safe, así que solo el hilo frontal toca el
+ROUTER; los trabajadores le devuelven las respuestas por un PUSH/PULL inproc.
+
+Con 'admision' el hilo frontal decide antes de encolar si acepta la
+solicitud (ver admision.py): una rechazada se responde ahí mismo, sin
+esperar en la cola.
+
+Con 'clasificar' la cola tiene un carril por clase (ColaPrioridad): las
+solicitudes síncronas (un usuario espera la respuesta) se atienden antes
+que las asíncronas, con envejecimiento para que estas no esperen sin fin.
+metricas_clases() da la espera en cola y la latencia por clase.
+"""
+
+import json
+import re
+import threading
+import time
+import uuid
+from collections import deque
+
+import zmq
+
+from config import PRIORIDAD_ENVEJECIMIENTO_MS, PRIORIDAD_PESO, PRIORIDAD_VENTANA_LATENCIAS
+
+
+CLASE_SINCRONA = "sincrona"
+CLASE_ASINCRONA = "asincrona"
+# En orden de prioridad
+CLASES = (CLASE_SINCRONA, CLASE_ASINCRONA)
+
+
+def clasificador_por_campo(campo: str, sincronas) -> callable:
+    """
+    Función payload -> clase según el valor de 'campo' (la primera vez que
+    aparece en el JSON). Se busca en los bytes sin decodificar el mensaje:
+    corre en el hilo frontal, por el que pasan todas las solicitudes.
+    """
+    patron = re.compile(rb'"' + campo.encode() + rb'"\s*:\s*"([^"]*)"')
+    sincronas = {s.encode() for s in sincronas}
+
+    def clasificar(payload: bytes) -> str:
+        encontrado = patron.search(payload)
+        if encontrado is not None and encontrado.group(1) in sincronas:
+            return CLASE_SINCRONA
+        return CLASE_ASINCRONA
+
+    return clasificar
+
+
+def _percentil(ordenados: list, p: float) -> float:
+    if not ordenados:
+        return 0.0
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100.0 * (len(ordenados) - 1))))]
+
+
+class ColaPrioridad:
+    """
+    Cola con un carril por clase, en orden de prioridad. get() atiende el
+    primer carril con solicitudes. Si la más antigua de un carril posterior
+    lleva esperando más que 'envejecimiento' segundos, ese carril pasa
+    después de 'peso' atenciones seguidas del primero: con sobrecarga
+    sostenida recibe al menos 1 de cada peso + 1 (y no vuelve al orden de
+    llegada, que es lo que pasaría si solo se comparara la antigüedad).
+    """
+
+    def __init__(self, clases=CLASES, envejecimiento: float = PRIORIDAD_ENVEJECIMIENTO_MS / 1000.0,
+                 peso: int = PRIORIDAD_PESO):
+        self.clases = tuple(clases)
+        self.envejecimiento = envejecimiento
+        self.peso = peso
+        # clase -> deque de (instante de llegada, item)
+        self._carriles = {clase: deque() for clase in self.clases}
+        self._total = 0
+        # Atenciones seguidas del primer carril con otro carril envejecido
+        self._seguidas = 0
+        self._hay_items = threading.Condition()
+        # Veces que una solicitud pasó adelante por envejecimiento
+        self.envejecidas = 0
+
+    def put(self, item, clase: str = None):
+        with self._hay_items:
+            self._carriles[clase or self.clases[0]].append((time.monotonic(), item))
+            self._total += 1
+            self._hay_items.notify()
+
+    def get(self):
+        with self._hay_items:
+            while not self._total:
+                self._hay_items.wait()
+
+            ahora = time.monotonic()
+            primero = vencido = None
+            for clase in self.clases:
+                carril = self._carriles[clase]
+                if not carril:
+                    continue
+                if primero is None:
+                    primero = carril
+                elif ahora - carril[0][0] > self.envejecimiento and (vencido is None or carril[0][0] < vencido[0][0]):
+                    vencido = carril
+
+            if vencido is not None and self._seguidas >= self.peso:
+                self.envejecidas += 1
+                self._seguidas = 0
+                carril = vencido
+            else:
+                carril = primero
+                self._seguidas = self._seguidas + 1 if vencido is not None else 0
+            self._total -= 1
+            return carril.popleft()[1]
+
+    def qsize(self) -> int:
+        return self._total
+
+
+class ServidorConcurrente:
+    """
+    - context: contexto ZeroMQ (debe ser el mismo para los sockets inproc)
+    - endpoint: dirección donde se hace bind del ROUTER (ej. "tcp://*:5580")
+    - manejador: función (str) -> str que procesa una solicitud
+    - num_trabajadores: tamaño del pool de hilos
+    - admision: función (payload, en_cola, espera_estimada) -> respuesta de
+      rechazo (str) o None para encolar la solicitud
+    - clasificar: función (payload) -> clase (ver clasificador_por_campo);
+      sin ella todas las solicitudes van a un solo carril, en orden de llegada
+    """
+
+    # Peso de la última solicitud en el tiempo medio de servicio
+    ALFA_SERVICIO = 0.1
+
+    def __init__(self, context: zmq.Context, endpoint: str, manejador, num_trabajadores: int,
+                 admision=None, clasificar=None,
+                 envejecimiento: float = PRIORIDAD_ENVEJECIMIENTO_MS / 1000.0):
+        self.context = context
+        self.endpoint = endpoint
+        self.manejador = manejador
+        self.num_trabajadores = max(1, num_trabajadores)
+        self.admision = admision
+        # Segundos que tarda un trabajador en una solicitud (promedio móvil)
+        self.servicio_medio = 0.0
+
+        self.clasificar = clasificar
+        self.cola = ColaPrioridad(CLASES, envejecimiento)
+
+        # clase -> deque de (espera en cola, latencia hasta la respuesta)
+        self._latencias = {clase: deque(maxlen=PRIORIDAD_VENTANA_LATENCIAS) for clase in CLASES}
+        self._atendidas = {clase: 0 for clase in CLASES}
+        self._lock_metricas = threading.Lock()
+        self._endpoint_respuestas = f"inproc://respuestas-{uuid.uuid4().hex}"
+        self._detener = threading.Event()
+        # Llegada de la solicitud que atiende cada trabajador (ver llegada_actual)
+        self._actual = threading.local()
+        self._hilos = []
+
+    # ----------------------------
+    # Ciclo de vida
+    # ----------------------------
+
+    def iniciar(self):
+        """Hace bind del ROUTER y arranca el hilo frontal y los trabajadores."""
+        self._router = self.context.socket(zmq.ROUTER)
+        self._router.bind(self.endpoint)
+        # Dirección real (útil si se pidió un puerto comodín, ej. "tcp://127.0.0.1:*")
+        self.endpoint_real = self._router.getsockopt_string(zmq.LAST_ENDPOINT)
+
+        self._pull_respuestas = self.context.socket(zmq.PULL)
+        self._pull_respuestas.bind(self._endpoint_respuestas)
+
+        for i in range(self.num_trabajadores):
+            hilo = threading.Thread(target=self._bucle_trabajador, args=(i,), daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+
+        hilo_frontal = threading.Thread(target=self._bucle_frontal, daemon=True)
+        hilo_frontal.start()
+        self._hilos.append(hilo_frontal)
+
+    def detener(self):
+        self._detener.set()
+        for _ in range(self.num_trabajadores):
+            self.cola.put(None)
+        for hilo in self._hilos:
+            hilo.join(timeout=2)
+
+    def metricas_clases(self) -> dict:
+        """clase -> atendidas y percentiles (ms) de la espera en cola y de la latencia."""
+        with self._lock_metricas:
+            muestras = {clase: list(valores) for clase, valores in self._latencias.items()}
+            atendidas = dict(self._atendidas)
+        resultado = {}
+        for clase in CLASES:
+            esperas = sorted(espera for espera, _ in muestras[clase])
+            latencias = sorted(latencia for _, latencia in muestras[clase])
+            resultado[clase] = {
+                "atendidas": atendidas[clase],
+                "espera_p50_ms": _percentil(esperas, 50) * 1000,
+                "espera_p99_ms": _percentil(esperas, 99) * 1000,
+                "latencia_p50_ms": _percentil(latencias, 50) * 1000,
+                "latencia_p99_ms": _percentil(latencias, 99) * 1000,
+            }
+        return resultado
+
+    def resumen_clases(self) -> str:
+        """Una línea por clase con solicitudes, para los logs."""
+        lineas = []
+        for clase, m in self.metricas_clases().items():
+            if m["atendidas"]:
+                lineas.append(f"{clase}: {m['atendidas']} atendidas, espera en cola p50/p99 "
+                              f"{m['espera_p50_ms']:.1f}/{m['espera_p99_ms']:.1f} ms, latencia p50/p99 "
+                              f"{m['latencia_p50_ms']:.1f}/{m['latencia_p99_ms']:.1f} ms")
+        return "\n".join(lineas)
+
+    def llegada_actual(self) -> float:
+        """
+        time.time() de cuando llegó al ROUTER la solicitud que atiende el
+        trabajador que llama (desde el manejador), antes de la espera en cola.
+        """
+        return time.time() - (time.perf_counter() - self._actual.llegada)
+
+    def espera_estimada(self) -> float:
+        """Segundos que esperaría en la cola una solicitud que llega ahora."""
+        return self.cola.qsize() * self.servicio_medio / self.num_trabajadores
+
+    # ----------------------------
+    # Hilo frontal (dueño del ROUTER)
+    # ----------------------------
+
+    def _bucle_frontal(self):
+        poller = zmq.Poller()
+        poller.register(self._router, zmq.POLLIN)
+        poller.register(self._pull_respuestas, zmq.POLLIN)
+
+        while not self._detener.is_set():
+            eventos = dict(poller.poll(100))
+
+            if self._router in eventos:
+                partes = self._router.recv_multipart()
+                llegada = time.perf_counter()
+                # partes = [identidad, b"", payload] -> guardamos el sobre completo
+                sobre, payload = partes[:-1], partes[-1]
+                rechazo = None
+                if self.admision is not None:
+                    rechazo = self.admision(payload, self.cola.qsize(), self.espera_estimada())
+                if rechazo is not None:
+                    self._router.send_multipart(sobre + [rechazo.encode("utf-8")])
+                else:
+                    clase = self.clasificar(payload) if self.clasificar is not None else CLASE_SINCRONA
+                    self.cola.put((sobre, payload, clase, llegada), clase)
+
+            if self._pull_respuestas in eventos:
+                partes = self._pull_respuestas.recv_multipart()
+                self._router.send_multipart(partes)
+
+        self._router.close(linger=0)
+        self._pull_respuestas.close(linger=0)
+
+    # ----------------------------
+    # Hilos trabajadores
+    # ----------------------------
+
+    def _bucle_trabajador(self, numero: int):
+        push = self.context.socket(zmq.PUSH)
+        push.connect(self._endpoint_respuestas)
+
+        while True:
+            item = self.cola.get()
+            if item is None:
+                break
+
+            sobre, payload, clase, llegada = item
+            inicio = time.perf_counter()
+            self._actual.llegada = llegada
+            try:
+                respuesta = self.manejador(payload.decode("utf-8"))
+            except Exception as e:
+                print(f"Error en trabajador {numero}: {e}")
+                respuesta = json.dumps({"ok": False, "mensaje": "Error interno en trabajador", "error_interno": True})
+            fin = time.perf_counter()
+            self.servicio_medio += self.ALFA_SERVICIO * (fin - inicio - self.servicio_medio)
+            with self._lock_metricas:
+                self._latencias[clase].append((inicio - llegada, fin - llegada))
+                self._atendidas[clase] += 1
+
+            push.send_multipart(sobre + [respuesta.encode("utf-8")])
+
+        push.close(linger=0)
@@ -0,0 +1,368 @@
+"""
+supervisor.py
+Supervisor de procesos: levanta la topología de SUPERVISOR_COMPONENTES
+(config.py), vigila cada proceso y lo reinicia cuando cae.
+
+- Caída: el proceso terminó (con cualquier código), o, en los GA, no
+  respondió PING/PONG durante GA_HEALTHCHECK_TIMEOUT (colgado: se mata).
+- Reinicio con espera exponencial (SUPERVISOR_BACKOFF_*), así un proceso
+  que cae apenas arranca no se relanza en un ciclo apretado.
+- Promoción: si cae el GA primario y el respaldo responde, el supervisor
+  termina lo que quede del primario y promueve al respaldo con un mandato
+  nuevo (ver mandato_ga.py). El respaldo ya tiene la BD en memoria: es más
+  rápido que recargarla en el primario. El primario no se vuelve a
+  arrancar (arrancaría relegado).
+- Tiempo de recuperación: por cada caída, desde la última señal de vida
+  (proceso en pie, o PONG en los GA) hasta que el componente vuelve a
+  estar sano (PONG en los GA; proceso en pie en los demás) o hasta que el
+  respaldo acepta la promoción. Se imprime en cada recuperación y en un
+  resumen al salir (Ctrl+C).
+
+Para que el primario vuelva a ser el GA activo, con los dos GA detenidos:
+    python src/supervisor.py --reintegrar
+(copia la BD del respaldo sobre la del primario y sube el mandato).
+
+Uso (desde la raíz del proyecto):
+    python src/supervisor.py [--componentes ga,ga_respaldo,gc_1] [--logs DIR]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import zmq
+
+from config import (
+    SUPERVISOR_COMPONENTES,
+    SUPERVISOR_INTERVALO,
+    SUPERVISOR_GRACIA_ARRANQUE,
+    SUPERVISOR_BACKOFF_INICIAL,
+    SUPERVISOR_BACKOFF_MAX,
+    SUPERVISOR_ESTABLE_SEGUNDOS,
+    SUPERVISOR_PROMOCION_ACTIVA,
+    GA_HEALTHCHECK_INTERVAL,
+    GA_HEALTHCHECK_TIMEOUT,
+    GA_HEALTHCHECK_PORT,
+    GA_REPLICA_HEALTHCHECK_PORT,
+    GA_REPLICA_PORT,
+    GA_BD_EN_DISCO,
+    GA_BD_SQLITE_FILE,
+    DB_PRIMARY_FILE,
+    DB_REPLICA_FILE,
+    SEDE1_HOST,
+    SEDE2_HOST,
+)
+from mandato_ga import ROL_PRIMARIO, ROL_RESPALDO, guardar_mandato, leer_mandato
+from transporte import direccion_conexion
+
+
+DIRECTORIO_SRC = os.path.dirname(os.path.abspath(__file__))
+
+# Componentes con health-check PING/PONG: nombre -> (host, puerto)
+SONDAS = {
+    "ga": (SEDE1_HOST, GA_HEALTHCHECK_PORT),
+    "ga_respaldo": (SEDE2_HOST, GA_REPLICA_HEALTHCHECK_PORT),
+}
+
+
+# ============================
+# Health-check
+# ============================
+
+class Sonda:
+    """PING/PONG sin bloquear: atender() se llama en cada vuelta del supervisor."""
+
+    def __init__(self, context: zmq.Context, host: str, puerto: int):
+        self.socket = context.socket(zmq.REQ)
+        # Si un PING queda sin respuesta, el siguiente se envía igual
+        self.socket.setsockopt(zmq.REQ_RELAXED, 1)
+        self.socket.setsockopt(zmq.REQ_CORRELATE, 1)
+        self.socket.setsockopt(zmq.LINGER, 0)
+        self.socket.connect(direccion_conexion(host, puerto))
+        self.ultimo_ping = 0.0
+        self.ultimo_pong = 0.0
+
+    def atender(self, ahora: float, intervalo: float):
+        """Recoge los PONG que llegaron y envía un PING si ya pasó 'intervalo'."""
+        while self.socket.poll(0):
+            if self.socket.recv_string() == "PONG":
+                self.ultimo_pong = ahora
+        if ahora - self.ultimo_ping >= intervalo:
+            self.socket.send_string("PING")
+            self.ultimo_ping = ahora
+
+    def cerrar(self):
+        self.socket.close()
+
+
+def solicitar(context: zmq.Context, endpoint: str, mensaje: str, timeout_ms: int):
+    """Una solicitud REQ/REP con timeout. Retorna el texto de la respuesta o None."""
+    socket = context.socket(zmq.REQ)
+    socket.setsockopt(zmq.LINGER, 0)
+    socket.connect(endpoint)
+    try:
+        socket.send_string(mensaje)
+        if not socket.poll(timeout_ms):
+            return None
+        return socket.recv_string()
+    finally:
+        socket.close()
+
+
+# ============================
+# Componentes supervisados
+# ============================
+
+class Componente:
+    def __init__(self, nombre: str, script: str, argumentos: tuple):
+        self.nombre = nombre
+        self.script = script
+        self.argumentos = tuple(argumentos)
+
+        self.proceso = None
+        self.sonda = None
+        self.iniciado = 0.0
+        self.ultima_vida = 0.0
+        # Última vez que poll() vio el proceso vivo (una caída se nota ahí)
+        self.ultimo_vivo = 0.0
+        self.sano = False
+        self.sano_desde = 0.0
+        # Espera para el próximo arranque (None: no se arranca más)
+        self.proximo_arranque = 0.0
+        self.caidas_seguidas = 0
+
+        self.reinicios = 0
+        # Caída en curso (la misma entrada de Supervisor.incidentes)
+        self.incidente = None
+        # Segundos de cada recuperación
+        self.recuperaciones = []
+
+
+class Supervisor:
+    def __init__(self, componentes: list, directorio_logs: str, promocion: bool = SUPERVISOR_PROMOCION_ACTIVA):
+        self.componentes = componentes
+        self.directorio_logs = directorio_logs
+        self.promocion = promocion
+        self.context = zmq.Context.instance()
+        self.promociones = 0
+        # Todas las caídas, en orden: {"componente", "causa", "desde", "detectada", "recuperado", "como"}
+        self.incidentes = []
+
+    def log(self, texto: str):
+        print(f"[supervisor {time.strftime('%H:%M:%S')}] {texto}", flush=True)
+
+    # --- Procesos ---
+
+    def arrancar(self, c: Componente, ahora: float):
+        ruta_log = os.path.join(self.directorio_logs, f"{c.nombre}.log")
+        with open(ruta_log, "a", encoding="utf-8") as log:
+            c.proceso = subprocess.Popen(
+                [sys.executable, os.path.join(DIRECTORIO_SRC, c.script), *c.argumentos],
+                stdout=log, stderr=subprocess.STDOUT, env=dict(os.environ, PYTHONUNBUFFERED="1"),
+            )
+        c.iniciado = c.ultima_vida = c.ultimo_vivo = ahora
+        c.sano = False
+        if c.nombre in SONDAS:
+            if c.sonda is not None:
+                c.sonda.cerrar()
+            c.sonda = Sonda(self.context, *SONDAS[c.nombre])
+        if c.incidente is not None:
+            c.reinicios += 1
+        self.log(f"{c.nombre} arrancado (pid {c.proceso.pid}, log {ruta_log}).")
+
+    def detener(self, c: Componente):
+        if c.proceso is None or c.proceso.poll() is not None:
+            return
+        c.proceso.terminate()
+        try:
+            c.proceso.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            c.proceso.kill()
+            c.proceso.wait()
+
+    # --- Caídas y recuperación ---
+
+    def caida(self, c: Componente, causa: str, ahora: float, desde: float):
+        c.incidente = {"componente": c.nombre, "causa": causa, "desde": desde, "detectada": ahora}
+        self.incidentes.append(c.incidente)
+        c.proceso = None
+        c.sano = False
+        self.log(f"{c.nombre} caído: {causa} (sin señal de vida hace {ahora - desde:.2f} s).")
+
+        if c.nombre == "ga" and self.promocion and self.promover_respaldo():
+            c.proximo_arranque = None
+            self.recuperado(c, time.monotonic(), "respaldo promovido")
+            self.log("ga no se reinicia: el respaldo es el GA activo (ver --reintegrar).")
+            return
+
+        c.caidas_seguidas += 1
+        espera = min(SUPERVISOR_BACKOFF_MAX, SUPERVISOR_BACKOFF_INICIAL * 2 ** (c.caidas_seguidas - 1))
+        c.proximo_arranque = ahora + espera
+        self.log(f"{c.nombre}: reinicio en {espera:.1f} s (caída seguida #{c.caidas_seguidas}).")
+
+    def recuperado(self, c: Componente, ahora: float, como: str = "sano"):
+        c.sano = True
+        c.sano_desde = ahora
+        if c.incidente is not None:
+            duracion = ahora - c.incidente["desde"]
+            c.recuperaciones.append(duracion)
+            c.incidente.update(recuperado=ahora, como=como)
+            self.log(f"{c.nombre} recuperado ({como}): {duracion:.2f} s desde la última señal de vida "
+                     f"({ahora - c.incidente['detectada']:.2f} s desde la detección).")
+            c.incidente = None
+
+    def promover_respaldo(self) -> bool:
+        """Promueve al GA de respaldo si responde. Retorna True si aceptó."""
+        host, puerto = SONDAS["ga_respaldo"]
+        if solicitar(self.context, direccion_conexion(host, puerto), "PING", 1000) != "PONG":
+            self.log("El GA de respaldo no responde: no se promueve.")
+            return False
+
+        mandato, activo = leer_mandato()
+        if activo == ROL_RESPALDO:
+            return False
+        nuevo = mandato + 1
+        respuesta = solicitar(self.context, direccion_conexion(SEDE2_HOST, GA_REPLICA_PORT),
+                              json.dumps({"accion": "PROMOVER", "mandato": nuevo}), int(GA_HEALTHCHECK_TIMEOUT * 1000))
+        if respuesta is None or not json.loads(respuesta).get("ok"):
+            self.log(f"El GA de respaldo no aceptó la promoción: {respuesta}")
+            return False
+        # El respaldo ya lo guardó; si corre en otra máquina, aquí queda para el primario
+        guardar_mandato(nuevo, ROL_RESPALDO)
+        self.promociones += 1
+        self.log(f"GA de respaldo promovido con mandato {nuevo}.")
+        return True
+
+    # --- Bucle ---
+
+    def revisar(self, c: Componente, ahora: float):
+        if c.proceso is None:
+            if c.proximo_arranque is not None and ahora >= c.proximo_arranque:
+                self.arrancar(c, ahora)
+            return
+
+        codigo = c.proceso.poll()
+        if codigo is not None:
+            # Un proceso que termina deja de atender en cuanto muere, no en el último PONG
+            self.caida(c, f"terminó con código {codigo}", ahora, c.ultimo_vivo)
+            return
+        c.ultimo_vivo = ahora
+
+        if c.sonda is None:
+            c.ultima_vida = ahora
+            if not c.sano:
+                self.recuperado(c, ahora)
+        else:
+            # Mientras arranca se pregunta seguido: la recuperación se nota enseguida
+            c.sonda.atender(ahora, GA_HEALTHCHECK_INTERVAL if c.sano else SUPERVISOR_INTERVALO)
+            if c.sonda.ultimo_pong > c.iniciado:
+                c.ultima_vida = c.sonda.ultimo_pong
+                if not c.sano:
+                    self.recuperado(c, ahora)
+            referencia = max(c.ultima_vida, c.iniciado + (0 if c.sano else SUPERVISOR_GRACIA_ARRANQUE))
+            if ahora - referencia > GA_HEALTHCHECK_TIMEOUT:
+                # Colgado: se termina antes de reiniciarlo (o de promover al respaldo)
+                c.proceso.kill()
+                c.proceso.wait()
+                self.caida(c, f"no responde PING en {GA_HEALTHCHECK_TIMEOUT:.1f} s", ahora, c.ultima_vida)
+                return
+
+        if c.sano and c.caidas_seguidas and ahora - c.sano_desde >= SUPERVISOR_ESTABLE_SEGUNDOS:
+            c.caidas_seguidas = 0
+
+    def ejecutar(self, detenido: threading.Event = None):
+        """Arranca los componentes y los vigila hasta Ctrl+C (o hasta 'detenido')."""
+        _, activo = leer_mandato()
+        for c in self.componentes:
+            if c.nombre == "ga" and activo == ROL_RESPALDO:
+                c.proximo_arranque = None
+                self.log("ga no se arranca: el respaldo es el GA activo (ver --reintegrar).")
+            elif c.proximo_arranque is not None:
+                self.arrancar(c, time.monotonic())
+
+        while detenido is None or not detenido.is_set():
+            time.sleep(SUPERVISOR_INTERVALO)
+            ahora = time.monotonic()
+            for c in self.componentes:
+                self.revisar(c, ahora)
+
+    def cerrar(self):
+        for c in self.componentes:
+            self.detener(c)
+            if c.sonda is not None:
+                c.sonda.cerrar()
+
+    def resumen(self) -> str:
+        lineas = [f"{'componente':>20} {'reinicios':>9} {'recuperaciones':>14} {'mediana s':>10} {'máx s':>8}"]
+        for c in self.componentes:
+            tiempos = c.recuperaciones
+            mediana = f"{statistics.median(tiempos):.2f}" if tiempos else "-"
+            maximo = f"{max(tiempos):.2f}" if tiempos else "-"
+            lineas.append(f"{c.nombre:>20} {c.reinicios:>9} {len(tiempos):>14} {mediana:>10} {maximo:>8}")
+        lineas.append(f"Promociones del respaldo: {self.promociones}")
+        return "\n".join(lineas)
+
+
+# ============================
+# Reintegración del primario
+# ============================
+
+def reintegrar_primario():
+    """Con los dos GA detenidos: la BD del respaldo pasa al primario, que vuelve a ser el activo."""
+    mandato, activo = leer_mandato()
+    if activo != ROL_RESPALDO:
+        print("El GA primario ya es el GA activo.")
+        return
+    shutil.copyfile(DB_REPLICA_FILE, DB_PRIMARY_FILE)
+    if GA_BD_EN_DISCO and os.path.exists(GA_BD_SQLITE_FILE):
+        # Se vuelve a llenar desde DB_PRIMARY_FILE al arrancar
+        os.remove(GA_BD_SQLITE_FILE)
+    guardar_mandato(mandato + 1, ROL_PRIMARIO)
+    print(f"{DB_REPLICA_FILE} copiada a {DB_PRIMARY_FILE}; el primario es el GA activo (mandato {mandato + 1}).")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Supervisor de procesos del sistema de préstamos")
+    parser.add_argument("--componentes", default=",".join(SUPERVISOR_COMPONENTES),
+                        help="nombres de SUPERVISOR_COMPONENTES separados por coma")
+    parser.add_argument("--logs", default=os.path.join(tempfile.gettempdir(), "biblioteca-supervisor"),
+                        help="directorio para la salida de cada componente")
+    parser.add_argument("--sin-promocion", action="store_true", help="reiniciar el primario en lugar de promover")
+    parser.add_argument("--reintegrar", action="store_true", help="devolver el papel de activo al primario y salir")
+    args = parser.parse_args()
+
+    if args.reintegrar:
+        reintegrar_primario()
+        return
+
+    nombres = [n.strip() for n in args.componentes.split(",") if n.strip()]
+    desconocidos = [n for n in nombres if n not in SUPERVISOR_COMPONENTES]
+    if desconocidos:
+        print(f"Componentes desconocidos: {', '.join(desconocidos)}")
+        sys.exit(1)
+
+    os.makedirs(args.logs, exist_ok=True)
+    componentes = [Componente(n, *SUPERVISOR_COMPONENTES[n]) for n in nombres]
+    supervisor = Supervisor(componentes, args.logs, promocion=not args.sin_promocion)
+
+    # SIGTERM también detiene los procesos y muestra el resumen
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        supervisor.ejecutar()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        supervisor.cerrar()
+        print(supervisor.resumen())
+
+
+if __name__ == "__main__":
+    main()
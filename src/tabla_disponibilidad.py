@@ -0,0 +1,324 @@
+"""
+tabla_disponibilidad.py
+Tabla de ejemplares_disponibles en un archivo mapeado en memoria (mmap).
+
+El GA primario escribe aquí el contador de cada libro en el mismo momento
+en que cambia la BD. Los procesos de la misma máquina (el GC de la Sede 1,
+ver gestor_carga.py, y benchmark_disponibilidad.py) leen el contador
+directamente del archivo mapeado: sin pedir nada al GA y sin recargar el
+JSON de la BD.
+
+Formato del archivo (little-endian):
+- Encabezado de 64 bytes: firma, capacidad, ranuras usadas, secuencia
+  del flujo de cambios del GA (ver cache_disponibilidad.py) y latido
+  (time.time() de la última escritura del GA).
+- Una ranura de 32 bytes por libro: código (UTF-8, hasta 28 bytes,
+  relleno con ceros) y ejemplares_disponibles (int32). La ranura de un
+  libro no cambia mientras el GA corre; los libros nuevos se agregan al
+  final y el archivo crece.
+
+El GA arma el archivo al arrancar (se escribe aparte y reemplaza al
+anterior); un lector que ve el latido detenido vuelve a abrir el archivo.
+Las ranuras también se pueden leer con NumPy sin copiar (DTYPE_RANURA).
+"""
+
+import mmap
+import os
+import struct
+import threading
+import time
+
+from config import CACHE_MAX_DESFASE
+
+
+FIRMA = b"DISPON01"
+# firma, capacidad, usados, secuencia, latido
+_ENCABEZADO = struct.Struct("<8sQQQd")
+TAM_ENCABEZADO = 64
+TAM_RANURA = 32
+TAM_CODIGO = 28
+CAPACIDAD_MINIMA = 1024
+
+# Posición (en int32) del contador de la ranura 0 y distancia entre ranuras
+_CONTADOR_BASE = (TAM_ENCABEZADO + TAM_CODIGO) // 4
+_CONTADOR_PASO = TAM_RANURA // 4
+
+# Tipo NumPy de una ranura, para np.frombuffer(...) sobre el archivo mapeado
+DTYPE_RANURA = [("codigo", "S28"), ("ejemplares", "<i4")]
+
+
+def _codificar(codigo: str):
+    """Código en bytes, o None si no cabe en una ranura."""
+    datos = str(codigo).encode("utf-8")
+    return datos if 0 < len(datos) <= TAM_CODIGO else None
+
+
+# ============================
+# Lado GA (escritura)
+# ============================
+
+class TablaDisponibilidad:
+    """
+    Usar TablaDisponibilidad.crear(ruta, bd). actualizar() se llama desde
+    los trabajadores del GA con el lock del libro tomado.
+    """
+
+    def __init__(self, ruta_archivo: str):
+        self.ruta_archivo = ruta_archivo
+        self._lock = threading.Lock()
+        self._archivo = open(ruta_archivo, "r+b")
+        self._mapear()
+
+        _, self.capacidad, self.usados, self.secuencia, _ = _ENCABEZADO.unpack_from(self._mmap, 0)
+        self._ranuras = {}
+        for ranura in range(self.usados):
+            inicio = TAM_ENCABEZADO + ranura * TAM_RANURA
+            self._ranuras[bytes(self._mmap[inicio:inicio + TAM_CODIGO]).rstrip(b"\0").decode("utf-8")] = ranura
+
+        # Libros cuyo código no cabe en una ranura (los lectores van al GA)
+        self.omitidos = 0
+
+    @classmethod
+    def crear(cls, ruta_archivo: str, bd: dict, secuencia: int = 0):
+        """Escribe la tabla con los libros de 'bd' y la abre para actualizarla."""
+        libros = []
+        omitidos = 0
+        for codigo, libro in bd.items():
+            datos = _codificar(codigo)
+            if datos is None:
+                omitidos += 1
+            else:
+                libros.append((datos, libro.get("ejemplares_disponibles", 0)))
+
+        capacidad = max(CAPACIDAD_MINIMA, 2 * len(libros))
+        temporal = ruta_archivo + ".tmp"
+        with open(temporal, "wb") as f:
+            f.write(_ENCABEZADO.pack(FIRMA, capacidad, len(libros), secuencia, time.time()).ljust(TAM_ENCABEZADO, b"\0"))
+            ranura = struct.Struct(f"<{TAM_CODIGO}si")
+            for datos, ejemplares in libros:
+                f.write(ranura.pack(datos, ejemplares))
+            f.truncate(TAM_ENCABEZADO + capacidad * TAM_RANURA)
+            # El latido cuenta desde que la tabla está completa
+            f.seek(0)
+            f.write(_ENCABEZADO.pack(FIRMA, capacidad, len(libros), secuencia, time.time()))
+        cls._retirar(ruta_archivo)
+        os.replace(temporal, ruta_archivo)
+
+        tabla = cls(ruta_archivo)
+        tabla.omitidos = omitidos
+        return tabla
+
+    @staticmethod
+    def _retirar(ruta_archivo: str):
+        """
+        Deja en 0 el latido de la tabla anterior (de un GA que ya no corre):
+        los lectores que aún la tienen mapeada la reabren enseguida.
+        """
+        try:
+            with open(ruta_archivo, "r+b") as f:
+                if f.read(len(FIRMA)) == FIRMA:
+                    f.seek(_ENCABEZADO.size - 8)
+                    f.write(struct.pack("<d", 0.0))
+        except FileNotFoundError:
+            pass
+
+    def _mapear(self):
+        self._mmap = mmap.mmap(self._archivo.fileno(), 0)
+        self._enteros = memoryview(self._mmap).cast("i")
+
+    def _crecer(self):
+        """Duplica la capacidad. Los lectores vuelven a mapear al ver más ranuras."""
+        self.capacidad *= 2
+        self._enteros.release()
+        self._mmap.close()
+        self._archivo.truncate(TAM_ENCABEZADO + self.capacidad * TAM_RANURA)
+        self._mapear()
+
+    def _escribir_encabezado(self):
+        _ENCABEZADO.pack_into(self._mmap, 0, FIRMA, self.capacidad, self.usados, self.secuencia, time.time())
+
+    def actualizar(self, codigo: str, ejemplares: int, secuencia: int = None):
+        """
+        Escribe el contador del libro (le asigna ranura si es nuevo) y, si se
+        indica, la secuencia del cambio en el flujo del GA.
+        """
+        with self._lock:
+            ranura = self._ranuras.get(codigo)
+            if ranura is None:
+                datos = _codificar(codigo)
+                if datos is None:
+                    self.omitidos += 1
+                    return
+                if self.usados == self.capacidad:
+                    self._crecer()
+                ranura = self.usados
+                inicio = TAM_ENCABEZADO + ranura * TAM_RANURA
+                self._mmap[inicio:inicio + TAM_CODIGO] = datos.ljust(TAM_CODIGO, b"\0")
+                self._ranuras[codigo] = ranura
+                self.usados += 1
+
+            # Un solo int32 alineado: un lector nunca ve un valor a medias
+            self._enteros[_CONTADOR_BASE + ranura * _CONTADOR_PASO] = ejemplares
+            # Se escribe después del contador: quien ve la secuencia ya ve el cambio
+            if secuencia is not None and secuencia > self.secuencia:
+                self.secuencia = secuencia
+            self._escribir_encabezado()
+
+    def latido(self):
+        """Renueva el latido aunque no haya cambios (el GA sigue vivo)."""
+        with self._lock:
+            self._escribir_encabezado()
+
+    def cerrar(self):
+        with self._lock:
+            self._enteros.release()
+            self._mmap.close()
+            self._archivo.close()
+
+
+# ============================
+# Lado lector (GC, analítica)
+# ============================
+
+class LectorDisponibilidad:
+    """
+    Lee la tabla del GA. consultar() tiene la misma forma que
+    CacheDisponibilidad.consultar: retorna la respuesta para el PS, o None
+    si la tabla no está al día (GA detenido o sin 'secuencia_minima').
+    """
+
+    def __init__(self, ruta_archivo: str, max_desfase: float = CACHE_MAX_DESFASE):
+        self.ruta_archivo = ruta_archivo
+        self.max_desfase = max_desfase
+
+        self._lock = threading.Lock()
+        self._mmap = None
+        self._ranuras = {}
+        self._indexadas = 0
+        self._inodo = None
+
+        self.aciertos = 0
+        self.rechazadas = 0
+
+    def _abrir(self) -> bool:
+        """(Re)abre el archivo. Retorna False si todavía no existe."""
+        self._cerrar_mapa()
+        try:
+            with open(self.ruta_archivo, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._inodo = os.fstat(f.fileno()).st_ino
+        except (FileNotFoundError, ValueError):
+            return False
+        if self._mmap[:len(FIRMA)] != FIRMA:
+            self._cerrar_mapa()
+            return False
+        self._enteros = memoryview(self._mmap).cast("i")
+        self._ranuras = {}
+        self._indexadas = 0
+        return True
+
+    def _cerrar_mapa(self):
+        if self._mmap is not None:
+            self._enteros.release()
+            self._mmap.close()
+            self._mmap = None
+
+    def _encabezado(self):
+        """(usados, secuencia, latido)"""
+        _, _, usados, secuencia, latido = _ENCABEZADO.unpack_from(self._mmap, 0)
+        return usados, secuencia, latido
+
+    def _indexar(self, usados: int):
+        """Agrega al índice las ranuras nuevas; si el archivo creció, lo vuelve a mapear."""
+        if TAM_ENCABEZADO + usados * TAM_RANURA > len(self._mmap):
+            inodo, indexadas, ranuras = self._inodo, self._indexadas, self._ranuras
+            if not self._abrir():
+                return
+            if self._inodo == inodo:
+                self._indexadas, self._ranuras = indexadas, ranuras
+            else:
+                # Es otro archivo (el GA se reinició): se indexa desde cero
+                usados = self._encabezado()[0]
+        for ranura in range(self._indexadas, usados):
+            inicio = TAM_ENCABEZADO + ranura * TAM_RANURA
+            codigo = bytes(self._mmap[inicio:inicio + TAM_CODIGO]).rstrip(b"\0").decode("utf-8")
+            self._ranuras[codigo] = ranura
+        self._indexadas = max(self._indexadas, usados)
+
+    def _al_dia(self) -> bool:
+        """Con self._lock tomado: abre o reabre la tabla si hace falta."""
+        if self._mmap is None and not self._abrir():
+            return False
+        if time.time() - self._encabezado()[2] <= self.max_desfase:
+            return True
+        # Latido detenido: quizá el GA se reinició y creó otro archivo
+        try:
+            if os.stat(self.ruta_archivo).st_ino != self._inodo and self._abrir():
+                return time.time() - self._encabezado()[2] <= self.max_desfase
+        except FileNotFoundError:
+            pass
+        return False
+
+    def ejemplares(self, codigo: str):
+        """Contador del libro, o None si no está en la tabla (sin revisar el latido)."""
+        with self._lock:
+            if self._mmap is None and not self._abrir():
+                return None
+            return self._ejemplares(codigo)
+
+    def ranura(self, codigo: str):
+        """
+        Ranura del libro, o None. Es estable mientras el GA no se reinicie:
+        quien la guarda lee el contador con leer_ranura() sin buscar el código.
+        """
+        with self._lock:
+            if self._mmap is None and not self._abrir():
+                return None
+            if codigo not in self._ranuras:
+                self._indexar(self._encabezado()[0])
+            return self._ranuras.get(codigo)
+
+    def leer_ranura(self, ranura: int) -> int:
+        return self._enteros[_CONTADOR_BASE + ranura * _CONTADOR_PASO]
+
+    def _ejemplares(self, codigo: str):
+        ranura = self._ranuras.get(codigo)
+        if ranura is None:
+            usados = self._encabezado()[0]
+            if usados == self._indexadas:
+                return None
+            self._indexar(usados)
+            ranura = self._ranuras.get(codigo)
+            if ranura is None:
+                return None
+        return self._enteros[_CONTADOR_BASE + ranura * _CONTADOR_PASO]
+
+    def consultar(self, codigo: str, secuencia_minima: int = 0):
+        with self._lock:
+            if not self._al_dia():
+                self.rechazadas += 1
+                return None
+            # La secuencia se lee antes que el contador (el GA escribe al revés)
+            _, secuencia, latido = self._encabezado()
+            if secuencia < secuencia_minima:
+                self.rechazadas += 1
+                return None
+            ejemplares = self._ejemplares(codigo)
+            if ejemplares is None:
+                # Código que no cabe en una ranura, o libro que la tabla aún no tiene
+                self.rechazadas += 1
+                return None
+            self.aciertos += 1
+
+        return {
+            "ok": True,
+            "mensaje": "Consulta realizada",
+            "ejemplares_disponibles": ejemplares,
+            "secuencia": secuencia,
+            "desfase_ms": int(max(0.0, time.time() - latido) * 1000),
+            "fuente": "tabla",
+        }
+
+    def cerrar(self):
+        with self._lock:
+            self._cerrar_mapa()
@@ -0,0 +1,42 @@
+"""
+transporte.py
+Direcciones ZeroMQ de los componentes según TRANSPORTE (config.py).
+
+Cada componente se identifica por su puerto de config.py, con cualquier
+transporte:
+- tcp:    bind "tcp://*:5580", connect "tcp://HOST:5580"
+- ipc:    "ipc://IPC_DIRECTORIO/5580.sock" (el host no se usa: es la
+          misma máquina)
+- inproc: "inproc://biblioteca-5580" (mismo proceso y mismo contexto)
+
+Con inproc los dos extremos deben compartir el contexto ZeroMQ, por eso
+los procesos usan zmq.Context.instance() (uno por proceso) en lugar de
+crear el suyo.
+"""
+
+import os
+
+from config import TRANSPORTE, IPC_DIRECTORIO
+
+
+TRANSPORTES = ("tcp", "ipc", "inproc")
+
+
+def direccion_bind(puerto: int) -> str:
+    """Dirección donde un componente hace bind de su puerto."""
+    if TRANSPORTE == "tcp":
+        return f"tcp://*:{puerto}"
+    if TRANSPORTE == "ipc":
+        os.makedirs(IPC_DIRECTORIO, exist_ok=True)
+    return direccion_conexion(None, puerto)
+
+
+def direccion_conexion(host: str, puerto: int) -> str:
+    """Dirección a la que se conecta quien habla con el puerto de 'host'."""
+    if TRANSPORTE == "tcp":
+        return f"tcp://{host}:{puerto}"
+    if TRANSPORTE == "ipc":
+        return f"ipc://{os.path.join(IPC_DIRECTORIO, f'{puerto}.sock')}"
+    if TRANSPORTE == "inproc":
+        return f"inproc://biblioteca-{puerto}"
+    raise ValueError(f"Transporte no reconocido: {TRANSPORTE} (válidos: {', '.join(TRANSPORTES)})")
@@ -0,0 +1,183 @@
+"""
+vencimientos.py
+Índice de vencimientos de préstamos.
+
+Los préstamos guardan "fecha_fin" como texto (str(datetime)), así que
+encontrar los atrasados obligaba a recorrer y parsear todos los préstamos
+del catálogo. Este índice mantiene un heap ordenado por fecha_fin:
+
+- registrar_prestamo / registrar_renovacion / registrar_devolucion (ver
+  base_datos.py) lo actualizan en O(log n) por cambio.
+- avanzar() saca del heap los préstamos que ya vencieron (O(log n) cada
+  uno) y los pasa al conjunto de vencidos; el barrido periódico del GA
+  publica un aviso por cada préstamo que vence (tópico VENCIDO).
+- vencidos() responde la consulta VENCIDOS sin recorrer la BD.
+- libros_de_usuario() da los libros con préstamos activos de un usuario,
+  para responder PRESTAMOS_USUARIO sin recorrer la BD.
+
+Cada préstamo se identifica por (codigo_libro, usuario, fecha_inicio);
+una renovación conserva fecha_inicio y solo cambia fecha_fin. Las
+entradas viejas del heap (renovaciones, devoluciones) se descartan al
+salir y el heap se reconstruye si acumula demasiadas.
+"""
+
+import heapq
+import threading
+import time
+from datetime import datetime
+
+
+def a_timestamp(fecha: str) -> float:
+    """Convierte un str(datetime) de la BD a segundos desde epoch."""
+    return datetime.fromisoformat(fecha).timestamp()
+
+
+class IndiceVencimientos:
+    """
+    - notificar: si es True, avanzar() acumula los préstamos que van
+      venciendo para que el barrido los publique (solo el GA primario)
+    """
+
+    def __init__(self, notificar: bool = False):
+        self.notificar = notificar
+
+        self._lock = threading.Lock()
+        # (fecha_fin_ts, clave) con clave = (codigo, usuario, fecha_inicio)
+        self._heap = []
+        # clave -> (fecha_fin_ts, fecha_fin) de los préstamos activos sin vencer
+        self._vigentes = {}
+        # clave -> (fecha_fin_ts, fecha_fin) de los préstamos activos ya vencidos
+        self._vencidos = {}
+        # codigo -> claves de sus préstamos activos (para actualizar_libro)
+        self._por_libro = {}
+        # usuario -> claves de sus préstamos activos (para libros_de_usuario)
+        self._por_usuario = {}
+        self._por_notificar = []
+
+    @classmethod
+    def desde_bd(cls, bd: dict, notificar: bool = False):
+        """Arma el índice recorriendo la BD una sola vez (al arrancar el GA)."""
+        indice = cls(notificar)
+        for codigo, libro in bd.items():
+            indice.actualizar_libro(codigo, libro)
+        # Lo que ya estaba vencido al arrancar no se vuelve a avisar
+        indice.avanzar(time.time())
+        indice.tomar_por_notificar()
+        return indice
+
+    @classmethod
+    def desde_prestamos(cls, prestamos, notificar: bool = False):
+        """
+        Arma el índice desde (codigo, usuario, fecha_inicio, fecha_fin) de
+        cada préstamo activo, sin recorrer los libros (BD en disco, ver
+        almacen_libros.prestamos_activos).
+        """
+        indice = cls(notificar)
+        for codigo, usuario, fecha_inicio, fecha_fin in prestamos:
+            indice._registrar((codigo, usuario, fecha_inicio), fecha_fin)
+        indice.avanzar(time.time())
+        indice.tomar_por_notificar()
+        return indice
+
+    def __len__(self):
+        with self._lock:
+            return len(self._vigentes) + len(self._vencidos)
+
+    # ---- cambios ----
+
+    def _registrar(self, clave: tuple, fecha_fin: str):
+        ts = a_timestamp(fecha_fin)
+        self._vencidos.pop(clave, None)
+        self._vigentes[clave] = (ts, fecha_fin)
+        self._por_libro.setdefault(clave[0], set()).add(clave)
+        self._por_usuario.setdefault(clave[1], set()).add(clave)
+        heapq.heappush(self._heap, (ts, clave))
+
+        # Demasiadas entradas viejas: se reconstruye el heap
+        if len(self._heap) > 2 * len(self._vigentes) + 64:
+            self._heap = [(ts, c) for c, (ts, _) in self._vigentes.items()]
+            heapq.heapify(self._heap)
+
+    def _quitar(self, clave: tuple):
+        self._vigentes.pop(clave, None)
+        self._vencidos.pop(clave, None)
+        claves = self._por_libro.get(clave[0])
+        if claves is not None:
+            claves.discard(clave)
+            if not claves:
+                del self._por_libro[clave[0]]
+        claves = self._por_usuario.get(clave[1])
+        if claves is not None:
+            claves.discard(clave)
+            if not claves:
+                del self._por_usuario[clave[1]]
+
+    def registrar(self, codigo: str, usuario: str, fecha_inicio: str, fecha_fin: str):
+        """Préstamo nuevo o renovado."""
+        with self._lock:
+            self._registrar((codigo, usuario, fecha_inicio), fecha_fin)
+
+    def quitar(self, codigo: str, usuario: str, fecha_inicio: str):
+        """Préstamo devuelto."""
+        with self._lock:
+            self._quitar((codigo, usuario, fecha_inicio))
+
+    def actualizar_libro(self, codigo: str, libro: dict):
+        """
+        Deja el índice igual a los préstamos de 'libro' (carga inicial y
+        cambios replicados, que traen el estado del libro y no la operación).
+        """
+        actuales = {
+            (codigo, p["usuario"], p.get("fecha_inicio", "")): p["fecha_fin"]
+            for p in (libro or {}).get("prestamos", [])
+        }
+
+        with self._lock:
+            for clave in list(self._por_libro.get(codigo, ())):
+                if clave not in actuales:
+                    self._quitar(clave)
+
+            for clave, fecha_fin in actuales.items():
+                previo = self._vigentes.get(clave) or self._vencidos.get(clave)
+                if previo is None or previo[1] != fecha_fin:
+                    self._registrar(clave, fecha_fin)
+
+    # ---- consultas ----
+
+    def avanzar(self, ahora: float) -> int:
+        """Pasa a vencidos los préstamos con fecha_fin <= ahora. Retorna cuántos."""
+        nuevos = 0
+        with self._lock:
+            while self._heap and self._heap[0][0] <= ahora:
+                ts, clave = heapq.heappop(self._heap)
+                actual = self._vigentes.get(clave)
+                if actual is None or actual[0] != ts:
+                    # Entrada vieja (renovado o devuelto)
+                    continue
+                del self._vigentes[clave]
+                self._vencidos[clave] = actual
+                if self.notificar:
+                    self._por_notificar.append((clave, actual[1]))
+                nuevos += 1
+        return nuevos
+
+    def tomar_por_notificar(self) -> list:
+        """Préstamos que vencieron desde la última llamada: [((codigo, usuario, inicio), fecha_fin), ...]"""
+        with self._lock:
+            pendientes, self._por_notificar = self._por_notificar, []
+        return pendientes
+
+    def libros_de_usuario(self, usuario: str) -> list:
+        """Códigos de los libros con algún préstamo activo de 'usuario', ordenados."""
+        with self._lock:
+            return sorted({codigo for codigo, _, _ in self._por_usuario.get(usuario, ())})
+
+    def vencidos(self, ahora: float = None) -> list:
+        """Préstamos vencidos, ordenados por fecha_fin."""
+        self.avanzar(time.time() if ahora is None else ahora)
+        with self._lock:
+            ordenados = sorted(self._vencidos.items(), key=lambda item: item[1][0])
+        return [
+            {"codigo_libro": codigo, "usuario": usuario, "fecha_fin": fecha_fin}
+            for (codigo, usuario, _), (_, fecha_fin) in ordenados
+        ]